@@ -395,9 +395,19 @@ class AccountReaper(Daemon):
                 if not policy:
                     self.logger.error('ERROR: invalid storage policy index: %r'
                                       % policy_index)
-                for obj in objects:
+                try:
+                    # look up the whole page of objects in one go
+                    obj_parts_and_nodes = self.get_object_ring(
+                        policy_index).get_nodes_bulk(
+                            [(account, container, obj['name'])
+                             for obj in objects])
+                except PolicyError:
+                    obj_parts_and_nodes = [None] * len(objects)
+                for obj, obj_part_and_nodes in zip(objects,
+                                                   obj_parts_and_nodes):
                     pool.spawn(self.reap_object, account, container, part,
-                               nodes, obj['name'], policy_index)
+                               nodes, obj['name'], policy_index,
+                               obj_part_and_nodes=obj_part_and_nodes)
                 pool.waitall()
             except (Exception, Timeout):
                 self.logger.exception('Exception with objects for container '
@@ -451,7 +461,8 @@ class AccountReaper(Daemon):
             self.logger.increment('containers_possibly_remaining')
 
     def reap_object(self, account, container, container_partition,
-                    container_nodes, obj, policy_index):
+                    container_nodes, obj, policy_index,
+                    obj_part_and_nodes=None):
         """
         Deletes the given object by issuing a delete request to each node for
         the object. The format of the delete request is such that each object
@@ -468,6 +479,8 @@ class AccountReaper(Daemon):
         :param container_nodes: The primary node dicts for the container.
         :param obj: The name of the object to delete.
         :param policy_index: The storage policy index of the object's container
+        :param obj_part_and_nodes: The (partition, node dicts) for the object,
+                                   if the caller has already looked them up.
 
         * See also: :func:`swift.common.ring.Ring.get_nodes` for a description
           of the container node dicts.
@@ -479,7 +492,9 @@ class AccountReaper(Daemon):
             self.stats_objects_remaining += 1
             self.logger.increment('objects_remaining')
             return
-        part, nodes = ring.get_nodes(account, container, obj)
+        if obj_part_and_nodes is None:
+            obj_part_and_nodes = ring.get_nodes(account, container, obj)
+        part, nodes = obj_part_and_nodes
         successes = 0
         failures = 0
         timestamp = Timestamp.now()
@@ -23,14 +23,15 @@ from eventlet import Timeout
 import swift.common.db
 from swift.account.backend import AccountBroker, DATADIR
 from swift.account.utils import account_listing_response, get_response_headers
-from swift.common.db import DatabaseConnectionError, DatabaseAlreadyExists
+from swift.common.db import DatabaseConnectionError, \
+    DatabaseAlreadyExists, ConnectionPool
 from swift.common.request_helpers import get_param, \
     split_and_validate_path, validate_internal_account, \
     validate_internal_container, constrain_req_limit
 from swift.common.utils import get_logger, hash_path, public, \
     Timestamp, storage_directory, config_true_value, \
     timing_stats, replication, get_log_line, \
-    config_fallocate_value, fs_has_free_space
+    config_fallocate_value, fs_has_free_space, non_negative_int
 from swift.common.constraints import valid_timestamp, check_utf8, \
     check_drive, AUTO_CREATE_ACCOUNT_PREFIX
 from swift.common import constraints
@@ -101,8 +102,17 @@ class AccountController(BaseStorageServer):
             config_true_value(conf.get('db_preallocation', 'f'))
         swift.common.db.QUERY_LOGGING = \
             config_true_value(conf.get('db_query_logging', 'f'))
+        swift.common.db.BINARY_PENDING = \
+            config_true_value(conf.get('db_binary_pending', 'f'))
         self.fallocate_reserve, self.fallocate_is_percent = \
             config_fallocate_value(conf.get('fallocate_reserve', '1%'))
+        connection_pool_size = non_negative_int(
+            conf.get('db_connection_pool_size', 0))
+        if connection_pool_size:
+            self.connection_pool = ConnectionPool(
+                max_size=connection_pool_size, logger=self.logger)
+        else:
+            self.connection_pool = None
 
     def _get_account_broker(self, drive, part, account, **kwargs):
         hsh = hash_path(account)
@@ -110,6 +120,7 @@ class AccountController(BaseStorageServer):
         db_path = os.path.join(self.root, drive, db_dir, hsh + '.db')
         kwargs.setdefault('account', account)
         kwargs.setdefault('logger', self.logger)
+        kwargs.setdefault('connection_pool', self.connection_pool)
         return AccountBroker(db_path, **kwargs)
 
     def _deleted_response(self, broker, req, resp, body=''):
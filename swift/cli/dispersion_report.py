@@ -125,8 +125,9 @@ def container_dispersion_report(coropool, connpool, account, container_ring,
                       end='')
                 stdout.flush()
     container_parts = {}
-    for container in containers:
-        part, nodes = container_ring.get_nodes(account, container)
+    for container, (part, nodes) in zip(
+            containers, container_ring.get_nodes_bulk(
+                [(account, container) for container in containers])):
         if part not in container_parts:
             container_copies_expected[0] += len(nodes)
             container_parts[part] = part
@@ -238,8 +239,9 @@ def object_dispersion_report(coropool, connpool, account, object_ring,
                       end='')
             stdout.flush()
     object_parts = {}
-    for obj in objects:
-        part, nodes = object_ring.get_nodes(account, container, obj)
+    for obj, (part, nodes) in zip(
+            objects, object_ring.get_nodes_bulk(
+                [(account, container, obj) for obj in objects])):
         if part not in object_parts:
             object_copies_expected[0] += len(nodes)
             object_parts[part] = part
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Rebuild or verify the hashes indexes of object partitions.
+
+``rebuild`` walks each partition and replaces its hashes.index with what it
+finds. ``verify`` walks each partition that has an index and reports object
+hash dirs that are missing from it, which the object server would not see,
+and index entries with no objects behind them, which are harmless and will
+be dropped the next time their suffix is rehashed.
+"""
+from __future__ import print_function
+
+import argparse
+import errno
+import os
+
+from swift.common.exceptions import LockTimeout
+from swift.common.storage_policy import POLICIES
+from swift.common.utils import listdir, non_negative_int
+from swift.common.constraints import check_drive
+from swift.obj import diskfile
+
+EXIT_SUCCESS = 0
+EXIT_ERROR = 1
+EXIT_MISMATCH = 2
+
+
+def policy(policy_name_or_index):
+    value = POLICIES.get_by_name_or_index(policy_name_or_index)
+    if value is None:
+        raise ValueError
+    return value
+
+
+def walk_partition(part_path):
+    """
+    :returns: a dict mapping the suffixes in a partition to lists of the
+              object hash dirs in them
+    """
+    found = {}
+    for suffix in listdir(part_path):
+        if not diskfile.valid_suffix(suffix):
+            continue
+        try:
+            found[suffix] = listdir(os.path.join(part_path, suffix))
+        except OSError as err:
+            if err.errno not in (errno.ENOTDIR, errno.ENODATA):
+                raise
+    return found
+
+
+def rebuild_partition(part_path):
+    token = diskfile.start_hashes_index(part_path)
+    found = walk_partition(part_path)
+    if diskfile.finish_hashes_index(part_path, token, found):
+        print('Indexed %s' % part_path)
+    else:
+        print('Index of %s was rebuilt concurrently' % part_path)
+    return True
+
+
+def verify_partition(part_path):
+    index = diskfile.read_hashes_index(part_path)
+    if index is None:
+        print('No usable index in %s' % part_path)
+        return True
+    found = walk_partition(part_path)
+    ok = True
+    for suffix in sorted(set(found) | set(index)):
+        on_disk = set(found.get(suffix, ()))
+        indexed = index.get(suffix, set())
+        for object_hash in sorted(on_disk - indexed):
+            hsh_path = os.path.join(part_path, suffix, object_hash)
+            if listdir(hsh_path):
+                print('Not indexed: %s' % hsh_path)
+                ok = False
+        for object_hash in sorted(indexed - on_disk):
+            print('Stale index entry: %s' % os.path.join(
+                part_path, suffix, object_hash))
+    return ok
+
+
+def process_device(devices, device, policies, partitions, action,
+                   mount_check):
+    try:
+        check_drive(devices, device, mount_check)
+    except ValueError as err:
+        print('Skipping: %s' % err)
+        return True
+    ok = True
+    for pol in policies:
+        datadir = os.path.join(devices, device, diskfile.get_data_dir(pol))
+        for partition in sorted(listdir(datadir)):
+            if not partition.isdigit():
+                continue
+            if partitions and int(partition) not in partitions:
+                continue
+            part_path = os.path.join(datadir, partition)
+            if not os.path.isdir(part_path):
+                continue
+            try:
+                ok = action(part_path) and ok
+            except (IOError, OSError, LockTimeout) as err:
+                print('Error processing %s: %s' % (part_path, err))
+                ok = False
+    return ok
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('action', choices=['rebuild', 'verify'])
+    parser.add_argument('--devices', default='/srv/node',
+                        help='Path to swift device directory')
+    parser.add_argument('--device', default=[], dest='device_list',
+                        action='append',
+                        help='Device name to process (default: all)')
+    parser.add_argument(
+        '--policy', default=[], dest='policies',
+        action='append', type=policy,
+        help='Policy to process; may specify multiple (default: all)')
+    parser.add_argument('--partition', '-p', default=[], dest='partitions',
+                        type=non_negative_int, action='append',
+                        help='Partition to process (default: all)')
+    parser.add_argument('--skip-mount-check', default=False,
+                        help='Don\'t test if disk is mounted',
+                        action='store_true', dest='skip_mount_check')
+    args = parser.parse_args(args)
+
+    action = {'rebuild': rebuild_partition,
+              'verify': verify_partition}[args.action]
+    devices = args.device_list or listdir(args.devices)
+    ok = True
+    for device in sorted(devices):
+        ok = process_device(
+            args.devices, device, args.policies or POLICIES,
+            set(args.partitions), action,
+            not args.skip_mount_check) and ok
+    if ok:
+        return EXIT_SUCCESS
+    return EXIT_MISMATCH if args.action == 'verify' else EXIT_ERROR
@@ -230,11 +230,13 @@ class SwiftRecon(object):
         if self.server_type == 'object':
             for ring_name in os.listdir(swift_dir):
                 if ring_name.startswith('object') and \
-                        ring_name.endswith('.ring.gz'):
+                        ring_name.endswith(('.ring.gz', '.ring')):
                     ring_names.add(ring_name)
         else:
             ring_name = '%s.ring.gz' % self.server_type
             ring_names.add(ring_name)
+            if os.path.exists(os.path.join(swift_dir, ring_name[:-3])):
+                ring_names.add(ring_name[:-3])
         rings = {}
         for ring_name in ring_names:
             rings[ring_name] = md5_hash_for_file(
@@ -349,7 +349,8 @@ class Relinker(object):
                         self.diskfile_mgr.partition_lock(
                             device, self.policy, partition):
                         # Order here is somewhat important for crash-tolerance
-                        for f in ('hashes.pkl', 'hashes.invalid', '.lock',
+                        for f in ('hashes.pkl', 'hashes.bin',
+                                  'hashes.invalid', 'hashes.index', '.lock',
                                   '.lock-replication'):
                             try:
                                 os.unlink(os.path.join(partition_path, f))
@@ -90,6 +90,9 @@ ARG_PARSER = argparse.ArgumentParser(
 ARG_PARSER.add_argument(
     '--check', '-c', action='store_true',
     help="Just check the scenario, don't execute it.")
+ARG_PARSER.add_argument(
+    '--processes', '-p', type=int, default=1,
+    help="Number of processes each rebalance may use.")
 ARG_PARSER.add_argument(
     'scenario_path',
     help="Path to the scenario file")
@@ -277,9 +280,12 @@ def parse_scenario(scenario_data):
     return parsed_scenario
 
 
-def run_scenario(scenario):
+def run_scenario(scenario, processes=1):
     """
     Takes a parsed scenario (like from parse_scenario()) and runs it.
+
+    :param processes: number of processes each rebalance may use
+    :returns: the RingBuilder in its final state
     """
     seed = scenario['random_seed']
 
@@ -305,14 +311,16 @@ def run_scenario(scenario):
             command_f(*command)
 
         rebalance_number = 1
-        parts_moved, old_balance, removed_devs = rb.rebalance(seed=seed)
+        parts_moved, old_balance, removed_devs = rb.rebalance(
+            seed=seed, processes=processes)
         rb.pretend_min_part_hours_passed()
         print("\tRebalance 1: moved %d parts, balance is %.6f, %d removed "
               "devs" % (parts_moved, old_balance, removed_devs))
 
         while True:
             rebalance_number += 1
-            parts_moved, new_balance, removed_devs = rb.rebalance(seed=seed)
+            parts_moved, new_balance, removed_devs = rb.rebalance(
+                seed=seed, processes=processes)
             rb.pretend_min_part_hours_passed()
             print("\tRebalance %d: moved %d parts, balance is %.6f, "
                   "%d removed devs" % (rebalance_number, parts_moved,
@@ -325,6 +333,8 @@ def run_scenario(scenario):
                 break
             old_balance = new_balance
 
+    return rb
+
 
 def main(argv=None):
     args = ARG_PARSER.parse_args(argv)
@@ -345,5 +355,5 @@ def main(argv=None):
         return 1
 
     if not args.check:
-        run_scenario(scenario)
+        run_scenario(scenario, processes=args.processes)
     return 0
@@ -530,6 +530,21 @@ def _make_display_device_table(builder):
     return header_line, print_dev_f
 
 
+def _write_ring_files(ring_data, mmap=False):
+    """
+    Write the ring file and, if asked for or if there already is one, the
+    uncompressed <ring_name>.ring file next to it.
+
+    The .ring file is written last, so that it is never older than the
+    .ring.gz file; servers ignore a .ring file that is older.
+    """
+    ring_data.save(ring_file)
+    if ring_file.endswith('.ring.gz'):
+        v2_file = ring_file[:-len('.gz')]
+        if mmap or exists(v2_file):
+            ring_data.save(v2_file, format_version=2)
+
+
 class Commands(object):
     @staticmethod
     def unknown():
@@ -1053,6 +1068,10 @@ swift-ring-builder <builder_file> rebalance [options]
         parser.add_option('-s', '--seed', help="seed to use for rebalance")
         parser.add_option('-d', '--debug', action='store_true',
                           help="print debug information")
+        parser.add_option('-p', '--processes', type='int', default=1,
+                          help="number of processes to use for the parts of "
+                          "the rebalance that scan every partition; the "
+                          "resulting ring is the same however many are used")
         options, args = parser.parse_args(argv)
 
         def get_seed(index):
@@ -1082,7 +1101,8 @@ swift-ring-builder <builder_file> rebalance [options]
         try:
             last_balance = builder.get_balance()
             last_dispersion = builder.dispersion
-            parts, balance, removed_devs = builder.rebalance(seed=get_seed(3))
+            parts, balance, removed_devs = builder.rebalance(
+                seed=get_seed(3), processes=options.processes)
             dispersion = builder.dispersion
         except exceptions.RingBuilderError as e:
             print('-' * 79)
@@ -1167,10 +1187,11 @@ swift-ring-builder <builder_file> rebalance [options]
             print('-' * 79)
             status = EXIT_WARNING
         ts = time()
-        builder.get_ring().save(
+        ring_data = builder.get_ring()
+        ring_data.save(
             pathjoin(backup_dir, '%d.' % ts + basename(ring_file)))
         builder.save(pathjoin(backup_dir, '%d.' % ts + basename(builder_file)))
-        builder.get_ring().save(ring_file)
+        _write_ring_files(ring_data)
         builder.save(builder_file)
         exit(status)
 
@@ -1289,12 +1310,26 @@ swift-ring-builder <builder_file> validate
     @staticmethod
     def write_ring():
         """
-swift-ring-builder <builder_file> write_ring
+swift-ring-builder <builder_file> write_ring [options]
     Just rewrites the distributable ring file. This is done automatically after
     a successful rebalance, so really this is only useful after one or more
     'set_info' calls when no rebalance is needed but you want to send out the
     new device information.
+
+    With --mmap, an uncompressed <ring_name>.ring file is written alongside
+    the usual <ring_name>.ring.gz file. Servers prefer the .ring file when it
+    exists and is no older than the .ring.gz file, and memory-map it rather
+    than decompressing and copying the partition assignments into every
+    worker process. Once there is a .ring file, it is rewritten by every
+    later write_ring and rebalance.
         """
+        usage = Commands.write_ring.__doc__.strip()
+        parser = optparse.OptionParser(usage)
+        parser.add_option('-m', '--mmap', action='store_true',
+                          help='Also write an uncompressed, memory-mappable '
+                          'ring file')
+        options, args = parser.parse_args(argv)
+
         if not builder.devs:
             print('Unable to write empty ring.')
             exit(EXIT_ERROR)
@@ -1307,7 +1342,7 @@ swift-ring-builder <builder_file> write_ring
                       '"rebalance"?')
         ring_data.save(
             pathjoin(backup_dir, '%d.' % time() + basename(ring_file)))
-        ring_data.save(ring_file)
+        _write_ring_files(ring_data, mmap=options.mmap)
         exit(EXIT_SUCCESS)
 
     @staticmethod
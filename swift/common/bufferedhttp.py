@@ -27,6 +27,8 @@ BufferedHTTPResponse.
 """
 
 from swift.common import constraints
+import collections
+import errno
 import logging
 import time
 import socket
@@ -206,6 +208,10 @@ class BufferedHTTPResponse(HTTPResponse):
 class BufferedHTTPConnection(HTTPConnection):
     """HTTPConnection class that uses BufferedHTTPResponse"""
     response_class = BufferedHTTPResponse
+    # set to a list by BufferedHTTPConnectionPool when it reuses an idle
+    # connection; until a response arrives, everything sent is kept in it so
+    # the request can be sent again if the server has closed the connection
+    _replay = None
 
     def connect(self):
         self._connected_time = time.time()
@@ -213,6 +219,37 @@ class BufferedHTTPConnection(HTTPConnection):
         self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         return ret
 
+    def _reconnect(self):
+        # the server closed the reused connection before it responded (it
+        # won't have seen the request), so send it again on a new one
+        replay, self._replay = self._replay, None
+        self.sock.close()
+        self.sock = None
+        self.connect()
+        for data in replay:
+            HTTPConnection.send(self, data)
+        self.pool._increment('retried')
+
+    def send(self, data):
+        if self._replay is None:
+            return HTTPConnection.send(self, data)
+        self._replay.append(data)
+        try:
+            return HTTPConnection.send(self, data)
+        except socket.error as err:
+            if err.errno not in (errno.EPIPE, errno.ECONNRESET):
+                raise
+        self._reconnect()
+
+    def _closed_by_server(self):
+        # wait for the first byte of the response without reading it
+        try:
+            return not self.sock.recv(1, socket.MSG_PEEK)
+        except socket.error as err:
+            if err.errno != errno.ECONNRESET:
+                raise
+        return True
+
     def putrequest(self, method, url, skip_host=0, skip_accept_encoding=0):
         '''Send a request to the server.
 
@@ -241,6 +278,10 @@ class BufferedHTTPConnection(HTTPConnection):
         return response
 
     def getresponse(self):
+        if self._replay is not None:
+            if self._closed_by_server():
+                self._reconnect()
+            self._replay = None
         response = HTTPConnection.getresponse(self)
         logging.debug("HTTP PERF: %(time).5f seconds to %(method)s "
                       "%(host)s:%(port)s %(path)s)",
@@ -250,8 +291,101 @@ class BufferedHTTPConnection(HTTPConnection):
         return response
 
 
+class BufferedHTTPConnectionPool(object):
+    """
+    Keeps idle, persistent :class:`BufferedHTTPConnection` instances to
+    backend servers so that later requests to the same server can reuse them
+    rather than paying for a new TCP connection.
+
+    A connection is only kept if its response was read to the end and the
+    server did not ask for the connection to be closed; see :meth:`release`.
+    If the server closes a reused connection before responding to the request
+    sent on it, the request is sent again, once, on a new connection.
+
+    :param max_idle: the maximum number of idle connections kept for each
+        server. Should be an int value.
+    :param idle_timeout: the number of seconds after which an idle connection
+        is closed rather than reused. Should be a float value, and less than
+        the time for which the servers keep idle connections open.
+    :param logger: an optional logger with which to emit metrics.
+    """
+    def __init__(self, max_idle=4, idle_timeout=10.0, logger=None):
+        self.max_idle = int(max_idle)
+        self.idle_timeout = float(idle_timeout)
+        self.logger = logger
+        # (ip, port) -> deque of (connection, time released)
+        self.idle = collections.defaultdict(collections.deque)
+
+    def _increment(self, metric):
+        if self.logger:
+            self.logger.increment('backend_connection.%s' % metric)
+
+    def _is_dropped(self, conn):
+        # a healthy idle connection has nothing to read; EOF or any data
+        # means that the server has closed it or it is out of sync
+        sock = getattr(conn.sock, 'fd', conn.sock)
+        try:
+            sock.recv(1, socket.MSG_PEEK | getattr(socket, 'MSG_DONTWAIT', 0))
+        except socket.error as err:
+            return err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK)
+        return True
+
+    def connect(self, ipaddr, port):
+        """
+        Get an idle connection to a server, or a new one if there is no
+        usable idle connection to it.
+
+        :param ipaddr: the server's IP address
+        :param port: the server's port
+        :returns: a :class:`BufferedHTTPConnection`
+        """
+        key = (ipaddr, port)
+        idle = self.idle.get(key)
+        expired = time.time() - self.idle_timeout
+        while idle:
+            conn, released = idle.pop()
+            if released < expired or self._is_dropped(conn):
+                self._increment('dropped')
+                conn.close()
+                continue
+            self._increment('reused')
+            conn._connected_time = time.time()
+            conn._replay = []
+            return conn
+        self.idle.pop(key, None)
+        self._increment('new')
+        conn = BufferedHTTPConnection('%s:%s' % (ipaddr, port))
+        conn.pool, conn.pool_key = self, key
+        return conn
+
+    def release(self, conn, response):
+        """
+        Keep a connection for reuse if its response has been read to the end
+        and the connection can be kept alive, otherwise close it.
+
+        :param conn: a :class:`BufferedHTTPConnection`
+        :param response: the connection's last response
+        :returns: True if the connection was kept, False if it was closed
+        """
+        idle = self.idle[conn.pool_key]
+        # a HEAD (or empty) response has nothing to read
+        finished = response.isclosed() or response.length == 0
+        if (conn.sock is None or not finished or
+                getattr(response, '_readline_buffer', None) or
+                len(idle) >= self.max_idle):
+            if not idle:
+                self.idle.pop(conn.pool_key, None)
+            response.close()
+            conn.close()
+            return False
+        # the response no longer owns the socket
+        response.close()
+        idle.append((conn, time.time()))
+        return True
+
+
 def http_connect(ipaddr, port, device, partition, method, path,
-                 headers=None, query_string=None, ssl=False):
+                 headers=None, query_string=None, ssl=False, pool=None):
     """
     Helper function to create an HTTPConnection object. If ssl is set True,
     HTTPSConnection will be used. However, if ssl=False, BufferedHTTPConnection
@@ -266,6 +400,8 @@ def http_connect(ipaddr, port, device, partition, method, path,
     :param headers: dictionary of headers
     :param query_string: request query string
     :param ssl: set True if SSL should be used (default: False)
+    :param pool: an optional :class:`BufferedHTTPConnectionPool` from which
+                 to reuse an idle connection if ssl is False
     :returns: HTTPConnection object
     """
     if isinstance(path, six.text_type):
@@ -277,12 +413,15 @@ def http_connect(ipaddr, port, device, partition, method, path,
     elif isinstance(partition, six.integer_types):
         partition = str(partition).encode('ascii')
     path = quote(b'/' + device + b'/' + partition + path)
+    kwargs = {}
+    if pool is not None:
+        kwargs['pool'] = pool
     return http_connect_raw(
-        ipaddr, port, method, path, headers, query_string, ssl)
+        ipaddr, port, method, path, headers, query_string, ssl, **kwargs)
 
 
 def http_connect_raw(ipaddr, port, method, path, headers=None,
-                     query_string=None, ssl=False):
+                     query_string=None, ssl=False, pool=None):
     """
     Helper function to create an HTTPConnection object. If ssl is set True,
     HTTPSConnection will be used. However, if ssl=False, BufferedHTTPConnection
@@ -295,12 +434,16 @@ def http_connect_raw(ipaddr, port, method, path, headers=None,
     :param headers: dictionary of headers
     :param query_string: request query string
     :param ssl: set True if SSL should be used (default: False)
+    :param pool: an optional :class:`BufferedHTTPConnectionPool` from which
+                 to reuse an idle connection if ssl is False
     :returns: HTTPConnection object
     """
     if not port:
         port = 443 if ssl else 80
     if ssl:
         conn = HTTPSConnection('%s:%s' % (ipaddr, port))
+    elif pool is not None:
+        conn = pool.connect(ipaddr, port)
     else:
         conn = BufferedHTTPConnection('%s:%s' % (ipaddr, port))
     if query_string:
@@ -15,6 +15,7 @@
 
 """ Database code for Swift """
 
+from collections import OrderedDict
 from contextlib import contextmanager, closing
 import base64
 import json
@@ -24,17 +25,22 @@ from uuid import uuid4
 import sys
 import time
 import errno
+import re
+import struct
+import zlib
 import six
 import six.moves.cPickle as pickle
 from tempfile import mkstemp
 
-from eventlet import sleep, Timeout
+from eventlet import sleep, spawn_n, Timeout
+from eventlet.event import Event
 import sqlite3
 
 from swift.common.constraints import MAX_META_COUNT, MAX_META_OVERALL_SIZE, \
     check_utf8
 from swift.common.utils import Timestamp, renamer, \
-    mkdirs, lock_parent_directory, fallocate, md5
+    mkdirs, lock_parent_directory, fallocate, md5, fsync as fsync_file, \
+    fsync_dir
 from swift.common.exceptions import LockTimeout
 from swift.common.swob import HTTPBadRequest
 
@@ -50,6 +56,17 @@ PICKLE_PROTOCOL = 2
 #: Max size of .pending file in bytes. When this is exceeded, the pending
 # records will be merged.
 PENDING_CAP = 131072
+#: Whether records are written to .pending files in the binary format rather
+# than as base64 encoded pickles. Both formats are always read.
+BINARY_PENDING = False
+
+# A binary .pending entry starts with a header of a marker byte, that is
+# neither a colon nor a base64 character, the format version, and the length
+# and CRC32 of the encoded record that follows.
+PENDING_MARKER = b'\xfe'
+PENDING_VERSION = 1
+PENDING_HEADER = struct.Struct('!cBII')
+_PENDING_BOUNDARY = re.compile(b'[:' + PENDING_MARKER + b']')
 
 SQLITE_ARG_LIMIT = 999
 RECLAIM_PAGE_SIZE = 10000
@@ -79,6 +96,104 @@ def native_str_keys_and_values(metadata):
                 for x in sv]
 
 
+def encode_pending_record(record):
+    """
+    Encode a record as a binary .pending entry. The record is pickled, as in
+    the original format, but without base64 encoding.
+
+    :param record: the record tuple.
+    :returns: the encoded entry.
+    """
+    payload = pickle.dumps(record, protocol=PICKLE_PROTOCOL)
+    return PENDING_HEADER.pack(
+        PENDING_MARKER, PENDING_VERSION, len(payload),
+        zlib.crc32(payload) & 0xffffffff) + payload
+
+
+def decode_pending_entry(version, entry):
+    """
+    Decode an entry read from a .pending file.
+
+    :param version: the version of the entry's format, as returned by
+        :func:`read_pending_entries`.
+    :param entry: the entry's data, as returned by
+        :func:`read_pending_entries`.
+    :returns: the record tuple.
+    :raises ValueError: if the entry's format is not supported.
+    """
+    if version == 0:
+        entry = base64.b64decode(entry)
+    elif version is None:
+        raise ValueError('Unparsable pending entry')
+    elif version != PENDING_VERSION:
+        raise ValueError('Unsupported pending entry version %r' % version)
+    if six.PY2:
+        return pickle.loads(entry)
+    return pickle.loads(entry, encoding='utf8')
+
+
+def read_pending_entries(fp, chunk_size=65536):
+    """
+    Incrementally read the entries of a .pending file. The file may contain
+    entries in the original format, a colon followed by a base64 encoded
+    pickle, and binary entries, in any order. Data that cannot be parsed as
+    an entry is skipped up to the start of the next entry.
+
+    :param fp: the file to read.
+    :param chunk_size: the number of bytes to read at a time.
+    :returns: an iterator of (version, data) tuples, where version is 0 for a
+        base64 encoded pickle, the version of the format for a binary entry,
+        or None for data that could not be parsed; the data can be passed to
+        :func:`decode_pending_entry`.
+    """
+    buf = b''
+    pos = 0
+    eof = False
+    while True:
+        # make sure that the buffer holds at least a header, or the rest of
+        # the file; a longer entry is read in full below
+        while not eof and len(buf) - pos < PENDING_HEADER.size:
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+        if pos >= len(buf):
+            return
+        end = None
+        lead = buf[pos:pos + 1]
+        if lead == PENDING_MARKER and len(buf) - pos >= PENDING_HEADER.size:
+            _junk, version, length, crc = PENDING_HEADER.unpack_from(buf, pos)
+            start = pos + PENDING_HEADER.size
+            while not eof and len(buf) < start + length:
+                chunk = fp.read(max(chunk_size, start + length - len(buf)))
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                start -= pos
+                pos = 0
+            entry = buf[start:start + length]
+            if len(entry) == length and \
+                    zlib.crc32(entry) & 0xffffffff == crc:
+                end = start + length
+                yield version, entry
+        if end is None:
+            # an entry in the original format, or something unparsable,
+            # which ends at the start of the next entry
+            match = _PENDING_BOUNDARY.search(buf, pos + 1)
+            while match is None and not eof:
+                chunk = fp.read(chunk_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                match = _PENDING_BOUNDARY.search(buf, pos + 1)
+            end = match.start() if match else len(buf)
+            if lead == b':':
+                if end > pos + 1:
+                    yield 0, buf[pos + 1:end]
+            else:
+                yield None, buf[pos:end]
+        pos = end
+
+
 ZERO_LIKE_VALUES = {None, '', 0, '0'}
 
 
@@ -302,6 +417,186 @@ class TombstoneReclaimer(object):
         return self.remaining_tombstones
 
 
+class GroupCommitQueue(object):
+    """
+    Queues the records that concurrent requests put to a database so that
+    they are written to the database's pending file in batches, by a single
+    greenthread per database, taking one lock of the pending file and
+    making one fsync per batch. Each put returns once its record has been
+    written, or raises whatever error prevented the batch being written.
+
+    :param max_batch_size: the maximum number of records written per batch.
+    :param max_delay: the number of seconds to wait for more records to join
+        a batch before it is written.
+    :param fsync: if True then pending files are fsync'd after each batch is
+        written.
+    """
+    def __init__(self, max_batch_size=100, max_delay=0, fsync=True):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_delay = float(max_delay)
+        self.fsync = fsync
+        # pending file -> list of (record, event) tuples
+        self.queues = {}
+
+    def put_record(self, broker, record):
+        """
+        Queue a record to be put to a broker and wait until it has been
+        written to the broker's pending file.
+
+        :param broker: the :class:`DatabaseBroker` to put the record to.
+        :param record: the record.
+        """
+        queue = self.queues.get(broker.pending_file)
+        if queue is None:
+            queue = self.queues[broker.pending_file] = []
+            spawn_n(self._write_batches, broker, queue)
+        written = Event()
+        queue.append((record, written))
+        written.wait()
+
+    def _write_batches(self, broker, queue):
+        batch = []
+        try:
+            while queue:
+                sleep(self.max_delay)
+                batch = queue[:self.max_batch_size]
+                del queue[:len(batch)]
+                try:
+                    broker.put_records([record for record, _junk in batch],
+                                       fsync=self.fsync)
+                except (Exception, Timeout) as err:
+                    for _junk, written in batch:
+                        written.send_exception(err)
+                else:
+                    for _junk, written in batch:
+                        written.send()
+                batch = []
+        except BaseException as err:
+            # e.g. GreenletExit; fail the records of the current batch and
+            # any that never made it into a batch so that their puts do not
+            # wait forever
+            for _junk, written in batch + queue:
+                if not written.ready():
+                    written.send_exception(err)
+            del queue[:]
+            raise
+        finally:
+            del self.queues[broker.pending_file]
+
+
+class ConnectionPool(object):
+    """
+    A bounded pool of idle database connections, keyed by database file, to
+    be shared by the brokers of a worker so that a connection does not have
+    to be opened and set up for every request.
+
+    A connection is only reused while the database file it was opened on is
+    still at the same path; connections to a file that has been unlinked,
+    quarantined or replaced are closed rather than reused. When the pool is
+    full, the connections to the least recently used file are closed.
+
+    :param max_size: the maximum number of idle connections kept open.
+    :param logger: if given, hits and misses are counted with its
+        ``increment`` method.
+    """
+    def __init__(self, max_size=100, logger=None):
+        self.max_size = max_size
+        self.logger = logger
+        # db file -> (file identity, list of idle connections), in LRU order
+        self._idle = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def _get_identity(db_file):
+        try:
+            st = os.stat(db_file)
+        except OSError:
+            return None
+        return st.st_dev, st.st_ino
+
+    def _increment(self, metric):
+        if self.logger:
+            self.logger.increment('db_connection_pool.%s' % metric)
+
+    def _close(self, conns):
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _pop(self, db_file, identity):
+        # take the idle connections to a db file out of the pool, closing
+        # them if the file is no longer the one they were opened on
+        idle = self._idle.pop(db_file, None)
+        if idle is None:
+            return []
+        self._size -= len(idle[1])
+        if idle[0] != identity:
+            self._close(idle[1])
+            return []
+        return idle[1]
+
+    def _push(self, db_file, identity, conns):
+        if conns:
+            self._idle[db_file] = (identity, conns)
+            self._size += len(conns)
+        while self._size > self.max_size:
+            _junk, (_junk, lru_conns) = self._idle.popitem(last=False)
+            self._size -= len(lru_conns)
+            self._close(lru_conns)
+
+    def get(self, db_file, timeout=BROKER_TIMEOUT, logger=None):
+        """
+        Get a connection to a database, taking an idle one from the pool if
+        there is one, or else opening a new one.
+
+        :param db_file: the path to the database file.
+        :param timeout: the timeout of the connection.
+        :param logger: a logger for the connection, if one is opened.
+        :returns: a connection as returned by :func:`get_db_connection`.
+        """
+        identity = self._get_identity(db_file)
+        conns = self._pop(db_file, identity)
+        if conns:
+            conn = conns.pop()
+            self._push(db_file, identity, conns)
+            self._increment('hit')
+            conn.timeout = timeout
+            return conn
+        self._increment('miss')
+        conn = get_db_connection(db_file, timeout, logger)
+        conn.pool_identity = identity
+        return conn
+
+    def put(self, db_file, conn):
+        """
+        Return a connection got from :meth:`get` to the pool, once any
+        transaction on it has been rolled back or committed.
+
+        :param db_file: the path to the database file.
+        :param conn: the connection.
+        """
+        identity = getattr(conn, 'pool_identity', None)
+        if identity is None or identity != self._get_identity(db_file):
+            self._close([conn])
+            return
+        conns = self._pop(db_file, identity)
+        conns.append(conn)
+        self._push(db_file, identity, conns)
+
+    def invalidate(self, db_file):
+        """
+        Close all idle connections to a database.
+
+        :param db_file: the path to the database file.
+        """
+        idle = self._idle.pop(db_file, None)
+        if idle:
+            self._size -= len(idle[1])
+            self._close(idle[1])
+
+
 class DatabaseBroker(object):
     """Encapsulates working with a database."""
 
@@ -309,7 +604,8 @@ class DatabaseBroker(object):
 
     def __init__(self, db_file, timeout=BROKER_TIMEOUT, logger=None,
                  account=None, container=None, pending_timeout=None,
-                 stale_reads_ok=False, skip_commits=False):
+                 stale_reads_ok=False, skip_commits=False,
+                 group_commit_queue=None, connection_pool=None):
         """Encapsulates working with a database.
 
         :param db_file: path to a database file.
@@ -326,6 +622,12 @@ class DatabaseBroker(object):
             commit records from the pending file to the database;
             :meth:`~swift.common.db.DatabaseBroker.put_record` should not
             called on brokers with skip_commits True.
+        :param group_commit_queue: an optional :class:`GroupCommitQueue`
+            through which records passed to
+            :meth:`~swift.common.db.DatabaseBroker.put_record` are written.
+        :param connection_pool: an optional :class:`ConnectionPool` from
+            which connections to the database are got, and to which they are
+            returned after each use, rather than being kept by the broker.
         """
         self.conn = None
         self._db_file = db_file
@@ -339,6 +641,8 @@ class DatabaseBroker(object):
         self.container = container
         self._db_version = -1
         self.skip_commits = skip_commits
+        self.group_commit_queue = group_commit_queue
+        self.connection_pool = connection_pool
 
     def __str__(self):
         """
@@ -470,6 +774,8 @@ class DatabaseBroker(object):
         The database will be quarantined and a
         sqlite3.DatabaseError will be raised indicating the action taken.
         """
+        if self.connection_pool is not None:
+            self.connection_pool.invalidate(self.db_file)
         device_path = self.get_device_path()
         quar_path = os.path.join(device_path, 'quarantined',
                                  self.db_type + 's',
@@ -532,14 +838,27 @@ class DatabaseBroker(object):
             with self.get() as conn:
                 yield conn
 
+    def _connect(self):
+        if self.connection_pool is None:
+            return get_db_connection(self.db_file, self.timeout, self.logger)
+        return self.connection_pool.get(self.db_file, self.timeout,
+                                        self.logger)
+
+    def _release(self, conn):
+        # keep the connection for the broker's next use of the database, or
+        # return it to the pool for any broker to use
+        if self.connection_pool is None:
+            self.conn = conn
+        else:
+            self.connection_pool.put(self.db_file, conn)
+
     @contextmanager
     def get(self):
         """Use with the "with" statement; returns a database connection."""
         if not self.conn:
             if os.path.exists(self.db_file):
                 try:
-                    self.conn = get_db_connection(self.db_file, self.timeout,
-                                                  self.logger)
+                    self.conn = self._connect()
                 except (sqlite3.DatabaseError, DatabaseConnectionError):
                     self.possibly_quarantine(*sys.exc_info())
             else:
@@ -549,7 +868,7 @@ class DatabaseBroker(object):
         try:
             yield conn
             conn.rollback()
-            self.conn = conn
+            self._release(conn)
         except sqlite3.DatabaseError:
             try:
                 conn.close()
@@ -565,8 +884,7 @@ class DatabaseBroker(object):
         """Use with the "with" statement; locks a database."""
         if not self.conn:
             if os.path.exists(self.db_file):
-                self.conn = get_db_connection(self.db_file, self.timeout,
-                                              self.logger)
+                self.conn = self._connect()
             else:
                 raise DatabaseConnectionError(self.db_file, "DB doesn't exist")
         conn = self.conn
@@ -580,7 +898,7 @@ class DatabaseBroker(object):
             try:
                 conn.execute('ROLLBACK')
                 conn.isolation_level = orig_isolation_level
-                self.conn = conn
+                self._release(conn)
             except (Exception, Timeout):
                 logging.exception(
                     'Broker error trying to rollback locked connection')
@@ -767,12 +1085,35 @@ class DatabaseBroker(object):
         is deferred. If its pending file is full then the record will be
         committed immediately.
 
+        If the broker has a ``group_commit_queue`` then the record is written
+        in a batch with any records that are concurrently put to the same DB.
+
         :param record: a record to be added to the DB.
         :raises DatabaseConnectionError: if the DB file does not exist or if
             ``skip_commits`` is True.
         :raises LockTimeout: if a timeout occurs while waiting to take a lock
             to write to the pending file.
         """
+        if self.group_commit_queue is not None:
+            self.group_commit_queue.put_record(self, record)
+        else:
+            self.put_records([record])
+
+    def put_records(self, records, fsync=False):
+        """
+        Put records into the DB, taking a single lock of the pending file. If
+        the pending file has space then the records are appended to it and a
+        commit to the DB is deferred, otherwise the records are committed
+        immediately.
+
+        :param records: a list of records to be added to the DB.
+        :param fsync: if True then the pending file is fsync'd after the
+            records are appended to it.
+        :raises DatabaseConnectionError: if the DB file does not exist or if
+            ``skip_commits`` is True.
+        :raises LockTimeout: if a timeout occurs while waiting to take a lock
+            to write to the pending file.
+        """
         if not os.path.exists(self.db_file):
             raise DatabaseConnectionError(self.db_file, "DB doesn't exist")
         if self.skip_commits:
@@ -780,22 +1121,35 @@ class DatabaseBroker(object):
                                           'commits not accepted')
         with lock_parent_directory(self.pending_file, self.pending_timeout):
             pending_size = 0
+            pending_exists = True
             try:
                 pending_size = os.path.getsize(self.pending_file)
             except OSError as err:
                 if err.errno != errno.ENOENT:
                     raise
+                pending_exists = False
             if pending_size > PENDING_CAP:
-                self._commit_puts([record])
+                self._commit_puts(list(records))
             else:
+                entries = []
+                for record in records:
+                    record = self.make_tuple_for_pickle(record)
+                    if BINARY_PENDING:
+                        entries.append(encode_pending_record(record))
+                    else:
+                        # Colons aren't used in base64 encoding; so they are
+                        # our delimiter
+                        entries.append(b':' + base64.b64encode(pickle.dumps(
+                            record, protocol=PICKLE_PROTOCOL)))
                 with open(self.pending_file, 'a+b') as fp:
-                    # Colons aren't used in base64 encoding; so they are our
-                    # delimiter
-                    fp.write(b':')
-                    fp.write(base64.b64encode(pickle.dumps(
-                        self.make_tuple_for_pickle(record),
-                        protocol=PICKLE_PROTOCOL)))
+                    fp.write(b''.join(entries))
                     fp.flush()
+                    if fsync:
+                        fsync_file(fp.fileno())
+                if fsync and not pending_exists:
+                    # the pending file was created by this put; its directory
+                    # entry must be durable too before the put is acknowledged
+                    fsync_dir(os.path.dirname(self.pending_file))
 
     def _skip_commit_puts(self):
         return self.skip_commits or not os.path.exists(self.pending_file)
@@ -824,19 +1178,14 @@ class DatabaseBroker(object):
                 self.merge_items(item_list)
             return
         with open(self.pending_file, 'r+b') as fp:
-            for entry in fp.read().split(b':'):
-                if entry:
-                    try:
-                        if six.PY2:
-                            data = pickle.loads(base64.b64decode(entry))
-                        else:
-                            data = pickle.loads(base64.b64decode(entry),
-                                                encoding='utf8')
-                        self._commit_puts_load(item_list, data)
-                    except Exception:
-                        self.logger.exception(
-                            'Invalid pending entry %(file)s: %(entry)s',
-                            {'file': self.pending_file, 'entry': entry})
+            for version, entry in read_pending_entries(fp):
+                try:
+                    data = decode_pending_entry(version, entry)
+                    self._commit_puts_load(item_list, data)
+                except Exception:
+                    self.logger.exception(
+                        'Invalid pending entry %(file)s: %(entry)s',
+                        {'file': self.pending_file, 'entry': entry})
             if item_list:
                 self.merge_items(item_list)
             try:
@@ -13,9 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import collections
+import fcntl
+import mmap
+import os
+import struct
 from time import time
 
-from swift.common.utils import node_to_string
+from swift.common.utils import md5, node_to_string
 
 
 class ErrorLimiter(object):
@@ -91,3 +95,240 @@ class ErrorLimiter(object):
         error_stats['errors'] = error_stats.get('errors', 0) + 1
         error_stats['last_error'] = time()
         return error_stats['errors'] > self.suppression_limit
+
+
+class SharedErrorTable(object):
+    """
+    A fixed-size hash table of per-node error stats kept in a memory-mapped
+    file, so that every process mapping the same file, such as every
+    proxy-server worker, sees the errors recorded by every other process.
+
+    Each slot holds a node key's hash, its error count, the time of its last
+    error, the time until which it is error-limited and the (truncated) node
+    key itself. Slots are found by linear probing from the key's hash and are
+    never emptied, only reused once their node has had no errors for longer
+    than any other probed node.
+
+    Slots are read and written without any locking between processes, so
+    errors recorded at the same moment by two processes may be counted once;
+    for error limiting that is an acceptable price for never blocking a
+    request on another process.
+
+    :param path: the path of the file, which is created if ``create`` is True
+        and it does not exist.
+    :param slots: the number of slots in the table if the file is created; an
+        existing file keeps the number of slots it was created with.
+    :param create: if False, an existing file is required.
+    """
+    header = struct.Struct('<8sII')
+    slot = struct.Struct('<QIdd100s')
+    # the mutable part of a slot, following the key hash
+    slot_stats = struct.Struct('<Idd')
+    magic = b'SWERRLIM'
+    version = 1
+    max_probes = 32
+
+    def __init__(self, path, slots=16384, create=True):
+        self.path = path
+        flags = os.O_RDWR | (os.O_CREAT if create else 0)
+        fd = os.open(path, flags, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size:
+                magic, version, slots = self.header.unpack(
+                    os.read(fd, self.header.size))
+                if (magic, version) != (self.magic, self.version):
+                    raise ValueError(
+                        '%s is not an error limiter table' % path)
+            elif create:
+                slots = int(slots)
+                if slots < 1:
+                    raise ValueError('slots must be at least 1, not %r'
+                                     % slots)
+                os.ftruncate(fd, self.header.size + slots * self.slot.size)
+                os.write(fd, self.header.pack(
+                    self.magic, self.version, slots))
+            else:
+                raise ValueError('%s is empty' % path)
+            self.slots = slots
+            self.mmap = mmap.mmap(
+                fd, self.header.size + slots * self.slot.size)
+        finally:
+            # the mmap holds a duplicate of the fd, and with it the lock
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def close(self):
+        self.mmap.close()
+
+    def _offset(self, index):
+        return self.header.size + index * self.slot.size
+
+    def _hash(self, key):
+        digest = md5(key.encode('utf8'), usedforsecurity=False).digest()
+        # a hash of 0 marks an unused slot
+        return struct.unpack('<Q', digest[:8])[0] or 1
+
+    def lookup(self, key, create=False):
+        """
+        Find the slot of a node key.
+
+        :param key: the node key
+        :param create: if True, claim a slot for the key if it has none
+        :returns: the index of the key's slot, or None if it has none and
+            ``create`` is False
+        """
+        key_hash = self._hash(key)
+        start = key_hash % self.slots
+        now = time()
+        victim = victim_rank = None
+        for i in range(min(self.max_probes, self.slots)):
+            index = (start + i) % self.slots
+            slot_hash, _errors, last_error, limited_until, _key = \
+                self.slot.unpack_from(self.mmap, self._offset(index))
+            if slot_hash == key_hash:
+                return index
+            if not slot_hash:
+                victim = index
+                break
+            # prefer to reuse the slot of the node that is not limited and
+            # has gone longest without an error
+            rank = (limited_until > now, last_error)
+            if victim is None or rank < victim_rank:
+                victim, victim_rank = index, rank
+        if not create:
+            return None
+        self.slot.pack_into(self.mmap, self._offset(victim), key_hash,
+                            0, 0.0, 0.0, key.encode('utf8'))
+        return victim
+
+    def get(self, index):
+        """
+        Get the stats in a slot.
+
+        :param index: the index of the slot
+        :returns: a tuple of (errors, last error time, limited until time)
+        """
+        return self.slot_stats.unpack_from(
+            self.mmap, self._offset(index) + 8)
+
+    def set(self, index, errors, last_error, limited_until, key=None,
+            expected_last_error=None):
+        """
+        Set the stats in a slot.
+
+        Another process may claim a slot for a different key, or update its
+        stats, between a :meth:`lookup` or :meth:`get` and this call; the
+        slot is re-read just before it is written so that such a change can
+        be detected and the stats are not written to the wrong node.
+
+        :param index: the index of the slot
+        :param errors: the error count
+        :param last_error: the time of the last error
+        :param limited_until: the time until which the node is error-limited
+        :param key: if given, the stats are only written if the slot still
+            belongs to this node key
+        :param expected_last_error: if given, the stats are only written if
+            the slot's time of the last error is still this
+        :returns: True if the stats were written, False otherwise
+        """
+        offset = self._offset(index)
+        if key is not None and struct.unpack_from(
+                '<Q', self.mmap, offset)[0] != self._hash(key):
+            return False
+        if expected_last_error is not None and self.slot_stats.unpack_from(
+                self.mmap, offset + 8)[1] != expected_last_error:
+            return False
+        self.slot_stats.pack_into(self.mmap, offset + 8,
+                                  errors, last_error, limited_until)
+        return True
+
+    def limited_nodes(self):
+        """
+        Get the nodes that are currently error-limited.
+
+        :returns: a dict mapping node keys to dicts with the node's error
+            count and the time until which it is error-limited
+        """
+        now = time()
+        limited = {}
+        for index in range(self.slots):
+            slot_hash, errors, _last_error, limited_until, key = \
+                self.slot.unpack_from(self.mmap, self._offset(index))
+            if slot_hash and limited_until > now:
+                key = key.rstrip(b'\0').decode('utf8', 'replace')
+                limited[key] = {'errors': errors,
+                                'limited_until': limited_until}
+        return limited
+
+
+class SharedErrorLimiter(ErrorLimiter):
+    """
+    An :class:`ErrorLimiter` that keeps its error stats in a
+    :class:`SharedErrorTable`, so that a node that is error-limited by one
+    process is error-limited by every process sharing the table.
+
+    :param suppression_interval: see :class:`ErrorLimiter`
+    :param suppression_limit: see :class:`ErrorLimiter`
+    :param path: the path of the table's file
+    :param slots: the number of slots in the table if the file is created
+    """
+    def __init__(self, suppression_interval, suppression_limit, path,
+                 slots=16384):
+        super(SharedErrorLimiter, self).__init__(
+            suppression_interval, suppression_limit)
+        self.table = SharedErrorTable(path, slots)
+
+    # the number of times an update is retried after another process
+    # changed the node's slot under it
+    max_update_attempts = 3
+
+    def _update(self, node, update):
+        """
+        Update the stats of a node's slot, claiming one if need be.
+
+        :param node: dictionary describing a node.
+        :param update: a callable taking the slot's current (errors, last
+            error time, limited until time) and returning the new ones.
+        :returns: the new stats, or None if the slot kept changing under us
+        """
+        node_key = self.node_key(node)
+        for _attempt in range(self.max_update_attempts):
+            index = self.table.lookup(node_key, create=True)
+            stats = update(*self.table.get(index))
+            if self.table.set(index, *stats, key=node_key):
+                return stats
+        return None
+
+    def is_limited(self, node):
+        node_key = self.node_key(node)
+        index = self.table.lookup(node_key)
+        if index is None:
+            return False
+        errors, last_error, limited_until = self.table.get(index)
+        if not errors:
+            return False
+        if last_error < time() - self.suppression_interval:
+            # don't wipe out an error that another process has just recorded
+            self.table.set(index, 0, last_error, 0.0, key=node_key,
+                           expected_last_error=last_error)
+            return False
+        return errors > self.suppression_limit
+
+    def limit(self, node):
+        now = time()
+        self._update(node, lambda *stats: (
+            self.suppression_limit + 1, now,
+            now + self.suppression_interval))
+
+    def increment(self, node):
+        now = time()
+
+        def update(errors, last_error, limited_until):
+            errors += 1
+            if errors > self.suppression_limit:
+                limited_until = now + self.suppression_interval
+            return errors, now, limited_until
+
+        stats = self._update(node, update)
+        return stats is not None and stats[0] > self.suppression_limit
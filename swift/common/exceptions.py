@@ -61,6 +61,10 @@ class RangeAlreadyComplete(SwiftException):
     pass
 
 
+class ThreadPoolDead(SwiftException):
+    pass
+
+
 class DiskFileError(SwiftException):
     pass
 
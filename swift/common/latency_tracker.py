@@ -0,0 +1,231 @@
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import math
+import random
+from collections import deque
+from time import time
+
+from swift.common.utils import node_to_string
+
+
+class LatencyTracker(object):
+    """
+    Tracks an exponentially-weighted moving average of the response latency
+    of each node (i.e. each device) and the number of requests currently
+    outstanding to it, and uses them to rank nodes.
+
+    :param decay: the weight, between 0 and 1, given to each new latency
+        sample in the moving average. Should be a float value.
+    :param expiry: the number of seconds after which the latency of a node
+        that has had no requests is forgotten. Should be a float value.
+    :param report_interval: the minimum number of seconds between reports of
+        each node's score, see :meth:`report_due`. Should be a float value.
+    :param sample_size: the number of recent latencies of each node that are
+        kept for :meth:`percentile`. Should be an int value.
+    """
+    def __init__(self, decay, expiry, report_interval=10, sample_size=100):
+        self.decay = float(decay)
+        if not 0 < self.decay <= 1:
+            raise ValueError('decay must be > 0 and <= 1, not %r' % decay)
+        self.expiry = float(expiry)
+        self.report_interval = float(report_interval)
+        self.sample_size = int(sample_size)
+        # node key -> [latency, outstanding, last update, last report,
+        #              recent latencies]
+        self.stats = {}
+
+    def node_key(self, node):
+        """
+        Get the key under which a node's latency stats will be stored.
+
+        :param node: dictionary describing a node.
+        :return: string key.
+        """
+        return node_to_string(node)
+
+    def _get_stats(self, node):
+        key = self.node_key(node)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = [
+                None, 0, 0, 0, deque(maxlen=self.sample_size)]
+        return stats
+
+    def started(self, node):
+        """
+        Note that a request to the given ``node`` has started.
+
+        :param node: dictionary describing a node.
+        """
+        self._get_stats(node)[1] += 1
+
+    def _update(self, stats, latency):
+        now = time()
+        if stats[0] is None or stats[2] < now - self.expiry:
+            stats[0] = latency
+            stats[4].clear()
+        else:
+            stats[0] += self.decay * (latency - stats[0])
+        stats[2] = now
+
+    def finished(self, node, latency=None):
+        """
+        Note that a request to the given ``node`` has finished, and update
+        the node's moving average latency.
+
+        :param node: dictionary describing a node.
+        :param latency: the request's latency in seconds, or None if the
+            request was abandoned before it got a response, in which case
+            only the number of outstanding requests is updated.
+        """
+        stats = self._get_stats(node)
+        stats[1] = max(0, stats[1] - 1)
+        if latency is not None:
+            self._update(stats, latency)
+            stats[4].append(latency)
+
+    def failed(self, node, penalty):
+        """
+        Note that a request to the given ``node`` has failed without getting
+        a response, and count ``penalty`` into the node's moving average
+        latency so that it is tried less. The penalty isn't one of the recent
+        latencies used by :meth:`percentile`.
+
+        :param node: dictionary describing a node.
+        :param penalty: the latency in seconds to count for the failure.
+        """
+        stats = self._get_stats(node)
+        stats[1] = max(0, stats[1] - 1)
+        self._update(stats, penalty)
+
+    def score(self, node, outstanding_weight=1.0):
+        """
+        Get the score of a node; lower is better. The score is the node's
+        moving average latency, inflated by the requests outstanding to it.
+        Nodes whose latency is not known score 0.0 so that they are tried.
+
+        :param node: dictionary describing a node.
+        :param outstanding_weight: how much each outstanding request inflates
+            the score, as a fraction of the moving average latency.
+        :returns: a float
+        """
+        stats = self.stats.get(self.node_key(node))
+        if stats is None or stats[0] is None:
+            return 0.0
+        if not stats[1] and stats[2] < time() - self.expiry:
+            # forget about nodes that we haven't heard from for a while
+            self.stats.pop(self.node_key(node), None)
+            return 0.0
+        return stats[0] * (1.0 + outstanding_weight * stats[1])
+
+    def percentile(self, node, percent, min_samples=10):
+        """
+        Get a percentile of the recent latencies of a node.
+
+        :param node: dictionary describing a node.
+        :param percent: the percentile, between 0 and 100.
+        :param min_samples: the number of recent latencies needed for the
+            percentile to be meaningful.
+        :returns: the latency in seconds, or None if there are fewer than
+            ``min_samples`` recent latencies.
+        """
+        stats = self.stats.get(self.node_key(node))
+        if stats is None or len(stats[4]) < max(1, min_samples) or \
+                stats[2] < time() - self.expiry:
+            return None
+        samples = sorted(stats[4])
+        index = int(math.ceil(len(samples) * percent / 100.0)) - 1
+        return samples[min(max(index, 0), len(samples) - 1)]
+
+    def report_due(self, node):
+        """
+        Check whether the score of the given ``node`` is due to be reported,
+        and if so note that it has been.
+
+        :param node: dictionary describing a node.
+        :returns: True if the node's score should be reported, False otherwise
+        """
+        stats = self._get_stats(node)
+        now = time()
+        if stats[3] > now - self.report_interval:
+            return False
+        stats[3] = now
+        return True
+
+    def sort(self, nodes, choices=2, outstanding_weight=1.0):
+        """
+        Sorts nodes in-place (and returns the sorted list) by repeatedly
+        picking ``choices`` of the remaining nodes at random and taking the
+        one with the best score. With the default of two choices, busy or
+        slow nodes are mostly avoided without every proxy herding onto the
+        single best node.
+
+        :param nodes: a list of nodes
+        :param choices: the number of nodes compared for each position
+        :param outstanding_weight: passed to :meth:`score`
+        :returns: the sorted list
+        """
+        remaining = [(self.score(node, outstanding_weight), node)
+                     for node in nodes]
+        del nodes[:]
+        while remaining:
+            candidates = random.sample(range(len(remaining)),
+                                       min(choices, len(remaining)))
+            best = min(candidates, key=lambda i: remaining[i][0])
+            nodes.append(remaining.pop(best)[1])
+        return nodes
+
+
+class RequestBudget(object):
+    """
+    Limits optional extra requests, such as hedged requests, to a fraction of
+    the requests that could have made them. Each eligible request deposits
+    ``ratio`` of a token, up to ``burst`` tokens, and each extra request
+    spends a whole token. The budget starts full.
+
+    :param ratio: the fraction of eligible requests that may make an extra
+        request. Should be a float value between 0 and 1.
+    :param burst: the most extra requests that may be made in a row after a
+        quiet period. Should be a float value.
+    """
+    def __init__(self, ratio, burst=10):
+        self.ratio = float(ratio)
+        if not 0 <= self.ratio <= 1:
+            raise ValueError('ratio must be >= 0 and <= 1, not %r' % ratio)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+
+    def deposit(self):
+        """
+        Note that an eligible request has been made.
+        """
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def spend(self):
+        """
+        Try to make an extra request.
+
+        :returns: True if the extra request may be made, False otherwise
+        """
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def refund(self):
+        """
+        Return the token of an extra request that was not made after all.
+        """
+        self.tokens = min(self.burst, self.tokens + 1)
@@ -48,6 +48,7 @@ import os
 import six
 import json
 import logging
+import zlib
 # the name of 'time' module is changed to 'tm', to avoid changing the
 # signatures of member functions in this file.
 import time as tm
@@ -55,7 +56,7 @@ from bisect import bisect
 
 from eventlet.green import socket, ssl
 from eventlet.pools import Pool
-from eventlet import Timeout
+from eventlet import GreenPile, Timeout
 from six.moves import range
 from six.moves.configparser import ConfigParser, NoSectionError, NoOptionError
 from swift.common import utils
@@ -69,6 +70,10 @@ POOL_TIMEOUT = 1.0  # WAG
 IO_TIMEOUT = 2.0
 PICKLE_FLAG = 1
 JSON_FLAG = 2
+ZLIB_FLAG = 4
+# compressed values are JSON, but are stored without JSON_FLAG and with
+# PICKLE_FLAG, which clients that don't know about compression read as a miss
+COMPRESSED_JSON_FLAGS = PICKLE_FLAG | ZLIB_FLAG
 NODE_WEIGHT = 50
 TRY_COUNT = 3
 
@@ -119,6 +124,82 @@ def set_msg(key, flags, timeout, value):
     ]) + (b'\r\n' + value + b'\r\n')
 
 
+class JSONSerializer(object):
+    """
+    Serializes values as JSON, which every version of Swift can read.
+
+    :param compress_threshold: values whose JSON is at least this many bytes
+                               are compressed with zlib; -1 disables
+                               compression. Swift versions that don't know
+                               about compression read compressed values as
+                               misses, so don't enable it until every
+                               memcache client has been upgraded.
+    :param compress_level: the zlib compression level, 0-9, or -1 for
+                           zlib's default
+    :raises ValueError: if either option is out of range
+    """
+    name = 'json'
+    separators = None
+
+    def __init__(self, compress_threshold=-1, compress_level=1):
+        self.compress_threshold = int(compress_threshold)
+        if self.compress_threshold < -1:
+            raise ValueError('compress_threshold must be -1 or greater, '
+                             'not %r' % compress_threshold)
+        self.compress_level = int(compress_level)
+        if not -1 <= self.compress_level <= 9:
+            raise ValueError('compress_level must be between -1 and 9, '
+                             'not %r' % compress_level)
+
+    def dumps(self, value):
+        """
+        :param value: the value to serialize
+        :returns: a tuple of (flags, serialized value as bytes)
+        """
+        if isinstance(value, bytes):
+            value = value.decode('utf8')
+        value = json.dumps(value, separators=self.separators).encode('ascii')
+        if 0 <= self.compress_threshold <= len(value):
+            return COMPRESSED_JSON_FLAGS, zlib.compress(
+                value, self.compress_level)
+        return JSON_FLAG, value
+
+
+class CompactJSONSerializer(JSONSerializer):
+    """
+    Serializes values as JSON without any optional whitespace, which makes
+    it smaller and quicker to parse but still readable by every version of
+    Swift.
+    """
+    name = 'compact_json'
+    separators = (',', ':')
+
+
+SERIALIZERS = dict((cls.name, cls)
+                   for cls in (JSONSerializer, CompactJSONSerializer))
+
+
+def deserialize(flags, value):
+    """
+    Deserializes a value read from memcache according to its flags. Values
+    stored in any of the formats that Swift writes, or has written, can be
+    read whatever serializer is configured.
+
+    :param flags: the flags stored with the value
+    :param value: the value, as bytes
+    :returns: the deserialized value
+    """
+    flags = int(flags)
+    if flags & ZLIB_FLAG:
+        return json.loads(zlib.decompress(value))
+    if flags & PICKLE_FLAG:
+        # we won't unpickle things from memcache
+        return None
+    if flags & JSON_FLAG:
+        value = json.loads(value)
+    return value
+
+
 class MemcacheConnectionError(Exception):
     pass
 
@@ -216,7 +297,8 @@ class MemcacheRing(object):
             error_limit_count=ERROR_LIMIT_COUNT,
             error_limit_time=ERROR_LIMIT_TIME,
             error_limit_duration=ERROR_LIMIT_DURATION,
-            item_size_warning_threshold=DEFAULT_ITEM_SIZE_WARNING_THRESHOLD):
+            item_size_warning_threshold=DEFAULT_ITEM_SIZE_WARNING_THRESHOLD,
+            serializer=None):
         self._ring = {}
         self._errors = dict(((serv, []) for serv in servers))
         self._error_limited = dict(((serv, 0) for serv in servers))
@@ -240,6 +322,7 @@ class MemcacheRing(object):
         else:
             self.logger = logger
         self.item_size_warning_threshold = item_size_warning_threshold
+        self.serializer = serializer or JSONSerializer()
 
     @property
     def memcache_servers(self):
@@ -383,13 +466,15 @@ class MemcacheRing(object):
 
         :param key: key
         :param value: value
-        :param serialize: if True, value is serialized with JSON before sending
+        :param serialize: if True, value is serialized (with JSON, unless
+                          another serializer is configured) before sending
                           to memcache
         :param time: the time to live
         :param min_compress_len: minimum compress length, this parameter was
                                  added to keep the signature compatible with
                                  python-memcached interface. This
-                                 implementation ignores it.
+                                 implementation ignores it; see the
+                                 serializer's compress_threshold instead.
         :param raise_on_error: if True, propagate Timeouts and other errors.
                                By default, errors are ignored.
         """
@@ -397,10 +482,7 @@ class MemcacheRing(object):
         timeout = sanitize_timeout(time)
         flags = 0
         if serialize:
-            if isinstance(value, bytes):
-                value = value.decode('utf8')
-            value = json.dumps(value).encode('ascii')
-            flags |= JSON_FLAG
+            flags, value = self.serializer.dumps(value)
         elif not isinstance(value, bytes):
             value = str(value).encode('utf-8')
 
@@ -461,11 +543,7 @@ class MemcacheRing(object):
                         if (line[0].upper() == b'VALUE' and
                                 line[1] == cmd.hash_key):
                             size = int(line[3])
-                            value = fp.read(size)
-                            if int(line[2]) & PICKLE_FLAG:
-                                value = None
-                            if int(line[2]) & JSON_FLAG:
-                                value = json.loads(value)
+                            value = deserialize(line[2], fp.read(size))
                             fp.readline()
                         line = fp.readline().strip().split()
                     self._return_conn(server, fp, sock)
@@ -605,10 +683,7 @@ class MemcacheRing(object):
             key = md5hash(key)
             flags = 0
             if serialize:
-                if isinstance(value, bytes):
-                    value = value.decode('utf8')
-                value = json.dumps(value).encode('ascii')
-                flags |= JSON_FLAG
+                flags, value = self.serializer.dumps(value)
             msg.append(set_msg(key, flags, timeout, value))
         for (server, fp, sock) in self._get_conns(cmd):
             conn_start_time = tm.time()
@@ -624,6 +699,27 @@ class MemcacheRing(object):
                 self._exception_occurred(server, e, cmd, conn_start_time,
                                          sock=sock, fp=fp)
 
+    def _read_values(self, fp):
+        """
+        Reads the response to a get command.
+
+        :param fp: the file pointer of the connection.
+        :returns: a dict mapping hashed keys to values
+        """
+        responses = {}
+        line = fp.readline().strip().split()
+        while True:
+            if not line:
+                raise MemcacheConnectionError('incomplete read')
+            if line[0].upper() == b'END':
+                break
+            if line[0].upper() == b'VALUE':
+                size = int(line[3])
+                responses[line[1]] = deserialize(line[2], fp.read(size))
+                fp.readline()
+            line = fp.readline().strip().split()
+        return responses
+
     @memcached_timing_stats(sample_rate=TIMING_SAMPLE_RATE_HIGH)
     def get_multi(self, keys, server_key):
         """
@@ -641,23 +737,7 @@ class MemcacheRing(object):
             try:
                 with Timeout(self._io_timeout):
                     sock.sendall(b'get ' + b' '.join(hash_keys) + b'\r\n')
-                    line = fp.readline().strip().split()
-                    responses = {}
-                    while True:
-                        if not line:
-                            raise MemcacheConnectionError('incomplete read')
-                        if line[0].upper() == b'END':
-                            break
-                        if line[0].upper() == b'VALUE':
-                            size = int(line[3])
-                            value = fp.read(size)
-                            if int(line[2]) & PICKLE_FLAG:
-                                value = None
-                            elif int(line[2]) & JSON_FLAG:
-                                value = json.loads(value)
-                            responses[line[1]] = value
-                            fp.readline()
-                        line = fp.readline().strip().split()
+                    responses = self._read_values(fp)
                     values = []
                     for key in hash_keys:
                         if key in responses:
@@ -670,6 +750,81 @@ class MemcacheRing(object):
                 self._exception_occurred(server, e, cmd, conn_start_time,
                                          sock=sock, fp=fp)
 
+    def _get_many_from_server(self, server, cmds):
+        """
+        Gets the values of keys that are on the same server.
+
+        :param server: the server that all the keys hash to first.
+        :param cmds: a list of instances of MemcacheCommand, whose keys all
+                     hash to the same server.
+        :returns: a dict mapping hashed keys to values
+        :raises MemcacheConnectionError: if the server could not be reached
+        """
+        hash_keys = [cmd.hash_key for cmd in cmds]
+        # only the first server is tried; the keys' fallback servers differ
+        # from one key to the next, so get_many() falls back key by key
+        for (conn_server, fp, sock) in self._get_conns(cmds[0]):
+            if conn_server != server:
+                self._return_conn(conn_server, fp, sock)
+                break
+            conn_start_time = tm.time()
+            try:
+                with Timeout(self._io_timeout):
+                    sock.sendall(b'get ' + b' '.join(hash_keys) + b'\r\n')
+                    responses = self._read_values(fp)
+                    self._return_conn(server, fp, sock)
+                    return responses
+            except (Exception, Timeout) as e:
+                self._exception_occurred(server, e, cmds[0], conn_start_time,
+                                         sock=sock, fp=fp)
+            break
+        raise MemcacheConnectionError("No memcached connections succeeded.")
+
+    @memcached_timing_stats(sample_rate=TIMING_SAMPLE_RATE_MEDIUM)
+    def get_many(self, keys, raise_on_error=False):
+        """
+        Gets the objects specified by several keys, which may be on different
+        servers. Keys on the same server are fetched with a single command,
+        and the servers are sent their commands concurrently, so this takes
+        about one round trip, rather than one round trip per key like
+        :meth:`get`.
+
+        :param keys: a list of keys
+        :param raise_on_error: if True, propagate Timeouts and other errors.
+                               By default, errors are treated as cache misses.
+        :returns: a dict mapping each key to its value in memcache, or None
+        """
+        cmds_by_server = {}
+        for key in keys:
+            cmd = MemcacheCommand('get_many', key)
+            # the first server that _get_conns() would try
+            pos = (bisect(self._sorted, cmd.hash_key) + 1) % len(self._sorted)
+            cmds_by_server.setdefault(
+                self._ring[self._sorted[pos]], []).append(cmd)
+
+        def get_from_server(server, cmds):
+            try:
+                return cmds, self._get_many_from_server(server, cmds)
+            except MemcacheConnectionError:
+                # each key falls back to its own next server, as with set()
+                return cmds, dict(
+                    (cmd.hash_key, self.get(
+                        cmd.key, raise_on_error=raise_on_error))
+                    for cmd in cmds)
+
+        values = dict.fromkeys(keys)
+        if len(cmds_by_server) <= 1:
+            results = [get_from_server(server, cmds)
+                       for server, cmds in cmds_by_server.items()]
+        else:
+            results = GreenPile(len(cmds_by_server))
+            for server, cmds in cmds_by_server.items():
+                results.spawn(get_from_server, server, cmds)
+        for cmds, responses in results:
+            for cmd in cmds:
+                values[cmd.key] = responses.get(cmd.hash_key)
+        return values
+
 
 def load_memcache(conf, logger):
     """
@@ -742,6 +897,15 @@ def load_memcache(conf, logger):
         'error_suppression_limit', ERROR_LIMIT_COUNT))
     item_size_warning_threshold = int(memcache_options.get(
         'item_size_warning_threshold', DEFAULT_ITEM_SIZE_WARNING_THRESHOLD))
+    serialization_format = memcache_options.get(
+        'serialization_format', JSONSerializer.name).strip().lower()
+    if serialization_format not in SERIALIZERS:
+        raise ValueError('Unknown serialization_format %r; expected one of '
+                         '%s' % (serialization_format,
+                                 ', '.join(sorted(SERIALIZERS))))
+    serializer = SERIALIZERS[serialization_format](
+        compress_threshold=memcache_options.get('compress_threshold', -1),
+        compress_level=memcache_options.get('compress_level', 1))
 
     if not memcache_servers:
         memcache_servers = '127.0.0.1:11211'
@@ -761,4 +925,5 @@ def load_memcache(conf, logger):
         error_limit_count=error_suppression_limit,
         error_limit_time=error_suppression_interval,
         error_limit_duration=error_suppression_interval,
-        item_size_warning_threshold=item_size_warning_threshold)
+        item_size_warning_threshold=item_size_warning_threshold,
+        serializer=serializer)
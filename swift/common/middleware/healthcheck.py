@@ -13,8 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import errno
+import json
 import os
 
+from swift.common.error_limiter import SharedErrorTable
 from swift.common.swob import Request, Response
 
 
@@ -27,11 +30,18 @@ class HealthCheckMiddleware(object):
     If the optional config parameter "disable_path" is set, and a file is
     present at that path, it will respond 503 with "DISABLED BY FILE" as the
     body.
+
+    If the optional config parameter "error_limiter_shared_file" is set to the
+    proxy-server's shared error limiter file, the path
+    /healthcheck/error_limited will respond 200 with a JSON body describing
+    the nodes that are currently error-limited.
     """
 
     def __init__(self, app, conf):
         self.app = app
         self.disable_path = conf.get('disable_path', '')
+        self.error_limiter_shared_file = conf.get(
+            'error_limiter_shared_file', '')
 
     def GET(self, req):
         """Returns a 200 response with "OK" in the body."""
@@ -42,6 +52,27 @@ class HealthCheckMiddleware(object):
         return Response(request=req, status=503, body=b"DISABLED BY FILE",
                         content_type="text/plain")
 
+    def ERROR_LIMITED(self, req):
+        """
+        Returns a 200 response with a JSON body mapping each currently
+        error-limited node to its error count and the time until which it is
+        error-limited.
+        """
+        try:
+            table = SharedErrorTable(self.error_limiter_shared_file,
+                                     create=False)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            limited = {}
+        else:
+            try:
+                limited = table.limited_nodes()
+            finally:
+                table.close()
+        return Response(request=req, body=json.dumps(limited).encode('ascii'),
+                        content_type="application/json")
+
     def __call__(self, env, start_response):
         req = Request(env)
         if req.path == '/healthcheck':
@@ -49,6 +80,9 @@ class HealthCheckMiddleware(object):
             if self.disable_path and os.path.exists(self.disable_path):
                 handler = self.DISABLED
             return handler(req)(env, start_response)
+        if req.path == '/healthcheck/error_limited' and \
+                self.error_limiter_shared_file:
+            return self.ERROR_LIMITED(req)(env, start_response)
         return self.app(env, start_response)
 
 
@@ -69,6 +69,10 @@ class ReconMiddleware(object):
         for policy in POLICIES:
             self.rings.append(os.path.join(swift_dir,
                                            policy.ring_name + '.ring.gz'))
+        # servers load an uncompressed .ring file in preference to the
+        # .ring.gz file, so check those too where they exist
+        self.rings.extend([ring_path[:-len('.gz')]
+                           for ring_path in self.rings])
 
     def _from_recon_cache(self, cache_keys, cache_file, openr=open,
                           ignore_missing=False):
@@ -176,6 +180,11 @@ class ReconMiddleware(object):
         return self._from_recon_cache(reconstruction_list,
                                       self.object_recon_cache)
 
+    def get_threadpool_info(self):
+        """get object server per-device threadpool stats"""
+        return self._from_recon_cache(['object_server_threadpools'],
+                                      self.object_recon_cache)
+
     def get_device_info(self):
         """get devices"""
         try:
@@ -408,6 +417,8 @@ class ReconMiddleware(object):
             content = self.get_relinker_info()
         elif rcheck == "reconstruction" and rtype == 'object':
             content = self.get_reconstruction_info()
+        elif rcheck == "threadpools":
+            content = self.get_threadpool_info()
         else:
             content = "Invalid path: %s" % req.path
             return Response(request=req, status="404 Not Found",
@@ -13,12 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
 import contextlib
 import copy
 import errno
 import itertools
 import logging
 import math
+import multiprocessing
+import operator
 import random
 import uuid
 
@@ -27,11 +30,14 @@ from copy import deepcopy
 from contextlib import contextmanager
 
 from array import array
-from collections import defaultdict
+from collections import Counter, defaultdict
 import six
-from six.moves import range
+from six.moves import map, range, zip
+from six.moves import zip_longest
 from time import time
 
+from eventlet import patcher
+
 from swift.common import exceptions
 from swift.common.ring.ring import RingData
 from swift.common.ring.utils import tiers_for_dev, build_tier_tree, \
@@ -49,6 +55,60 @@ class RingValidationWarning(Warning):
     pass
 
 
+# (function, leading args) for _call_forked(); set just before a pool of
+# worker processes is forked so they inherit it rather than having the
+# builder pickled over to them.
+_forked_call = None
+
+
+def _call_forked(args):
+    func, leading_args = _forked_call
+    return func(*(leading_args + args))
+
+
+def _fork_pool(processes):
+    if six.PY2:
+        # always forks on posix
+        return multiprocessing.Pool(processes)
+    return multiprocessing.get_context('fork').Pool(processes)
+
+
+def _map_part_ranges(func, leading_args, num_parts, processes):
+    """
+    Call ``func(*(leading_args + (start, stop)))`` for ranges of parts
+    covering ``range(num_parts)``, using up to ``processes`` forked
+    worker processes.
+
+    ``func`` must only read builder state; any changes it makes in a worker
+    process are lost.
+
+    A multiprocessing pool's result handling deadlocks once eventlet has
+    monkey-patched threading, so in that case everything is done in this
+    process.
+
+    :returns: a list of the results, in order of the ranges
+    """
+    global _forked_call
+    if patcher.is_monkey_patched('thread'):
+        processes = 1
+    processes = max(1, min(processes or 1, num_parts))
+    step = max(1, -(-num_parts // processes))
+    ranges = [(start, min(start + step, num_parts))
+              for start in range(0, num_parts, step)] or [(0, 0)]
+    if len(ranges) == 1:
+        return [func(*(leading_args + ranges[0]))]
+    _forked_call = (func, leading_args)
+    try:
+        pool = _fork_pool(len(ranges))
+        try:
+            return pool.map(_call_forked, ranges)
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        _forked_call = None
+
+
 @contextlib.contextmanager
 def _set_random_seed(seed):
     # If random seed is set when entering this context then reset original
@@ -511,7 +571,7 @@ class RingBuilder(object):
         self.devs_changed = True
         self.version += 1
 
-    def rebalance(self, seed=None):
+    def rebalance(self, seed=None, processes=1):
         """
         Rebalance the ring.
 
@@ -527,6 +587,11 @@ class RingBuilder(object):
         that can't be balanced no matter what).
 
         :param seed: a value for the random seed (optional)
+        :param processes: the number of processes to spread the read-only
+                          scans of every partition over; the partitions are
+                          still moved one at a time in this process, so the
+                          resulting ring doesn't depend on this. Ignored if
+                          eventlet has monkey-patched threading.
         :returns: (number_of_partitions_altered, resulting_balance,
                    number_of_removed_devices)
         """
@@ -564,7 +629,8 @@ class RingBuilder(object):
             removed_devs = self._gather_parts_from_failed_devices(assign_parts)
             # gather parts for dispersion (N.B. this only picks up parts that
             # *must* disperse according to the replica plan)
-            self._gather_parts_for_dispersion(assign_parts, replica_plan)
+            self._gather_parts_for_dispersion(assign_parts, replica_plan,
+                                              processes=processes)
 
             # we'll gather a few times, or until we archive the plan
             for gather_count in range(MAX_BALANCE_GATHER_COUNT):
@@ -598,7 +664,8 @@ class RingBuilder(object):
                 {'status': finish_status, 'count': gather_count + 1})
 
         self.devs_changed = False
-        changed_parts = self._build_dispersion_graph(old_replica2part2dev)
+        changed_parts = self._build_dispersion_graph(old_replica2part2dev,
+                                                     processes=processes)
 
         # clean up the cache
         for dev in self._iter_devs():
@@ -606,7 +673,8 @@ class RingBuilder(object):
 
         return changed_parts, self.get_balance(), removed_devs
 
-    def _build_dispersion_graph(self, old_replica2part2dev=None):
+    def _build_dispersion_graph(self, old_replica2part2dev=None,
+                                processes=1):
         """
         Build a dict of all tiers in the cluster to a list of the number of
         parts with a replica count at each index.  The values of the dict will
@@ -627,6 +695,7 @@ class RingBuilder(object):
 
         :param old_replica2part2dev: if called from rebalance, the
             old_replica2part2dev can be used to count moved parts.
+        :param processes: the number of processes to split the parts between
 
         :returns: number of parts with different assignments than
             old_replica2part2dev if provided
@@ -644,45 +713,85 @@ class RingBuilder(object):
         max_allowed_replicas = self._build_max_replicas_by_tier()
         parts_at_risk = 0
 
+        # only the parts that every replica has an assignment for count
+        num_parts = 0
+        if self._replica2part2dev:
+            num_parts = min(len(part2dev)
+                            for part2dev in self._replica2part2dev)
         dispersion_graph = {}
-        # go over all the devices holding each replica part by part
-        for part_id, dev_ids in enumerate(
-                six.moves.zip(*self._replica2part2dev)):
+        for graph, range_changed_parts, range_parts_at_risk in \
+                _map_part_ranges(self._dispersion_for_parts,
+                                 (old_replica2part2dev, int_replicas,
+                                  max_allowed_replicas),
+                                 num_parts, processes):
+            for tier, replica_counts in graph.items():
+                if tier not in dispersion_graph:
+                    dispersion_graph[tier] = [self.parts] + [0] * int_replicas
+                totals = dispersion_graph[tier]
+                for replicas, count in enumerate(replica_counts):
+                    totals[replicas] += count
+            changed_parts += range_changed_parts
+            parts_at_risk += range_parts_at_risk
+        self._dispersion_graph = dispersion_graph
+        self.dispersion = 100.0 * parts_at_risk / (self.parts * self.replicas)
+        self.version += 1
+        return changed_parts
+
+    def _dispersion_for_parts(self, old_replica2part2dev, int_replicas,
+                              max_allowed_replicas, start, stop):
+        """
+        Work out what the parts in ``range(start, stop)`` contribute to the
+        dispersion graph.
+
+        :returns: a tuple of (changes to the dispersion graph, number of
+                  changed part-replicas, number of part-replicas at risk)
+        """
+        replica_rows = [part2dev[start:stop]
+                        for part2dev in self._replica2part2dev]
+        changed_parts = 0
+        for rep_id, part2dev in enumerate(replica_rows):
+            # IndexErrors would be raised if the replicas are increased or
+            # decreased, and that actually means the partition has changed
+            if rep_id < len(old_replica2part2dev):
+                old_part2dev = old_replica2part2dev[rep_id][start:stop]
+            else:
+                old_part2dev = ()
+            changed_parts += len(part2dev) - len(old_part2dev)
+            changed_parts += sum(map(operator.ne, old_part2dev, part2dev))
+
+        # Parts whose replicas are on the same devices disperse the same way,
+        # so only work each combination out once.
+        graph = {}
+        parts_at_risk = 0
+        dev_tiers = {}
+        for dev_ids, num_parts in Counter(zip(*replica_rows)).items():
             # count the number of replicas of this part for each tier of each
             # device, some devices may have overlapping tiers!
             replicas_at_tier = defaultdict(int)
-            for rep_id, dev in enumerate(iter(
-                    self.devs[dev_id] for dev_id in dev_ids)):
-                for tier in (dev.get('tiers') or tiers_for_dev(dev)):
-                    replicas_at_tier[tier] += 1
-                # IndexErrors will be raised if the replicas are increased or
-                # decreased, and that actually means the partition has changed
+            for dev_id in dev_ids:
                 try:
-                    old_device = old_replica2part2dev[rep_id][part_id]
-                except IndexError:
-                    changed_parts += 1
-                    continue
-
-                if old_device != dev['id']:
-                    changed_parts += 1
+                    tiers = dev_tiers[dev_id]
+                except KeyError:
+                    dev = self.devs[dev_id]
+                    tiers = dev_tiers[dev_id] = (
+                        dev.get('tiers') or tiers_for_dev(dev))
+                for tier in tiers:
+                    replicas_at_tier[tier] += 1
             # update running totals for each tiers' number of parts with a
             # given replica count
             part_risk_depth = defaultdict(int)
             part_risk_depth[0] = 0
             for tier, replicas in replicas_at_tier.items():
-                if tier not in dispersion_graph:
-                    dispersion_graph[tier] = [self.parts] + [0] * int_replicas
-                dispersion_graph[tier][0] -= 1
-                dispersion_graph[tier][replicas] += 1
+                if tier not in graph:
+                    graph[tier] = [0] * (int_replicas + 1)
+                graph[tier][0] -= num_parts
+                graph[tier][replicas] += num_parts
                 if replicas > max_allowed_replicas[tier]:
                     part_risk_depth[len(tier)] += (
                         replicas - max_allowed_replicas[tier])
             # count each part-replica once at tier where dispersion is worst
-            parts_at_risk += max(part_risk_depth.values())
-        self._dispersion_graph = dispersion_graph
-        self.dispersion = 100.0 * parts_at_risk / (self.parts * self.replicas)
-        self.version += 1
-        return changed_parts
+            parts_at_risk += max(part_risk_depth.values()) * num_parts
+        return graph, changed_parts, parts_at_risk
 
     def validate(self, stats=False):
         """
@@ -1077,14 +1186,56 @@ class RingBuilder(object):
             "%d new parts and %d removed parts from replica-count change",
             new_parts, removed_parts)
 
-    def _gather_parts_for_dispersion(self, assign_parts, replica_plan):
+    def _undispersed_parts(self, replica_plan, start, stop):
+        """
+        Find the parts in ``range(start, stop)`` with a replica in a tier that
+        holds more replicas of the part than the replica plan allows.
+
+        :returns: a list of parts
+        """
+        replica_rows = [part2dev[start:stop]
+                        for part2dev in self._replica2part2dev]
+        # Parts whose replicas are on the same devices are dispersed the same
+        # way, so only work each combination out once.
+        undispersed_by_dev_ids = {}
+        undispersed_parts = []
+        for part, dev_ids in enumerate(
+                zip_longest(*replica_rows, fillvalue=NONE_DEV), start):
+            try:
+                undispersed = undispersed_by_dev_ids[dev_ids]
+            except KeyError:
+                devs = [self.devs[dev_id] for dev_id in dev_ids
+                        if dev_id != NONE_DEV]
+                replicas_at_tier = defaultdict(int)
+                for dev in devs:
+                    for tier in dev['tiers']:
+                        replicas_at_tier[tier] += 1
+                undispersed = undispersed_by_dev_ids[dev_ids] = any(
+                    not all(replicas_at_tier[tier] <=
+                            replica_plan[tier]['max']
+                            for tier in dev['tiers'])
+                    for dev in devs)
+            if undispersed:
+                undispersed_parts.append(part)
+        return undispersed_parts
+
+    def _gather_parts_for_dispersion(self, assign_parts, replica_plan,
+                                     processes=1):
         """
         Update the map of partition => [replicas] to be reassigned from
         insufficiently-far-apart replicas.
+
+        :param processes: the number of processes to split the search for
+                          undispersed parts between
         """
         # Now we gather partitions that are "at risk" because they aren't
-        # currently sufficient spread out across the cluster.
-        for part in range(self.parts):
+        # currently sufficient spread out across the cluster. Finding them
+        # only means reading the ring, so that can be done in other
+        # processes; what to do about each one depends on what happened to
+        # the ones before it though.
+        for part in itertools.chain.from_iterable(_map_part_ranges(
+                self._undispersed_parts, (replica_plan,),
+                self.parts, processes)):
             if (not self._can_part_move(part)):
                 continue
             # First, add up the count of replicas at each tier for each
@@ -1131,6 +1282,29 @@ class RingBuilder(object):
                     replicas_at_tier[tier] -= 1
                 self._set_part_moved(part)
 
+    def _parts_on_overweight_devs(self, start):
+        """
+        Find the parts with a replica on a device that has more parts than
+        it wants.
+
+        Devices only ever shed parts while gathering, so these are the only
+        parts a gather pass needs to look at.
+
+        :param start: offset into self.parts at which the pass begins
+        :returns: a list of parts in the order the pass would reach them
+        """
+        overweight = bytearray(NONE_DEV + 1)
+        for dev in self._iter_devs():
+            if dev['parts_wanted'] < 0:
+                overweight[dev['id']] = 1
+        parts = set()
+        for part2dev in self._replica2part2dev:
+            parts.update(itertools.compress(
+                itertools.count(), map(overweight.__getitem__, part2dev)))
+        parts = sorted(parts)
+        index = bisect.bisect_left(parts, start)
+        return parts[index:] + parts[:index]
+
     def _gather_parts_for_balance_can_disperse(self, assign_parts, start,
                                                replica_plan):
         """
@@ -1150,8 +1324,7 @@ class RingBuilder(object):
                 parts_wanted_in_tier[tier] += wanted
         # Last, we gather partitions from devices that are "overweight" because
         # they have more partitions than their parts_wanted.
-        for offset in range(self.parts):
-            part = (start + offset) % self.parts
+        for part in self._parts_on_overweight_devs(start):
             if (not self._can_part_move(part)):
                 continue
             # For each part we'll look at the devices holding those parts and
@@ -1245,8 +1418,7 @@ class RingBuilder(object):
         :param assign_parts: the map of partition => [replica] to update
         :param start: offset into self.parts to begin search
         """
-        for offset in range(self.parts):
-            part = (start + offset) % self.parts
+        for part in self._parts_on_overweight_devs(start):
             if (not self._can_part_move(part)):
                 continue
             overweight_dev_replica = []
@@ -1351,6 +1523,8 @@ class RingBuilder(object):
             tiers_list = new_tiers_list
             depth += 1
 
+        max_replicas = {tier: plan['max']
+                        for tier, plan in replica_plan.items()}
         for part, replace_replicas in reassign_parts:
             # always update part_moves for min_part_hours
             self._last_part_moves[part] = 0
@@ -1371,8 +1545,7 @@ class RingBuilder(object):
                     # already have their max replicas assigned according
                     # to the replica_plan.
                     candidates = [t for t in tier2children[tier] if
-                                  replicas_at_tier[t] <
-                                  replica_plan[t]['max']]
+                                  replicas_at_tier[t] < max_replicas[t]]
 
                     if not candidates:
                         raise Exception('no home for %s/%s %s' % (
@@ -1380,8 +1553,8 @@ class RingBuilder(object):
                                 replicas_at_tier[t],
                                 replica_plan[t]['max'],
                             ) for t in tier2children[tier]}))
-                    tier = max(candidates, key=lambda t:
-                               parts_available_in_tier[t])
+                    tier = max(candidates,
+                               key=parts_available_in_tier.__getitem__)
 
                     depth += 1
 
@@ -18,8 +18,10 @@ import contextlib
 
 import six.moves.cPickle as pickle
 import json
-from collections import defaultdict
+import logging
+from collections import defaultdict, OrderedDict
 from gzip import GzipFile
+import mmap
 from os.path import getmtime
 import struct
 from time import time
@@ -29,15 +31,76 @@ from tempfile import NamedTemporaryFile
 import sys
 import zlib
 
+from eventlet import sleep, spawn_n, tpool
 import six
-from six.moves import range
+from six.moves import range, zip, zip_longest
 
 from swift.common.exceptions import RingLoadError
 from swift.common.utils import hash_path, validate_configuration, md5
 from swift.common.ring.utils import tiers_for_dev
 
 
+LOG = logging.getLogger('swift.ring')
+
 DEFAULT_RELOAD_TIME = 15
+# Number of partitions whose primary node lists are remembered between calls
+PART_NODES_CACHE_SIZE = 16384
+# Bounds on the number of partitions get_more_nodes() examines at a time
+HANDOFF_CHUNK_MIN = 8
+HANDOFF_CHUNK_MAX = 1024
+# v2 ring files are not compressed; the header is padded out so that each
+# replica2part2dev_id row starts on a page boundary and can be mmap'd
+V2_HEADER_SIZE = 10  # magic, format version and json length
+V2_ROW_ALIGNMENT = 4096
+
+
+def _v2_align(offset):
+    return -(-offset // V2_ROW_ALIGNMENT) * V2_ROW_ALIGNMENT
+
+
+def _part2dev_id_bytes(part2dev_id):
+    if isinstance(part2dev_id, memoryview):
+        return part2dev_id.tobytes()
+    if not isinstance(part2dev_id, array.array):
+        part2dev_id = array.array('H', part2dev_id)
+    if six.PY2:
+        return part2dev_id.tostring()
+    return part2dev_id.tobytes()
+
+
+def _replica2part2dev_id_md5(replica2part2dev_id):
+    checksum = md5(usedforsecurity=False)
+    for part2dev_id in replica2part2dev_id:
+        checksum.update(_part2dev_id_bytes(part2dev_id))
+    return checksum.hexdigest()
+
+
+def _dev_ids_with_parts(replica2part2dev_id):
+    dev_ids_with_parts = set()
+    for part2dev_id in replica2part2dev_id:
+        dev_ids_with_parts.update(part2dev_id)
+    return dev_ids_with_parts
+
+
+def _reusable_assignments(ring_dict, previous):
+    """
+    Find out whether the partition assignments described by a freshly read
+    ring file header are the ones already loaded in ``previous``.
+
+    :param ring_dict: a dict as returned by one of the ``deserialize_v*``
+                      methods with ``metadata_only=True``
+    :param previous: a RingData instance, or None
+    :returns: the ``replica2part2dev_id`` of ``previous`` if it can be
+              reused, otherwise None
+    """
+    if previous is None:
+        return None
+    checksum = ring_dict.get('replica2part2dev_id_md5')
+    if (checksum and checksum == getattr(
+            previous, 'replica2part2dev_id_md5', None) and
+            ring_dict['part_shift'] == previous._part_shift):
+        return previous._replica2part2dev_id
+    return None
 
 
 def calc_replica_count(replica2part2dev_id):
@@ -100,6 +163,19 @@ class RingReader(object):
         self._buffer += chunk
         return True
 
+    def skip_rest(self, remaining_raw_size):
+        """
+        Checksum the rest of the file without decompressing it.
+
+        :param remaining_raw_size: the number of decompressed bytes the rest
+                                   of the file is known to hold
+        """
+        self.raw_size += remaining_raw_size - len(self._buffer)
+        self._buffer = b''
+        for chunk in iter(lambda: self.fp.read(self.chunk_size), b''):
+            self.size += len(chunk)
+            self._md5.update(chunk)
+
     def read(self, amount=-1):
         if amount < 0:
             raise IOError("don't be greedy")
@@ -142,6 +218,9 @@ class RingData(object):
         self.next_part_power = next_part_power
         self.version = version
         self.md5 = self.size = self.raw_size = None
+        # checksum of the partition assignments as they were serialized;
+        # only known for rings loaded from a file that recorded it
+        self.replica2part2dev_id_md5 = None
 
     @property
     def replica_count(self):
@@ -169,9 +248,12 @@ class RingData(object):
         ring_dict = json.loads(gz_file.read(json_len))
         ring_dict['replica2part2dev_id'] = []
 
-        if metadata_only:
-            return ring_dict
+        if not metadata_only:
+            cls._deserialize_v1_assignments(gz_file, ring_dict)
+        return ring_dict
 
+    @staticmethod
+    def _deserialize_v1_assignments(gz_file, ring_dict):
         byteswap = (ring_dict.get('byteorder', sys.byteorder) != sys.byteorder)
 
         partition_count = 1 << (32 - ring_dict['part_shift'])
@@ -181,17 +263,116 @@ class RingData(object):
                 part2dev.byteswap()
             ring_dict['replica2part2dev_id'].append(part2dev)
 
+    @classmethod
+    def deserialize_v2(cls, fp, metadata_only=False):
+        """
+        Deserialize a v2 ring file into a dictionary with `devs`,
+        `part_shift`, and `replica2part2dev_id` keys.
+
+        v2 ring files are uncompressed, and each `replica2part2dev_id` row
+        starts on a page boundary. Rather than copying the rows into fresh
+        arrays, they are returned as read-only ``memoryview`` objects backed
+        by a shared mmap of the file, so every process that loads the same
+        ring file shares the same pages in the page cache.
+
+        If the ring was written on a machine with a different byte order
+        (or on python 2, where memoryviews can't be cast) the rows are
+        copied into arrays instead.
+
+        :param file fp: An opened file object which has already consumed
+                        the 6 bytes of magic and version.
+        :param bool metadata_only: If True, only load `devs` and `part_shift`
+        :returns: A dict containing `devs`, `part_shift`, and
+                  `replica2part2dev_id`
+        """
+        json_len, = struct.unpack('!I', fp.read(4))
+        ring_dict = json.loads(fp.read(json_len))
+        ring_dict['replica2part2dev_id'] = []
+
+        if not metadata_only:
+            cls._deserialize_v2_assignments(fp, ring_dict)
         return ring_dict
 
+    @staticmethod
+    def _deserialize_v2_assignments(fp, ring_dict):
+        byteswap = (ring_dict.get('byteorder', sys.byteorder) != sys.byteorder)
+
+        # the header has just been read
+        offset = _v2_align(fp.tell())
+        row_lengths = ring_dict['replica_lengths']
+        if byteswap or six.PY2:
+            for row_length in row_lengths:
+                fp.seek(offset)
+                part2dev = array.array('H', fp.read(2 * row_length))
+                if byteswap:
+                    part2dev.byteswap()
+                ring_dict['replica2part2dev_id'].append(part2dev)
+                offset += _v2_align(2 * row_length)
+        elif row_lengths:
+            view = memoryview(mmap.mmap(fp.fileno(), 0,
+                                        access=mmap.ACCESS_READ))
+            for row_length in row_lengths:
+                ring_dict['replica2part2dev_id'].append(
+                    view[offset:offset + 2 * row_length].cast('H'))
+                offset += _v2_align(2 * row_length)
+
+    @classmethod
+    def _load_v2(cls, filename, metadata_only=False, previous=None):
+        with open(filename, 'rb') as fp:
+            fp.seek(6)
+            ring_dict = cls.deserialize_v2(fp, metadata_only=True)
+            consumed = fp.tell()
+            if not metadata_only:
+                reused = _reusable_assignments(ring_dict, previous)
+                if reused is None:
+                    cls._deserialize_v2_assignments(fp, ring_dict)
+                else:
+                    ring_dict['replica2part2dev_id'] = reused
+            fp.seek(0)
+            if metadata_only:
+                # like v1, only checksum what was actually read
+                checksum = md5(fp.read(consumed), usedforsecurity=False)
+            else:
+                checksum = md5(usedforsecurity=False)
+                for chunk in iter(
+                        lambda: fp.read(RingReader.chunk_size), b''):
+                    checksum.update(chunk)
+            size = os.fstat(fp.fileno()).st_size
+
+        ring_data = RingData(ring_dict['replica2part2dev_id'],
+                             ring_dict['devs'], ring_dict['part_shift'],
+                             ring_dict.get('next_part_power'),
+                             ring_dict.get('version'))
+        ring_data.md5 = checksum.hexdigest()
+        ring_data.size = ring_data.raw_size = size
+        ring_data.replica2part2dev_id_md5 = ring_dict.get(
+            'replica2part2dev_id_md5')
+        return ring_data
+
     @classmethod
-    def load(cls, filename, metadata_only=False):
+    def load(cls, filename, metadata_only=False, previous=None):
         """
         Load ring data from a file.
 
+        Both the gzipped v1 format and the uncompressed, memory-mappable v2
+        format are detected automatically.
+
         :param filename: Path to a file serialized by the save() method.
         :param bool metadata_only: If True, only load `devs` and `part_shift`.
+        :param previous: RingData previously loaded from the same path. If
+                         the file records the same partition assignments,
+                         they are taken from ``previous`` rather than read
+                         and decompressed again; this is the common case
+                         when only device metadata such as weights or
+                         addresses changed.
         :returns: A RingData instance containing the loaded data.
         """
+        with open(filename, 'rb') as fp:
+            is_v2 = fp.read(6) == struct.pack('!4sH', b'R1NG', 2)
+        if is_v2:
+            return cls._load_v2(filename, metadata_only=metadata_only,
+                                previous=previous)
+
         with contextlib.closing(RingReader(filename)) as gz_file:
             # See if the file is in the new format
             magic = gz_file.read(4)
@@ -199,7 +380,17 @@ class RingData(object):
                 format_version, = struct.unpack('!H', gz_file.read(2))
                 if format_version == 1:
                     ring_data = cls.deserialize_v1(
-                        gz_file, metadata_only=metadata_only)
+                        gz_file, metadata_only=True)
+                    if not metadata_only:
+                        reused = _reusable_assignments(ring_data, previous)
+                        if reused is None:
+                            cls._deserialize_v1_assignments(
+                                gz_file, ring_data)
+                        else:
+                            ring_data['replica2part2dev_id'] = reused
+                            gz_file.skip_rest(sum(
+                                2 * len(part2dev_id)
+                                for part2dev_id in reused))
                 else:
                     raise Exception('Unknown ring format version %d' %
                                     format_version)
@@ -212,10 +403,13 @@ class RingData(object):
             # pickled RingData; make sure we've got region/replication info
             normalize_devices(ring_data.devs)
         else:
-            ring_data = RingData(ring_data['replica2part2dev_id'],
-                                 ring_data['devs'], ring_data['part_shift'],
-                                 ring_data.get('next_part_power'),
-                                 ring_data.get('version'))
+            ring_dict = ring_data
+            ring_data = RingData(ring_dict['replica2part2dev_id'],
+                                 ring_dict['devs'], ring_dict['part_shift'],
+                                 ring_dict.get('next_part_power'),
+                                 ring_dict.get('version'))
+            ring_data.replica2part2dev_id_md5 = ring_dict.get(
+                'replica2part2dev_id_md5')
         for attr in ('md5', 'size', 'raw_size'):
             setattr(ring_data, attr, getattr(gz_file, attr))
         return ring_data
@@ -229,6 +423,8 @@ class RingData(object):
         # builder, otherwise just ignore it
         _text = {'devs': ring['devs'], 'part_shift': ring['part_shift'],
                  'replica_count': len(ring['replica2part2dev_id']),
+                 'replica2part2dev_id_md5': _replica2part2dev_id_md5(
+                     ring['replica2part2dev_id']),
                  'byteorder': sys.byteorder}
 
         if ring['version'] is not None:
@@ -244,28 +440,74 @@ class RingData(object):
         file_obj.write(struct.pack('!I', json_len))
         file_obj.write(json_text)
         for part2dev_id in ring['replica2part2dev_id']:
-            if six.PY2:
+            if isinstance(part2dev_id, memoryview):
+                # loaded from a v2 ring file
+                file_obj.write(_part2dev_id_bytes(part2dev_id))
+            elif six.PY2:
                 # Can't just use tofile() because a GzipFile apparently
                 # doesn't count as an 'open file'
                 file_obj.write(part2dev_id.tostring())
             else:
                 part2dev_id.tofile(file_obj)
 
-    def save(self, filename, mtime=1300507380.0):
+    def serialize_v2(self, file_obj):
+        # Write out new-style serialization magic and version:
+        file_obj.write(struct.pack('!4sH', b'R1NG', 2))
+        ring = self.to_dict()
+
+        _text = {'devs': ring['devs'], 'part_shift': ring['part_shift'],
+                 'replica_count': len(ring['replica2part2dev_id']),
+                 'replica_lengths': [
+                     len(part2dev_id)
+                     for part2dev_id in ring['replica2part2dev_id']],
+                 'replica2part2dev_id_md5': _replica2part2dev_id_md5(
+                     ring['replica2part2dev_id']),
+                 'byteorder': sys.byteorder}
+
+        if ring['version'] is not None:
+            _text['version'] = ring['version']
+
+        next_part_power = ring.get('next_part_power')
+        if next_part_power is not None:
+            _text['next_part_power'] = next_part_power
+
+        json_text = json.dumps(_text, sort_keys=True,
+                               ensure_ascii=True).encode('ascii')
+        json_len = len(json_text)
+        file_obj.write(struct.pack('!I', json_len))
+        file_obj.write(json_text)
+        offset = V2_HEADER_SIZE + json_len
+        for part2dev_id in ring['replica2part2dev_id']:
+            padding = _v2_align(offset) - offset
+            file_obj.write(b'\x00' * padding)
+            row = _part2dev_id_bytes(part2dev_id)
+            file_obj.write(row)
+            offset += padding + len(row)
+
+    def save(self, filename, mtime=1300507380.0, format_version=1):
         """
         Serialize this RingData instance to disk.
 
         :param filename: File into which this instance should be serialized.
         :param mtime: time used to override mtime for gzip, default or None
                       if the caller wants to include time
+        :param format_version: 1 for a gzipped ring file, 2 for an
+                               uncompressed ring file that can be mmap'd
         """
-        # Override the timestamp so that the same ring data creates
-        # the same bytes on disk. This makes a checksum comparison a
-        # good way to see if two rings are identical.
+        if format_version not in (1, 2):
+            raise ValueError('Unknown ring format version %r' %
+                             format_version)
         tempf = NamedTemporaryFile(dir=".", prefix=filename, delete=False)
-        gz_file = GzipFile(filename, mode='wb', fileobj=tempf, mtime=mtime)
-        self.serialize_v1(gz_file)
-        gz_file.close()
+        if format_version == 2:
+            self.serialize_v2(tempf)
+        else:
+            # Override the timestamp so that the same ring data creates
+            # the same bytes on disk. This makes a checksum comparison a
+            # good way to see if two rings are identical.
+            gz_file = GzipFile(filename, mode='wb', fileobj=tempf,
+                               mtime=mtime)
+            self.serialize_v1(gz_file)
+            gz_file.close()
         tempf.flush()
         os.fsync(tempf.fileno())
         tempf.close()
@@ -284,56 +526,150 @@ class Ring(object):
     """
     Partitioned consistent hashing ring.
 
-    :param serialized_path: path to serialized RingData instance
+    :param serialized_path: path to serialized RingData instance; if
+                            ``ring_name`` is given, the directory containing
+                            the ring file. A memory-mappable
+                            ``<ring_name>.ring`` (v2) file is preferred to
+                            ``<ring_name>.ring.gz`` when both exist, unless
+                            it is older.
     :param reload_time: time interval in seconds to check for a ring change
     :param ring_name: ring name string (basically specified from policy)
     :param validation_hook: hook point to validate ring configuration ontime
+    :param background_reload: if True, a changed ring file is loaded in a
+                              separate greenthread (which reads the file in
+                              a real thread) and swapped in once it's
+                              ready; until then callers keep getting answers
+                              from the ring already in memory. The initial
+                              load always happens inline.
 
     :raises RingLoadError: if the loaded ring data violates its constraint
     """
 
     def __init__(self, serialized_path, reload_time=None, ring_name=None,
-                 validation_hook=lambda ring_data: None):
+                 validation_hook=lambda ring_data: None,
+                 background_reload=False):
         # can't use the ring unless HASH_PATH_SUFFIX is set
         validate_configuration()
         if ring_name:
-            self.serialized_path = os.path.join(serialized_path,
-                                                ring_name + '.ring.gz')
+            self._ring_path = os.path.join(serialized_path,
+                                           ring_name + '.ring.gz')
+            self._v2_path = os.path.join(serialized_path, ring_name + '.ring')
         else:
-            self.serialized_path = os.path.join(serialized_path)
+            self._ring_path = os.path.join(serialized_path)
+            self._v2_path = None
+        self.serialized_path = self._pick_serialized_path()
         self.reload_time = (DEFAULT_RELOAD_TIME if reload_time is None
                             else reload_time)
         self._validation_hook = validation_hook
+        self.background_reload = background_reload
+        self._reloading = False
         self._reload(force=True)
 
+    def _pick_serialized_path(self):
+        """
+        Choose the ring file to load.
+
+        A ``.ring`` file is only used if it is at least as new as the
+        ``.ring.gz`` file next to it; tools that only know about
+        ``.ring.gz`` files leave a stale ``.ring`` file behind them.
+        """
+        if self._v2_path is None:
+            return self._ring_path
+        try:
+            v2_mtime = getmtime(self._v2_path)
+        except OSError:
+            return self._ring_path
+        try:
+            ring_mtime = getmtime(self._ring_path)
+        except OSError:
+            return self._v2_path
+        return self._v2_path if v2_mtime >= ring_mtime else self._ring_path
+
     def _reload(self, force=False):
         self._rtime = time() + self.reload_time
-        if force or self.has_changed():
-            ring_data = RingData.load(self.serialized_path)
-
-            try:
-                self._validation_hook(ring_data)
-            except RingLoadError:
-                if force:
-                    raise
-                else:
-                    # In runtime reload at working server, it's ok to use old
-                    # ring data if the new ring data is invalid.
-                    return
-
-            self._mtime = getmtime(self.serialized_path)
-            self._devs = ring_data.devs
-            self._replica2part2dev_id = ring_data._replica2part2dev_id
-            self._part_shift = ring_data._part_shift
-            self._rebuild_tier_data()
-            self._update_bookkeeping()
-            self._next_part_power = ring_data.next_part_power
-            self._version = ring_data.version
-            self._md5 = ring_data.md5
-            self._size = ring_data.size
-            self._raw_size = ring_data.raw_size
-
-    def _update_bookkeeping(self):
+        if not (force or self.has_changed()):
+            return
+        if force or not self.background_reload:
+            self._load_ring(force=force)
+        elif not self._reloading:
+            self._reloading = True
+            spawn_n(self._background_reload)
+
+    def _background_reload(self):
+        try:
+            self._load_ring(cooperative=True)
+        except Exception:
+            # keep serving from the ring we've got; we'll try again the
+            # next time the reload interval passes
+            LOG.exception('Error reloading ring %s', self.serialized_path)
+        finally:
+            self._reloading = False
+
+    def _load_ring(self, force=False, cooperative=False):
+        """
+        Load the ring file and swap the result in.
+
+        Everything derived from the ring data is built on a separate object
+        and then copied over in one go, so nobody ever sees a mixture of old
+        and new ring data.
+
+        :param force: True for the initial load; a ring that fails
+                      validation raises instead of being ignored
+        :param cooperative: if True, read and parse the ring file in a
+                            real thread, and yield to other greenthreads
+                            between the expensive steps after that
+        """
+        previous = getattr(self, '_ring_data', None)
+        serialized_path = self._pick_serialized_path()
+        if cooperative:
+            # reading and decompressing the file doesn't yield, so keep it
+            # off the hub; the result is still swapped in by this greenthread
+            ring_data = tpool.execute(
+                RingData.load, serialized_path, previous=previous)
+        else:
+            ring_data = RingData.load(serialized_path, previous=previous)
+
+        try:
+            self._validation_hook(ring_data)
+        except RingLoadError:
+            if force:
+                raise
+            else:
+                # In runtime reload at working server, it's ok to use old
+                # ring data if the new ring data is invalid.
+                return
+
+        new_ring = object.__new__(type(self))
+        new_ring.serialized_path = serialized_path
+        new_ring._mtime = getmtime(serialized_path)
+        new_ring._devs = ring_data.devs
+        new_ring._replica2part2dev_id = ring_data._replica2part2dev_id
+        new_ring._part_shift = ring_data._part_shift
+        if cooperative:
+            sleep()
+        new_ring._rebuild_tier_data()
+        if cooperative:
+            sleep()
+        if previous is not None and (ring_data._replica2part2dev_id is
+                                     previous._replica2part2dev_id):
+            # only device metadata changed
+            new_ring._update_bookkeeping(self._dev_ids_with_parts)
+        elif cooperative:
+            # scanning every partition assignment takes a while for a big
+            # ring; don't hold up the hub while it's done
+            new_ring._update_bookkeeping(tpool.execute(
+                _dev_ids_with_parts, ring_data._replica2part2dev_id))
+        else:
+            new_ring._update_bookkeeping()
+        new_ring._next_part_power = ring_data.next_part_power
+        new_ring._version = ring_data.version
+        new_ring._md5 = ring_data.md5
+        new_ring._size = ring_data.size
+        new_ring._raw_size = ring_data.raw_size
+        new_ring._ring_data = ring_data
+        self.__dict__.update(new_ring.__dict__)
+
+    def _update_bookkeeping(self, dev_ids_with_parts=None):
         # Do this now, when we know the data has changed, rather than
         # doing it on every call to get_more_nodes().
         #
@@ -342,13 +678,18 @@ class Ring(object):
         # way, a region, zone, or server with no partitions assigned
         # does not count toward our totals, thereby keeping the early
         # bailouts in get_more_nodes() working.
-        dev_ids_with_parts = set()
-        for part2dev_id in self._replica2part2dev_id:
-            for dev_id in part2dev_id:
-                dev_ids_with_parts.add(dev_id)
-        regions = set()
-        zones = set()
-        ips = set()
+        if dev_ids_with_parts is None:
+            dev_ids_with_parts = _dev_ids_with_parts(
+                self._replica2part2dev_id)
+        self._dev_ids_with_parts = dev_ids_with_parts
+        # get_more_nodes() compares the region, zone and ip tiers of lots of
+        # devices; map each assigned device's id to small integers
+        # identifying those tiers so it needn't keep looking in device dicts
+        # and making tuples.
+        regions, zones, ips = tier_ids = ({}, {}, {})
+        self._dev_tier_ids = ([None] * len(self._devs),
+                              [None] * len(self._devs),
+                              [None] * len(self._devs))
         self._num_devs = 0
         self._num_assigned_devs = 0
         self._num_weighted_devs = 0
@@ -359,14 +700,20 @@ class Ring(object):
             if dev.get('weight', 0) > 0:
                 self._num_weighted_devs += 1
             if dev['id'] in dev_ids_with_parts:
-                regions.add(dev['region'])
-                zones.add((dev['region'], dev['zone']))
-                ips.add((dev['region'], dev['zone'], dev['ip']))
+                for tier, ids, dev_tier_ids in zip(
+                        tiers_for_dev(dev), tier_ids, self._dev_tier_ids):
+                    dev_tier_ids[dev['id']] = ids.setdefault(tier, len(ids))
                 self._num_assigned_devs += 1
         self._num_regions = len(regions)
         self._num_zones = len(zones)
         self._num_ips = len(ips)
 
+        # The devices that are the primary nodes of a partition are found on
+        # demand and remembered until the ring changes. The node dicts are
+        # still built from self._devs on every call, so that any changes made
+        # to the devs in place are seen.
+        self._part_nodes_cache = OrderedDict()
+
     @property
     def next_part_power(self):
         if time() > self._rtime:
@@ -448,18 +795,36 @@ class Ring(object):
 
         :returns: True if the ring on disk has changed, False otherwise
         """
-        return getmtime(self.serialized_path) != self._mtime
+        serialized_path = self._pick_serialized_path()
+        return (serialized_path != self.serialized_path or
+                getmtime(serialized_path) != self._mtime)
 
-    def _get_part_nodes(self, part):
-        part_nodes = []
-        seen_ids = set()
+    def _build_part_dev_ids(self, part):
+        dev_ids = []
         for r2p2d in self._replica2part2dev_id:
             if part < len(r2p2d):
                 dev_id = r2p2d[part]
-                if dev_id not in seen_ids:
-                    part_nodes.append(self.devs[dev_id])
-                    seen_ids.add(dev_id)
-        return [dict(node, index=i) for i, node in enumerate(part_nodes)]
+                if dev_id not in dev_ids:
+                    dev_ids.append(dev_id)
+        return tuple(dev_ids)
+
+    def _cached_part_dev_ids(self, part):
+        # NB: utils.LRUCache costs about as much per hit as just finding the
+        # devices, so keep a plain OrderedDict in LRU order instead
+        cache = self._part_nodes_cache
+        try:
+            dev_ids = cache.pop(part)
+        except KeyError:
+            dev_ids = self._build_part_dev_ids(part)
+            if len(cache) >= PART_NODES_CACHE_SIZE:
+                cache.popitem(last=False)
+        cache[part] = dev_ids
+        return dev_ids
+
+    def _get_part_nodes(self, part):
+        devs = self._devs
+        return [dict(devs[dev_id], index=i)
+                for i, dev_id in enumerate(self._cached_part_dev_ids(part))]
 
     def get_part(self, account, container=None, obj=None):
         """
@@ -524,6 +889,67 @@ class Ring(object):
         part = self.get_part(account, container, obj)
         return part, self._get_part_nodes(part)
 
+    def _iter_handoff_chunks(self, start, parts, inc):
+        """
+        Yields lists of device ids in the order that get_more_nodes()
+        considers them: every replica of each handoff partition in turn.
+
+        The replica rows are sliced rather than indexed one partition at a
+        time; chunks start small since most callers only want a few
+        handoffs, and grow as more of the ring needs to be walked.
+        """
+        rows = self._replica2part2dev_id
+        chunk_size = HANDOFF_CHUNK_MIN
+        for first, stop in ((start, parts),
+                            (inc - ((parts - start) % inc), start)):
+            while first < stop:
+                last = min(stop, first + chunk_size * inc)
+                slices = [row[first:last:inc] for row in rows]
+                if all(len(s) == len(slices[0]) for s in slices):
+                    yield list(chain.from_iterable(zip(*slices)))
+                else:
+                    # partial replica; some rows don't cover every part
+                    yield [dev_id for dev_id in chain.from_iterable(
+                        zip_longest(*slices)) if dev_id is not None]
+                first = last
+                chunk_size = min(chunk_size * 2, HANDOFF_CHUNK_MAX)
+
+    def get_parts_bulk(self, paths):
+        """
+        Get the partitions for many account/container/object paths at once.
+
+        This is equivalent to calling :func:`get_part` for each path, but the
+        partitions are all extracted from the path hashes in a single pass,
+        which saves a lot of per-call overhead for daemons working their way
+        through long listings.
+
+        :param paths: an iterable of (account, container, obj) tuples;
+                      container and obj may be omitted or None
+        :returns: a list of partition numbers, in the same order as paths
+        """
+        digests = b''.join(hash_path(*path, raw_digest=True)
+                           for path in paths)
+        if time() > self._rtime:
+            self._reload()
+        part_shift = self._part_shift
+        return [key >> part_shift for key in struct.unpack(
+            '>' + 'I12x' * (len(digests) // 16), digests)]
+
+    def get_nodes_bulk(self, paths):
+        """
+        Get the partition and nodes for many account/container/object paths
+        at once.
+
+        :param paths: an iterable of (account, container, obj) tuples;
+                      container and obj may be omitted or None
+        :returns: a list of (partition, list of node dicts) tuples, in the
+                  same order as paths
+
+        See :func:`get_nodes` for a description of the node dicts.
+        """
+        return [(part, self._get_part_nodes(part))
+                for part in self.get_parts_bulk(paths)]
+
     def get_more_nodes(self, part):
         """
         Generator to get extra nodes for a partition for hinted handoff.
@@ -540,105 +966,94 @@ class Ring(object):
         """
         if time() > self._rtime:
             self._reload()
-        primary_nodes = self._get_part_nodes(part)
-        used = set(d['id'] for d in primary_nodes)
+        dev_region, dev_zone, dev_ip = self._dev_tier_ids
+        devs = self._devs
+        used = set(self._cached_part_dev_ids(part))
         index = count()
-        same_regions = set(d['region'] for d in primary_nodes)
-        same_zones = set((d['region'], d['zone']) for d in primary_nodes)
-        same_ips = set(
-            (d['region'], d['zone'], d['ip']) for d in primary_nodes)
+        same_regions = set(dev_region[dev_id] for dev_id in used)
+        same_zones = set(dev_zone[dev_id] for dev_id in used)
+        same_ips = set(dev_ip[dev_id] for dev_id in used)
 
         parts = len(self._replica2part2dev_id[0])
         part_hash = md5(str(part).encode('ascii'),
                         usedforsecurity=False).digest()
         start = struct.unpack_from('>I', part_hash)[0] >> self._part_shift
         inc = int(parts / 65536) or 1
+        # Every pass walks the same sequence of candidate devices, so it is
+        # gathered lazily, a chunk at a time, and shared between the passes.
+        chunks = []
+        chunk_iter = self._iter_handoff_chunks(start, parts, inc)
+
+        def handoff_chunks():
+            for chunk in chunks:
+                yield chunk
+            for chunk in chunk_iter:
+                chunks.append(chunk)
+                yield chunk
+
         # Multiple loops for execution speed; the checks and bookkeeping get
         # simpler as you go along
-        hit_all_regions = len(same_regions) == self._num_regions
-        for handoff_part in chain(range(start, parts, inc),
-                                  range(inc - ((parts - start) % inc),
-                                        start, inc)):
-            if hit_all_regions:
-                # At this point, there are no regions left untouched, so we
-                # can stop looking.
-                break
-            for part2dev_id in self._replica2part2dev_id:
-                if handoff_part < len(part2dev_id):
-                    dev_id = part2dev_id[handoff_part]
-                    dev = self._devs[dev_id]
-                    region = dev['region']
+        if len(same_regions) < self._num_regions:
+            for chunk in handoff_chunks():
+                for dev_id in chunk:
+                    region = dev_region[dev_id]
                     if dev_id not in used and region not in same_regions:
-                        yield dict(dev, handoff_index=next(index))
+                        yield dict(devs[dev_id], handoff_index=next(index))
                         used.add(dev_id)
                         same_regions.add(region)
-                        zone = dev['zone']
-                        ip = (region, zone, dev['ip'])
-                        same_zones.add((region, zone))
-                        same_ips.add(ip)
+                        same_zones.add(dev_zone[dev_id])
+                        same_ips.add(dev_ip[dev_id])
                         if len(same_regions) == self._num_regions:
-                            hit_all_regions = True
                             break
-
-        hit_all_zones = len(same_zones) == self._num_zones
-        for handoff_part in chain(range(start, parts, inc),
-                                  range(inc - ((parts - start) % inc),
-                                        start, inc)):
-            if hit_all_zones:
-                # Much like we stopped looking for fresh regions before, we
-                # can now stop looking for fresh zones; there are no more.
+                else:
+                    continue
+                # At this point, there are no regions left untouched, so we
+                # can stop looking.
                 break
-            for part2dev_id in self._replica2part2dev_id:
-                if handoff_part < len(part2dev_id):
-                    dev_id = part2dev_id[handoff_part]
-                    dev = self._devs[dev_id]
-                    zone = (dev['region'], dev['zone'])
+
+        if len(same_zones) < self._num_zones:
+            for chunk in handoff_chunks():
+                for dev_id in chunk:
+                    zone = dev_zone[dev_id]
                     if dev_id not in used and zone not in same_zones:
-                        yield dict(dev, handoff_index=next(index))
+                        yield dict(devs[dev_id], handoff_index=next(index))
                         used.add(dev_id)
                         same_zones.add(zone)
-                        ip = zone + (dev['ip'],)
-                        same_ips.add(ip)
+                        same_ips.add(dev_ip[dev_id])
                         if len(same_zones) == self._num_zones:
-                            hit_all_zones = True
                             break
-
-        hit_all_ips = len(same_ips) == self._num_ips
-        for handoff_part in chain(range(start, parts, inc),
-                                  range(inc - ((parts - start) % inc),
-                                        start, inc)):
-            if hit_all_ips:
-                # We've exhausted the pool of unused backends, so stop
-                # looking.
+                else:
+                    continue
+                # Much like we stopped looking for fresh regions before, we
+                # can now stop looking for fresh zones; there are no more.
                 break
-            for part2dev_id in self._replica2part2dev_id:
-                if handoff_part < len(part2dev_id):
-                    dev_id = part2dev_id[handoff_part]
-                    dev = self._devs[dev_id]
-                    ip = (dev['region'], dev['zone'], dev['ip'])
+
+        if len(same_ips) < self._num_ips:
+            for chunk in handoff_chunks():
+                for dev_id in chunk:
+                    ip = dev_ip[dev_id]
                     if dev_id not in used and ip not in same_ips:
-                        yield dict(dev, handoff_index=next(index))
+                        yield dict(devs[dev_id], handoff_index=next(index))
                         used.add(dev_id)
                         same_ips.add(ip)
                         if len(same_ips) == self._num_ips:
-                            hit_all_ips = True
                             break
-
-        hit_all_devs = len(used) == self._num_assigned_devs
-        for handoff_part in chain(range(start, parts, inc),
-                                  range(inc - ((parts - start) % inc),
-                                        start, inc)):
-            if hit_all_devs:
-                # We've used every device we have, so let's stop looking for
-                # unused devices now.
+                else:
+                    continue
+                # We've exhausted the pool of unused backends, so stop
+                # looking.
                 break
-            for part2dev_id in self._replica2part2dev_id:
-                if handoff_part < len(part2dev_id):
-                    dev_id = part2dev_id[handoff_part]
+
+        if len(used) < self._num_assigned_devs:
+            for chunk in handoff_chunks():
+                for dev_id in chunk:
                     if dev_id not in used:
-                        dev = self._devs[dev_id]
-                        yield dict(dev, handoff_index=next(index))
+                        yield dict(devs[dev_id], handoff_index=next(index))
                         used.add(dev_id)
                         if len(used) == self._num_assigned_devs:
-                            hit_all_devs = True
                             break
+                else:
+                    continue
+                # We've used every device we have, so let's stop looking for
+                # unused devices now.
+                break
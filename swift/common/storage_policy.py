@@ -371,21 +371,26 @@ class BaseStoragePolicy(object):
         Validation hook used when loading the ring; currently only used for EC
         """
 
-    def load_ring(self, swift_dir, reload_time=None):
+    def load_ring(self, swift_dir, reload_time=None, background_reload=None):
         """
         Load the ring for this policy immediately.
 
         :param swift_dir: path to rings
         :param reload_time: time interval in seconds to check for a ring change
+        :param background_reload: if True, reload a changed ring in the
+                                  background rather than on the request path
         """
         if self.object_ring:
             if reload_time is not None:
                 self.object_ring.reload_time = reload_time
+            if background_reload is not None:
+                self.object_ring.background_reload = background_reload
             return
 
         self.object_ring = Ring(
             swift_dir, ring_name=self.ring_name,
-            validation_hook=self.validate_ring_data, reload_time=reload_time)
+            validation_hook=self.validate_ring_data, reload_time=reload_time,
+            background_reload=bool(background_reload))
 
     @property
     def quorum(self):
@@ -1349,6 +1349,9 @@ class StatsdClient(object):
         return self.timing(metric, (time.time() - orig_time) * 1000,
                            sample_rate)
 
+    def gauge(self, metric, value, sample_rate=None):
+        return self._send(metric, value, 'g', sample_rate)
+
     def transfer_rate(self, metric, elapsed_time, byte_xfer, sample_rate=None):
         if byte_xfer:
             return self.timing(metric,
@@ -1441,6 +1444,9 @@ class SwiftLoggerAdapter(logging.LoggerAdapter):
     def timing_since(self, metric, *a, **kw):
         return self.logger.timing_since(self.get_metric_name(metric), *a, **kw)
 
+    def gauge(self, metric, *a, **kw):
+        return self.logger.gauge(self.get_metric_name(metric), *a, **kw)
+
     def transfer_rate(self, metric, *a, **kw):
         return self.logger.transfer_rate(
             self.get_metric_name(metric), *a, **kw)
@@ -1677,6 +1683,7 @@ class LogAdapter(logging.LoggerAdapter, object):
     decrement = statsd_delegate('decrement')
     timing = statsd_delegate('timing')
     timing_since = statsd_delegate('timing_since')
+    gauge = statsd_delegate('gauge')
     transfer_rate = statsd_delegate('transfer_rate')
 
 
@@ -3630,6 +3637,13 @@ class InputProxy(object):
         self.bytes_received += len(line)
         return line
 
+    def get_socket(self):
+        """
+        Pass get_socket request to the underlying file-like object, so that
+        the client socket can be found by e.g. zero-copy GETs.
+        """
+        return self.wsgi_input.get_socket()
+
 
 class LRUCache(object):
     """
@@ -0,0 +1,194 @@
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+
+import eventlet.patcher
+import six
+from eventlet import event, greenio, greenthread, tpool
+from six.moves import range
+
+from swift.common.exceptions import ThreadPoolDead
+
+stdlib_queue = eventlet.patcher.original('queue' if six.PY3 else 'Queue')
+stdlib_threading = eventlet.patcher.original('threading')
+
+
+class ThreadPool(object):
+    """
+    Perform blocking operations in background OS threads.
+
+    Unlike eventlet.tpool, of which there is one per process, any number of
+    ThreadPools may be created, so that e.g. each disk can be given its own
+    threads and a slow disk only holds up the greenthreads waiting on it.
+
+    :param nthreads: the number of worker threads. If 0, ``run_in_thread``
+                     runs its function in the calling greenthread and
+                     ``force_run_in_thread`` uses eventlet.tpool.
+    """
+
+    BYTE = b'a'
+
+    def __init__(self, nthreads=2):
+        self.nthreads = nthreads
+        self._run_queue = stdlib_queue.Queue()
+        self._result_queue = stdlib_queue.Queue()
+        self._threads = []
+        self._alive = True
+        # calls waiting for or running in a worker thread; only ever changed
+        # by greenthreads of the OS thread that created the pool
+        self.pending = 0
+
+        if nthreads <= 0:
+            return
+
+        # A worker thread can't wake the calling greenthread by sending to
+        # its Event directly, as that would only notify the worker thread's
+        # own hub. Instead, workers put their results in a queue and write a
+        # byte to a pipe, which wakes a greenthread in the calling OS thread
+        # to send the results to the Events.
+        _raw_rpipe, self.wpipe = os.pipe()
+        self.rpipe = greenio.GreenPipe(_raw_rpipe, 'rb')
+
+        for _junk in range(nthreads):
+            thr = stdlib_threading.Thread(
+                target=self._worker,
+                args=(self._run_queue, self._result_queue))
+            thr.daemon = True
+            thr.start()
+            self._threads.append(thr)
+
+        self._consumer_coro = greenthread.spawn_n(self._consume_results,
+                                                  self._result_queue)
+
+    @property
+    def queue_depth(self):
+        """
+        The number of calls that are waiting for a worker thread.
+        """
+        return self._run_queue.qsize()
+
+    def _worker(self, work_queue, result_queue):
+        """
+        Pulls an item from the queue and runs it, then puts the result into
+        the result queue. Repeats forever, or until it gets None.
+
+        :param work_queue: queue from which to pull work
+        :param result_queue: queue into which to place results
+        """
+        while True:
+            item = work_queue.get()
+            if item is None:
+                break
+            ev, func, args, kwargs = item
+            try:
+                result = func(*args, **kwargs)
+                result_queue.put((ev, True, result))
+            except BaseException:
+                result_queue.put((ev, False, sys.exc_info()))
+            finally:
+                work_queue.task_done()
+                os.write(self.wpipe, self.BYTE)
+
+    def _consume_results(self, queue):
+        """
+        Runs as a greenthread in the same OS thread as callers of
+        run_in_thread().
+
+        Takes results from the worker OS threads and sends them to the
+        waiting greenthreads.
+        """
+        while True:
+            try:
+                self.rpipe.read(1)
+            except ValueError:
+                # can happen at process shutdown when pipe is closed
+                break
+
+            while True:
+                try:
+                    ev, success, result = queue.get(block=False)
+                except stdlib_queue.Empty:
+                    break
+
+                try:
+                    if success:
+                        ev.send(result)
+                    else:
+                        ev.send_exception(*result)
+                finally:
+                    queue.task_done()
+
+    def _run_in_worker(self, func, *args, **kwargs):
+        ev = event.Event()
+        self.pending += 1
+        try:
+            self._run_queue.put((ev, func, args, kwargs), block=False)
+            # blocks this greenthread (and only this greenthread) until a
+            # worker thread has run func
+            return ev.wait()
+        finally:
+            self.pending -= 1
+
+    def run_in_thread(self, func, *args, **kwargs):
+        """
+        Runs ``func(*args, **kwargs)`` in a worker thread and blocks the
+        calling greenthread until it returns, or runs it in the calling
+        greenthread if the pool has no threads.
+
+        :returns: result of calling func
+        :raises: whatever func raises
+        """
+        if not self._alive:
+            raise ThreadPoolDead()
+        if self.nthreads <= 0:
+            return func(*args, **kwargs)
+        return self._run_in_worker(func, *args, **kwargs)
+
+    def force_run_in_thread(self, func, *args, **kwargs):
+        """
+        Like run_in_thread, but uses eventlet.tpool if the pool has no
+        threads, so that func never blocks the calling OS thread.
+
+        :returns: result of calling func
+        :raises: whatever func raises
+        """
+        if not self._alive:
+            raise ThreadPoolDead()
+        if self.nthreads <= 0:
+            return tpool.execute(func, *args, **kwargs)
+        return self._run_in_worker(func, *args, **kwargs)
+
+    def terminate(self):
+        """
+        Releases the pool's OS threads, greenthread and pipe, and renders it
+        unusable.
+        """
+        self._alive = False
+        if self.nthreads <= 0:
+            return
+
+        for _junk in range(self.nthreads):
+            self._run_queue.put(None)
+        for thr in self._threads:
+            thr.join()
+        self._threads = []
+        self.nthreads = 0
+
+        greenthread.kill(self._consumer_coro)
+
+        self.rpipe.close()
+        os.close(self.wpipe)
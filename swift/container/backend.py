@@ -18,6 +18,7 @@ Pluggable Back-ends for Container Server
 import errno
 
 import os
+from collections import OrderedDict
 from uuid import uuid4
 
 import six
@@ -353,6 +354,108 @@ def sift_shard_ranges(new_shard_ranges, existing_shard_ranges):
     return to_add.values(), to_delete
 
 
+def get_db_version(db_file):
+    """
+    Get a value that changes whenever a database file is replaced or a
+    transaction is committed to it, without opening a database connection.
+
+    :param db_file: the path to the database file
+    :returns: a tuple of the inode, mtime and size of the file and the file
+        change counter from its header, or None if the file cannot be read.
+    """
+    try:
+        with open(db_file, 'rb') as fp:
+            st = os.fstat(fp.fileno())
+            # the file change counter is incremented by every transaction
+            # that changes the database, since it does not use a WAL
+            header = fp.read(28)
+    except (IOError, OSError):
+        return None
+    return st.st_ino, st.st_mtime, st.st_size, header[24:28]
+
+
+class ContainerStatsCache(object):
+    """
+    An in-process cache of the stats of container databases, to be shared by
+    the brokers of a worker, so that a broker can return the stats of a
+    database that has not changed since they were last read without opening
+    a connection to it.
+
+    Entries are kept per database file, with the version of the file that
+    they were read from, and are discarded when the version changes.
+
+    :param max_size: the maximum number of database files to cache stats for.
+    :param logger: if given, hits and misses are counted with its
+        ``increment`` method.
+    """
+    def __init__(self, max_size=1000, logger=None):
+        self.max_size = max_size
+        self.logger = logger
+        # db file -> (version, {stat name: value}), in LRU order
+        self._entries = OrderedDict()
+
+    def _increment(self, metric):
+        if self.logger:
+            self.logger.increment('stats_cache.%s' % metric)
+
+    def get(self, db_file, version, name):
+        """
+        Get a cached stat of a database.
+
+        :param db_file: the path to the database file.
+        :param version: the current version of the database file, as returned
+            by :func:`get_db_version`.
+        :param name: the name of the stat.
+        :returns: the cached value, or None if there is no value cached for
+            this version of the database file.
+        """
+        entry = self._entries.pop(db_file, None)
+        if entry is None or entry[0] != version:
+            self._increment('miss')
+            return None
+        self._entries[db_file] = entry
+        value = entry[1].get(name)
+        self._increment('miss' if value is None else 'hit')
+        return value
+
+    def set(self, db_file, version, name, value):
+        """
+        Cache a stat of a database.
+
+        :param db_file: the path to the database file.
+        :param version: the version of the database file that the stat was
+            read from, as returned by :func:`get_db_version`.
+        :param name: the name of the stat.
+        :param value: the value of the stat.
+        """
+        entry = self._entries.pop(db_file, None)
+        if entry is None or entry[0] != version:
+            entry = (version, {})
+            if len(self._entries) >= self.max_size:
+                self._entries.popitem(last=False)
+        entry[1][name] = value
+        self._entries[db_file] = entry
+
+
+def subdir_marker(name, prefix, delimiter, suffix):
+    """
+    SQL function used by delimiter listings to skip past subdirs.
+
+    :param name: an object name, or None
+    :param prefix: the prefix of the listing
+    :param delimiter: the delimiter of the listing
+    :param suffix: the string that replaces the delimiter to make the marker
+    :returns: the marker that skips past the subdir the name is in, or None
+        if the name is None or is not in a subdir.
+    """
+    if name is None:
+        return None
+    end = name.find(delimiter, len(prefix))
+    if end < 0:
+        return None
+    return name[:end] + suffix
+
+
 class ContainerBroker(DatabaseBroker):
     """
     Encapsulates working with a container database.
@@ -374,6 +477,10 @@ class ContainerBroker(DatabaseBroker):
       to the ``db_file`` argument given to :meth:`~__init__`.
     * :attr:`pending_file` is always equal to :attr:`_db_file` extended with
       ``.pending``, i.e. ``<hash>.db.pending``.
+
+    If a :class:`ContainerStatsCache` is given as ``stats_cache`` then the
+    container's info and policy stats are read from it while the db file is
+    unchanged.
     """
     db_type = 'container'
     db_contains_type = 'object'
@@ -385,16 +492,20 @@ class ContainerBroker(DatabaseBroker):
     def __init__(self, db_file, timeout=BROKER_TIMEOUT, logger=None,
                  account=None, container=None, pending_timeout=None,
                  stale_reads_ok=False, skip_commits=False,
-                 force_db_file=False):
+                 force_db_file=False, group_commit_queue=None,
+                 stats_cache=None, connection_pool=None):
         self._init_db_file = db_file
         base_db_file = make_db_file_path(db_file, None)
         super(ContainerBroker, self).__init__(
             base_db_file, timeout, logger, account, container, pending_timeout,
-            stale_reads_ok, skip_commits=skip_commits)
+            stale_reads_ok, skip_commits=skip_commits,
+            group_commit_queue=group_commit_queue,
+            connection_pool=connection_pool)
         # the root account and container are populated on demand
         self._root_account = self._root_container = None
         self._force_db_file = force_db_file
         self._db_files = None
+        self.stats_cache = stats_cache
 
     @classmethod
     def create_broker(cls, device_path, part, account, container, logger=None,
@@ -929,10 +1040,40 @@ class ContainerBroker(DatabaseBroker):
         self.container = data['container']
         return data
 
+    def _get_cached_stat(self, name, get_stat):
+        """
+        Get a stat of the db from the broker's stats cache, if it has one,
+        or else by calling ``get_stat``.
+
+        :param name: the name of the stat in the cache.
+        :param get_stat: a function that reads the stat from the db.
+        :returns: the value of the stat.
+        """
+        if self.stats_cache is None:
+            return get_stat()
+        db_file = self.db_file
+        version = get_db_version(db_file)
+        if version is None:
+            return get_stat()
+        value = self.stats_cache.get(db_file, version, name)
+        if value is None:
+            value = get_stat()
+            self.stats_cache.set(db_file, version, name, value)
+        return value
+
     def _get_info(self):
         self._commit_puts_stale_ok()
-        with self.get() as conn:
-            return self._do_get_info_query(conn)
+
+        def do_get_info():
+            with self.get() as conn:
+                return self._do_get_info_query(conn)
+
+        data = dict(self._get_cached_stat('info', do_get_info))
+        # populate instance cache
+        self._storage_policy_index = data['storage_policy_index']
+        self.account = data['account']
+        self.container = data['container']
+        return data
 
     def _populate_instance_cache(self, conn=None):
         # load cached instance attributes from the database if necessary
@@ -1003,6 +1144,12 @@ class ContainerBroker(DatabaseBroker):
             ''', (sync_point2,))
 
     def get_policy_stats(self):
+        policy_stats = self._get_cached_stat(
+            'policy_stats', self._get_policy_stats)
+        return dict((key, dict(stats))
+                    for key, stats in policy_stats.items())
+
+    def _get_policy_stats(self):
         with self.get() as conn:
             try:
                 info = conn.execute('''
@@ -1026,6 +1173,10 @@ class ContainerBroker(DatabaseBroker):
         return policy_stats
 
     def has_multiple_policies(self):
+        return self._get_cached_stat(
+            'multiple_policies', self._has_multiple_policies)
+
+    def _has_multiple_policies(self):
         with self.get() as conn:
             try:
                 curs = conn.execute('''
@@ -1199,21 +1350,23 @@ class ContainerBroker(DatabaseBroker):
                     return query + tail_query, args + [limit - len(results)]
 
                 # storage policy filter
-                if all_policies:
-                    query, args = build_query(
-                        query_keys + ['storage_policy_index'],
-                        query_conditions,
-                        query_args)
+                if not all_policies:
+                    policy_conditions = query_conditions + [
+                        'storage_policy_index = ?']
+                    policy_args = query_args + [storage_policy_index]
                 else:
-                    query, args = build_query(
-                        query_keys + ['storage_policy_index'],
-                        query_conditions + ['storage_policy_index = ?'],
-                        query_args + [storage_policy_index])
+                    policy_conditions, policy_args = query_conditions, \
+                        query_args
+                query, args = build_query(
+                    query_keys + ['storage_policy_index'],
+                    policy_conditions, policy_args)
                 try:
                     curs = conn.execute(query, tuple(args))
                 except sqlite3.OperationalError as err:
                     if 'no such column: storage_policy_index' not in str(err):
                         raise
+                    policy_conditions, policy_args = query_conditions, \
+                        query_args
                     query, args = build_query(
                         query_keys + ['0 as storage_policy_index'],
                         query_conditions, query_args)
@@ -1256,26 +1409,81 @@ class ContainerBroker(DatabaseBroker):
                             curs.close()
                             break
                     elif end >= 0:
+                        curs.close()
                         if reverse:
-                            end_marker = name[:end + len(delimiter)]
+                            suffix = delimiter
                         else:
-                            marker = ''.join([
-                                name[:end],
-                                delimiter[:-1],
-                                chr(ord(delimiter[-1:]) + 1),
-                            ])
+                            suffix = delimiter[:-1] + chr(
+                                ord(delimiter[-1:]) + 1)
                             # we want result to be inclusive of delim+1
                             delim_force_gte = True
-                        dir_name = name[:end + len(delimiter)]
-                        if dir_name != orig_marker:
-                            results.append([dir_name, '0', 0, None, ''])
-                        curs.close()
+                        # rather than querying again for each subdir, skip
+                        # over the run of subdirs that starts here at once
+                        for subdir in self._skip_subdirs(
+                                conn, policy_conditions, policy_args,
+                                name[:end] + suffix, prefix, delimiter,
+                                suffix, reverse, limit - len(results)):
+                            if reverse:
+                                end_marker = subdir
+                            else:
+                                marker = subdir
+                            dir_name = subdir[:len(subdir) - len(suffix)] + \
+                                delimiter
+                            if dir_name != orig_marker:
+                                results.append([dir_name, '0', 0, None, ''])
                         break
                     results.append(transform_func(row))
                 if not rowcount:
                     break
             return results
 
+    def _skip_subdirs(self, conn, conditions, args, marker, prefix,
+                      delimiter, suffix, reverse, limit):
+        """
+        Skip-scan a run of subdirs in a delimiter listing with one query.
+
+        Starting from the marker that skips past a subdir, each step of a
+        recursive query seeks over the ``ix_object_deleted_name`` index to
+        the name that follows the previous subdir, until it finds a name that
+        is not in a subdir or runs out of names.
+
+        :param conn: the database connection
+        :param conditions: the conditions of the listing query
+        :param args: the arguments of the listing query conditions
+        :param marker: the marker that skips past the first subdir
+        :param prefix: the prefix of the listing
+        :param delimiter: the delimiter of the listing
+        :param suffix: the string that replaces the delimiter to make the
+            marker for a subdir
+        :param reverse: True if the listing is reversed
+        :param limit: maximum number of subdirs to skip
+        :returns: a list of the markers that skip past each subdir in the run,
+            starting with ``marker``
+        """
+        conn.create_function('subdir_marker', 4, subdir_marker)
+        # the seek comes before the conditions so that it is the range of
+        # the index that is searched, rather than the listing's own bounds
+        if reverse:
+            seek, order = 'name < subdir.marker', 'DESC'
+        else:
+            seek, order = 'name >= subdir.marker', ''
+        query = '''
+            WITH RECURSIVE subdir(marker) AS (
+                VALUES (?)
+                UNION ALL
+                SELECT subdir_marker((
+                    SELECT name FROM object WHERE %s
+                    ORDER BY name %s LIMIT 1
+                ), ?, ?, ?) FROM subdir WHERE marker IS NOT NULL
+                LIMIT ?
+            )
+            SELECT marker FROM subdir WHERE marker IS NOT NULL
+        ''' % (' AND '.join([seek] + conditions), order)
+        curs = conn.execute(query, tuple(
+            [marker] + args + [prefix, delimiter, suffix, limit]))
+        curs.row_factory = None
+        return [row[0] for row in curs]
+
     def get_objects(self, limit=None, marker='', end_marker='',
                     include_deleted=None, since_row=None):
         """
@@ -2080,6 +2288,8 @@ class ContainerBroker(DatabaseBroker):
         try:
             os.unlink(retiring_file)
             self.logger.debug('Unlinked retiring db %r', retiring_file)
+            if self.connection_pool is not None:
+                self.connection_pool.invalidate(retiring_file)
         except OSError as err:
             if err.errno != errno.ENOENT:
                 self.logger.exception('Failed to unlink %r' % self._db_file)
@@ -2114,7 +2324,9 @@ class ContainerBroker(DatabaseBroker):
             sub_broker = ContainerBroker(
                 db_file, self.timeout, self.logger, self.account,
                 self.container, self.pending_timeout, self.stale_reads_ok,
-                force_db_file=True, skip_commits=bool(db_files))
+                force_db_file=True, skip_commits=bool(db_files),
+                stats_cache=self.stats_cache,
+                connection_pool=self.connection_pool)
             brokers.append(sub_broker)
         return brokers
 
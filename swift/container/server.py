@@ -26,9 +26,11 @@ from six.moves.urllib.parse import quote
 import swift.common.db
 from swift.container.sync_store import ContainerSyncStore
 from swift.container.backend import ContainerBroker, DATADIR, \
-    RECORD_TYPE_SHARD, UNSHARDED, SHARDING, SHARDED, SHARD_UPDATE_STATES
+    RECORD_TYPE_SHARD, UNSHARDED, SHARDING, SHARDED, SHARD_UPDATE_STATES, \
+    ContainerStatsCache
 from swift.container.replicator import ContainerReplicatorRpc
-from swift.common.db import DatabaseAlreadyExists
+from swift.common.db import DatabaseAlreadyExists, GroupCommitQueue, \
+    ConnectionPool
 from swift.common.container_sync_realms import ContainerSyncRealms
 from swift.common.request_helpers import split_and_validate_path, \
     is_sys_or_user_meta, validate_internal_container, validate_internal_obj, \
@@ -38,7 +40,8 @@ from swift.common.utils import get_logger, hash_path, public, \
     config_true_value, timing_stats, replication, \
     override_bytes_from_content_type, get_log_line, \
     config_fallocate_value, fs_has_free_space, list_from_csv, \
-    ShardRange
+    ShardRange, config_positive_int_value, non_negative_float, \
+    non_negative_int
 from swift.common.constraints import valid_timestamp, check_utf8, \
     check_drive, AUTO_CREATE_ACCOUNT_PREFIX
 from swift.common.bufferedhttp import http_connect
@@ -165,11 +168,34 @@ class ContainerController(BaseStorageServer):
             config_true_value(conf.get('db_preallocation', 'f'))
         swift.common.db.QUERY_LOGGING = \
             config_true_value(conf.get('db_query_logging', 'f'))
+        swift.common.db.BINARY_PENDING = \
+            config_true_value(conf.get('db_binary_pending', 'f'))
         self.sync_store = ContainerSyncStore(self.root,
                                              self.logger,
                                              self.mount_check)
         self.fallocate_reserve, self.fallocate_is_percent = \
             config_fallocate_value(conf.get('fallocate_reserve', '1%'))
+        if config_true_value(conf.get('group_commit', 'false')):
+            self.group_commit_queue = GroupCommitQueue(
+                max_batch_size=config_positive_int_value(
+                    conf.get('group_commit_max_batch_size', 100)),
+                max_delay=non_negative_float(
+                    conf.get('group_commit_max_delay', 0)))
+        else:
+            self.group_commit_queue = None
+        stats_cache_size = non_negative_int(conf.get('stats_cache_size', 0))
+        if stats_cache_size:
+            self.stats_cache = ContainerStatsCache(
+                max_size=stats_cache_size, logger=self.logger)
+        else:
+            self.stats_cache = None
+        connection_pool_size = non_negative_int(
+            conf.get('db_connection_pool_size', 0))
+        if connection_pool_size:
+            self.connection_pool = ConnectionPool(
+                max_size=connection_pool_size, logger=self.logger)
+        else:
+            self.connection_pool = None
 
     def _get_container_broker(self, drive, part, account, container, **kwargs):
         """
@@ -187,6 +213,9 @@ class ContainerController(BaseStorageServer):
         kwargs.setdefault('account', account)
         kwargs.setdefault('container', container)
         kwargs.setdefault('logger', self.logger)
+        kwargs.setdefault('group_commit_queue', self.group_commit_queue)
+        kwargs.setdefault('stats_cache', self.stats_cache)
+        kwargs.setdefault('connection_pool', self.connection_pool)
         return ContainerBroker(db_path, **kwargs)
 
     def get_and_validate_policy_index(self, req):
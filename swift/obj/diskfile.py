@@ -38,6 +38,7 @@ import fcntl
 import json
 import os
 import re
+import struct
 import time
 import uuid
 import logging
@@ -47,10 +48,11 @@ from os.path import basename, dirname, exists, join, splitext
 from random import shuffle
 from tempfile import mkstemp
 from contextlib import contextmanager
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from datetime import timedelta
 
-from eventlet import Timeout, tpool
+import eventlet.patcher
+from eventlet import Timeout, sleep, spawn_n
 from eventlet.hubs import trampoline
 import six
 from pyeclib.ec_iface import ECDriverError, ECInvalidFragmentMetadata, \
@@ -65,13 +67,16 @@ from swift.common.utils import mkdirs, Timestamp, \
     get_md5_socket, F_SETPIPE_SZ, decode_timestamps, encode_timestamps, \
     MD5_OF_EMPTY_STRING, link_fd_to_path, \
     O_TMPFILE, makedirs_count, replace_partition_in_path, remove_directory, \
-    md5, is_file_older, non_negative_float
+    md5, is_file_older, non_negative_float, non_negative_int, \
+    dump_recon_cache, load_recon_cache
+from swift.common.utils.threadpool import ThreadPool
 from swift.common.splice import splice, tee
 from swift.common.exceptions import DiskFileQuarantined, DiskFileNotExist, \
     DiskFileCollision, DiskFileNoSpace, DiskFileDeviceUnavailable, \
     DiskFileDeleted, DiskFileError, DiskFileNotOpen, PathNotDir, \
     ReplicationLockTimeout, DiskFileExpired, DiskFileXattrNotSupported, \
-    DiskFileBadMetadataChecksum, PartitionLockTimeout
+    DiskFileBadMetadataChecksum, PartitionLockTimeout, LockTimeout
+from swift.common.recon import RECON_OBJECT_FILE, DEFAULT_RECON_CACHE_PATH
 from swift.common.swob import multi_range_iterator
 from swift.common.storage_policy import (
     get_policy_string, split_policy_string, PolicyError, POLICIES,
@@ -82,7 +87,39 @@ PICKLE_PROTOCOL = 2
 DEFAULT_RECLAIM_AGE = timedelta(weeks=1).total_seconds()
 DEFAULT_COMMIT_WINDOW = 60.0
 HASH_FILE = 'hashes.pkl'
+BINARY_HASH_FILE = 'hashes.bin'
 HASH_INVALIDATIONS_FILE = 'hashes.invalid'
+# hashes.bin starts with a header of magic, format version, 'valid' flag and
+# 'updated' time, followed by a fixed size slot for each of the 4096 possible
+# suffixes. Each slot is a state byte and an md5 digest.
+BINARY_HASHES_HEADER = struct.Struct('!4sBBxxd')
+BINARY_HASHES_MAGIC = b'SWSH'
+BINARY_HASHES_VERSION = 1
+BINARY_HASHES_SLOT_SIZE = 17
+BINARY_HASHES_NUM_SLOTS = 4096
+BINARY_HASHES_SIZE = BINARY_HASHES_HEADER.size + \
+    BINARY_HASHES_SLOT_SIZE * BINARY_HASHES_NUM_SLOTS
+BINARY_HASHES_SUFFIXES = ['%03x' % i for i in range(BINARY_HASHES_NUM_SLOTS)]
+# slot states
+SUFFIX_ABSENT = 0
+SUFFIX_HASHED = 1
+SUFFIX_INVALID = 2
+# hashes.index is a header line followed by records of either '+<hash>' (an
+# object hash dir was created) or '=<suffix> <hash> <hash>...' (the suffix
+# dir holds exactly these object hash dirs)
+HASHES_INDEX_FILE = 'hashes.index'
+HASHES_INDEX_HEADER = 'swift hashes index 1'
+HASHES_INDEX_RECORD = re.compile(
+    r'^(\+[0-9a-f]{32}|=[0-9a-f]{3}( [0-9a-f]{32})*)$')
+# the number of records an index may have beyond one per suffix before it is
+# compacted
+HASHES_INDEX_SLACK = 4096
+# the number of seconds for which a partition found to have no hashes index
+# is assumed to still have none, rather than trying to open its index on
+# every update
+HASHES_INDEX_ABSENT_TIME = 60
+# the most partitions remembered to have no hashes index
+HASHES_INDEX_ABSENT_MAX_ENTRIES = 4096
 METADATA_KEY = b'user.swift.metadata'
 METADATA_CHECKSUM_KEY = b'user.swift.metadata_checksum'
 DROP_CACHE_WINDOW = 1024 * 1024
@@ -364,32 +401,114 @@ def valid_suffix(value):
     return all(c in '0123456789abcdef' for c in value)
 
 
-def read_hashes(partition_dir):
+def _read_pickled_hashes(partition_dir):
     """
-    Read the existing hashes.pkl
+    Read hashes.pkl
 
-    :returns: a dict, the suffix hashes (if any), the key 'valid' will be False
-              if hashes.pkl is corrupt, cannot be read or does not exist
+    :returns: a dict, or None if there is no hashes.pkl
     """
     hashes_file = join(partition_dir, HASH_FILE)
-    hashes = {'valid': False}
     try:
         with open(hashes_file, 'rb') as hashes_fp:
             pickled_hashes = hashes_fp.read()
     except (IOError, OSError):
-        pass
-    else:
-        try:
-            hashes = pickle.loads(pickled_hashes)
-        except Exception:
-            # pickle.loads() can raise a wide variety of exceptions when
-            # given invalid input depending on the way in which the
-            # input is invalid.
-            pass
+        return None
+    try:
+        return pickle.loads(pickled_hashes)
+    except Exception:
+        # pickle.loads() can raise a wide variety of exceptions when
+        # given invalid input depending on the way in which the
+        # input is invalid.
+        return {'valid': False}
+
+
+def _binary_hashes_slot_offset(suffix):
+    return (BINARY_HASHES_HEADER.size +
+            BINARY_HASHES_SLOT_SIZE * int(suffix, 16))
+
+
+def _read_binary_hashes(partition_dir):
+    """
+    Read hashes.bin
+
+    :returns: a dict, or None if there is no hashes.bin
+    """
+    hashes_file = join(partition_dir, BINARY_HASH_FILE)
+    try:
+        # unbuffered, so the whole file comes back from a single read
+        with open(hashes_file, 'rb', 0) as hashes_fp:
+            data = hashes_fp.read(BINARY_HASHES_SIZE + 1)
+    except (IOError, OSError):
+        return None
+    if len(data) != BINARY_HASHES_SIZE:
+        return {'valid': False}
+    magic, version, valid, updated = \
+        BINARY_HASHES_HEADER.unpack_from(data)
+    if magic != BINARY_HASHES_MAGIC or version != BINARY_HASHES_VERSION:
+        return {'valid': False}
+    hashes = {'valid': bool(valid), 'updated': updated}
+    slots = data[BINARY_HASHES_HEADER.size:]
+    # hexlify all the slots at once; each takes up two hex digits per byte
+    hex_slots = binascii.hexlify(slots).decode('ascii')
+    hex_slot_size = 2 * BINARY_HASHES_SLOT_SIZE
+    for index, state in enumerate(bytearray(
+            slots[::BINARY_HASHES_SLOT_SIZE])):
+        if state == SUFFIX_ABSENT:
+            continue
+        if state == SUFFIX_HASHED:
+            offset = index * hex_slot_size
+            hashes[BINARY_HASHES_SUFFIXES[index]] = \
+                hex_slots[offset + 2:offset + hex_slot_size]
+        elif state == SUFFIX_INVALID:
+            hashes[BINARY_HASHES_SUFFIXES[index]] = None
+        else:
+            return {'valid': False}
+    return hashes
+
+
+def _read_newest_hashes(partition_dir, binary=True):
+    """
+    Read whichever of hashes.bin or hashes.pkl holds the newest hashes.
+
+    :param binary: if False, hashes.bin is only looked for if there is no
+                   hashes.pkl
+    :returns: a tuple of (hashes dict or None, True if the hashes came
+              from hashes.bin)
+    """
+    pickled_hashes = _read_pickled_hashes(partition_dir)
+    if not binary and pickled_hashes is not None:
+        return pickled_hashes, False
+    binary_hashes = _read_binary_hashes(partition_dir)
+    if binary_hashes is None:
+        return pickled_hashes, False
+    if pickled_hashes is None:
+        return binary_hashes, True
+    # both exist if we died between writing one and removing the other
+    if (not isinstance(pickled_hashes, dict) or
+            binary_hashes.get('updated', -1) >=
+            pickled_hashes.get('updated', -1)):
+        return binary_hashes, True
+    return pickled_hashes, False
+
+
+def read_hashes(partition_dir, binary=True):
+    """
+    Read the existing hashes.bin or hashes.pkl
 
-    # Check for corrupted data that could break os.listdir()
-    if not all(valid_suffix(key) or key in ('valid', 'updated')
-               for key in hashes):
+    :param binary: if False, hashes.bin is only read if there is no
+                   hashes.pkl; a hashes.pkl is only left beside a newer
+                   hashes.bin by a crash while ``binary_hashes_file`` is on
+    :returns: a dict, the suffix hashes (if any), the key 'valid' will be False
+              if hashes.pkl is corrupt, cannot be read or does not exist
+    """
+    hashes, binary = _read_newest_hashes(partition_dir, binary)
+    if hashes is None:
+        hashes = {'valid': False}
+
+    # Check for corrupted data that could break os.listdir(); the suffixes in
+    # hashes.bin are always valid
+    if not binary and not all(valid_suffix(key) or key in ('valid', 'updated')
+                              for key in hashes):
         return {'valid': False}
 
     # hashes.pkl w/o valid updated key is "valid" but "forever old"
@@ -398,27 +517,98 @@ def read_hashes(partition_dir):
     return hashes
 
 
-def write_hashes(partition_dir, hashes):
+def _pack_binary_hashes(hashes):
     """
-    Write hashes to hashes.pkl
+    :returns: the contents of a hashes.bin for the hashes, or None if they
+              don't fit; only single md5 hex digests per suffix do.
+    """
+    data = bytearray(BINARY_HASHES_SIZE)
+    BINARY_HASHES_HEADER.pack_into(
+        data, 0, BINARY_HASHES_MAGIC, BINARY_HASHES_VERSION,
+        bool(hashes['valid']), hashes['updated'])
+    for suffix, hash_ in hashes.items():
+        if suffix in ('valid', 'updated'):
+            continue
+        if not valid_suffix(suffix):
+            return None
+        offset = _binary_hashes_slot_offset(suffix)
+        if hash_ is None:
+            data[offset] = SUFFIX_INVALID
+            continue
+        try:
+            digest = binascii.unhexlify(hash_)
+        except (TypeError, ValueError):
+            return None
+        if len(digest) != 16:
+            return None
+        data[offset] = SUFFIX_HASHED
+        data[offset + 1:offset + 17] = digest
+    return bytes(data)
 
-    The updated key is added to hashes before it is written.
+
+def write_hashes(partition_dir, hashes, binary=False):
+    """
+    Write hashes to hashes.pkl, or hashes.bin if ``binary`` is True
+
+    The updated key is added to hashes before it is written. Whichever of
+    the two files isn't written is removed.
+
+    :param binary: if True, write hashes.bin, if the hashes fit in it;
+                   otherwise hashes.pkl is written anyway
     """
-    hashes_file = join(partition_dir, HASH_FILE)
     # 'valid' key should always be set by the caller; however, if there's a bug
     # setting invalid is most safe
     hashes.setdefault('valid', False)
     hashes['updated'] = time.time()
-    write_pickle(hashes, hashes_file, partition_dir, PICKLE_PROTOCOL)
+    data = _pack_binary_hashes(hashes) if binary else None
+    if data is None:
+        write_pickle(hashes, join(partition_dir, HASH_FILE), partition_dir,
+                     PICKLE_PROTOCOL)
+        remove_file(join(partition_dir, BINARY_HASH_FILE))
+        return
+    fd, tmppath = mkstemp(dir=partition_dir, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as fp:
+        fp.write(data)
+        fp.flush()
+        os.fsync(fd)
+        renamer(tmppath, join(partition_dir, BINARY_HASH_FILE))
+    remove_file(join(partition_dir, HASH_FILE))
 
 
-def consolidate_hashes(partition_dir):
+def _invalidate_binary_hashes(partition_dir, hashes, suffixes):
     """
-    Take what's in hashes.pkl and hashes.invalid, combine them, write the
-    result back to hashes.pkl, and clear out hashes.invalid.
+    Mark suffixes as needing to be rehashed in hashes.bin by rewriting just
+    their slots' state bytes and the header.
+
+    :param hashes: the dict read from hashes.bin, which is updated to match
+    :param suffixes: an iterable of valid suffixes
+    """
+    hashes['updated'] = time.time()
+    with open(join(partition_dir, BINARY_HASH_FILE), 'r+b', 0) as fp:
+        for suffix in sorted(set(suffixes)):
+            fp.seek(_binary_hashes_slot_offset(suffix))
+            fp.write(struct.pack('!B', SUFFIX_INVALID))
+            hashes[suffix] = None
+        fp.seek(0)
+        fp.write(BINARY_HASHES_HEADER.pack(
+            BINARY_HASHES_MAGIC, BINARY_HASHES_VERSION,
+            bool(hashes['valid']), hashes['updated']))
+        os.fsync(fp.fileno())
+
+
+def consolidate_hashes(partition_dir, binary=True):
+    """
+    Take what's in hashes.pkl (or hashes.bin) and hashes.invalid, combine
+    them, write the result back, and clear out hashes.invalid.
+
+    The suffixes of a hashes.bin are invalidated in place rather than
+    rewriting the whole file.
 
     :param partition_dir: absolute path to partition dir containing hashes.pkl
                           and hashes.invalid
+    :param binary: if False, hashes.bin is only read if there is no
+                   hashes.pkl, and any invalidations are written to
+                   hashes.pkl, removing hashes.bin
 
     :returns: a dict, the suffix hashes (if any), the key 'valid' will be False
               if hashes.pkl is corrupt, cannot be read or does not exist
@@ -426,29 +616,60 @@ def consolidate_hashes(partition_dir):
     invalidations_file = join(partition_dir, HASH_INVALIDATIONS_FILE)
 
     with lock_path(partition_dir):
-        hashes = read_hashes(partition_dir)
+        hashes = read_hashes(partition_dir, binary)
 
-        found_invalidation_entry = False
+        invalidated_suffixes = []
         try:
             with open(invalidations_file, 'r') as inv_fh:
                 for line in inv_fh:
-                    found_invalidation_entry = True
-                    suffix = line.strip()
-                    hashes[suffix] = None
+                    invalidated_suffixes.append(line.strip())
         except (IOError, OSError) as e:
             if e.errno != errno.ENOENT:
                 raise
 
-        if found_invalidation_entry:
-            write_hashes(partition_dir, hashes)
-            # Now that all the invalidations are reflected in hashes.pkl, it's
-            # safe to clear out the invalidations file.
+        if invalidated_suffixes:
+            binary = binary and os.path.exists(
+                join(partition_dir, BINARY_HASH_FILE))
+            # if both files exist hashes.bin can't be updated in place, it
+            # may not be what the hashes were read from
+            if binary and hashes['valid'] and not os.path.exists(
+                    join(partition_dir, HASH_FILE)) and all(
+                    valid_suffix(suffix) for suffix in invalidated_suffixes):
+                _invalidate_binary_hashes(
+                    partition_dir, hashes, invalidated_suffixes)
+            else:
+                for suffix in invalidated_suffixes:
+                    hashes[suffix] = None
+                write_hashes(partition_dir, hashes, binary=binary)
+            # Now that all the invalidations are reflected in the hashes file,
+            # it's safe to clear out the invalidations file.
             with open(invalidations_file, 'wb') as inv_fh:
                 pass
 
         return hashes
 
 
+def append_hash_invalidations(partition_dir, suffixes):
+    """
+    Invalidates the hashes of some suffixes in a partition's hashes file,
+    taking the partition lock once for all of them.
+
+    :param partition_dir: absolute path to partition dir
+    :param suffixes: an iterable of suffixes whose hashes need invalidating
+    :returns: the time in seconds spent waiting for the partition lock
+    """
+    data = b''.join(
+        (suffix if isinstance(suffix, bytes) else suffix.encode('utf-8')) +
+        b"\n" for suffix in suffixes)
+    invalidations_file = join(partition_dir, HASH_INVALIDATIONS_FILE)
+    start = time.time()
+    with lock_path(partition_dir):
+        lock_wait = time.time() - start
+        with open(invalidations_file, 'ab') as inv_fh:
+            inv_fh.write(data)
+    return lock_wait
+
+
 def invalidate_hash(suffix_dir):
     """
     Invalidates the hash for a suffix_dir in the partition's hashes file.
@@ -456,14 +677,319 @@ def invalidate_hash(suffix_dir):
     :param suffix_dir: absolute path to suffix dir whose hash needs
                        invalidating
     """
+    append_hash_invalidations(dirname(suffix_dir), [basename(suffix_dir)])
+
+
+class _InvalidationBatch(object):
+    def __init__(self):
+        self.suffixes = set()
+        self.done = False
+        self.error = None
+
+
+class HashInvalidationBatcher(object):
+    """
+    Coalesces the hash invalidations made by concurrent writers to the same
+    partition, so that they take the partition lock and append to
+    hashes.invalid once between them rather than once each.
+
+    The first writer to invalidate a suffix in a partition starts a batch and
+    flushes it: it waits up to ``max_delay`` seconds, and for any earlier
+    batch of the partition to be flushed, while other writers add their
+    suffixes to its batch, then appends the whole batch to hashes.invalid.
+    Every writer waits for the batch it joined to be flushed before
+    returning, so that, as with :func:`invalidate_hash`, an object is never
+    renamed into place before its suffix has been invalidated on disk.
+
+    Only writers in real threads, of eventlet's tpool or a device's
+    ThreadPool, which is where PUTs are finalized, are batched. They wait on
+    a real condition variable, whose lock is never held while doing any i/o.
+    Greenthreads, i.e. writers in the thread that created the batcher, can't
+    wait on it without blocking every other greenthread, so they append
+    their invalidations to hashes.invalid straight away.
+
+    :param logger: a logger to emit the hash invalidation metrics to
+    :param max_delay: the longest time, in seconds, that a batch is held open
+                      for more suffixes before it is flushed
+    """
+
+    def __init__(self, logger, max_delay=0.0):
+        threading = eventlet.patcher.original('threading')
+        self.logger = logger
+        self.max_delay = max_delay
+        # batches are only flushed in real threads, which shouldn't each
+        # start an eventlet hub just to sleep
+        self._sleep = eventlet.patcher.original('time').sleep
+        self._current_thread = threading.current_thread
+        self._hub_thread = threading.current_thread()
+        self._lock = threading.Lock()
+        # notified whenever a batch is done
+        self._batch_done = threading.Condition(self._lock)
+        # partition_dir -> the batch that is open for more suffixes
+        self._open_batches = {}
+        # partition_dirs with a batch being appended to hashes.invalid
+        self._flushing = set()
+
+    def invalidate_hash(self, suffix_dir):
+        """
+        Invalidates the hash for a suffix_dir in the partition's hashes file,
+        along with those of any other suffixes of the partition that are
+        being invalidated at the same time.
+
+        :param suffix_dir: absolute path to suffix dir whose hash needs
+                           invalidating
+        """
+        partition_dir = dirname(suffix_dir)
+        if self._current_thread() is self._hub_thread:
+            lock_wait = append_hash_invalidations(
+                partition_dir, [basename(suffix_dir)])
+            self._log_flush(lock_wait, 1)
+            return
+        with self._lock:
+            batch = self._open_batches.get(partition_dir)
+            is_flusher = batch is None
+            if is_flusher:
+                batch = self._open_batches[partition_dir] = \
+                    _InvalidationBatch()
+            batch.suffixes.add(basename(suffix_dir))
+        if is_flusher:
+            self._flush(partition_dir, batch)
+        else:
+            with self._lock:
+                while not batch.done:
+                    self._batch_done.wait()
+        if batch.error is not None:
+            raise batch.error
+
+    def _flush(self, partition_dir, batch):
+        flushing = flushed = False
+        try:
+            if self.max_delay > 0:
+                self._sleep(self.max_delay)
+            with self._lock:
+                while partition_dir in self._flushing:
+                    self._batch_done.wait()
+                del self._open_batches[partition_dir]
+                self._flushing.add(partition_dir)
+                flushing = True
+            lock_wait = append_hash_invalidations(
+                partition_dir, sorted(batch.suffixes))
+            flushed = True
+        except (Exception, LockTimeout) as err:
+            batch.error = err
+        finally:
+            with self._lock:
+                if self._open_batches.get(partition_dir) is batch:
+                    del self._open_batches[partition_dir]
+                if flushing:
+                    self._flushing.discard(partition_dir)
+                if not flushed and batch.error is None:
+                    # the flusher was interrupted, e.g. by a Timeout of its
+                    # own, which must not be raised in the other writers
+                    batch.error = DiskFileError(
+                        'Hash invalidation of %s interrupted' % partition_dir)
+                batch.done = True
+                self._batch_done.notify_all()
+        if flushed:
+            self._log_flush(lock_wait, len(batch.suffixes))
+
+    def _log_flush(self, lock_wait, num_suffixes):
+        self.logger.timing('hash_invalidation.lock_wait', lock_wait * 1000)
+        self.logger.increment('hash_invalidation.flushes')
+        self.logger.update_stats('hash_invalidation.suffixes', num_suffixes)
+
+
+def _valid_object_hash(suffix, object_hash):
+    return (len(object_hash) == 32 and object_hash.endswith(suffix) and
+            all(c in '0123456789abcdef' for c in object_hash))
+
+
+def _parse_hashes_index(data, index=None):
+    """
+    :param index: a dict mapping suffixes to sets of object hashes to apply
+                  the records to
+    :returns: a tuple of (header, dict mapping suffixes to sets of object
+              hashes, number of records), or (None, None, 0) if data isn't
+              an index
+    """
+    if six.PY3:
+        try:
+            data = data.decode('ascii')
+        except UnicodeDecodeError:
+            return None, None, 0
+    records = data.split('\n')
+    # the last record was interrupted while being appended if it isn't
+    # newline terminated
+    records.pop()
+    if not records or not records[0].startswith(HASHES_INDEX_HEADER):
+        return None, None, 0
+    header = records.pop(0)
+    if index is None:
+        index = {}
+    for record in records:
+        if not HASHES_INDEX_RECORD.match(record):
+            return None, None, 0
+        if record[0] == '+':
+            index.setdefault(record[-3:], set()).add(record[1:])
+        else:
+            object_hashes = record[1:].split(' ')
+            suffix = object_hashes.pop(0)
+            if not all(object_hash.endswith(suffix)
+                       for object_hash in object_hashes):
+                return None, None, 0
+            index[suffix] = set(object_hashes)
+    index = dict((suffix, object_hashes)
+                 for suffix, object_hashes in index.items() if object_hashes)
+    return header, index, len(records)
+
+
+def _load_hashes_index(partition_dir, index=None):
+    try:
+        with open(join(partition_dir, HASHES_INDEX_FILE), 'rb') as fp:
+            data = fp.read()
+    except (IOError, OSError):
+        return None, None, 0
+    return _parse_hashes_index(data, index)
+
 
+def _write_hashes_index(partition_dir, header, index):
+    records = [header] + [
+        '=' + ' '.join([suffix] + sorted(index[suffix]))
+        for suffix in sorted(index) if index[suffix]]
+    data = '\n'.join(records) + '\n'
+    if six.PY3:
+        data = data.encode('ascii')
+    fd, tmppath = mkstemp(dir=partition_dir, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as fp:
+        fp.write(data)
+        fp.flush()
+        os.fsync(fd)
+        renamer(tmppath, join(partition_dir, HASHES_INDEX_FILE))
+
+
+def read_hashes_index(partition_dir):
+    """
+    Read a partition's hashes.index, compacting it if it has grown too much.
+
+    :param partition_dir: absolute path to a partition dir
+    :returns: a dict mapping suffixes to sets of the object hashes in them,
+              or None if the partition has no usable index
+    """
+    header, index, num_records = _load_hashes_index(partition_dir)
+    if header != HASHES_INDEX_HEADER:
+        # missing, corrupt or still being built
+        return None
+    if num_records > len(index) + HASHES_INDEX_SLACK:
+        try:
+            with lock_path(partition_dir):
+                header, index, num_records = _load_hashes_index(
+                    partition_dir)
+                if header != HASHES_INDEX_HEADER:
+                    return None
+                _write_hashes_index(partition_dir, header, index)
+        except (IOError, OSError, LockTimeout):
+            # it's still good to use, just bigger than it should be
+            pass
+    return index
+
+
+def start_hashes_index(partition_dir):
+    """
+    Start building a partition's hashes.index from scratch.
+
+    The index is only usable once :func:`finish_hashes_index` is called
+    after walking the partition. Objects indexed while the walk is underway
+    are merged in then, and if the index is started again before it is
+    finished the first build is abandoned.
+
+    :param partition_dir: absolute path to a partition dir
+    :returns: a token identifying this build
+    """
+    token = uuid.uuid4().hex
+    with lock_path(partition_dir):
+        _write_hashes_index(partition_dir, '%s building %s' % (
+            HASHES_INDEX_HEADER, token), {})
+    return token
+
+
+def finish_hashes_index(partition_dir, token, index):
+    """
+    Finish building a partition's hashes.index.
+
+    :param partition_dir: absolute path to a partition dir
+    :param token: the token returned by :func:`start_hashes_index`
+    :param index: a dict mapping the suffixes found in the partition to
+                  iterables of the object hashes found in them
+    :returns: True if the index was written, False if the build was
+              abandoned
+    """
+    if not exists(join(partition_dir, HASHES_INDEX_FILE)):
+        # abandoned, or the partition is gone
+        return False
+    index = dict((suffix, set(object_hash for object_hash in object_hashes
+                              if _valid_object_hash(suffix, object_hash)))
+                 for suffix, object_hashes in index.items()
+                 if valid_suffix(suffix))
+    with lock_path(partition_dir):
+        # apply whatever was indexed during the walk
+        header, index, _junk = _load_hashes_index(partition_dir, index)
+        if header != '%s building %s' % (HASHES_INDEX_HEADER, token):
+            return False
+        _write_hashes_index(partition_dir, HASHES_INDEX_HEADER, index)
+    return True
+
+
+def _append_to_hashes_index(partition_dir, record):
+    # a single O_APPEND write doesn't interleave with other appends, so this
+    # doesn't take the partition lock, which a PUT has just taken to
+    # invalidate the suffix. A record appended to an index as it is replaced
+    # is lost, but the index is only a hint, and the suffix is reindexed
+    # when it is next rehashed.
+    index_file = join(partition_dir, HASHES_INDEX_FILE)
+    record += '\n'
+    if not isinstance(record, bytes):
+        record = record.encode('ascii')
+    try:
+        fd = os.open(index_file, os.O_WRONLY | os.O_APPEND)
+    except OSError as err:
+        if err.errno != errno.ENOENT:
+            raise
+        return False
+    try:
+        os.write(fd, record)
+    finally:
+        os.close(fd)
+    return True
+
+
+def index_object_hash(hsh_path):
+    """
+    Add an object hash dir to its partition's hashes.index, if it has one.
+
+    :param hsh_path: absolute path to an object hash dir
+    :returns: False if the partition has no hashes.index, True otherwise
+    """
+    object_hash = basename(hsh_path)
+    if not _valid_object_hash(object_hash[-3:], object_hash):
+        return True
+    return _append_to_hashes_index(dirname(dirname(hsh_path)),
+                                   '+' + object_hash)
+
+
+def reindex_suffix(suffix_dir, object_hashes):
+    """
+    Set the object hashes of a suffix in its partition's hashes.index, if it
+    has one.
+
+    :param suffix_dir: absolute path to a suffix dir
+    :param object_hashes: an iterable of all the object hash dirs in the
+                          suffix dir
+    :returns: False if the partition has no hashes.index, True otherwise
+    """
     suffix = basename(suffix_dir)
-    partition_dir = dirname(suffix_dir)
-    invalidations_file = join(partition_dir, HASH_INVALIDATIONS_FILE)
-    if not isinstance(suffix, bytes):
-        suffix = suffix.encode('utf-8')
-    with lock_path(partition_dir), open(invalidations_file, 'ab') as inv_fh:
-        inv_fh.write(suffix + b"\n")
+    return _append_to_hashes_index(dirname(suffix_dir), '=' + ' '.join(
+        [suffix] + sorted(object_hash for object_hash in object_hashes
+                          if _valid_object_hash(suffix, object_hash))))
 
 
 def relink_paths(target_path, new_target_path, ignore_missing=True):
@@ -546,7 +1072,8 @@ class AuditLocation(object):
 
 def object_audit_location_generator(devices, datadir, mount_check=True,
                                     logger=None, device_dirs=None,
-                                    auditor_type="ALL"):
+                                    auditor_type="ALL",
+                                    use_hashes_index=False):
     """
     Given a devices path (e.g. "/srv/node"), yield an AuditLocation for all
     objects stored under that directory for the given datadir (policy),
@@ -563,6 +1090,10 @@ def object_audit_location_generator(devices, datadir, mount_check=True,
     :param logger: a logger object
     :param device_dirs: a list of directories under devices to traverse
     :param auditor_type: either ALL or ZBF
+    :param use_hashes_index: if True, read the object hashes of partitions
+                             from their hashes.index rather than listing
+                             their suffix dirs, and index partitions that
+                             don't have one
     """
     if not device_dirs:
         device_dirs = listdir(devices)
@@ -592,12 +1123,30 @@ def object_audit_location_generator(devices, datadir, mount_check=True,
             update_auditor_status(datadir_path, logger,
                                   partitions[pos:], auditor_type)
             part_path = os.path.join(datadir_path, partition)
+            index = read_hashes_index(part_path) if use_hashes_index else None
+            if index is not None:
+                for asuffix in sorted(index):
+                    suff_path = os.path.join(part_path, asuffix)
+                    for hsh in sorted(index[asuffix]):
+                        hsh_path = os.path.join(suff_path, hsh)
+                        yield AuditLocation(hsh_path, device, partition,
+                                            policy)
+                continue
             try:
                 suffixes = listdir(part_path)
             except OSError as e:
                 if e.errno not in (errno.ENOTDIR, errno.ENODATA):
                     raise
                 continue
+            index_token = None
+            if use_hashes_index:
+                try:
+                    index_token = start_hashes_index(part_path)
+                except (IOError, OSError, LockTimeout) as e:
+                    if logger:
+                        logger.warning('Unable to index %s: %s',
+                                       part_path, e)
+            found = {}
             for asuffix in suffixes:
                 suff_path = os.path.join(part_path, asuffix)
                 try:
@@ -606,10 +1155,18 @@ def object_audit_location_generator(devices, datadir, mount_check=True,
                     if e.errno not in (errno.ENOTDIR, errno.ENODATA):
                         raise
                     continue
+                found[asuffix] = hashes
                 for hsh in hashes:
                     hsh_path = os.path.join(suff_path, hsh)
                     yield AuditLocation(hsh_path, device, partition,
                                         policy)
+            if index_token:
+                try:
+                    finish_hashes_index(part_path, index_token, found)
+                except (IOError, OSError, LockTimeout) as e:
+                    if logger:
+                        logger.warning('Unable to index %s: %s',
+                                       part_path, e)
 
         update_auditor_status(datadir_path, logger, [], auditor_type)
 
@@ -674,14 +1231,102 @@ def clear_auditor_status(devices, datadir, auditor_type="ALL"):
         remove_file(auditor_status)
 
 
+class DeviceThreadPools(object):
+    """
+    The per-device :class:`~swift.common.utils.threadpool.ThreadPool` in
+    which DiskFiles do their blocking i/o when ``threads_per_disk`` is
+    configured, so that a slow device only holds up requests to itself.
+
+    While any device has threads, each process dumps the queue depths of its
+    devices to the object recon cache every ``threadpool_recon_interval``
+    seconds, under its pid.
+
+    :param conf: caller provided configuration object
+    :param logger: caller provided logger
+    """
+
+    recon_key = 'object_server_threadpools'
+
+    def __init__(self, conf, logger):
+        self.logger = logger
+        self.threads_per_disk = non_negative_int(
+            conf.get('threads_per_disk', 0))
+        self.recon_interval = non_negative_float(
+            conf.get('threadpool_recon_interval', 30))
+        self.rcache = os.path.join(
+            conf.get('recon_cache_path', DEFAULT_RECON_CACHE_PATH),
+            RECON_OBJECT_FILE)
+        self._pools = {}
+        self._reporting = False
+
+    def __getitem__(self, device):
+        pool = self._pools.get(device)
+        if pool is None:
+            # threads are only started on first use, so that they are not
+            # lost when the server forks its workers
+            pool = self._pools[device] = ThreadPool(
+                nthreads=self.threads_per_disk)
+            if pool.nthreads and self.recon_interval and \
+                    not self._reporting:
+                self._reporting = True
+                spawn_n(self._report_forever)
+        return pool
+
+    def get_stats(self):
+        """
+        :returns: a dict mapping the devices with threads to dicts of their
+                  number of ``threads``, ``queue_depth`` (calls waiting for
+                  a thread) and ``in_progress`` calls
+        """
+        stats = {}
+        for device, pool in self._pools.items():
+            if pool.nthreads:
+                queue_depth = pool.queue_depth
+                stats[device] = {
+                    'threads': pool.nthreads,
+                    'queue_depth': queue_depth,
+                    'in_progress': max(pool.pending - queue_depth, 0),
+                }
+        return stats
+
+    def dump_recon(self):
+        now = time.time()
+        entry = {str(os.getpid()): {'devices': self.get_stats(),
+                                    'updated': now}}
+        # forget about processes that have stopped reporting
+        existing = load_recon_cache(self.rcache).get(self.recon_key)
+        if isinstance(existing, dict):
+            for pid, stats in existing.items():
+                if pid not in entry and not (
+                        isinstance(stats, dict) and stats.get('updated', 0) >
+                        now - 10 * self.recon_interval):
+                    entry[pid] = {}
+        dump_recon_cache({self.recon_key: entry}, self.rcache, self.logger)
+
+    def _report_forever(self):
+        while True:
+            sleep(self.recon_interval)
+            try:
+                self.dump_recon()
+            except Exception:
+                self.logger.exception('Exception dumping threadpool stats')
+
+
 class DiskFileRouter(object):
 
     def __init__(self, *args, **kwargs):
         self.policy_to_manager = {}
+        threadpools = None
         for policy in POLICIES:
             # create diskfile managers now to provoke any errors
-            self.policy_to_manager[int(policy)] = \
-                policy.get_diskfile_manager(*args, **kwargs)
+            manager = policy.get_diskfile_manager(*args, **kwargs)
+            if isinstance(manager, BaseDiskFileManager):
+                # all policies share each device's threads
+                if threadpools is None:
+                    threadpools = manager.threadpools
+                else:
+                    manager.threadpools = threadpools
+            self.policy_to_manager[int(policy)] = manager
 
     def __getitem__(self, policy):
         return self.policy_to_manager[int(policy)]
@@ -713,7 +1358,6 @@ class BaseDiskFileManager(object):
     diskfile_cls = None  # must be set by subclasses
     policy = None  # must be set by subclasses
 
-    invalidate_hash = staticmethod(invalidate_hash)
     consolidate_hashes = staticmethod(consolidate_hashes)
     quarantine_renamer = staticmethod(quarantine_renamer)
 
@@ -751,6 +1395,20 @@ class BaseDiskFileManager(object):
                 replication_concurrency_per_device)
         self.replication_lock_timeout = int(conf.get(
             'replication_lock_timeout', 15))
+        self.binary_hashes_file = config_true_value(
+            conf.get('binary_hashes_file', 'no'))
+        self.hashes_index = config_true_value(
+            conf.get('hashes_index', 'no'))
+        # partition dir -> time until which it is assumed to have no hashes
+        # index, oldest first
+        self._unindexed_partitions = OrderedDict()
+        self.threadpools = DeviceThreadPools(conf, logger)
+        if config_true_value(conf.get('batch_hash_invalidations', 'no')):
+            self.hash_invalidation_batcher = HashInvalidationBatcher(
+                self.logger, non_negative_float(conf.get(
+                    'hash_invalidation_max_delay', 0.0)))
+        else:
+            self.hash_invalidation_batcher = None
 
         self.use_splice = False
         self.pipe_size = None
@@ -1182,8 +1840,12 @@ class BaseDiskFileManager(object):
             path_contents = sorted(os.listdir(path))
         except OSError as err:
             if err.errno in (errno.ENOTDIR, errno.ENOENT):
+                self.reindex_suffix(path, [])
                 raise PathNotDir()
             raise
+        # this is a fresh listing of the suffix, so it also brings its hashes
+        # index back up to date with anything that changed behind its back
+        indexed = []
         for hsh in path_contents:
             hsh_path = join(path, hsh)
             try:
@@ -1228,6 +1890,7 @@ class BaseDiskFileManager(object):
                 raise
             if not ondisk_info['files']:
                 continue
+            indexed.append(hsh)
 
             # ondisk_info has info dicts containing timestamps for those
             # files that could determine the state of the diskfile if it were
@@ -1260,11 +1923,14 @@ class BaseDiskFileManager(object):
             os.rmdir(path)
         except OSError as e:
             if e.errno == errno.ENOENT:
+                self.reindex_suffix(path, [])
                 raise PathNotDir()
         else:
             # if we remove it, pretend like it wasn't there to begin with so
             # that the suffix key gets removed
+            self.reindex_suffix(path, [])
             raise PathNotDir()
+        self.reindex_suffix(path, indexed)
         return hashes
 
     def _hash_suffix(self, path, policy=None):
@@ -1278,6 +1944,127 @@ class BaseDiskFileManager(object):
         """
         raise NotImplementedError
 
+    def invalidate_hash(self, suffix_dir):
+        """
+        Invalidates the hash for a suffix_dir in the partition's hashes file,
+        coalescing concurrent invalidations of the same partition if
+        ``batch_hash_invalidations`` is configured.
+
+        :param suffix_dir: absolute path to suffix dir whose hash needs
+                           invalidating
+        """
+        if self.hash_invalidation_batcher:
+            self.hash_invalidation_batcher.invalidate_hash(suffix_dir)
+            return
+        lock_wait = append_hash_invalidations(
+            dirname(suffix_dir), [basename(suffix_dir)])
+        self.logger.timing('hash_invalidation.lock_wait', lock_wait * 1000)
+        self.logger.increment('hash_invalidation.flushes')
+        self.logger.update_stats('hash_invalidation.suffixes', 1)
+
+    def _update_hashes_index(self, partition_path, path, update, *args):
+        try:
+            indexed = update(path, *args)
+        except (IOError, OSError) as err:
+            self.logger.warning('Unable to index %s: %s', path, err)
+            return None
+        if indexed:
+            self._unindexed_partitions.pop(partition_path, None)
+        return indexed
+
+    def _remember_unindexed(self, partition_path):
+        now = time.time()
+        unindexed = self._unindexed_partitions
+        # every entry lives as long, so the expired ones are the oldest
+        while unindexed and (
+                len(unindexed) >= HASHES_INDEX_ABSENT_MAX_ENTRIES or
+                next(iter(unindexed.values())) <= now):
+            unindexed.popitem(last=False)
+        unindexed[partition_path] = now + HASHES_INDEX_ABSENT_TIME
+
+    def index_object_hash(self, hsh_path):
+        """
+        Add an object hash dir to its partition's hashes index, if it has
+        one. The index is only a hint, so failing to update it is logged
+        rather than raised.
+
+        Most partitions have no index unless ``hashes_index`` is enabled, so
+        a partition found to have none is not looked at again by this for
+        ``HASHES_INDEX_ABSENT_TIME`` seconds, and at most
+        ``HASHES_INDEX_ABSENT_MAX_ENTRIES`` partitions are remembered. An
+        index built by another process in the meantime misses the objects
+        added, until their (invalidated) suffixes are next rehashed and so
+        reindexed.
+
+        :param hsh_path: absolute path to an object hash dir
+        """
+        partition_path = dirname(dirname(hsh_path))
+        expires = self._unindexed_partitions.get(partition_path)
+        if expires is not None:
+            if expires > time.time():
+                return
+            del self._unindexed_partitions[partition_path]
+        if self._update_hashes_index(partition_path, hsh_path,
+                                     index_object_hash) is False:
+            self._remember_unindexed(partition_path)
+
+    def reindex_suffix(self, suffix_dir, object_hashes):
+        """
+        Set the object hashes of a suffix in its partition's hashes index, if
+        it has one. The index is only a hint, so failing to update it is
+        logged rather than raised.
+
+        Unlike :meth:`index_object_hash`, this always looks for the index,
+        and doesn't remember partitions that have none; rehashing a suffix is
+        what corrects the index for it.
+
+        :param suffix_dir: absolute path to a suffix dir
+        :param object_hashes: an iterable of all the object hash dirs in the
+                              suffix dir
+        """
+        self._update_hashes_index(dirname(suffix_dir), suffix_dir,
+                                  reindex_suffix, object_hashes)
+
+    def get_hashes_index(self, partition_path):
+        """
+        :param partition_path: absolute path to a partition dir
+        :returns: a dict mapping suffixes to sets of the object hashes in
+                  them, or None if hashes indexes aren't enabled or the
+                  partition has no usable one
+        """
+        if not self.hashes_index:
+            return None
+        return read_hashes_index(partition_path)
+
+    def start_hashes_index(self, partition_path):
+        """
+        Start building a partition's hashes index; the partition should be
+        walked and the results passed to :meth:`finish_hashes_index`.
+
+        :param partition_path: absolute path to a partition dir
+        :returns: a token identifying the build, or None if it couldn't be
+                  started
+        """
+        self._unindexed_partitions.pop(partition_path, None)
+        try:
+            return start_hashes_index(partition_path)
+        except (IOError, OSError, LockTimeout) as err:
+            self.logger.warning('Unable to index %s: %s', partition_path, err)
+
+    def finish_hashes_index(self, partition_path, token, found):
+        """
+        Finish building a partition's hashes index.
+
+        :param partition_path: absolute path to a partition dir
+        :param token: the token returned by :meth:`start_hashes_index`
+        :param found: a dict mapping the suffixes found by the walk to
+                      iterables of the object hashes found in them
+        """
+        try:
+            finish_hashes_index(partition_path, token, found)
+        except (IOError, OSError, LockTimeout) as err:
+            self.logger.warning('Unable to index %s: %s', partition_path, err)
+
     def _get_hashes(self, *args, **kwargs):
         hashed, hashes = self.__get_hashes(*args, **kwargs)
         hashes.pop('updated', None)
@@ -1312,7 +2099,8 @@ class BaseDiskFileManager(object):
             recalculate = []
 
         try:
-            orig_hashes = self.consolidate_hashes(partition_path)
+            orig_hashes = self.consolidate_hashes(
+                partition_path, binary=self.binary_hashes_file)
         except Exception:
             self.logger.warning('Unable to read %r', hashes_file,
                                 exc_info=True)
@@ -1333,7 +2121,8 @@ class BaseDiskFileManager(object):
             # conditions - so try not to get overly caught up trying to
             # optimize it out unless you manage to convince yourself there's a
             # bad behavior.
-            orig_hashes = read_hashes(partition_path)
+            orig_hashes = read_hashes(partition_path,
+                                      binary=self.binary_hashes_file)
         else:
             hashes = copy.deepcopy(orig_hashes)
 
@@ -1360,8 +2149,10 @@ class BaseDiskFileManager(object):
                 modified = True
         if modified:
             with lock_path(partition_path):
-                if read_hashes(partition_path) == orig_hashes:
-                    write_hashes(partition_path, hashes)
+                if read_hashes(partition_path,
+                               binary=self.binary_hashes_file) == orig_hashes:
+                    write_hashes(partition_path, hashes,
+                                 binary=self.binary_hashes_file)
                     return hashed, hashes
             return self.__get_hashes(device, partition, policy,
                                      recalculate=recalculate,
@@ -1508,7 +2299,8 @@ class BaseDiskFileManager(object):
         return object_audit_location_generator(self.devices, datadir,
                                                self.mount_check,
                                                self.logger, device_dirs,
-                                               auditor_type)
+                                               auditor_type,
+                                               self.hashes_index)
 
     def get_diskfile_from_audit_location(self, audit_location):
         """
@@ -1640,7 +2432,7 @@ class BaseDiskFileManager(object):
         elif not os.path.exists(partition_path):
             hashes = {}
         else:
-            _junk, hashes = tpool.execute(
+            _junk, hashes = self.threadpools[device].force_run_in_thread(
                 self._get_hashes, device, partition, policy,
                 recalculate=suffixes)
         return hashes
@@ -1701,6 +2493,10 @@ class BaseDiskFileManager(object):
         where timestamps are instances of
         :class:`~swift.common.utils.Timestamp`
 
+        If hashes indexes are enabled, the object hashes are read from the
+        partition's index rather than by listing its suffix dirs. A partition
+        without an index is indexed when all its suffixes are searched.
+
         :param device: name of target device
         :param partition: partition name
         :param policy: the StoragePolicy instance
@@ -1711,12 +2507,23 @@ class BaseDiskFileManager(object):
             raise DiskFileDeviceUnavailable()
 
         partition_path = get_part_path(dev_path, policy, partition)
+        index = self.get_hashes_index(partition_path)
+        index_token = None
         if suffixes is None:
-            suffixes = self.yield_suffixes(device, partition, policy)
+            if index is not None:
+                suffixes = (
+                    (os.path.join(partition_path, suffix), suffix)
+                    for suffix in sorted(index))
+            else:
+                if self.hashes_index and os.path.isdir(partition_path):
+                    # this walks the whole partition, so index it too
+                    index_token = self.start_hashes_index(partition_path)
+                suffixes = self.yield_suffixes(device, partition, policy)
         else:
             suffixes = (
                 (os.path.join(partition_path, suffix), suffix)
                 for suffix in suffixes)
+        found = {}
 
         # define keys that we need to extract the result from the on disk info
         # data:
@@ -1734,13 +2541,18 @@ class BaseDiskFileManager(object):
         # the next rehash
         for suffix_path, suffix in suffixes:
             found_files = False
-            for object_hash in self._listdir(suffix_path):
+            if index is None:
+                object_hashes = self._listdir(suffix_path)
+            else:
+                object_hashes = sorted(index.get(suffix, ()))
+            for object_hash in object_hashes:
                 object_path = os.path.join(suffix_path, object_hash)
                 try:
                     diskfile_info = self.cleanup_ondisk_files(
                         object_path, **kwargs)
                     if diskfile_info['files']:
                         found_files = True
+                        found.setdefault(suffix, []).append(object_hash)
                     result = {}
                     for result_key, diskfile_info_key, info_key in key_map:
                         if diskfile_info_key not in diskfile_info:
@@ -1766,6 +2578,9 @@ class BaseDiskFileManager(object):
             if not found_files:
                 self.invalidate_hash(suffix_path)
 
+        if index_token:
+            self.finish_hashes_index(partition_path, index_token, found)
+
 
 class BaseDiskFileWriter(object):
     """
@@ -1806,6 +2621,7 @@ class BaseDiskFileWriter(object):
         self._chunks_etag = md5(usedforsecurity=False)
         self._bytes_per_sync = bytes_per_sync
         self._diskfile = diskfile
+        self._threadpool = diskfile._threadpool
         self.next_part_power = next_part_power
 
         # Internal attributes
@@ -1905,7 +2721,7 @@ class BaseDiskFileWriter(object):
         # For large files sync every 512MB (by default) written
         diff = self._upload_size - self._last_sync
         if diff >= self._bytes_per_sync:
-            tpool.execute(fdatasync, self._fd)
+            self._threadpool.force_run_in_thread(fdatasync, self._fd)
             drop_buffer_cache(self._fd, self._last_sync, diff)
             self._last_sync = self._upload_size
 
@@ -1942,6 +2758,7 @@ class BaseDiskFileWriter(object):
             # It was an unnamed temp file created by open() with O_TMPFILE
             link_fd_to_path(self._fd, target_path,
                             self._diskfile._dirs_created)
+        self.manager.index_object_hash(self._datadir)
 
         # Check if the partition power will/has been increased
         new_target_path = None
@@ -1959,6 +2776,9 @@ class BaseDiskFileWriter(object):
                     self.manager.logger.exception(
                         'Relinking %s to %s failed: %s',
                         target_path, new_target_path, exc)
+                else:
+                    self.manager.index_object_hash(
+                        os.path.dirname(new_target_path))
 
         # If rename is successful, flag put as succeeded. This is done to avoid
         # unnecessary os.unlink() of tempfile later. As renamer() has
@@ -1997,7 +2817,7 @@ class BaseDiskFileWriter(object):
         metadata['name'] = self._name
         target_path = join(self._datadir, filename)
 
-        tpool.execute(
+        self._threadpool.force_run_in_thread(
             self._finalize_put, metadata, target_path, cleanup,
             logger_thread_locals=getattr(self.logger, 'thread_locals', None))
 
@@ -2099,6 +2919,7 @@ class BaseDiskFileReader(object):
         self._obj_size = obj_size
         self._etag = etag
         self._diskfile = diskfile
+        self._threadpool = diskfile._threadpool
         self._disk_chunk_size = disk_chunk_size
         self._device_path = device_path
         self._logger = logger
@@ -2144,7 +2965,8 @@ class BaseDiskFileReader(object):
             self._init_checks()
             while True:
                 try:
-                    chunk = self._fp.read(self._disk_chunk_size)
+                    chunk = self._threadpool.run_in_thread(
+                        self._fp.read, self._disk_chunk_size)
                 except IOError as e:
                     if e.errno == errno.EIO:
                         # Note that if there's no quarantine hook set up,
@@ -2417,6 +3239,7 @@ class BaseDiskFile(object):
                  open_expired=False, next_part_power=None, **kwargs):
         self._manager = mgr
         self._device_path = device_path
+        self._threadpool = mgr.threadpools[basename(device_path)]
         self._logger = mgr.logger
         self._disk_chunk_size = mgr.disk_chunk_size
         self._bytes_per_sync = mgr.bytes_per_sync
@@ -2568,6 +3391,10 @@ class BaseDiskFile(object):
                                      some data did pass cross checks
         :returns: itself for use as a context manager
         """
+        return self._threadpool.run_in_thread(
+            self._open, modernize=modernize, current_time=current_time)
+
+    def _open(self, modernize, current_time):
         # First figure out if the data directory exists
         try:
             files = os.listdir(self._datadir)
@@ -3297,7 +4124,7 @@ class ECDiskFileWriter(BaseDiskFileWriter):
         durable_data_file_path = os.path.join(
             self._datadir, self.manager.make_on_disk_filename(
                 timestamp, '.data', self._diskfile._frag_index, durable=True))
-        tpool.execute(
+        self._threadpool.force_run_in_thread(
             self._finalize_durable, data_file_path, durable_data_file_path,
             timestamp)
 
@@ -26,8 +26,12 @@
 
 from six.moves.urllib.parse import quote
 
+import errno
+import fcntl
+import os
 import time
 import json
+from collections import OrderedDict
 import functools
 import inspect
 import itertools
@@ -36,6 +40,9 @@ import random
 from copy import deepcopy
 from sys import exc_info
 
+from eventlet import sleep, GreenPool
+from eventlet.event import Event
+from eventlet.hubs import trampoline
 from eventlet.timeout import Timeout
 import six
 
@@ -44,12 +51,14 @@ from swift.common.utils import Timestamp, WatchdogTimeout, config_true_value, \
     public, split_path, list_from_csv, GreenthreadSafeIterator, \
     GreenAsyncPile, quorum_size, parse_content_type, drain_and_close, \
     document_iters_to_http_response_body, ShardRange, cache_from_env, \
-    MetricsPrefixLoggerAdapter, CooperativeIterator
+    MetricsPrefixLoggerAdapter, CooperativeIterator, F_SETPIPE_SZ
 from swift.common.bufferedhttp import http_connect
 from swift.common import constraints
 from swift.common.exceptions import ChunkReadTimeout, ChunkWriteTimeout, \
     ConnectionTimeout, RangeAlreadyComplete, ShortReadError
 from swift.common.header_key_dict import HeaderKeyDict
+from swift.common.memcached import MemcacheConnectionError
+from swift.common.splice import splice
 from swift.common.http import is_informational, is_success, is_redirection, \
     is_server_error, HTTP_OK, HTTP_PARTIAL_CONTENT, HTTP_MULTIPLE_CHOICES, \
     HTTP_BAD_REQUEST, HTTP_NOT_FOUND, HTTP_SERVICE_UNAVAILABLE, \
@@ -69,6 +78,14 @@ DEFAULT_RECHECK_ACCOUNT_EXISTENCE = 60  # seconds
 DEFAULT_RECHECK_CONTAINER_EXISTENCE = 60  # seconds
 DEFAULT_RECHECK_UPDATING_SHARD_RANGES = 3600  # seconds
 DEFAULT_RECHECK_LISTING_SHARD_RANGES = 600  # seconds
+# backend response headers that mean middleware may need to see or change
+# the body of an object, so it can't be spliced straight to the client
+ZERO_COPY_EXCLUDED_HEADERS = (
+    'X-Static-Large-Object',
+    'X-Object-Manifest',
+    get_sys_meta_prefix('object') + 'symlink-target',
+)
+ZERO_COPY_EXCLUDED_PREFIX = get_sys_meta_prefix('object') + 'crypto-'
 
 
 def update_headers(response, headers):
@@ -462,21 +479,25 @@ def get_container_info(env, app, swift_source=None):
             if not account_info or not is_success(account_info['status']):
                 return headers_to_container_info({}, 0)
 
-        req = _prepare_pre_auth_info_request(
-            env, ("/%s/%s/%s" % (version, wsgi_account, wsgi_container)),
-            (swift_source or 'GET_CONTAINER_INFO'))
-        # *Always* allow reserved names for get-info requests -- it's on the
-        # caller to keep the result private-ish
-        req.headers['X-Backend-Allow-Reserved-Names'] = 'true'
-        resp = req.get_response(app)
-        drain_and_close(resp)
-        # Check in infocache to see if the proxy (or anyone else) already
-        # populated the cache for us. If they did, just use what's there.
-        #
-        # See similar comment in get_account_info() for justification.
-        info = _get_info_from_infocache(env, account, container)
-        if info is None:
-            info = set_info_cache(env, account, container, resp)
+        def fetch():
+            req = _prepare_pre_auth_info_request(
+                env, ("/%s/%s/%s" % (version, wsgi_account, wsgi_container)),
+                (swift_source or 'GET_CONTAINER_INFO'))
+            # *Always* allow reserved names for get-info requests -- it's on
+            # the caller to keep the result private-ish
+            req.headers['X-Backend-Allow-Reserved-Names'] = 'true'
+            resp = req.get_response(app)
+            drain_and_close(resp)
+            # Check in infocache to see if the proxy (or anyone else) already
+            # populated the cache for us. If they did, just use what's there.
+            #
+            # See similar comment in get_account_info() for justification.
+            info = _get_info_from_infocache(env, account, container)
+            if info is None:
+                info = set_info_cache(env, account, container, resp)
+            return info
+
+        info = _fetch_info(app, env, account, container, fetch)
 
     if info:
         info = deepcopy(info)  # avoid mutating what's in swift.infocache
@@ -541,31 +562,36 @@ def get_account_info(env, app, swift_source=None):
     # Cache miss; go HEAD the account and populate the caches
     if not info:
         env.setdefault('swift.infocache', {})
-        req = _prepare_pre_auth_info_request(
-            env, "/%s/%s" % (version, wsgi_account),
-            (swift_source or 'GET_ACCOUNT_INFO'))
-        # *Always* allow reserved names for get-info requests -- it's on the
-        # caller to keep the result private-ish
-        req.headers['X-Backend-Allow-Reserved-Names'] = 'true'
-        resp = req.get_response(app)
-        drain_and_close(resp)
-        # Check in infocache to see if the proxy (or anyone else) already
-        # populated the cache for us. If they did, just use what's there.
-        #
-        # The point of this is to avoid setting the value in memcached
-        # twice. Otherwise, we're needlessly sending requests across the
-        # network.
-        #
-        # If the info didn't make it into the cache, we'll compute it from
-        # the response and populate the cache ourselves.
-        #
-        # Note that this is taking "exists in infocache" to imply "exists in
-        # memcache". That's because we're trying to avoid superfluous
-        # network traffic, and checking in memcache prior to setting in
-        # memcache would defeat the purpose.
-        info = _get_info_from_infocache(env, account)
-        if info is None:
-            info = set_info_cache(env, account, None, resp)
+
+        def fetch():
+            req = _prepare_pre_auth_info_request(
+                env, "/%s/%s" % (version, wsgi_account),
+                (swift_source or 'GET_ACCOUNT_INFO'))
+            # *Always* allow reserved names for get-info requests -- it's on
+            # the caller to keep the result private-ish
+            req.headers['X-Backend-Allow-Reserved-Names'] = 'true'
+            resp = req.get_response(app)
+            drain_and_close(resp)
+            # Check in infocache to see if the proxy (or anyone else) already
+            # populated the cache for us. If they did, just use what's there.
+            #
+            # The point of this is to avoid setting the value in memcached
+            # twice. Otherwise, we're needlessly sending requests across the
+            # network.
+            #
+            # If the info didn't make it into the cache, we'll compute it from
+            # the response and populate the cache ourselves.
+            #
+            # Note that this is taking "exists in infocache" to imply "exists
+            # in memcache". That's because we're trying to avoid superfluous
+            # network traffic, and checking in memcache prior to setting in
+            # memcache would defeat the purpose.
+            info = _get_info_from_infocache(env, account)
+            if info is None:
+                info = set_info_cache(env, account, None, resp)
+            return info
+
+        info = _fetch_info(app, env, account, None, fetch)
 
     if info:
         info = info.copy()  # avoid mutating what's in swift.infocache
@@ -632,6 +658,209 @@ def get_cache_key(account, container=None, obj=None, shard=None):
     return cache_key
 
 
+class LocalInfoCache(object):
+    """
+    A process-local LRU cache of account and container info, shared by the
+    requests that a proxy-server worker handles. It is consulted after
+    ``swift.infocache`` and before memcache, so that requests for a few very
+    hot containers don't each cost a memcache round trip.
+
+    Entries are only invalidated by ``clear_info_cache`` in the same worker,
+    so they are kept for a short time: ``ttl`` seconds, or ``negative_ttl``
+    seconds for info about accounts or containers that don't exist.
+
+    :param max_size: the maximum number of entries to keep
+    :param ttl: how long, in seconds, to keep info
+    :param negative_ttl: how long, in seconds, to keep info with a 404 or 410
+                         status
+    :param logger: a logger to emit hit, miss and eviction metrics to
+    """
+
+    def __init__(self, max_size, ttl, negative_ttl, logger=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.logger = logger
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, cache_key):
+        entry = self._entries.get(cache_key)
+        return entry is not None and entry[0] > time.time()
+
+    def _increment(self, cache_key, event):
+        if self.logger:
+            # cache keys look like "container/<account>/<container>"
+            self.logger.increment('%s.info.local_cache.%s' % (
+                cache_key.split('/', 1)[0], event))
+
+    def get(self, cache_key):
+        """
+        :returns: a copy of the cached info, or None
+        """
+        entry = self._entries.pop(cache_key, None)
+        if entry is None or entry[0] <= time.time():
+            self._increment(cache_key, 'miss')
+            return None
+        # most recently used entries are kept at the end
+        self._entries[cache_key] = entry
+        self._increment(cache_key, 'hit')
+        return deepcopy(entry[1])
+
+    def set(self, cache_key, info):
+        self._entries.pop(cache_key, None)
+        if info.get('status') in (HTTP_NOT_FOUND, HTTP_GONE):
+            ttl = self.negative_ttl
+        else:
+            ttl = self.ttl
+        if ttl <= 0:
+            return
+        self._entries[cache_key] = (time.time() + ttl, deepcopy(info))
+        while len(self._entries) > self.max_size:
+            evicted_key, _junk = self._entries.popitem(last=False)
+            self._increment(evicted_key, 'evict')
+
+    def delete(self, cache_key):
+        self._entries.pop(cache_key, None)
+
+
+def local_info_cache_from_env(env, app=None):
+    """
+    Get the proxy-server's :class:`LocalInfoCache` from the WSGI environment
+    or, if it has not been put there yet, from the proxy-server app.
+
+    :param env: the WSGI request environment
+    :param app: the proxy-server app, if known
+    :returns: a :class:`LocalInfoCache`, or None if it is not in use
+    """
+    cache = env.get('swift.local_info_cache')
+    if cache is None:
+        cache = getattr(app, 'local_info_cache', None)
+        if cache is not None:
+            env['swift.local_info_cache'] = cache
+    return cache
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent backend requests for the same thing, e.g. the info
+    or shard ranges of a container, so that when that thing drops out of
+    the caches only one request per proxy-server worker goes to the backend
+    and the others wait for, and share, its result.
+
+    Optionally, a lease in memcache coalesces requests across workers too:
+    a worker that finds the lease held by another worker polls for the
+    result to appear in memcache rather than going to the backend.
+
+    :param logger: a logger to emit metrics to
+    :param wait_timeout: the maximum time, in seconds, to wait for a
+                         concurrent request's result before going to the
+                         backend anyway
+    :param lease_time: the time, in seconds, for which a memcache lease is
+                       held; 0 disables coalescing across workers
+    :param lease_poll_interval: the time, in seconds, between polls of
+                                memcache while another worker holds the
+                                lease
+    """
+
+    def __init__(self, logger, wait_timeout=10.0, lease_time=0,
+                 lease_poll_interval=0.05):
+        self.logger = logger
+        self.wait_timeout = wait_timeout
+        self.lease_time = lease_time
+        self.lease_poll_interval = lease_poll_interval
+        self._in_flight = {}
+
+    def _run_leased(self, key, metric_prefix, func, memcache, recheck):
+        if not (self.lease_time and memcache and recheck):
+            return func()
+        lease_key = 'coalesce-lease/%s' % key
+        try:
+            holders = memcache.incr(lease_key, time=self.lease_time)
+        except MemcacheConnectionError:
+            return func()
+        if holders > 1:
+            # another worker is going to the backend, so wait for it to
+            # populate memcache
+            self.logger.increment('%s.lease.wait' % metric_prefix)
+            deadline = time.time() + self.lease_time
+            while time.time() < deadline:
+                sleep(self.lease_poll_interval)
+                result = recheck()
+                if result is not None:
+                    self.logger.increment('%s.lease.hit' % metric_prefix)
+                    return result
+                if memcache.get(lease_key) is None:
+                    # the lease was released but nothing was cached
+                    break
+            self.logger.increment('%s.lease.miss' % metric_prefix)
+            return func()
+        try:
+            return func()
+        finally:
+            memcache.delete(lease_key)
+
+    def run(self, key, metric_prefix, func, memcache=None, recheck=None):
+        """
+        Call ``func()``, or wait for the result of a concurrent call with the
+        same key.
+
+        :param key: identifies what ``func`` fetches, e.g. its cache key
+        :param metric_prefix: the prefix for metrics, e.g.
+                              ``container.info``
+        :param func: makes the backend request(s) and returns the result
+        :param memcache: the memcache client to hold a lease in, if any
+        :param recheck: returns the result from memcache, or None; it is
+                        polled while another worker holds the lease
+        :returns: a tuple of (result, coalesced), where coalesced is True if
+                  the result was returned by another request's ``func``,
+                  in which case it must be treated as read-only
+        """
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            start = time.time()
+            outcome = None
+            with Timeout(self.wait_timeout, False):
+                outcome = in_flight.wait()
+            if outcome is None:
+                self.logger.increment('%s.coalesced.timeout' % metric_prefix)
+            elif outcome[0]:
+                self.logger.timing_since(
+                    '%s.coalesced.timing' % metric_prefix, start)
+                return outcome[1], True
+            # the other request timed out or failed; try for ourselves
+            return func(), False
+
+        event = Event()
+        self._in_flight[key] = event
+        outcome = (False, None)
+        try:
+            result = self._run_leased(
+                key, metric_prefix, func, memcache, recheck)
+            outcome = (True, result)
+            return result, False
+        finally:
+            del self._in_flight[key]
+            event.send(outcome)
+
+
+def single_flight_from_app(app):
+    """
+    Get the proxy-server's :class:`SingleFlight`, if it coalesces backend
+    requests.
+
+    :param app: the proxy-server app, or a middleware in front of it
+    :returns: a :class:`SingleFlight`, or None
+    """
+    try:
+        app = app._pipeline_final_app
+    except AttributeError:
+        pass
+    return getattr(app, 'single_flight', None)
+
+
 def set_info_cache(env, account, container, resp):
     """
     Cache info in both memcache and env.
@@ -673,6 +902,10 @@ def set_info_cache(env, account, container, resp):
         info = headers_to_account_info(resp.headers, resp.status_int)
     if memcache:
         memcache.set(cache_key, info, time=cache_time)
+    env.get('swift.memcache_prefetch', {}).pop(cache_key, None)
+    local_cache = local_info_cache_from_env(env)
+    if local_cache is not None:
+        local_cache.set(cache_key, info)
     infocache[cache_key] = info
     return info
 
@@ -707,7 +940,7 @@ def set_object_info_cache(app, env, account, container, obj, resp):
 
 def clear_info_cache(env, account, container=None, shard=None):
     """
-    Clear the cached info in both memcache and env
+    Clear the cached info in env, the process-local cache and memcache
 
     :param  env: the WSGI request environment
     :param  account: the account name
@@ -720,6 +953,10 @@ def clear_info_cache(env, account, container=None, shard=None):
     infocache = env.setdefault('swift.infocache', {})
     memcache = cache_from_env(env, True)
     infocache.pop(cache_key, None)
+    env.get('swift.memcache_prefetch', {}).pop(cache_key, None)
+    local_cache = local_info_cache_from_env(env)
+    if local_cache is not None:
+        local_cache.delete(cache_key)
     if memcache:
         memcache.delete(cache_key)
 
@@ -804,7 +1041,11 @@ def _get_info_from_memcache(app, env, account, container=None):
             if logger:
                 logger.increment('%s.info.cache.skip' % info_type)
         else:
-            info = memcache.get(cache_key)
+            prefetched = env.get('swift.memcache_prefetch', {})
+            if cache_key in prefetched:
+                info = prefetched.pop(cache_key)
+            else:
+                info = memcache.get(cache_key)
             if logger:
                 logger.increment('%s.info.cache.%s' % (
                     info_type, 'hit' if info else 'miss'))
@@ -835,10 +1076,73 @@ def _get_info_from_memcache(app, env, account, container=None):
     return None
 
 
+def prefetch_info(app, env, account, container):
+    """
+    Look up the account info and container info that a request is going to
+    need in memcache together, which costs about one memcache round trip
+    rather than two. Nothing that is already cached in env or the
+    process-local cache is looked up.
+
+    The values are kept in the environment until ``get_account_info`` or
+    ``get_container_info`` use them, so cache skipping and metrics work just
+    as if they had been looked up one at a time.
+
+    :param  app: the application object
+    :param  env: the environment used by the current request
+    :param  account: the account name
+    :param  container: the container name
+    """
+    memcache = cache_from_env(env, True)
+    if not memcache or not hasattr(memcache, 'get_many'):
+        return
+    infocache = env.setdefault('swift.infocache', {})
+    local_cache = local_info_cache_from_env(env, app)
+    cache_keys = [
+        cache_key for cache_key in (get_cache_key(account),
+                                    get_cache_key(account, container))
+        if cache_key not in infocache and
+        (local_cache is None or cache_key not in local_cache)]
+    if len(cache_keys) < 2:
+        return
+    try:
+        values = memcache.get_many(cache_keys, raise_on_error=True)
+    except MemcacheConnectionError:
+        return
+    # only hits are kept; a miss is looked up again, in case the value is on
+    # a server that get_many() couldn't reach
+    env.setdefault('swift.memcache_prefetch', {}).update(
+        (cache_key, value) for cache_key, value in values.items()
+        if value is not None)
+
+
+def _get_info_from_local_cache(app, env, account, container=None):
+    """
+    Get cached account or container information from the proxy-server's
+    process-local cache
+
+    :param  app: the application object
+    :param  env: the environment used by the current request
+    :param  account: the account name
+    :param  container: the container name
+
+    :returns: a dictionary of cached info on cache hit, None on miss. Also
+      returns None if the process-local cache is not in use.
+    """
+    local_cache = local_info_cache_from_env(env, app)
+    if local_cache is None:
+        return None
+    cache_key = get_cache_key(account, container)
+    info = local_cache.get(cache_key)
+    if info:
+        env.setdefault('swift.infocache', {})[cache_key] = info
+    return info
+
+
 def _get_info_from_caches(app, env, account, container=None):
     """
-    Get the cached info from env or memcache (if used) in that order.
-    Used for both account and container info.
+    Get the cached info from env, the process-local cache (if used) or
+    memcache (if used) in that order. Used for both account and container
+    info.
 
     :param  app: the application object
     :param  env: the environment used by the current request
@@ -846,8 +1150,39 @@ def _get_info_from_caches(app, env, account, container=None):
     """
 
     info = _get_info_from_infocache(env, account, container)
+    if info is None:
+        info = _get_info_from_local_cache(app, env, account, container)
     if info is None:
         info = _get_info_from_memcache(app, env, account, container)
+        local_cache = local_info_cache_from_env(env, app)
+        if info and local_cache is not None:
+            local_cache.set(get_cache_key(account, container), info)
+    return info
+
+
+def _fetch_info(app, env, account, container, fetch):
+    """
+    Call ``fetch`` to get account or container info from the backend, unless
+    a concurrent request is already doing so, in which case share its info.
+
+    :param  app: the proxy-server app
+    :param  env: the environment used by the current request
+    :param  account: the account name
+    :param  container: the container name, or None for account info
+    :param  fetch: makes the backend request and returns the info
+    :returns: the info
+    """
+    single_flight = single_flight_from_app(app)
+    if single_flight is None:
+        return fetch()
+    cache_key = get_cache_key(account, container)
+    info, coalesced = single_flight.run(
+        cache_key, '%s.info' % ('container' if container else 'account'),
+        fetch, memcache=cache_from_env(env, True),
+        recheck=lambda: _get_info_from_memcache(app, env, account, container))
+    if coalesced and info:
+        info = deepcopy(info)
+        env.setdefault('swift.infocache', {})[cache_key] = info
     return info
 
 
@@ -964,6 +1299,39 @@ def close_swift_conn(src):
         pass
 
 
+def pooled_http_connect(pool, *args, **kwargs):
+    """
+    Call :func:`~swift.common.bufferedhttp.http_connect`, and if ``pool`` is
+    not None have it reuse an idle connection from the pool if it can.
+
+    :param pool: a ``BufferedHTTPConnectionPool``, or None
+    :returns: HTTPConnection object
+    """
+    if pool is not None:
+        kwargs['pool'] = pool
+        # ask the backend to keep the connection open so it can be reused
+        kwargs['headers'] = HeaderKeyDict(kwargs.get('headers') or {})
+        kwargs['headers']['Connection'] = 'keep-alive'
+    return http_connect(*args, **kwargs)
+
+
+def release_swift_conn(src):
+    """
+    If the http connection to the backend came from a connection pool, return
+    it to the pool, which keeps it for reuse if the response has been read to
+    its end and closes it otherwise.
+
+    :param src: the response from the backend
+    :returns: True if the connection came from a pool, False otherwise
+    """
+    conn = getattr(src, 'swift_conn', None)
+    pool = getattr(conn, 'pool', None)
+    if pool is None:
+        return False
+    pool.release(conn, src)
+    return True
+
+
 def bytes_to_skip(record_size, range_start):
     """
     Assume an object is composed of N records, where the first N-1 are all
@@ -1014,10 +1382,57 @@ class ByteCountEnforcer(object):
             return chunk
 
 
+class SplicedBytes(bytes):
+    """
+    Stands in for a chunk of response body that has already been spliced to
+    the client socket behind the WSGI server's back. It is empty, so the WSGI
+    server has nothing more to send, but its length is the number of bytes
+    spliced, so that middleware counting the bytes sent still gets it right.
+    """
+    def __new__(cls, nbytes):
+        self = super(SplicedBytes, cls).__new__(cls)
+        self.nbytes = nbytes
+        return self
+
+    def __len__(self):
+        return self.nbytes
+
+
+def splice_from_socket(sockfd, pipefd, nbytes):
+    """
+    Splice up to ``nbytes`` bytes from a non-blocking socket into an empty
+    pipe, waiting for the socket to be readable if need be.
+
+    :returns: the number of bytes spliced, or 0 if the socket was closed.
+    """
+    while True:
+        try:
+            return splice(sockfd, None, pipefd, None, nbytes, 0)[0]
+        except IOError as err:
+            if err.errno != errno.EWOULDBLOCK:
+                raise
+            trampoline(sockfd, read=True)
+
+
+def splice_to_socket(pipefd, sockfd, nbytes):
+    """
+    Splice exactly ``nbytes`` bytes from a pipe to a non-blocking socket,
+    waiting for the socket to be writable if need be.
+    """
+    while nbytes > 0:
+        try:
+            nbytes -= splice(pipefd, None, sockfd, None, nbytes, 0)[0]
+        except IOError as err:
+            if err.errno != errno.EWOULDBLOCK:
+                raise
+            trampoline(sockfd, write=True)
+
+
 class GetOrHeadHandler(object):
     def __init__(self, app, req, server_type, node_iter, partition, path,
                  backend_headers, concurrency=1, policy=None,
-                 client_chunk_size=None, newest=None, logger=None):
+                 client_chunk_size=None, newest=None, logger=None,
+                 hedged=False, zero_copy=False):
         self.app = app
         self.node_iter = node_iter
         self.server_type = server_type
@@ -1031,6 +1446,8 @@ class GetOrHeadHandler(object):
         self.used_nodes = []
         self.used_source_etag = ''
         self.concurrency = concurrency
+        self.hedged = hedged
+        self.zero_copy = zero_copy
         self.policy = policy
         self.node = None
         self.source = None
@@ -1044,6 +1461,7 @@ class GetOrHeadHandler(object):
         self.rebalance_missing_suppression_count = min(
             policy_options.rebalance_missing_suppression_count,
             node_iter.num_primary_nodes - 1)
+        self.zero_copy_min_size = policy_options.zero_copy_gets_min_size
 
         # stuff from request
         self.req_method = req.method
@@ -1375,7 +1793,8 @@ class GetOrHeadHandler(object):
             raise
         finally:
             # Close-out the connection as best as possible.
-            if getattr(self.source, 'swift_conn', None):
+            if getattr(self.source, 'swift_conn', None) and \
+                    not release_swift_conn(self.source):
                 close_swift_conn(self.source)
 
     @property
@@ -1399,9 +1818,12 @@ class GetOrHeadHandler(object):
         req_headers = dict(self.backend_headers)
         ip, port = get_ip_port(node, req_headers)
         start_node_timing = time.time()
+        self.app.node_request_started(node)
+        conn = None
         try:
             with ConnectionTimeout(self.app.conn_timeout):
-                conn = http_connect(
+                conn = pooled_http_connect(
+                    self.app.backend_connection_pool,
                     ip, port, node['device'],
                     self.partition, self.req_method, self.path,
                     headers=req_headers,
@@ -1413,11 +1835,21 @@ class GetOrHeadHandler(object):
                 # See NOTE: swift_conn at top of file about this.
                 possible_source.swift_conn = conn
         except (Exception, Timeout):
+            self.app.node_request_failed(node, node_timeout)
             self.app.exception_occurred(
                 node, self.server_type,
                 'Trying to %(method)s %(path)s' %
                 {'method': self.req_method, 'path': self.req_path})
             return False
+        except BaseException:
+            # killed before we got a response, e.g. a hedged request that
+            # lost; that's no latency sample, and the connection is part way
+            # through a request so it can't go back in the pool
+            self.app.node_request_finished(node)
+            if conn is not None:
+                conn.close()
+            raise
+        self.app.node_request_finished(node, time.time() - start_node_timing)
 
         src_headers = dict(
             (k.lower(), v) for k, v in
@@ -1474,6 +1906,7 @@ class GetOrHeadHandler(object):
             self.reasons.append(possible_source.reason)
             self.bodies.append(possible_source.read())
             self.source_headers.append(possible_source.getheaders())
+            release_swift_conn(possible_source)
 
             # if 404, record the timestamp. If a good source shows up, its
             # timestamp will be compared to the latest 404.
@@ -1503,19 +1936,23 @@ class GetOrHeadHandler(object):
         if self.server_type == 'Object' and not self.newest:
             node_timeout = self.app.recoverable_node_timeout
 
-        pile = GreenAsyncPile(self.concurrency)
-
-        for node in nodes:
-            pile.spawn(self._make_node_request, node, node_timeout,
-                       self.logger.thread_locals)
-            _timeout = self.app.get_policy_options(
-                self.policy).concurrency_timeout \
-                if pile.inflight < self.concurrency else None
-            if pile.waitfirst(_timeout):
-                break
+        hedged_nodes = []
+        if self.hedged:
+            hedged_nodes = self._wait_for_hedged_source(nodes, node_timeout)
         else:
-            # ran out of nodes, see if any stragglers will finish
-            any(pile)
+            pile = GreenAsyncPile(self.concurrency)
+
+            for node in nodes:
+                pile.spawn(self._make_node_request, node, node_timeout,
+                           self.logger.thread_locals)
+                _timeout = self.app.get_policy_options(
+                    self.policy).concurrency_timeout \
+                    if pile.inflight < self.concurrency else None
+                if pile.waitfirst(_timeout):
+                    break
+            else:
+                # ran out of nodes, see if any stragglers will finish
+                any(pile)
 
         # this helps weed out any sucess status that were found before a 404
         # and added to the list in the case of x-newest.
@@ -1540,9 +1977,65 @@ class GetOrHeadHandler(object):
             # between old and new mid-stream and giving garbage to the client.
             self.used_source_etag = normalize_etag(src_headers.get('etag', ''))
             self.node = node
+            if node in hedged_nodes:
+                self.logger.increment('hedged_get.won')
             return source, node
         return None, None
 
+    def _wait_for_hedged_source(self, nodes, node_timeout):
+        """
+        Make requests to nodes one at a time, except that if a request has
+        not returned headers by a high percentile of its node's recent
+        latencies, and the app's hedge budget allows, a hedged request is
+        made to the next node. Whichever request finds a source first wins;
+        the other is cancelled.
+
+        :param nodes: an iterator of nodes
+        :param node_timeout: the timeout for each request
+        :returns: a list of the nodes to which hedged requests were made
+        """
+        policy_options = self.app.get_policy_options(self.policy)
+        self.app.hedge_budget.deposit()
+        hedged_nodes = []
+        hedge = False
+        pool = GreenPool(2)
+        pile = GreenAsyncPile(pool)
+        for node in nodes:
+            pile.spawn(self._make_node_request, node, node_timeout,
+                       self.logger.thread_locals)
+            if hedge:
+                hedge = False
+                hedged_nodes.append(node)
+                self.logger.increment('hedged_get.sent')
+                if any(pile):
+                    break
+                continue
+            delay = self.app.node_latencies.percentile(
+                node, policy_options.hedged_gets_percentile)
+            if delay is None:
+                delay = policy_options.concurrency_timeout
+            if pile.waitfirst(delay):
+                break
+            if not pile.inflight:
+                # the request failed, so just move on to the next node
+                continue
+            if self.app.hedge_budget.spend():
+                hedge = True
+                continue
+            self.logger.increment('hedged_get.budget_exhausted')
+            if pile.waitfirst(None):
+                break
+        else:
+            if hedge:
+                # there was no node to send the hedged request to
+                self.app.hedge_budget.refund()
+            # ran out of nodes, see if any stragglers will finish
+            any(pile)
+        # cancel the loser
+        for gt in list(pool.coroutines_running):
+            gt.kill()
+        return hedged_nodes
+
     def _make_app_iter(self, req):
         """
         Returns an iterator over the contents of the source (via its read
@@ -1579,6 +2072,115 @@ class GetOrHeadHandler(object):
             (add_content_type(pi) for pi in parts_iter),
             boundary, is_multipart, self.logger)
 
+    def _can_zero_copy(self, req, source):
+        """
+        Check whether the body of the source can be spliced straight from the
+        backend socket to the client socket. That needs a whole object of
+        known length, plaintext sockets at both ends, and no middleware that
+        wants to see or change the body, so ranges, subrequests and encrypted,
+        large or symlinked objects all take the usual path.
+
+        :param req: incoming request object
+        :param source: the httplib.Response object from the backend
+        :returns: True if the body can be spliced, False otherwise
+        """
+        if six.PY2 or not (self.zero_copy and self.app.zero_copy_pipe_size):
+            return False
+        if source.status != HTTP_OK or self.backend_headers.get('Range'):
+            return False
+        if req.environ.get('swift.source') or \
+                req.environ.get('wsgi.url_scheme') != 'http':
+            return False
+        try:
+            if req.environ['wsgi.input'].get_socket() is None:
+                return False
+        except (KeyError, AttributeError):
+            return False
+        if getattr(source, '_real_socket', None) is None or \
+                getattr(source, '_readline_buffer', None) or \
+                source.chunked or not hasattr(source.fp, 'peek'):
+            return False
+        headers = HeaderKeyDict(source.getheaders())
+        if any(header in headers for header in ZERO_COPY_EXCLUDED_HEADERS) or \
+                any(header.lower().startswith(ZERO_COPY_EXCLUDED_PREFIX)
+                    for header in headers):
+            return False
+        try:
+            content_length = int(headers['Content-Length'])
+        except (KeyError, ValueError):
+            return False
+        return content_length >= self.zero_copy_min_size
+
+    def _make_zero_copy_app_iter(self, req):
+        """
+        Returns an iterator that splices the body of the source from the
+        backend socket to the client socket through a pipe, so it is never
+        copied into userspace. Whatever was buffered along with the response
+        headers is yielded as usual, which also sends the headers to the
+        client; after that only :class:`SplicedBytes` are yielded. Unlike
+        :meth:`_make_app_iter` this can't resume from another node, so a
+        failure mid-way cuts the response short.
+
+        :param req: incoming request object
+        """
+        source = self.source
+        bytes_left = int(source.getheader('Content-Length'))
+        backend_fd = source._real_socket.fileno()
+        client_fd = req.environ['wsgi.input'].get_socket().fileno()
+        rpipe, wpipe = os.pipe()
+        try:
+            pipe_size = fcntl.fcntl(rpipe, F_SETPIPE_SZ,
+                                    self.app.zero_copy_pipe_size)
+            with WatchdogTimeout(self.app.watchdog, self.node_timeout,
+                                 ChunkReadTimeout):
+                chunk = source.read(len(source.fp.peek(1)[:bytes_left]))
+            while chunk:
+                bytes_left -= len(chunk)
+                with WatchdogTimeout(self.app.watchdog,
+                                     self.app.client_timeout,
+                                     ChunkWriteTimeout):
+                    self.bytes_used_from_backend += len(chunk)
+                    yield chunk
+                if not bytes_left:
+                    break
+                with WatchdogTimeout(self.app.watchdog, self.node_timeout,
+                                     ChunkReadTimeout):
+                    in_pipe = splice_from_socket(
+                        backend_fd, wpipe, min(bytes_left, pipe_size))
+                source.length -= in_pipe
+                with WatchdogTimeout(self.app.watchdog,
+                                     self.app.client_timeout,
+                                     ChunkWriteTimeout):
+                    splice_to_socket(rpipe, client_fd, in_pipe)
+                chunk = SplicedBytes(in_pipe)
+            if bytes_left:
+                raise ShortReadError(
+                    "Too few bytes; read %d, expecting %d" % (
+                        self.bytes_used_from_backend,
+                        self.bytes_used_from_backend + bytes_left))
+        except ChunkReadTimeout:
+            self.app.exception_occurred(self.node, 'Object',
+                                        'Trying to read during GET')
+            raise
+        except ChunkWriteTimeout:
+            self.logger.info(
+                'Client did not read from proxy within %ss',
+                self.app.client_timeout)
+            self.logger.increment('client_timeouts')
+        except GeneratorExit:
+            self.logger.info('Client disconnected on read of %r', self.path)
+            raise
+        except Exception:
+            self.logger.exception('Trying to send to client')
+            raise
+        finally:
+            os.close(rpipe)
+            os.close(wpipe)
+            # Close-out the connection as best as possible.
+            if getattr(source, 'swift_conn', None) and \
+                    not release_swift_conn(source):
+                close_swift_conn(source)
+
     def get_working_response(self, req):
         source, node = self._get_source_and_node()
         res = None
@@ -1590,9 +2192,17 @@ class GetOrHeadHandler(object):
                     source.status in (HTTP_OK, HTTP_PARTIAL_CONTENT):
                 self.source = source
                 self.node = node
-                res.app_iter = self._make_app_iter(req)
+                if self._can_zero_copy(req, source):
+                    # the headers must be out before any of the body is
+                    # spliced, so eventlet mustn't hold back the first chunk
+                    req.environ['eventlet.minimum_write_chunk_size'] = 0
+                    res.app_iter = self._make_zero_copy_app_iter(req)
+                else:
+                    res.app_iter = self._make_app_iter(req)
                 # See NOTE: swift_conn at top of file about this.
                 res.swift_conn = source.swift_conn
+            else:
+                release_swift_conn(source)
             if not res.environ:
                 res.environ = {}
             res.environ['swift_x_timestamp'] = source.getheader('x-timestamp')
@@ -1935,7 +2545,8 @@ class Controller(object):
                 ip, port = get_ip_port(node, headers)
                 start_node_timing = time.time()
                 with ConnectionTimeout(self.app.conn_timeout):
-                    conn = http_connect(
+                    conn = pooled_http_connect(
+                        self.app.backend_connection_pool,
                         ip, port, node['device'], part, method, path,
                         headers=headers, query_string=query)
                     conn.node = node
@@ -1948,8 +2559,12 @@ class Controller(object):
                     if (self.app.check_response(node, self.server_type, resp,
                                                 method, path)
                             and not is_informational(resp.status)):
+                        body = resp.read()
+                        # See NOTE: swift_conn at top of file about this.
+                        resp.swift_conn = conn
+                        release_swift_conn(resp)
                         return resp.status, resp.reason, resp.getheaders(), \
-                            resp.read()
+                            body
 
             except (Exception, Timeout):
                 self.app.exception_occurred(
@@ -2163,7 +2778,8 @@ class Controller(object):
             return False
 
     def GETorHEAD_base(self, req, server_type, node_iter, partition, path,
-                       concurrency=1, policy=None, client_chunk_size=None):
+                       concurrency=1, policy=None, client_chunk_size=None,
+                       hedged=False, zero_copy=False):
         """
         Base handler for HTTP GET or HEAD requests.
 
@@ -2175,6 +2791,11 @@ class Controller(object):
         :param concurrency: number of requests to run concurrently
         :param policy: the policy instance, or None if Account or Container
         :param client_chunk_size: chunk size for response body iterator
+        :param hedged: if True, and concurrency is 1, make a hedged request to
+                       another node when the first is slow to respond
+        :param zero_copy: if True, splice the body of a large enough object
+                          from the backend socket to the client socket when
+                          nothing else needs to see it
         :returns: swob.Response object
         """
         backend_headers = self.generate_request_headers(
@@ -2184,7 +2805,8 @@ class Controller(object):
                                    partition, path, backend_headers,
                                    concurrency, policy=policy,
                                    client_chunk_size=client_chunk_size,
-                                   logger=self.logger)
+                                   logger=self.logger, hedged=hedged,
+                                   zero_copy=zero_copy)
         res = handler.get_working_response(req)
 
         if not res:
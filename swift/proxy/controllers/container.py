@@ -16,6 +16,7 @@
 import json
 import random
 
+from eventlet import GreenPool
 import six
 from six.moves.urllib.parse import unquote
 
@@ -30,7 +31,7 @@ from swift.common.request_helpers import get_sys_meta_prefix, get_param, \
 from swift.proxy.controllers.base import Controller, delay_denial, \
     cors_validation, set_info_cache, clear_info_cache, _get_info_from_caches, \
     record_cache_op_metrics, get_cache_key, headers_from_container_info, \
-    update_headers
+    update_headers, single_flight_from_app, prefetch_info
 from swift.common.storage_policy import POLICIES
 from swift.common.swob import HTTPBadRequest, HTTPForbidden, HTTPNotFound, \
     HTTPServiceUnavailable, str_to_wsgi, wsgi_to_str, Response
@@ -329,6 +330,42 @@ class ContainerController(Controller):
             record_cache_op_metrics(
                 self.logger, 'shard_listing', cache_state, resp)
 
+    def _get_shard_ranges_coalesced(self, req, headers, cache_state,
+                                    single_flight):
+        """
+        Get shard ranges from the backend, unless a concurrent request is
+        already doing so, in which case wait for it and then look for the
+        shard ranges that it cached.
+
+        :param req: an instance of ``swob.Request``.
+        :param headers: the container's headers, from its info.
+        :param cache_state: the state of the cache lookup that missed.
+        :param single_flight: an instance of
+            :class:`~swift.proxy.controllers.base.SingleFlight`.
+        :return: a tuple of (an instance of ``swob.Response``, cache state).
+        """
+        cache_key = get_cache_key(
+            self.account_name, self.container_name, shard='listing')
+
+        def fetch():
+            return self._get_shard_ranges_from_backend(req), cache_state
+
+        def recheck():
+            resp_and_state = self._get_shard_ranges_from_cache(req, headers)
+            return resp_and_state if resp_and_state[0] else None
+
+        resp_and_state, coalesced = single_flight.run(
+            cache_key, 'shard_listing', fetch,
+            memcache=cache_from_env(req.environ, True), recheck=recheck)
+        if not coalesced:
+            return resp_and_state
+        # the response belongs to the other request, but the shard ranges it
+        # got should now be cached
+        resp, cache_state = self._get_shard_ranges_from_cache(req, headers)
+        if resp:
+            return resp, cache_state
+        return self._get_shard_ranges_from_backend(req), cache_state
+
     def _GET_using_cache(self, req, info):
         # It may be possible to fulfil the request from cache: we only reach
         # here if request record_type is 'shard' or 'auto', so if the container
@@ -346,6 +383,10 @@ class ContainerController(Controller):
             resp, cache_state = self._get_shard_ranges_from_cache(req, headers)
             if resp:
                 return resp, cache_state
+            single_flight = single_flight_from_app(self.app)
+            if single_flight is not None:
+                return self._get_shard_ranges_coalesced(
+                    req, headers, cache_state, single_flight)
         else:
             # container metadata didn't support a cache lookup, this could be
             # the case that container metadata was not in cache and we don't
@@ -357,6 +398,12 @@ class ContainerController(Controller):
 
     def GETorHEAD(self, req):
         """Handler for HTTP GET/HEAD requests."""
+        if (req.method == 'GET'
+                and not req.headers.get('X-Backend-Record-Type')):
+            # a client listing will need both the account info and the
+            # container info, so look them up in memcache together
+            prefetch_info(self.app, req.environ, self.account_name,
+                          self.container_name)
         ai = self.account_info(self.account_name, req)
         auto_account = self.account_name.startswith(
             self.app.auto_create_account_prefix)
@@ -501,42 +548,58 @@ class ContainerController(Controller):
         end_marker = wsgi_to_str(params.get('end_marker'))
         prefix = wsgi_to_str(params.get('prefix'))
 
-        limit = req_limit
-        all_resp_status = []
-        for i, shard_range in enumerate(shard_ranges):
-            params['limit'] = limit
+        def listed_name(obj):
+            name = obj.get('name', obj.get('subdir', u''))
+            if six.PY2:
+                name = name.encode('utf8')
+            return name
+
+        def last_listed():
+            # the name of the last object or subdir listed so far, if any,
+            # and whether it was a subdir
+            if not objects:
+                return None, False
+            return listed_name(objects[-1]), 'subdir' in objects[-1]
+
+        def excluded_by_prefix(shard_range):
+            if not prefix:
+                return False
+            if prefix > shard_range:
+                return True
+            try:
+                just_past = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            except ValueError:
+                return False
+            return just_past < shard_range
+
+        def make_shard_params(shard_range, limit):
+            shard_params = dict(params, limit=limit)
             # Always set marker to ensure that object names less than or equal
             # to those already in the listing are not fetched; if the listing
             # is empty then the original request marker, if any, is used. This
             # allows misplaced objects below the expected shard range to be
             # included in the listing.
-            last_name = ''
-            last_name_was_subdir = False
-            if objects:
-                last_name_was_subdir = 'subdir' in objects[-1]
-                if last_name_was_subdir:
-                    last_name = objects[-1]['subdir']
-                else:
-                    last_name = objects[-1]['name']
-
-                if six.PY2:
-                    last_name = last_name.encode('utf8')
-                params['marker'] = str_to_wsgi(last_name)
+            last_name = last_listed()[0]
+            if last_name is not None:
+                shard_params['marker'] = str_to_wsgi(last_name)
             elif marker:
-                params['marker'] = str_to_wsgi(marker)
+                shard_params['marker'] = str_to_wsgi(marker)
             else:
-                params['marker'] = ''
+                shard_params['marker'] = ''
             # Always set end_marker to ensure that misplaced objects beyond the
             # expected shard range are not fetched. This prevents a misplaced
             # object obscuring correctly placed objects in the next shard
             # range.
             if end_marker and end_marker in shard_range:
-                params['end_marker'] = str_to_wsgi(end_marker)
+                shard_params['end_marker'] = str_to_wsgi(end_marker)
             elif reverse:
-                params['end_marker'] = str_to_wsgi(shard_range.lower_str)
+                shard_params['end_marker'] = str_to_wsgi(shard_range.lower_str)
             else:
-                params['end_marker'] = str_to_wsgi(shard_range.end_marker)
+                shard_params['end_marker'] = str_to_wsgi(
+                    shard_range.end_marker)
+            return shard_params
 
+        def make_shard_headers(shard_range):
             headers = {}
             if ((shard_range.account, shard_range.container) in
                     shard_listing_history):
@@ -544,71 +607,114 @@ class ContainerController(Controller):
                 headers['X-Backend-Record-Type'] = 'object'
             if config_true_value(req.headers.get('x-newest', False)):
                 headers['X-Newest'] = 'true'
+            return headers
 
-            if prefix:
-                if prefix > shard_range:
-                    continue
-                try:
-                    just_past = prefix[:-1] + chr(ord(prefix[-1]) + 1)
-                except ValueError:
-                    pass
-                else:
-                    if just_past < shard_range:
-                        continue
-
-            if last_name_was_subdir and str(
-                shard_range.lower if reverse else shard_range.upper
-            ).startswith(last_name):
-                continue
-
+        def fetch_listing(i, shard_range, limit, spawn=None):
+            headers = make_shard_headers(shard_range)
+            shard_params = make_shard_params(shard_range, limit)
             self.logger.debug(
                 'Getting listing part %d from shard %s %s with %s',
                 i, shard_range, shard_range.name, headers)
-            objs, shard_resp = self._get_container_listing(
-                req, shard_range.account, shard_range.container,
-                headers=headers, params=params)
-            all_resp_status.append(shard_resp.status_int)
-
-            sharding_state = shard_resp.headers.get('x-backend-sharding-state',
-                                                    'unknown')
-
-            if objs is None:
-                # give up if any non-success response from shard containers
-                self.logger.error(
-                    'Aborting listing from shards due to bad response: %r'
-                    % all_resp_status)
-                return HTTPServiceUnavailable(request=req)
-            shard_policy = shard_resp.headers.get(
-                'X-Backend-Record-Storage-Policy-Index',
-                shard_resp.headers[policy_key]
-            )
-            if shard_policy != req.headers[policy_key]:
-                self.logger.error(
-                    'Aborting listing from shards due to bad shard policy '
-                    'index: %s (expected %s)',
-                    shard_policy, req.headers[policy_key])
-                return HTTPServiceUnavailable(request=req)
-            self.logger.debug(
-                'Found %d objects in shard (state=%s), total = %d',
-                len(objs), sharding_state, len(objs) + len(objects))
-
-            if not objs:
-                # tolerate empty shard containers
-                continue
+            if spawn:
+                return shard_params, spawn(
+                    self._get_shard_listing, req, shard_range, headers,
+                    shard_params, self.logger.thread_locals)
+            return shard_params, self._get_shard_listing(
+                req, shard_range, headers, shard_params)
+
+        # When shard_listing_concurrency > 1 the listings of the next few
+        # shards are fetched while waiting for the current one. Until the
+        # current listing is known their markers may be too low, so they may
+        # include names that have already been listed, which are dropped.
+        concurrency = self.app.shard_listing_concurrency
+        pool = GreenPool(concurrency) if concurrency > 1 else None
+        prefetched = {}
+        shards = [(i, shard_range)
+                  for i, shard_range in enumerate(shard_ranges)
+                  if not excluded_by_prefix(shard_range)]
+        next_prefetch = 0
+        limit = req_limit
+        all_resp_status = []
+        try:
+            for pos, (i, shard_range) in enumerate(shards):
+                last_name, last_name_was_subdir = last_listed()
+                if last_name_was_subdir and str(
+                    shard_range.lower if reverse else shard_range.upper
+                ).startswith(last_name):
+                    continue
 
-            objects.extend(objs)
-            limit -= len(objs)
+                if pool is None:
+                    _junk, (objs, shard_resp) = fetch_listing(
+                        i, shard_range, limit)
+                else:
+                    next_prefetch = max(next_prefetch, pos)
+                    while next_prefetch < min(len(shards), pos + concurrency):
+                        prefetched[next_prefetch] = fetch_listing(
+                            shards[next_prefetch][0], shards[next_prefetch][1],
+                            limit, spawn=pool.spawn)
+                        next_prefetch += 1
+                    shard_params, fetch = prefetched.pop(pos)
+                    objs, shard_resp = fetch.wait()
+                    if objs and last_name is not None and \
+                            shard_params['marker'] != make_shard_params(
+                                shard_range, limit)['marker']:
+                        listed = len(objs)
+                        objs = [obj for obj in objs if (
+                            listed_name(obj) < last_name if reverse
+                            else listed_name(obj) > last_name)]
+                        if len(objs) < limit and \
+                                listed >= shard_params['limit']:
+                            # the listing may have been cut short by names
+                            # that were dropped, so fetch it again
+                            self.logger.increment('shard_listing.refetch')
+                            _junk, (objs, shard_resp) = fetch_listing(
+                                i, shard_range, limit)
+                    if objs:
+                        objs = objs[:limit]
+                all_resp_status.append(shard_resp.status_int)
+
+                sharding_state = shard_resp.headers.get(
+                    'x-backend-sharding-state', 'unknown')
+
+                if objs is None:
+                    # give up if any non-success response from shard
+                    # containers
+                    self.logger.error(
+                        'Aborting listing from shards due to bad response: %r'
+                        % all_resp_status)
+                    return HTTPServiceUnavailable(request=req)
+                shard_policy = shard_resp.headers.get(
+                    'X-Backend-Record-Storage-Policy-Index',
+                    shard_resp.headers[policy_key]
+                )
+                if shard_policy != req.headers[policy_key]:
+                    self.logger.error(
+                        'Aborting listing from shards due to bad shard policy '
+                        'index: %s (expected %s)',
+                        shard_policy, req.headers[policy_key])
+                    return HTTPServiceUnavailable(request=req)
+                self.logger.debug(
+                    'Found %d objects in shard (state=%s), total = %d',
+                    len(objs), sharding_state, len(objs) + len(objects))
+
+                if not objs:
+                    # tolerate empty shard containers
+                    continue
 
-            if limit <= 0:
-                break
-            last_name = objects[-1].get('name',
-                                        objects[-1].get('subdir', u''))
-            if six.PY2:
-                last_name = last_name.encode('utf8')
-            if end_marker and reverse and end_marker >= last_name:
-                break
-            if end_marker and not reverse and end_marker <= last_name:
-                break
+                objects.extend(objs)
+                limit -= len(objs)
+
+                if limit <= 0:
+                    break
+                last_name = last_listed()[0]
+                if end_marker and reverse and end_marker >= last_name:
+                    break
+                if end_marker and not reverse and end_marker <= last_name:
+                    break
+        finally:
+            # stop fetching listings that are no longer needed
+            for _junk, fetch in prefetched.values():
+                fetch.kill()
 
         resp.body = json.dumps(objects).encode('ascii')
         constrained = any(req.params.get(constraint) for constraint in (
@@ -626,6 +732,14 @@ class ContainerController(Controller):
                 [o['bytes'] for o in objects])
         return resp
 
+    def _get_shard_listing(self, req, shard_range, headers, params,
+                           logger_thread_locals=None):
+        if logger_thread_locals is not None:
+            self.logger.thread_locals = logger_thread_locals
+        return self._get_container_listing(
+            req, shard_range.account, shard_range.container,
+            headers=headers, params=params)
+
     @public
     @delay_denial
     @cors_validation
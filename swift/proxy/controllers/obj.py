@@ -69,7 +69,8 @@ from swift.common.storage_policy import (POLICIES, REPL_POLICY, EC_POLICY,
                                          ECDriverError, PolicyError)
 from swift.proxy.controllers.base import Controller, delay_denial, \
     cors_validation, update_headers, bytes_to_skip, close_swift_conn, \
-    ByteCountEnforcer, record_cache_op_metrics, get_cache_key
+    ByteCountEnforcer, record_cache_op_metrics, get_cache_key, \
+    single_flight_from_app
 from swift.common.swob import HTTPAccepted, HTTPBadRequest, HTTPNotFound, \
     HTTPPreconditionFailed, HTTPRequestEntityTooLarge, HTTPRequestTimeout, \
     HTTPServerError, HTTPServiceUnavailable, HTTPClientDisconnect, \
@@ -376,15 +377,52 @@ class BaseObjectController(Controller):
                 name=namespace.name, timestamp=0, lower=namespace.lower,
                 upper=namespace.upper)
         else:
-            # pull full set of updating shard ranges from backend
+            cached_namespaces, shard_ranges, response = \
+                self._get_updating_namespaces_from_backend(
+                    req, account, container, cache_key, memcache)
+            if cached_namespaces:
+                infocache[cache_key] = cached_namespaces
+            if shard_ranges is not None or not cached_namespaces:
+                update_shard = find_namespace(obj, shard_ranges or [])
+            else:
+                # another worker cached the namespaces for us
+                namespace = cached_namespaces.get_namespace(obj)
+                update_shard = ShardRange(
+                    name=namespace.name, timestamp=0, lower=namespace.lower,
+                    upper=namespace.upper)
+        record_cache_op_metrics(
+            self.logger, 'shard_updating', cache_state, response)
+        return update_shard
+
+    def _get_updating_namespaces_from_backend(
+            self, req, account, container, cache_key, memcache):
+        """
+        Fetch the full set of updating shard ranges for the given root
+        container from the backend and cache their namespaces, unless a
+        concurrent request is already doing so, in which case share its
+        result.
+
+        :param req: original Request instance.
+        :param account: account from which shard ranges should be fetched.
+        :param container: container from which shard ranges should be fetched.
+        :param cache_key: the cache key for both infocache and memcache.
+        :param memcache: an instance of a memcache client,
+                         :class:`swift.common.memcached.MemcacheRing`.
+        :return: a tuple of (an instance of NamespaceBoundList, a list of
+            instances of :class:`swift.common.utils.ShardRange`, the backend
+            response); the shard ranges and response are None if the
+            namespaces were found in memcache after waiting for another
+            worker, and the response is None if it belongs to another request.
+        """
+        def fetch():
             shard_ranges, response = self._get_shard_ranges(
                 req, account, container, states='updating')
+            cached_namespaces = None
             if shard_ranges:
                 # only store the list of namespace lower bounds and names into
                 # infocache and memcache.
                 cached_namespaces = NamespaceBoundList.parse(
                     shard_ranges)
-                infocache[cache_key] = cached_namespaces
                 if memcache:
                     self.logger.info(
                         'Caching updating shards for %s (%d shards)',
@@ -392,10 +430,25 @@ class BaseObjectController(Controller):
                     memcache.set(
                         cache_key, cached_namespaces.bounds,
                         time=self.app.recheck_updating_shard_ranges)
-            update_shard = find_namespace(obj, shard_ranges or [])
-        record_cache_op_metrics(
-            self.logger, 'shard_updating', cache_state, response)
-        return update_shard
+            return cached_namespaces, shard_ranges, response
+
+        def recheck():
+            cached_namespaces = self._get_cached_updating_namespaces(
+                {}, memcache, cache_key)[0]
+            if cached_namespaces:
+                return cached_namespaces, None, None
+            return None
+
+        single_flight = single_flight_from_app(self.app)
+        if single_flight is None:
+            return fetch()
+        result, coalesced = single_flight.run(
+            cache_key, 'shard_updating', fetch, memcache=memcache,
+            recheck=recheck)
+        if coalesced:
+            # the backend response was recorded by the other request
+            return result[0], result[1], None
+        return result
 
     def _get_update_target(self, req, container_info):
         # find the sharded container to which we'll send the update
@@ -736,20 +789,29 @@ class BaseObjectController(Controller):
         """
         self.logger.thread_locals = logger_thread_locals
         for node in nodes:
+            start_time = time.time()
+            self.app.node_request_started(node)
             try:
                 putter = self._make_putter(node, part, req, headers)
                 self.app.set_node_timing(node, putter.connect_duration)
+                self.app.node_request_finished(node, time.time() - start_time)
                 return putter
             except InsufficientStorage:
+                self.app.node_request_finished(node, time.time() - start_time)
                 self.app.error_limit(node, 'ERROR Insufficient Storage')
             except PutterConnectError as e:
+                self.app.node_request_finished(node, time.time() - start_time)
                 msg = 'ERROR %d Expect: 100-continue From Object Server'
                 self.app.error_occurred(node, msg % e.status)
             except (Exception, Timeout):
+                self.app.node_request_failed(node, self.app.node_timeout)
                 self.app.exception_occurred(
                     node, 'Object',
                     'Expect: 100-continue on %s' %
                     quote(req.swift_entity_path))
+            except BaseException:
+                self.app.node_request_finished(node)
+                raise
 
     def _get_put_connections(self, req, nodes, partition, outgoing_headers,
                              policy):
@@ -975,11 +1037,16 @@ class BaseObjectController(Controller):
 class ReplicatedObjectController(BaseObjectController):
 
     def _get_or_head_response(self, req, node_iter, partition, policy):
+        policy_options = self.app.get_policy_options(policy)
         concurrency = self.app.get_object_ring(policy.idx).replica_count \
-            if self.app.get_policy_options(policy).concurrent_gets else 1
+            if policy_options.concurrent_gets else 1
+        hedged = (policy_options.hedged_gets and req.method == 'GET' and
+                  concurrency == 1)
+        zero_copy = policy_options.zero_copy_gets and req.method == 'GET'
         resp = self.GETorHEAD_base(
             req, 'Object', node_iter, partition,
-            req.swift_entity_path, concurrency, policy)
+            req.swift_entity_path, concurrency, policy, hedged=hedged,
+            zero_copy=zero_copy)
         return resp
 
     def _make_putter(self, node, part, req, headers):
@@ -2827,6 +2894,8 @@ class ECFragGetter(object):
         ip, port = get_ip_port(node, req_headers)
         req_headers.update(self.header_provider())
         start_node_timing = time.time()
+        self.app.node_request_started(node)
+        conn = None
         try:
             with ConnectionTimeout(self.app.conn_timeout):
                 conn = http_connect(
@@ -2841,11 +2910,19 @@ class ECFragGetter(object):
                 # See NOTE: swift_conn at top of file about this.
                 possible_source.swift_conn = conn
         except (Exception, Timeout):
+            self.app.node_request_failed(node, node_timeout)
             self.app.exception_occurred(
                 node, 'Object',
                 'Trying to %(method)s %(path)s' %
                 {'method': self.req.method, 'path': self.req.path})
             return None
+        except BaseException:
+            # killed before we got a response; that's no latency sample
+            self.app.node_request_finished(node)
+            if conn is not None:
+                conn.close()
+            raise
+        self.app.node_request_finished(node, time.time() - start_node_timing)
 
         src_headers = dict(
             (k.lower(), v) for k, v in
@@ -15,6 +15,7 @@
 
 import mimetypes
 import os
+import re
 import socket
 
 from collections import defaultdict
@@ -31,19 +32,24 @@ from swift.common import constraints
 from swift.common.http import is_server_error, HTTP_INSUFFICIENT_STORAGE
 from swift.common.storage_policy import POLICIES
 from swift.common.ring import Ring
-from swift.common.error_limiter import ErrorLimiter
+from swift.common.bufferedhttp import BufferedHTTPConnectionPool
+from swift.common.error_limiter import ErrorLimiter, SharedErrorLimiter
+from swift.common.latency_tracker import LatencyTracker, RequestBudget
+from swift.common.splice import splice
 from swift.common.utils import Watchdog, get_logger, \
     get_remote_client, split_path, config_true_value, generate_trans_id, \
     affinity_key_function, affinity_locality_predicate, list_from_csv, \
     parse_prefixed_conf, config_auto_int_value, node_to_string, \
-    config_request_node_count_value, config_percent_value, cap_length
+    config_request_node_count_value, config_percent_value, cap_length, \
+    non_negative_int, non_negative_float, config_positive_int_value
 from swift.common.registry import register_swift_info
 from swift.common.constraints import check_utf8, valid_api_version
 from swift.proxy.controllers import AccountController, ContainerController, \
     ObjectControllerRouter, InfoController
 from swift.proxy.controllers.base import get_container_info, NodeIter, \
     DEFAULT_RECHECK_CONTAINER_EXISTENCE, DEFAULT_RECHECK_ACCOUNT_EXISTENCE, \
-    DEFAULT_RECHECK_UPDATING_SHARD_RANGES, DEFAULT_RECHECK_LISTING_SHARD_RANGES
+    DEFAULT_RECHECK_UPDATING_SHARD_RANGES, \
+    DEFAULT_RECHECK_LISTING_SHARD_RANGES, LocalInfoCache, SingleFlight
 from swift.common.swob import HTTPBadRequest, HTTPForbidden, \
     HTTPMethodNotAllowed, HTTPNotFound, HTTPPreconditionFailed, \
     HTTPServerError, HTTPException, Request, HTTPServiceUnavailable, \
@@ -92,7 +98,7 @@ def _label_for_policy(policy):
     return '(default)'
 
 
-VALID_SORTING_METHODS = ('shuffle', 'timing', 'affinity')
+VALID_SORTING_METHODS = ('shuffle', 'timing', 'affinity', 'adaptive')
 
 
 class ProxyOverrideOptions(object):
@@ -113,6 +119,14 @@ class ProxyOverrideOptions(object):
             raise ValueError(
                 'Invalid sorting_method value; must be one of %s, not %r' % (
                     ', '.join(VALID_SORTING_METHODS), self.sorting_method))
+        self.adaptive_sorting_choices = int(get(
+            'adaptive_sorting_choices', 2))
+        if self.adaptive_sorting_choices < 1:
+            raise ValueError(
+                'Invalid adaptive_sorting_choices value; must be at least 1, '
+                'not %r' % self.adaptive_sorting_choices)
+        self.adaptive_sorting_outstanding_weight = float(get(
+            'adaptive_sorting_outstanding_weight', 1.0))
 
         self.read_affinity = get('read_affinity', '')
         try:
@@ -157,12 +171,24 @@ class ProxyOverrideOptions(object):
             'concurrency_timeout', app.conn_timeout))
         self.concurrent_ec_extra_requests = int(get(
             'concurrent_ec_extra_requests', 0))
+        self.hedged_gets = config_true_value(get('hedged_gets', False))
+        self.hedged_gets_percentile = float(get(
+            'hedged_gets_percentile', 95))
+        if not 0 < self.hedged_gets_percentile <= 100:
+            raise ValueError(
+                'Invalid hedged_gets_percentile value; must be > 0 and '
+                '<= 100, not %r' % self.hedged_gets_percentile)
+        self.zero_copy_gets = config_true_value(get('zero_copy_gets', False))
+        self.zero_copy_gets_min_size = int(get(
+            'zero_copy_gets_min_size', 1048576))
 
     def __repr__(self):
         return '%s({}, {%s}, app)' % (
             self.__class__.__name__, ', '.join(
                 '%r: %r' % (k, getattr(self, k)) for k in (
                     'sorting_method',
+                    'adaptive_sorting_choices',
+                    'adaptive_sorting_outstanding_weight',
                     'read_affinity',
                     'write_affinity',
                     'write_affinity_node_count',
@@ -171,6 +197,10 @@ class ProxyOverrideOptions(object):
                     'concurrent_gets',
                     'concurrency_timeout',
                     'concurrent_ec_extra_requests',
+                    'hedged_gets',
+                    'hedged_gets_percentile',
+                    'zero_copy_gets',
+                    'zero_copy_gets_min_size',
                 )))
 
     def __eq__(self, other):
@@ -178,6 +208,8 @@ class ProxyOverrideOptions(object):
             return False
         return all(getattr(self, k) == getattr(other, k) for k in (
             'sorting_method',
+            'adaptive_sorting_choices',
+            'adaptive_sorting_outstanding_weight',
             'read_affinity',
             'write_affinity',
             'write_affinity_node_count',
@@ -186,6 +218,10 @@ class ProxyOverrideOptions(object):
             'concurrent_gets',
             'concurrency_timeout',
             'concurrent_ec_extra_requests',
+            'hedged_gets',
+            'hedged_gets_percentile',
+            'zero_copy_gets',
+            'zero_copy_gets_min_size',
         ))
 
 
@@ -213,6 +249,13 @@ class Application(object):
         self.recoverable_node_timeout = float(
             conf.get('recoverable_node_timeout', self.node_timeout))
         self.conn_timeout = float(conf.get('conn_timeout', 0.5))
+        if config_true_value(conf.get('backend_connection_pool', False)):
+            self.backend_connection_pool = BufferedHTTPConnectionPool(
+                int(conf.get('backend_connection_pool_size', 4)),
+                float(conf.get('backend_connection_idle_timeout', 10)),
+                logger=self.logger)
+        else:
+            self.backend_connection_pool = None
         self.client_timeout = float(conf.get('client_timeout', 60))
         self.object_chunk_size = int(conf.get('object_chunk_size', 65536))
         self.client_chunk_size = int(conf.get('client_chunk_size', 65536))
@@ -222,8 +265,15 @@ class Application(object):
             float(conf.get('error_suppression_interval', 60))
         error_suppression_limit = \
             int(conf.get('error_suppression_limit', 10))
-        self.error_limiter = ErrorLimiter(error_suppression_interval,
-                                          error_suppression_limit)
+        error_limiter_shared_file = conf.get('error_limiter_shared_file')
+        if error_limiter_shared_file:
+            self.error_limiter = SharedErrorLimiter(
+                error_suppression_interval, error_suppression_limit,
+                error_limiter_shared_file,
+                int(conf.get('error_limiter_shared_slots', 16384)))
+        else:
+            self.error_limiter = ErrorLimiter(error_suppression_interval,
+                                              error_suppression_limit)
         self.recheck_container_existence = \
             int(conf.get('recheck_container_existence',
                          DEFAULT_RECHECK_CONTAINER_EXISTENCE))
@@ -244,17 +294,44 @@ class Application(object):
         self.container_listing_shard_ranges_skip_cache = \
             config_percent_value(conf.get(
                 'container_listing_shard_ranges_skip_cache_pct', 0))
+        self.shard_listing_concurrency = config_positive_int_value(
+            conf.get('shard_listing_concurrency', 1))
         self.account_existence_skip_cache = config_percent_value(
             conf.get('account_existence_skip_cache_pct', 0))
+        local_info_cache_size = non_negative_int(
+            conf.get('local_info_cache_size', 0))
+        if local_info_cache_size:
+            self.local_info_cache = LocalInfoCache(
+                local_info_cache_size,
+                non_negative_float(conf.get('local_info_cache_ttl', 1.0)),
+                non_negative_float(
+                    conf.get('local_info_cache_negative_ttl', 0.1)),
+                self.logger)
+        else:
+            self.local_info_cache = None
+        if config_true_value(conf.get('coalesce_backend_requests', 'no')):
+            self.single_flight = SingleFlight(
+                self.logger,
+                non_negative_float(conf.get('coalesce_wait_timeout', 10.0)),
+                non_negative_float(conf.get('coalesce_lease_time', 0)),
+                non_negative_float(
+                    conf.get('coalesce_lease_poll_interval', 0.05)))
+        else:
+            self.single_flight = None
         self.allow_account_management = \
             config_true_value(conf.get('allow_account_management', 'no'))
-        self.container_ring = container_ring or Ring(swift_dir,
-                                                     ring_name='container')
-        self.account_ring = account_ring or Ring(swift_dir,
-                                                 ring_name='account')
+        self.background_ring_reload = config_true_value(
+            conf.get('background_ring_reload', 'no'))
+        self.container_ring = container_ring or Ring(
+            swift_dir, ring_name='container',
+            background_reload=self.background_ring_reload)
+        self.account_ring = account_ring or Ring(
+            swift_dir, ring_name='account',
+            background_reload=self.background_ring_reload)
         # ensure rings are loaded for all configured storage policies
         for policy in POLICIES:
-            policy.load_ring(swift_dir)
+            policy.load_ring(swift_dir,
+                             background_reload=self.background_ring_reload)
         self.obj_controller_router = ObjectControllerRouter()
         mimetypes.init(mimetypes.knownfiles +
                        [os.path.join(swift_dir, 'mime.types')])
@@ -350,6 +427,29 @@ class Application(object):
         self._override_options = self._load_per_policy_config(conf)
         self.sorts_by_timing = any(pc.sorting_method == 'timing'
                                    for pc in self._override_options.values())
+        self.sorts_adaptively = any(pc.sorting_method == 'adaptive'
+                                    for pc in self._override_options.values())
+        self.hedges_gets = any(pc.hedged_gets
+                               for pc in self._override_options.values())
+        self.hedge_budget = RequestBudget(config_percent_value(
+            conf.get('hedged_gets_budget', 5)))
+        self.zero_copy_pipe_size = None
+        if any(pc.zero_copy_gets for pc in self._override_options.values()):
+            # If the operator wants zero-copy with splice() but we don't have
+            # the requisite kernel support, complain so they can go fix it.
+            if not splice.available:
+                self.logger.warning(
+                    "Use of splice() requested (config says "
+                    "\"zero_copy_gets = true\"), but the system does not "
+                    "support it. splice() will not be used.")
+            else:
+                with open('/proc/sys/fs/pipe-max-size') as f:
+                    max_pipe_size = int(f.read())
+                self.zero_copy_pipe_size = min(max_pipe_size,
+                                               self.object_chunk_size)
+        self.node_latencies = LatencyTracker(
+            conf.get('adaptive_sorting_decay', 0.2), self.timing_expiry,
+            conf.get('adaptive_sorting_report_interval', 10))
 
         register_swift_info(
             version=swift_version,
@@ -558,6 +658,8 @@ class Application(object):
                     req.host.split(':')[0] in self.deny_host_headers:
                 return HTTPForbidden(request=req, body='Invalid host header')
 
+            if self.local_info_cache is not None:
+                req.environ['swift.local_info_cache'] = self.local_info_cache
             controller = controller(self, **path_parts)
             if 'swift.trans_id' not in req.environ:
                 # if this wasn't set by an earlier middleware, set it now
@@ -620,7 +722,9 @@ class Application(object):
         Sorts nodes in-place (and returns the sorted list) according to
         the configured strategy. The default "sorting" is to randomly
         shuffle the nodes. If the "timing" strategy is chosen, the nodes
-        are sorted according to the stored timing data.
+        are sorted according to the stored timing data. If the "adaptive"
+        strategy is chosen, the nodes are ranked by power-of-two-choices over
+        the moving average latency and outstanding requests of each device.
 
         :param nodes: a list of nodes
         :param policy: an instance of :class:`BaseStoragePolicy`
@@ -639,6 +743,10 @@ class Application(object):
             nodes.sort(key=key_func)
         elif policy_options.sorting_method == 'affinity':
             nodes.sort(key=policy_options.read_affinity_sort_key)
+        elif policy_options.sorting_method == 'adaptive':
+            self.node_latencies.sort(
+                nodes, policy_options.adaptive_sorting_choices,
+                policy_options.adaptive_sorting_outstanding_weight)
         return nodes
 
     def set_node_timing(self, node, timing):
@@ -648,6 +756,54 @@ class Application(object):
         timing = round(timing, 3)  # sort timings to the millisecond
         self.node_timings[node['ip']] = (timing, now + self.timing_expiry)
 
+    def node_request_started(self, node):
+        """
+        Note that a backend request to ``node`` has started, for the adaptive
+        sorting method and hedged GETs.
+
+        :param node: dictionary of the node
+        """
+        if self.sorts_adaptively or self.hedges_gets:
+            self.node_latencies.started(node)
+
+    def node_request_finished(self, node, latency=None):
+        """
+        Note that a backend request to ``node`` has got a response after
+        ``latency`` seconds, for the adaptive sorting method and hedged GETs,
+        and emit the node's score as a gauge if one is due.
+
+        :param node: dictionary of the node
+        :param latency: seconds from the start of the request until its
+            response headers were received, or None if the request was
+            abandoned before then
+        """
+        if not (self.sorts_adaptively or self.hedges_gets):
+            return
+        self.node_latencies.finished(node, latency)
+        self._report_node_score(node)
+
+    def node_request_failed(self, node, penalty):
+        """
+        Note that a backend request to ``node`` has failed without a response,
+        for the adaptive sorting method and hedged GETs, and emit the node's
+        score as a gauge if one is due.
+
+        :param node: dictionary of the node
+        :param penalty: seconds of latency to count against the node for the
+            failure, usually the request's timeout
+        """
+        if not (self.sorts_adaptively or self.hedges_gets):
+            return
+        self.node_latencies.failed(node, penalty)
+        self._report_node_score(node)
+
+    def _report_node_score(self, node):
+        if self.node_latencies.report_due(node):
+            self.logger.gauge(
+                'adaptive_sorting.%s.score' % re.sub(
+                    r'[^\w-]+', '_', node_to_string(node)),
+                round(self.node_latencies.score(node) * 1000, 3))
+
     def error_limited(self, node):
         """
         Check if the node is currently error limited.
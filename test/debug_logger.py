@@ -127,6 +127,7 @@ class FakeLogger(logging.Logger, CaptureLog):
     decrement = _store_in('decrement')
     timing = _store_in('timing')
     timing_since = _store_in('timing_since')
+    gauge = _store_in('gauge')
     transfer_rate = _store_in('transfer_rate')
     set_statsd_prefix = _store_in('set_statsd_prefix')
 
@@ -225,6 +226,7 @@ class DebugLogAdapter(utils.LogAdapter):
     decrement = _send_to_logger('decrement')
     timing = _send_to_logger('timing')
     timing_since = _send_to_logger('timing_since')
+    gauge = _send_to_logger('gauge')
     transfer_rate = _send_to_logger('transfer_rate')
     set_statsd_prefix = _send_to_logger('set_statsd_prefix')
 
@@ -631,6 +631,29 @@ def quiet_eventlet_exceptions():
         eventlet_debug.hub_exceptions(orig_state)
 
 
+class FakeProcessPool(object):
+    """
+    Stands in for a ``multiprocessing.Pool``, calling mapped functions in
+    this process; a real pool can't be used in a process that eventlet has
+    monkey-patched.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes
+        self.mapped = []
+
+    def map(self, func, iterable):
+        iterable = list(iterable)
+        self.mapped.append(iterable)
+        return [func(item) for item in iterable]
+
+    def terminate(self):
+        pass
+
+    def join(self):
+        pass
+
+
 @contextmanager
 def mock_check_drive(isdir=False, ismount=False):
     """
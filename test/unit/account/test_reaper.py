@@ -454,6 +454,43 @@ class TestReaper(unittest.TestCase):
                 self.assertEqual(call_args, expected)
         self.assertEqual(r.stats_objects_deleted, policy.object_ring.replicas)
 
+    @patch('swift.account.reaper.Ring',
+           lambda *args, **kwargs: unit.FakeRing())
+    def test_reap_container_looks_up_objects_in_bulk(self):
+        policy = random.choice(list(POLICIES))
+        r = self.init_reaper({}, fakelogger=True)
+        ring = r.get_object_ring(policy.idx)
+        with patch.multiple('swift.account.reaper',
+                            direct_get_container=DEFAULT,
+                            direct_delete_object=DEFAULT,
+                            direct_delete_container=DEFAULT) as mocks, \
+                patch.object(ring, 'get_nodes_bulk',
+                             wraps=ring.get_nodes_bulk) as mock_bulk, \
+                patch.object(ring, 'get_nodes',
+                             wraps=ring.get_nodes) as mock_get_nodes:
+            headers = {'X-Backend-Storage-Policy-Index': policy.idx}
+            obj_listing = [[{'name': 'o1'}, {'name': 'o2'}, {'name': 'o3'}]]
+
+            def fake_get_container(*args, **kwargs):
+                return headers, obj_listing.pop(0) if obj_listing else []
+
+            mocks['direct_get_container'].side_effect = fake_get_container
+            r.reap_container('a', 'partition', acc_nodes, 'c')
+
+        self.assertEqual([call([('a', 'c', 'o1'), ('a', 'c', 'o2'),
+                                ('a', 'c', 'o3')])],
+                         mock_bulk.call_args_list)
+        self.assertFalse(mock_get_nodes.called)
+        deleted = [args[4] for args, _kwargs in
+                   mocks['direct_delete_object'].call_args_list]
+        self.assertEqual(
+            sorted(['o1', 'o2', 'o3'] * policy.object_ring.replicas),
+            sorted(deleted))
+        for args, _kwargs in mocks['direct_delete_object'].call_args_list:
+            self.assertEqual(ring.get_part('a', 'c', args[4]), args[1])
+        self.assertEqual(r.stats_objects_deleted,
+                         3 * policy.object_ring.replicas)
+
     def test_reap_container_get_object_fail(self):
         r = self.init_reaper({}, fakelogger=True)
         self.get_fail = True
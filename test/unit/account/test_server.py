@@ -80,6 +80,24 @@ class TestAccountController(unittest.TestCase):
             'will be ignored in a future release.'
         ])
 
+    def test_db_connection_pool(self):
+        self.assertIsNone(self.controller.connection_pool)
+        self.controller = AccountController(
+            {'devices': self.testdir, 'mount_check': 'false',
+             'db_connection_pool_size': '4'},
+            logger=self.logger)
+        self.assertEqual(4, self.controller.connection_pool.max_size)
+        req = Request.blank('/sda1/p/a', method='PUT', headers={
+            'X-Timestamp': next(self.ts).internal})
+        self.assertEqual(201, req.get_response(self.controller).status_int)
+        self.logger.clear()
+        for i in range(3):
+            req = Request.blank('/sda1/p/a', method='HEAD')
+            self.assertEqual(204, req.get_response(self.controller).status_int)
+        counts = self.logger.get_increment_counts()
+        self.assertEqual(1, counts['db_connection_pool.miss'])
+        self.assertGreater(counts['db_connection_pool.hit'], 2)
+
     def test_OPTIONS(self):
         server_handler = AccountController(
             {'devices': self.testdir, 'mount_check': 'false'})
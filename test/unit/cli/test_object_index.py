@@ -0,0 +1,100 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from six.moves import cStringIO as StringIO
+
+from swift.cli import object_index
+from swift.common.storage_policy import StoragePolicy
+from swift.obj import diskfile
+
+from test.unit import patch_policies
+
+
+@patch_policies([StoragePolicy(0, 'zero', is_default=True),
+                 StoragePolicy(1, 'one')])
+class TestObjectIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.testdir = tempfile.mkdtemp()
+        self.devices = os.path.join(self.testdir, 'node')
+        self.part_path = os.path.join(self.devices, 'sda1', 'objects', '7')
+        self.hashes = ['5c1fdc1ffb12e5eaf84edc30d8b67aca',
+                       'fdfd184d39080020bc8b487f8a7beaca',
+                       'b0fe7af831cc7b1af5bf486b1c841df2']
+        for hash_ in self.hashes:
+            self._make_object(hash_)
+        os.makedirs(os.path.join(self.devices, 'sda1', 'objects-1'))
+
+    def tearDown(self):
+        shutil.rmtree(self.testdir, ignore_errors=True)
+
+    def _make_object(self, hash_):
+        hash_path = os.path.join(self.part_path, hash_[-3:], hash_)
+        os.makedirs(hash_path)
+        with open(os.path.join(hash_path, '1234567890.00000.ts'), 'w'):
+            pass
+
+    def _run(self, *args):
+        with mock.patch('sys.stdout', new=StringIO()) as stdout:
+            rv = object_index.main(list(args) + [
+                '--devices', self.devices, '--skip-mount-check'])
+        return rv, stdout.getvalue().splitlines()
+
+    def test_rebuild(self):
+        rv, lines = self._run('rebuild')
+        self.assertEqual(object_index.EXIT_SUCCESS, rv)
+        self.assertEqual(['Indexed %s' % self.part_path], lines)
+        self.assertEqual({
+            'aca': set(self.hashes[:2]),
+            'df2': set(self.hashes[2:]),
+        }, diskfile.read_hashes_index(self.part_path))
+
+    def test_rebuild_other_partition(self):
+        rv, lines = self._run('rebuild', '--partition', '8')
+        self.assertEqual(object_index.EXIT_SUCCESS, rv)
+        self.assertEqual([], lines)
+        self.assertIsNone(diskfile.read_hashes_index(self.part_path))
+
+    def test_verify(self):
+        rv, lines = self._run('verify')
+        self.assertEqual(object_index.EXIT_SUCCESS, rv)
+        self.assertEqual(['No usable index in %s' % self.part_path], lines)
+
+        self._run('rebuild')
+        rv, lines = self._run('verify', '--policy', '0')
+        self.assertEqual(object_index.EXIT_SUCCESS, rv)
+        self.assertEqual([], lines)
+
+        # objects that aren't indexed are a problem...
+        new_hash = '4a943bc72c2e647c4675923d58cf4ca5'
+        self._make_object(new_hash)
+        # ... but entries for objects that are gone aren't
+        shutil.rmtree(os.path.join(self.part_path, 'df2'))
+        rv, lines = self._run('verify')
+        self.assertEqual(object_index.EXIT_MISMATCH, rv)
+        self.assertEqual([
+            'Not indexed: %s' % os.path.join(
+                self.part_path, 'ca5', new_hash),
+            'Stale index entry: %s' % os.path.join(
+                self.part_path, 'df2', self.hashes[2]),
+        ], lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
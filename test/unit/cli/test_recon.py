@@ -399,6 +399,38 @@ aliases = %s
         for ring in ('account', 'container', 'object', 'object-1'):
             os.remove(os.path.join(self.swift_dir, "%s.ring.gz" % ring))
 
+    def test_get_ringmd5_v2_ring(self):
+        for ring_name in ('container.ring.gz', 'container.ring'):
+            open(os.path.join(self.swift_dir, ring_name), 'w').close()
+
+        empty_file_hash = 'd41d8cd98f00b204e9800998ecf8427e'
+        bad_file_hash = '00000000000000000000000000000000'
+        hosts = [("127.0.0.1", "8080")]
+        url = 'http://%s:%s/recon/ringmd5' % hosts[0]
+        self.recon_instance.server_type = 'container'
+        self.addCleanup(setattr, self.recon_instance, 'server_type', 'object')
+
+        def check(response):
+            stdout = StringIO()
+            with mock.patch('swift.cli.recon.Scout') as mock_scout, \
+                    mock.patch('sys.stdout', new=stdout):
+                mock_scout.return_value.scout.return_value = (
+                    url, response, 200, 0, 0)
+                self.recon_instance.get_ringmd5(hosts, self.swift_dir)
+            return stdout.getvalue()
+
+        output = check({'/etc/swift/container.ring.gz': empty_file_hash,
+                        '/etc/swift/container.ring': empty_file_hash})
+        self.assertIn('1/1 hosts matched', output)
+        self.assertNotIn('!!', output)
+
+        # a stale .ring file on the remote host is reported
+        output = check({'/etc/swift/container.ring.gz': empty_file_hash,
+                        '/etc/swift/container.ring': bad_file_hash})
+        self.assertIn('0/1 hosts matched', output)
+        self.assertIn('!! %s (container.ring => %s) doesn\'t match on disk '
+                      'md5sum' % (url, bad_file_hash), output)
+
     def test_quarantine_check(self):
         hosts = [('127.0.0.1', 6010), ('127.0.0.1', 6020),
                  ('127.0.0.1', 6030), ('127.0.0.1', 6040),
@@ -19,7 +19,7 @@ import json
 import mock
 from six import StringIO
 import unittest
-from test.unit import with_tempdir
+from test.unit import FakeProcessPool, with_tempdir
 
 from swift.cli.ring_builder_analyzer import parse_scenario, run_scenario
 
@@ -49,6 +49,29 @@ class TestRunScenario(unittest.TestCase):
         self.assertIn('Rebalance', fake_stdout.getvalue())
         self.assertTrue(os.path.exists(builder_path))
 
+    def test_processes(self):
+        scenario = {
+            'replicas': 3, 'part_power': 8, 'random_seed': 123, 'overload': 0,
+            'rounds': [[['add', 'r1z1-3.4.5.6:7/sda8', 100],
+                        ['add', 'r1z2-3.4.5.7:7/sda9', 200],
+                        ['add', 'r1z3-3.4.5.8:7/sda10', 200],
+                        ['add', 'r1z3-3.4.5.8:7/sda11', 200]],
+                       [['set_weight', 0, 150]],
+                       [['remove', 1]]]}
+
+        builders = []
+        for processes in (1, 2):
+            parsed = parse_scenario(json.dumps(scenario))
+            with mock.patch('sys.stdout', StringIO()), \
+                    mock.patch('swift.common.ring.builder._fork_pool',
+                               side_effect=FakeProcessPool) as mock_pool, \
+                    mock.patch('swift.common.ring.builder.patcher.'
+                               'is_monkey_patched', return_value=False):
+                builders.append(run_scenario(parsed, processes=processes))
+            self.assertEqual(processes > 1, mock_pool.called)
+        self.assertEqual(builders[0].get_ring().to_dict(),
+                         builders[1].get_ring().to_dict())
+
 
 class TestParseScenario(unittest.TestCase):
     def test_good(self):
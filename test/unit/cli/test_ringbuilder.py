@@ -30,10 +30,10 @@ import time
 from swift.cli import ringbuilder
 from swift.cli.ringbuilder import EXIT_SUCCESS, EXIT_WARNING, EXIT_ERROR
 from swift.common import exceptions
-from swift.common.ring import RingBuilder
+from swift.common.ring import Ring, RingBuilder, RingData
 from swift.common.ring.composite_builder import CompositeRingBuilder
 
-from test.unit import Timeout, write_stub_builder
+from test.unit import FakeProcessPool, Timeout, write_stub_builder
 
 try:
     from itertools import zip_longest
@@ -2495,6 +2495,27 @@ class TestCommands(unittest.TestCase, RunSwiftRingBuilderMixin):
         argv = ["", self.tmpfile, "rebalance", "--seed", "2"]
         self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
 
+    def test_rebalance_with_processes(self):
+        self.create_sample_ring()
+        argv = ["", self.tmpfile, "rebalance", "--seed", "2"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        expected = RingBuilder.load(self.tmpfile).get_ring().to_dict()
+
+        self.create_sample_ring()
+        argv = ["", self.tmpfile, "rebalance", "--seed", "2",
+                "--processes", "2"]
+        with mock.patch('swift.common.ring.builder._fork_pool',
+                        side_effect=FakeProcessPool) as mock_pool, \
+                mock.patch('swift.common.ring.builder.patcher.'
+                           'is_monkey_patched', return_value=False):
+            self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        self.assertTrue(mock_pool.called)
+        self.assertEqual(
+            [mock.call(2)] * len(mock_pool.call_args_list),
+            mock_pool.call_args_list)
+        self.assertEqual(
+            expected, RingBuilder.load(self.tmpfile).get_ring().to_dict())
+
     def test_rebalance_removed_devices(self):
         self.create_sample_ring()
         argvs = [
@@ -2546,6 +2567,60 @@ class TestCommands(unittest.TestCase, RunSwiftRingBuilderMixin):
         argv = ["", self.tmpfile, "write_ring"]
         self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
 
+    def test_write_ring_mmap(self):
+        self.create_sample_ring()
+        argv = ["", self.tmpfile, "rebalance"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        ring_file = self.tmpfile + '.ring.gz'
+        v2_ring_file = self.tmpfile + '.ring'
+        os.remove(ring_file)
+
+        argv = ["", self.tmpfile, "write_ring", "--mmap"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        self.assertTrue(os.path.exists(ring_file))
+        self.assertTrue(os.path.exists(v2_ring_file))
+        self.assertGreaterEqual(os.path.getmtime(v2_ring_file),
+                                os.path.getmtime(ring_file))
+        with open(v2_ring_file, 'rb') as fp:
+            self.assertEqual(b'R1NG\x00\x02', fp.read(6))
+        v1_data = RingData.load(ring_file)
+        v2_data = RingData.load(v2_ring_file)
+        self.assertEqual(v1_data.devs, v2_data.devs)
+        self.assertEqual(v1_data._part_shift, v2_data._part_shift)
+        self.assertEqual(v1_data._replica2part2dev_id,
+                         v2_data._replica2part2dev_id)
+
+    def test_rebalance_after_write_ring_mmap(self):
+        self.create_sample_ring()
+        argv = ["", self.tmpfile, "rebalance"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        argv = ["", self.tmpfile, "write_ring", "--mmap"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        ring_dir, ring_name = os.path.split(self.tmpfile)
+        v2_ring_file = self.tmpfile + '.ring'
+        ring = Ring(ring_dir, ring_name=ring_name)
+        self.assertEqual(v2_ring_file, ring.serialized_path)
+        self.assertEqual(4, len(ring.devs))
+
+        # a plain rebalance rewrites the .ring file as well as the .ring.gz
+        argv = ["", self.tmpfile, "add", "r4z4-127.0.0.5:6204/sde5", "100"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        argv = ["", self.tmpfile, "pretend_min_part_hours_passed"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        argv = ["", self.tmpfile, "rebalance"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        with open(v2_ring_file, 'rb') as fp:
+            self.assertEqual(b'R1NG\x00\x02', fp.read(6))
+
+        ring = Ring(ring_dir, ring_name=ring_name)
+        self.assertEqual(v2_ring_file, ring.serialized_path)
+        self.assertEqual(5, len(ring.devs))
+        self.assertTrue(any(4 in part2dev_id
+                            for part2dev_id in ring._replica2part2dev_id))
+        ring_data = RingData.load(self.tmpfile + '.ring.gz')
+        self.assertEqual(ring_data._replica2part2dev_id,
+                         ring._replica2part2dev_id)
+
     def test_write_empty_ring(self):
         ring = RingBuilder(6, 3, 1)
         ring.save(self.tmpfile)
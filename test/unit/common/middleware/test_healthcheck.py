@@ -13,11 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import os
 import shutil
 import tempfile
 import unittest
+from time import time
 
+from swift.common.error_limiter import SharedErrorTable
 from swift.common.swob import Request, Response
 from swift.common.middleware import healthcheck
 
@@ -75,6 +78,33 @@ class TestHealthCheck(unittest.TestCase):
         self.assertEqual(['503 Service Unavailable'], self.got_statuses)
         self.assertEqual(resp, [b'DISABLED BY FILE'])
 
+    def test_healthcheck_error_limited(self):
+        path = os.path.join(self.tempdir, 'error_limits')
+        req = Request.blank('/healthcheck/error_limited')
+        # without the option the request passes through
+        app = self.get_app(FakeApp(), {})
+        resp = app(req.environ, self.start_response)
+        self.assertEqual(['200 OK'], self.got_statuses)
+        self.assertEqual(resp, [b'FAKE APP'])
+
+        # the table does not exist yet
+        app = self.get_app(FakeApp(), {}, error_limiter_shared_file=path)
+        resp = app(req.environ, self.start_response)
+        self.assertEqual(['200 OK'] * 2, self.got_statuses)
+        self.assertEqual({}, json.loads(b''.join(resp)))
+        self.assertFalse(os.path.exists(path))
+
+        table = SharedErrorTable(path, slots=10)
+        now = time()
+        table.set(table.lookup('1.2.3.4:6200/sda', create=True),
+                  11, now, now + 60)
+        table.set(table.lookup('1.2.3.4:6200/sdb', create=True), 1, now, 0.0)
+        resp = app(req.environ, self.start_response)
+        self.assertEqual(['200 OK'] * 3, self.got_statuses)
+        self.assertEqual(
+            {'1.2.3.4:6200/sda': {'errors': 11, 'limited_until': now + 60}},
+            json.loads(b''.join(resp)))
+
 
 if __name__ == '__main__':
     unittest.main()
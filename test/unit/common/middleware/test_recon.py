@@ -171,6 +171,9 @@ class FakeRecon(object):
     def fake_reconstruction(self):
         return {'reconstructiontest': "1"}
 
+    def fake_threadpools(self):
+        return {'threadpooltest': "1"}
+
     def fake_updater(self, recon_type):
         self.fake_updater_rtype = recon_type
         return {'updatertest': "1"}
@@ -352,6 +355,33 @@ class TestReconSuccess(TestCase):
         self.assertEqual(sorted(app.get_ring_md5().items()),
                          sorted(expt_out.items()))
 
+    @patch_policies([
+        StoragePolicy(0, 'stagecoach', is_default=True),
+        StoragePolicy(1, 'pinto'),
+    ])
+    def test_get_ring_md5_includes_v2_rings(self):
+        ring.RingData(
+            [array.array('H', [0, 1, 0, 1]),
+             array.array('H', [0, 1, 0, 1]),
+             array.array('H', [3, 4, 3, 4])],
+            self.ring_devs, self.ring_part_shift).save(
+                os.path.join(self.tempdir, 'object-1.ring'), mtime=None,
+                format_version=2)
+        expt_out = {'%s/account.ring.gz' % self.tempdir:
+                    'hash-account.ring.gz',
+                    '%s/container.ring.gz' % self.tempdir:
+                    'hash-container.ring.gz',
+                    '%s/object.ring.gz' % self.tempdir:
+                    'hash-object.ring.gz',
+                    '%s/object-1.ring.gz' % self.tempdir:
+                    'hash-object-1.ring.gz',
+                    '%s/object-1.ring' % self.tempdir:
+                    'hash-object-1.ring'}
+
+        app = self._get_app()
+        self.assertEqual(sorted(app.get_ring_md5().items()),
+                         sorted(expt_out.items()))
+
     def test_get_ring_md5_ioerror_produces_none_hash(self):
         # Ring files that are present but produce an IOError on read should
         # still produce a ringmd5 entry with a None for the hash. Note that
@@ -825,6 +855,21 @@ class TestReconSuccess(TestCase):
             "object_reconstruction_time": 0.2615511417388916,
             "object_reconstruction_last": 1357969645.25})
 
+    def test_get_threadpool_info(self):
+        from_cache_response = {
+            "object_server_threadpools": {
+                "1234": {"devices": {"sda1": {"threads": 4,
+                                              "queue_depth": 2,
+                                              "in_progress": 4}},
+                         "updated": 1357969645.25}}}
+        self.fakecache.fakeout_calls = []
+        self.fakecache.fakeout = from_cache_response
+        rv = self.app.get_threadpool_info()
+        self.assertEqual(self.fakecache.fakeout_calls,
+                         [((['object_server_threadpools'],
+                             '/var/cache/swift/object.recon'), {})])
+        self.assertEqual(rv, from_cache_response)
+
     def test_get_updater_info_container(self):
         from_cache_response = {"container_updater_sweep": 18.476239919662476}
         self.fakecache.fakeout_calls = []
@@ -1352,6 +1397,7 @@ class TestReconMiddleware(unittest.TestCase):
         self.app.get_device_info = self.frecon.fake_get_device_info
         self.app.get_replication_info = self.frecon.fake_replication
         self.app.get_reconstruction_info = self.frecon.fake_reconstruction
+        self.app.get_threadpool_info = self.frecon.fake_threadpools
         self.app.get_auditor_info = self.frecon.fake_auditor
         self.app.get_updater_info = self.frecon.fake_updater
         self.app.get_expirer_info = self.frecon.fake_expirer
@@ -1648,6 +1694,13 @@ class TestReconMiddleware(unittest.TestCase):
         resp = self.app(req.environ, start_response)
         self.assertEqual(resp, get_sharding_resp)
 
+    def test_recon_get_threadpools(self):
+        get_threadpools_resp = [b'{"threadpooltest": "1"}']
+        req = Request.blank('/recon/threadpools',
+                            environ={'REQUEST_METHOD': 'GET'})
+        resp = self.app(req.environ, start_response)
+        self.assertEqual(resp, get_threadpools_resp)
+
     def test_recon_get_relink(self):
         get_recon_resp = [
             b'{"relinktest": "1"}']
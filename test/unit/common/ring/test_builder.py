@@ -25,6 +25,7 @@ from collections import Counter, defaultdict
 from math import ceil
 from tempfile import mkdtemp
 from shutil import rmtree
+import subprocess
 import sys
 import random
 import uuid
@@ -36,6 +37,7 @@ from swift.common import exceptions
 from swift.common import ring
 from swift.common.ring import utils
 from swift.common.ring.builder import MAX_BALANCE
+from test.unit import FakeProcessPool
 
 
 def _partition_counts(builder, key='id'):
@@ -202,6 +204,125 @@ class TestRingBuilder(unittest.TestCase):
         self.assertEqual(pre_state, random.getstate(),
                          "Random state was not reset")
 
+    def test_rebalance_with_processes(self):
+        def make_builder():
+            rb = ring.RingBuilder(8, 3, 1)
+            for idx in range(12):
+                rb.add_dev({'id': idx, 'region': idx % 2, 'zone': idx % 3,
+                            'ip': '127.0.0.%d' % (idx % 4), 'port': 10000,
+                            'device': 'sda%d' % idx, 'weight': 100})
+            return rb
+
+        rb1 = make_builder()
+        rb2 = make_builder()
+        for seed in range(3):
+            with mock.patch('swift.common.ring.builder._fork_pool',
+                            side_effect=FakeProcessPool) as mock_pool, \
+                    mock.patch('swift.common.ring.builder.patcher.'
+                               'is_monkey_patched', return_value=False):
+                self.assertEqual(rb1.rebalance(seed=seed),
+                                 rb2.rebalance(seed=seed, processes=3))
+            self.assertTrue(mock_pool.call_args_list)
+            self.assertEqual(
+                [mock.call(3)] * len(mock_pool.call_args_list),
+                mock_pool.call_args_list)
+            self.assertEqual(rb1.get_ring().to_dict(),
+                             rb2.get_ring().to_dict())
+            self.assertEqual(rb1._dispersion_graph, rb2._dispersion_graph)
+            self.assertEqual(rb1.dispersion, rb2.dispersion)
+            for rb in (rb1, rb2):
+                rb.set_dev_weight(seed, 50)
+                rb.remove_dev(seed + 6)
+                rb.pretend_min_part_hours_passed()
+
+    def test_map_part_ranges(self):
+        calls = []
+
+        def func(*args):
+            calls.append(args)
+            return args
+
+        # everything in this process
+        self.assertEqual([('a', 0, 10)],
+                         ring.builder._map_part_ranges(func, ('a',), 10, 1))
+        self.assertEqual([('a', 0, 10)], calls)
+        self.assertEqual([('a', 0, 0)],
+                         ring.builder._map_part_ranges(func, ('a',), 0, 4))
+        self.assertEqual([('a', 0, 1)],
+                         ring.builder._map_part_ranges(func, ('a',), 1, 4))
+
+        # split between processes
+        del calls[:]
+        pools = []
+
+        def fake_fork_pool(processes):
+            self.assertEqual((func, ('a',)), ring.builder._forked_call)
+            pools.append(FakeProcessPool(processes))
+            return pools[-1]
+
+        with mock.patch('swift.common.ring.builder._fork_pool',
+                        fake_fork_pool), \
+                mock.patch('swift.common.ring.builder.patcher.'
+                           'is_monkey_patched', return_value=False):
+            self.assertEqual(
+                [('a', 0, 4), ('a', 4, 8), ('a', 8, 10)],
+                ring.builder._map_part_ranges(func, ('a',), 10, 3))
+        self.assertEqual(1, len(pools))
+        self.assertEqual(3, pools[0].processes)
+        self.assertEqual([[(0, 4), (4, 8), (8, 10)]], pools[0].mapped)
+        self.assertIsNone(ring.builder._forked_call)
+
+        # no processes once eventlet has patched threading
+        del calls[:]
+        with mock.patch('swift.common.ring.builder._fork_pool') as \
+                mock_pool, \
+                mock.patch('swift.common.ring.builder.patcher.'
+                           'is_monkey_patched', return_value=True):
+            self.assertEqual(
+                [('a', 0, 10)],
+                ring.builder._map_part_ranges(func, ('a',), 10, 3))
+        self.assertFalse(mock_pool.called)
+        self.assertEqual([('a', 0, 10)], calls)
+
+    def _run_rebalance_script(self, monkey_patch):
+        # real worker processes are only forked in a separate interpreter;
+        # a multiprocessing pool can't be used in a test run that eventlet
+        # may have monkey-patched
+        script = '''
+import sys
+if sys.argv[1] == 'patch':
+    import eventlet
+    eventlet.monkey_patch()
+from swift.common.ring import RingBuilder
+
+def make_builder():
+    rb = RingBuilder(8, 3, 1)
+    for idx in range(12):
+        rb.add_dev({'id': idx, 'region': idx % 2, 'zone': idx % 3,
+                    'ip': '127.0.0.%d' % (idx % 4), 'port': 10000,
+                    'device': 'sda%d' % idx, 'weight': 100})
+    return rb
+
+rb1 = make_builder()
+rb2 = make_builder()
+assert rb1.rebalance(seed=1) == rb2.rebalance(seed=1, processes=3)
+assert rb1.get_ring().to_dict() == rb2.get_ring().to_dict()
+print('ok')
+'''
+        proc = subprocess.Popen(
+            [sys.executable, '-c', script,
+             'patch' if monkey_patch else 'no-patch'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = proc.communicate()
+        self.assertEqual(0, proc.returncode, err)
+        self.assertEqual(b'ok\n', out)
+
+    def test_rebalance_with_forked_processes(self):
+        self._run_rebalance_script(monkey_patch=False)
+
+    def test_rebalance_with_processes_monkey_patched(self):
+        self._run_rebalance_script(monkey_patch=True)
+
     def test_rebalance_part_on_deleted_other_part_on_drained(self):
         rb = ring.RingBuilder(8, 3, 1)
         rb.add_dev({'id': 0, 'region': 1, 'zone': 1, 'weight': 1,
@@ -1252,6 +1252,11 @@ class TestCooperativeRingBuilder(BaseTestCompositeBuilder):
         rb1 = self._make_coop_builder(1, cb, min_part_hours=min_part_hours)
         rb2 = self._make_coop_builder(2, cb, min_part_hours=min_part_hours)
         cb._builders = [rb1, rb2]
+        # builders only check parts that they might move, so give rb2 some
+        # parts to move
+        rb2.rebalance()
+        self.add_dev(rb2, region=2)
+        rb2.pretend_min_part_hours_passed()
         # composite rebalance updates last_part_moves before any component
         # rebalance - after that expect no more updates
         with mock_update_last_part_moves() as update_calls:
@@ -1266,14 +1271,21 @@ class TestCooperativeRingBuilder(BaseTestCompositeBuilder):
         # can_part_move method to its superclass _can_part_move method
         self.assertEqual({rb2}, set(can_part_move_calls))
 
+        rb1.rebalance()
+        self.add_dev(rb1, region=1)
+        rb1.pretend_min_part_hours_passed()
+        rb2.pretend_min_part_hours_passed()
+        cb.update_last_part_moves()
         with mock_update_last_part_moves() as update_calls:
             with mock_can_part_move() as can_part_move_calls:
                 rb1.rebalance()
         self.assertFalse(update_calls)
         # rb1 is being rebalanced so gets checked, and rb2 also gets checked
+        # unless rb1 has already said no
         self.assertEqual({rb1, rb2}, set(can_part_move_calls))
-        self.assertEqual(768, len(can_part_move_calls[rb1]))
-        self.assertEqual(768, len(can_part_move_calls[rb2]))
+        self.assertTrue(set(can_part_move_calls[rb2]))
+        self.assertLessEqual(set(can_part_move_calls[rb2]),
+                             set(can_part_move_calls[rb1]))
 
     def test_rebalance_cobuilders_calls(self):
         self._check_rebalance_cobuilders_calls(1)
@@ -17,6 +17,8 @@ import array
 import collections
 import six.moves.cPickle as pickle
 import os
+import random
+import struct
 import unittest
 import stat
 from contextlib import closing
@@ -26,8 +28,11 @@ from shutil import rmtree
 from time import sleep, time
 import sys
 import copy
+import itertools
+import eventlet
 import mock
 
+import six
 from six.moves import range
 from swift.common import ring, utils
 from swift.common.ring import utils as ring_utils
@@ -162,6 +167,111 @@ class TestRingData(unittest.TestCase):
         rd2 = ring.RingData.load(ring_fname)
         self.assert_ring_data_equal(rd1, rd2)
 
+    def test_roundtrip_serialization_v2(self):
+        ring_fname = os.path.join(self.testdir, 'foo.ring')
+        rd = ring.RingData(
+            [array.array('H', [0, 1, 0, 1]), array.array('H', [0, 1, 0, 1]),
+             array.array('H', [1, 0])],
+            [{'id': 0, 'zone': 0}, {'id': 1, 'zone': 1}], 30,
+            next_part_power=3, version=7)
+        rd.save(ring_fname, format_version=2)
+
+        with open(ring_fname, 'rb') as fp:
+            raw = fp.read()
+        self.assertEqual(b'R1NG\x00\x02', raw[:6])
+        # every row starts on a page boundary
+        self.assertEqual(
+            ring.ring.V2_ROW_ALIGNMENT * 3 + 4, len(raw))
+
+        meta_only = ring.RingData.load(ring_fname, metadata_only=True)
+        self.assertEqual([
+            {'id': 0, 'zone': 0, 'region': 1},
+            {'id': 1, 'zone': 1, 'region': 1},
+        ], meta_only.devs)
+        self.assertEqual([], meta_only._replica2part2dev_id)
+        rd2 = ring.RingData.load(ring_fname)
+        self.assert_ring_data_equal(rd, rd2)
+        self.assertEqual(2.5, rd2.replica_count)
+        self.assertEqual(len(raw), rd2.size)
+        self.assertEqual(len(raw), rd2.raw_size)
+        self.assertEqual(md5(raw, usedforsecurity=False).hexdigest(),
+                         rd2.md5)
+        if not six.PY2:
+            for part2dev_id in rd2._replica2part2dev_id:
+                self.assertIsInstance(part2dev_id, memoryview)
+                self.assertTrue(part2dev_id.readonly)
+
+        # v2 rings can be written back out in either format
+        rd2.save(os.path.join(self.testdir, 'bar.ring.gz'))
+        rd3 = ring.RingData.load(os.path.join(self.testdir, 'bar.ring.gz'))
+        self.assert_ring_data_equal(rd, rd3)
+        rd2.save(os.path.join(self.testdir, 'bar.ring'), format_version=2)
+        with open(os.path.join(self.testdir, 'bar.ring'), 'rb') as fp:
+            self.assertEqual(raw, fp.read())
+
+    def test_byteswapped_serialization_v2(self):
+        ring_fname = os.path.join(self.testdir, 'foo.ring')
+        data = [array.array('H', [0, 1, 0, 1]), array.array('H', [0, 1, 0, 1])]
+        swapped_data = copy.deepcopy(data)
+        for x in swapped_data:
+            x.byteswap()
+
+        with mock.patch.object(sys, 'byteorder',
+                               'big' if sys.byteorder == 'little'
+                               else 'little'):
+            rds = ring.RingData(swapped_data,
+                                [{'id': 0, 'zone': 0}, {'id': 1, 'zone': 1}],
+                                30)
+            rds.save(ring_fname, format_version=2)
+
+        rd1 = ring.RingData(data, [{'id': 0, 'zone': 0}, {'id': 1, 'zone': 1}],
+                            30)
+        rd2 = ring.RingData.load(ring_fname)
+        self.assert_ring_data_equal(rd1, rd2)
+        for part2dev_id in rd2._replica2part2dev_id:
+            self.assertIsInstance(part2dev_id, array.array)
+
+    def test_load_reuses_unchanged_assignments(self):
+        data = [array.array('H', [0, 1, 0, 1]), array.array('H', [1, 0, 1, 0])]
+        for fname, format_version in (('foo.ring.gz', 1), ('foo.ring', 2)):
+            ring_fname = os.path.join(self.testdir, fname)
+            devs = [{'id': 0, 'zone': 0, 'weight': 1.0},
+                    {'id': 1, 'zone': 1, 'weight': 1.0}]
+            ring.RingData(data, devs, 30).save(
+                ring_fname, format_version=format_version)
+            rd1 = ring.RingData.load(ring_fname)
+            self.assertIsNotNone(rd1.replica2part2dev_id_md5)
+
+            # only a device changes; the assignments are reused as-is
+            devs[1]['weight'] = 2.0
+            ring.RingData(data, devs, 30).save(
+                ring_fname, format_version=format_version)
+            rd2 = ring.RingData.load(ring_fname, previous=rd1)
+            self.assertIs(rd1._replica2part2dev_id, rd2._replica2part2dev_id)
+            self.assertEqual(2.0, rd2.devs[1]['weight'])
+            # ... but the file's size and checksum are still accounted for
+            fresh = ring.RingData.load(ring_fname)
+            self.assert_ring_data_equal(fresh, rd2)
+            self.assertEqual(fresh.md5, rd2.md5)
+            self.assertEqual(fresh.size, rd2.size)
+            self.assertEqual(fresh.raw_size, rd2.raw_size)
+
+            # new assignments are read from the file
+            ring.RingData(data[::-1], devs, 30).save(
+                ring_fname, format_version=format_version)
+            rd3 = ring.RingData.load(ring_fname, previous=rd2)
+            self.assertEqual(data[::-1], rd3._replica2part2dev_id)
+            self.assertNotEqual(rd2.replica2part2dev_id_md5,
+                                rd3.replica2part2dev_id_md5)
+
+    def test_save_unknown_format_version(self):
+        ring_fname = os.path.join(self.testdir, 'foo.ring.gz')
+        rd = ring.RingData(
+            [array.array('H', [0, 1, 0, 1])], [{'id': 0, 'zone': 0}], 30)
+        with self.assertRaises(ValueError):
+            rd.save(ring_fname, format_version=3)
+        self.assertFalse(os.path.exists(ring_fname))
+
     def test_deterministic_serialization(self):
         """
         Two identical rings should produce identical .gz files on disk.
@@ -210,6 +320,100 @@ class TestRingData(unittest.TestCase):
         self.assertEqual(rd.replica_count, 1.75)
 
 
+def legacy_get_more_nodes(r, part):
+    """
+    The original, unchunked get_more_nodes() implementation; the ring must
+    always hand out exactly the same handoffs as this.
+    """
+    primary_nodes = r._get_part_nodes(part)
+    used = set(d['id'] for d in primary_nodes)
+    index = itertools.count()
+    same_regions = set(d['region'] for d in primary_nodes)
+    same_zones = set((d['region'], d['zone']) for d in primary_nodes)
+    same_ips = set(
+        (d['region'], d['zone'], d['ip']) for d in primary_nodes)
+
+    parts = len(r._replica2part2dev_id[0])
+    part_hash = md5(str(part).encode('ascii'),
+                    usedforsecurity=False).digest()
+    start = struct.unpack_from('>I', part_hash)[0] >> r._part_shift
+    inc = int(parts / 65536) or 1
+
+    def handoff_parts():
+        return itertools.chain(range(start, parts, inc),
+                               range(inc - ((parts - start) % inc),
+                                     start, inc))
+
+    hit_all_regions = len(same_regions) == r._num_regions
+    for handoff_part in handoff_parts():
+        if hit_all_regions:
+            break
+        for part2dev_id in r._replica2part2dev_id:
+            if handoff_part < len(part2dev_id):
+                dev_id = part2dev_id[handoff_part]
+                dev = r._devs[dev_id]
+                region = dev['region']
+                if dev_id not in used and region not in same_regions:
+                    yield dict(dev, handoff_index=next(index))
+                    used.add(dev_id)
+                    same_regions.add(region)
+                    zone = dev['zone']
+                    same_zones.add((region, zone))
+                    same_ips.add((region, zone, dev['ip']))
+                    if len(same_regions) == r._num_regions:
+                        hit_all_regions = True
+                        break
+
+    hit_all_zones = len(same_zones) == r._num_zones
+    for handoff_part in handoff_parts():
+        if hit_all_zones:
+            break
+        for part2dev_id in r._replica2part2dev_id:
+            if handoff_part < len(part2dev_id):
+                dev_id = part2dev_id[handoff_part]
+                dev = r._devs[dev_id]
+                zone = (dev['region'], dev['zone'])
+                if dev_id not in used and zone not in same_zones:
+                    yield dict(dev, handoff_index=next(index))
+                    used.add(dev_id)
+                    same_zones.add(zone)
+                    same_ips.add(zone + (dev['ip'],))
+                    if len(same_zones) == r._num_zones:
+                        hit_all_zones = True
+                        break
+
+    hit_all_ips = len(same_ips) == r._num_ips
+    for handoff_part in handoff_parts():
+        if hit_all_ips:
+            break
+        for part2dev_id in r._replica2part2dev_id:
+            if handoff_part < len(part2dev_id):
+                dev_id = part2dev_id[handoff_part]
+                dev = r._devs[dev_id]
+                ip = (dev['region'], dev['zone'], dev['ip'])
+                if dev_id not in used and ip not in same_ips:
+                    yield dict(dev, handoff_index=next(index))
+                    used.add(dev_id)
+                    same_ips.add(ip)
+                    if len(same_ips) == r._num_ips:
+                        hit_all_ips = True
+                        break
+
+    hit_all_devs = len(used) == r._num_assigned_devs
+    for handoff_part in handoff_parts():
+        if hit_all_devs:
+            break
+        for part2dev_id in r._replica2part2dev_id:
+            if handoff_part < len(part2dev_id):
+                dev_id = part2dev_id[handoff_part]
+                if dev_id not in used:
+                    yield dict(r._devs[dev_id], handoff_index=next(index))
+                    used.add(dev_id)
+                    if len(used) == r._num_assigned_devs:
+                        hit_all_devs = True
+                        break
+
+
 class TestRing(TestRingBase):
 
     def setUp(self):
@@ -274,6 +478,69 @@ class TestRing(TestRingBase):
                 mock.patch.object(utils, 'SWIFT_CONF_FILE', ''):
             self.assertRaises(IOError, ring.Ring, self.testdir, 'whatever')
 
+    def test_creation_prefers_v2_ring(self):
+        v2_path = os.path.join(self.testdir, 'whatever.ring')
+        ring.RingData(
+            self.intended_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(
+                v2_path, format_version=2)
+        r = ring.Ring(self.testdir, reload_time=self.intended_reload_time,
+                      ring_name='whatever')
+        self.assertEqual(v2_path, r.serialized_path)
+        self.assertEqual(r._replica2part2dev_id,
+                         self.intended_replica2part2dev_id)
+        self.assertEqual(r.devs, self.intended_devs)
+        for account in ('a', 'b', 'c'):
+            self.assertEqual(self.ring.get_nodes(account),
+                             r.get_nodes(account))
+        self.assertEqual(list(self.ring.get_more_nodes(1)),
+                         list(r.get_more_nodes(1)))
+
+    def test_stale_v2_ring_ignored(self):
+        v2_path = os.path.join(self.testdir, 'whatever.ring')
+        ring.RingData(
+            self.intended_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(
+                v2_path, format_version=2)
+        # something that only knows about .ring.gz files writes a new ring
+        new_replica2part2dev_id = [
+            array.array('H', [4, 3, 4, 3]),
+            array.array('H', [1, 0, 1, 0]),
+            array.array('H', [0, 1, 0, 1])]
+        ring.RingData(
+            new_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(self.testgz)
+        os.utime(v2_path, (os.path.getmtime(self.testgz) - 10,) * 2)
+
+        r = ring.Ring(self.testdir, reload_time=self.intended_reload_time,
+                      ring_name='whatever')
+        self.assertEqual(self.testgz, r.serialized_path)
+        self.assertEqual(r._replica2part2dev_id, new_replica2part2dev_id)
+        self.assertFalse(r.has_changed())
+
+        # the .ring file is used again once it is brought up to date...
+        ring.RingData(
+            self.intended_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(
+                v2_path, format_version=2)
+        os.utime(v2_path, (os.path.getmtime(self.testgz) + 10,) * 2)
+        self.assertTrue(r.has_changed())
+        r._reload()
+        self.assertEqual(v2_path, r.serialized_path)
+        self.assertEqual(r._replica2part2dev_id,
+                         self.intended_replica2part2dev_id)
+        self.assertFalse(r.has_changed())
+
+        # ... and dropped when a newer .ring.gz appears
+        ring.RingData(
+            new_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(self.testgz)
+        os.utime(self.testgz, (os.path.getmtime(v2_path) + 10,) * 2)
+        self.assertTrue(r.has_changed())
+        r._reload()
+        self.assertEqual(self.testgz, r.serialized_path)
+        self.assertEqual(r._replica2part2dev_id, new_replica2part2dev_id)
+
     def test_replica_count(self):
         self.assertEqual(self.ring.replica_count, 3)
         self.ring._replica2part2dev_id.append([0])
@@ -349,6 +616,130 @@ class TestRing(TestRingBase):
         self.assertEqual(len(self.ring.devs), 9)
         self.assertNotEqual(self.ring._mtime, orig_mtime)
 
+    def test_reload_device_change_reuses_assignments(self):
+        os.utime(self.testgz, (time() - 300, time() - 300))
+        self.ring = ring.Ring(self.testdir, reload_time=0.001,
+                              ring_name='whatever')
+        orig_replica2part2dev_id = self.ring._replica2part2dev_id
+        orig_dev_ids_with_parts = self.ring._dev_ids_with_parts
+        self.intended_devs[3]['ip'] = '10.1.2.3'
+        ring.RingData(
+            self.intended_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(self.testgz)
+        sleep(0.1)
+        part, nodes = self.ring.get_nodes('a')
+        self.assertIs(orig_replica2part2dev_id,
+                      self.ring._replica2part2dev_id)
+        self.assertIs(orig_dev_ids_with_parts, self.ring._dev_ids_with_parts)
+        self.assertEqual('10.1.2.3', self.ring.devs[3]['ip'])
+        self.assertEqual(['10.1.2.3'], [
+            n['ip'] for n in self.ring.get_part_nodes(0) if n['id'] == 3])
+
+        # changed assignments are picked up
+        os.utime(self.testgz, (time() - 300, time() - 300))
+        self.ring = ring.Ring(self.testdir, reload_time=0.001,
+                              ring_name='whatever')
+        self.intended_replica2part2dev_id[2][0] = 4
+        ring.RingData(
+            self.intended_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(self.testgz)
+        sleep(0.1)
+        self.assertEqual([0, 4], [
+            n['id'] for n in self.ring.get_part_nodes(0)])
+
+    def test_background_reload(self):
+        os.utime(self.testgz, (time() - 300, time() - 300))
+        self.ring = ring.Ring(self.testdir, reload_time=0.001,
+                              ring_name='whatever', background_reload=True)
+        orig_mtime = self.ring._mtime
+        self.intended_devs.append(
+            {'id': 5, 'region': 0, 'zone': 4, 'weight': 1.0,
+             'ip': '10.5.5.5', 'port': 6200})
+        ring.RingData(
+            self.intended_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(self.testgz)
+        sleep(0.1)
+        spawned = []
+        with mock.patch('swift.common.ring.ring.spawn_n',
+                        side_effect=lambda f: spawned.append(f)):
+            # the caller that notices the change still gets the old ring
+            self.assertEqual(5, len(self.ring.devs))
+            sleep(0.01)
+            self.assertEqual(5, len(self.ring.devs))
+        # ... and only one reload is started
+        self.assertEqual(1, len(spawned))
+        self.assertTrue(self.ring._reloading)
+        self.assertEqual(orig_mtime, self.ring._mtime)
+
+        with mock.patch('swift.common.ring.ring.sleep') as mock_sleep:
+            spawned[0]()
+        self.assertTrue(mock_sleep.called)
+        self.assertFalse(self.ring._reloading)
+        self.assertNotEqual(orig_mtime, self.ring._mtime)
+        self.assertEqual(6, len(self.ring.devs))
+
+    def test_background_reload_does_not_block_hub(self):
+        os.utime(self.testgz, (time() - 300, time() - 300))
+        self.ring = ring.Ring(self.testdir, reload_time=0.001,
+                              ring_name='whatever', background_reload=True)
+        self.intended_devs.append(
+            {'id': 5, 'region': 0, 'zone': 4, 'weight': 1.0,
+             'ip': '10.5.5.5', 'port': 6200})
+        ring.RingData(
+            self.intended_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(self.testgz)
+        real_load = ring.RingData.load
+        load_threads = []
+
+        def slow_load(*args, **kwargs):
+            load_threads.append(eventlet.patcher.original(
+                'threading').current_thread())
+            # blocks whichever OS thread it's called in
+            sleep(0.2)
+            return real_load(*args, **kwargs)
+
+        ticks = []
+
+        def ticker():
+            while True:
+                ticks.append(time())
+                eventlet.sleep(0.01)
+
+        ticker_gt = eventlet.spawn(ticker)
+        try:
+            eventlet.sleep(0)
+            with mock.patch.object(ring.RingData, 'load',
+                                   side_effect=slow_load):
+                self.ring._background_reload()
+        finally:
+            ticker_gt.kill()
+        self.assertEqual(6, len(self.ring.devs))
+        self.assertIsNot(eventlet.patcher.original(
+            'threading').current_thread(), load_threads[0])
+        # other greenthreads carried on while the ring file was loaded
+        self.assertGreater(len(ticks), 5)
+
+    def test_background_reload_error(self):
+        os.utime(self.testgz, (time() - 300, time() - 300))
+        self.ring = ring.Ring(self.testdir, reload_time=0.001,
+                              ring_name='whatever', background_reload=True)
+        orig_mtime = self.ring._mtime
+        with open(self.testgz, 'wb') as fp:
+            fp.write(b'garbage')
+        sleep(0.1)
+        with mock.patch('swift.common.ring.ring.LOG') as mock_log:
+            part, nodes = self.ring.get_nodes('a')
+            # let the reload run
+            eventlet.sleep(0.01)
+        self.assertEqual(1, mock_log.exception.call_count)
+        self.assertEqual([0, 3], [n['id'] for n in nodes])
+        self.assertFalse(self.ring._reloading)
+        self.assertEqual(orig_mtime, self.ring._mtime)
+        # the old ring is still in use (and will be reloaded again)
+        with mock.patch('swift.common.ring.ring.spawn_n') as mock_spawn:
+            self.assertEqual(5, len(self.ring.devs))
+        self.assertEqual(1, mock_spawn.call_count)
+
     def test_reload_without_replication(self):
         replication_less_devs = [{'id': 0, 'region': 0, 'zone': 0,
                                   'weight': 1.0, 'ip': '10.1.1.1',
@@ -453,6 +844,78 @@ class TestRing(TestRingBase):
         part, nodes = self.ring.get_nodes('a')
         self.assertEqual(nodes, self.ring.get_part_nodes(part))
 
+    def test_get_parts_bulk(self):
+        paths = [('a',), ('a', 'c'), ('a', 'c', 'o'), ('a', None, None),
+                 (u'\N{SNOWMAN}', u'c\N{SNOWMAN}', b'o')] + [
+            ('a', 'c', 'o%d' % i) for i in range(20)]
+        self.assertEqual([self.ring.get_part(*path) for path in paths],
+                         self.ring.get_parts_bulk(paths))
+        self.assertEqual([], self.ring.get_parts_bulk([]))
+        # works with any iterable
+        self.assertEqual([self.ring.get_part(*path) for path in paths],
+                         self.ring.get_parts_bulk(iter(paths)))
+        with self.assertRaises(ValueError):
+            self.ring.get_parts_bulk([('a', None, 'o')])
+
+    def test_get_nodes_bulk(self):
+        paths = [('a', 'c', 'o%d' % i) for i in range(20)]
+        results = self.ring.get_nodes_bulk(paths)
+        self.assertEqual([self.ring.get_nodes(*path) for path in paths],
+                         results)
+        # still our own copies
+        results[0][1][0]['index'] = 'handoff'
+        self.assertEqual(self.ring.get_nodes(*paths[0]),
+                         self.ring.get_nodes_bulk(paths[:1])[0])
+
+    def test_get_part_nodes_cached(self):
+        nodes = self.ring.get_part_nodes(1)
+        self.assertEqual([dict(self.intended_devs[1], index=0),
+                          dict(self.intended_devs[4], index=1)], nodes)
+        self.assertEqual(1, len(self.ring._part_nodes_cache))
+
+        # callers get their own copies to play with...
+        nodes[0]['index'] = 'handoff'
+        nodes.pop()
+        again = self.ring.get_part_nodes(1)
+        self.assertEqual([dict(self.intended_devs[1], index=0),
+                          dict(self.intended_devs[4], index=1)], again)
+        self.assertIsNot(nodes[0], again[0])
+        # ... and only the devices' ids are cached
+        self.assertEqual({1: (1, 4)}, self.ring._part_nodes_cache)
+        self.ring.get_part_nodes(3)
+        self.assertEqual(2, len(self.ring._part_nodes_cache))
+        self.assertEqual((1, 4), self.ring._cached_part_dev_ids(1))
+
+        # changes made to the devs in place are seen
+        self.ring.devs[4]['replication_port'] = 12345
+        self.assertEqual(12345,
+                         self.ring.get_part_nodes(1)[1]['replication_port'])
+
+    def test_get_part_nodes_cache_bounded(self):
+        with mock.patch('swift.common.ring.ring.PART_NODES_CACHE_SIZE', 2):
+            for part in range(4):
+                self.ring.get_part_nodes(part)
+                self.assertLessEqual(len(self.ring._part_nodes_cache), 2)
+            self.assertEqual([2, 3], list(self.ring._part_nodes_cache))
+            # least recently used is evicted first
+            self.ring.get_part_nodes(2)
+            self.ring.get_part_nodes(0)
+            self.assertEqual([2, 0], list(self.ring._part_nodes_cache))
+
+    def test_get_part_nodes_cache_reset_on_reload(self):
+        os.utime(self.testgz, (time() - 300, time() - 300))
+        self.ring = ring.Ring(self.testdir, reload_time=0.001,
+                              ring_name='whatever')
+        self.assertEqual('10.1.2.2', self.ring.get_part_nodes(1)[1]['ip'])
+        self.assertEqual(1, len(self.ring._part_nodes_cache))
+        self.intended_devs[4]['ip'] = '10.1.2.3'
+        ring.RingData(
+            self.intended_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(self.testgz)
+        sleep(0.1)
+        self.assertEqual('10.1.2.3', self.ring.get_part_nodes(1)[1]['ip'])
+        self.assertEqual(1, len(self.ring._part_nodes_cache))
+
     def test_get_nodes(self):
         # Yes, these tests are deliberately very fragile. We want to make sure
         # that if someones changes the results the ring produces, they know it.
@@ -946,33 +1409,26 @@ class TestRing(TestRingBase):
         r = ring.Ring(self.testdir, ring_name='whatever')
         self.assertEqual(r.version, rb.version)
 
-        class CountingRingTable(object):
-
-            def __init__(self, table):
-                self.table = table
-                self.count = 0
-
-            def __iter__(self):
-                self._iter = iter(self.table)
-                return self
-
-            def __next__(self):
-                self.count += 1
-                return next(self._iter)
+        orig_iter_handoff_chunks = r._iter_handoff_chunks
+        chunk_counts = []
 
-            # complete the api
-            next = __next__
-
-            def __getitem__(self, key):
-                return self.table[key]
+        def counting_iter_handoff_chunks(*args):
+            for chunk in orig_iter_handoff_chunks(*args):
+                chunk_counts[-1] += 1
+                yield chunk
 
         histogram = collections.defaultdict(int)
-        for part in range(r.partition_count):
-            counting_table = CountingRingTable(r._replica2part2dev_id)
-            with mock.patch.object(r, '_replica2part2dev_id', counting_table):
+        # look at one partition at a time so we can tell how far
+        # get_more_nodes() had to look
+        with mock.patch('swift.common.ring.ring.HANDOFF_CHUNK_MIN', 1), \
+                mock.patch('swift.common.ring.ring.HANDOFF_CHUNK_MAX', 1), \
+                mock.patch.object(r, '_iter_handoff_chunks',
+                                  counting_iter_handoff_chunks):
+            for part in range(r.partition_count):
+                chunk_counts.append(0)
                 node_iter = r.get_more_nodes(part)
                 next(node_iter)
-            histogram[counting_table.count] += 1
+                histogram[chunk_counts[-1]] += 1
         # Don't let our summing muddy our histogram
         histogram = dict(histogram)
 
@@ -981,29 +1437,104 @@ class TestRing(TestRingBase):
         self.assertEqual(2, r._num_zones)
         self.assertEqual(256, r.partition_count)
 
-        # We always do one loop (including the StopIteration) while getting
-        # primaries, so every part should hit next() at least 5 times
-        self.assertEqual(sum(histogram.get(x, 0) for x in range(5)), 0,
-                         histogram)
+        # We always have to look at at least one handoff partition
+        self.assertEqual(histogram.get(0, 0), 0, histogram)
 
         # Most of the parts should find a handoff device in the next partition,
-        # but because some of the primary devices may *also* be used for that
-        # partition, that means 5, 6, or 7 calls to next().
-        self.assertGreater(sum(histogram.get(x, 0) for x in range(8)), 160,
-                           histogram)
+        # even though some of the primary devices may *also* be used for that
+        # partition.
+        self.assertGreater(histogram.get(1, 0), 160, histogram)
 
         # Want 90% confidence that it'll happen within two partitions
-        self.assertGreater(sum(histogram.get(x, 0) for x in range(12)), 230,
+        self.assertGreater(sum(histogram.get(x, 0) for x in range(3)), 230,
                            histogram)
 
         # Tail should fall off fairly quickly
-        self.assertLess(sum(histogram.get(x, 0) for x in range(20, 100)), 5,
+        self.assertLess(sum(histogram.get(x, 0) for x in range(5, 100)), 5,
                         histogram)
 
-        # Hard limit at 50 (we've seen as bad as 41, 45)
-        self.assertEqual(sum(histogram.get(x, 0) for x in range(50, 100)), 0,
+        # Hard limit (we've seen as bad as 10)
+        self.assertEqual(sum(histogram.get(x, 0) for x in range(12, 100)), 0,
                          histogram)
 
+    def test_get_more_nodes_matches_legacy(self):
+        rb = ring.RingBuilder(9, 3.25, 1)
+        dev_id = 0
+        for region in range(3):
+            for zone in range(3):
+                for server in range(2):
+                    for device in range(2):
+                        rb.add_dev({
+                            'id': dev_id, 'region': region, 'zone': zone,
+                            'weight': 0.0 if region == 2 and zone else 1.0,
+                            'ip': '10.%d.%d.%d' % (region, zone, server),
+                            'port': 6200, 'device': 'sd%d' % device})
+                        dev_id += 1
+        rb.rebalance(seed=1)
+        rb.get_ring().save(self.testgz)
+        r = ring.Ring(self.testdir, ring_name='whatever')
+        for part in range(r.partition_count):
+            self.assertEqual(list(legacy_get_more_nodes(r, part)),
+                             list(r.get_more_nodes(part)), part)
+        # a partial read is just a prefix
+        self.assertEqual(
+            list(itertools.islice(legacy_get_more_nodes(r, 3), 4)),
+            list(itertools.islice(r.get_more_nodes(3), 4)))
+
+    def test_get_more_nodes_matches_legacy_big_ring(self):
+        # more than 2 ** 16 parts means only some parts are handoff
+        # candidates
+        part_power = 17
+        rng = random.Random(17)
+        devs = [{'id': i, 'region': i % 2, 'zone': i % 5, 'weight': 1.0,
+                 'ip': '10.0.0.%d' % (i % 7), 'port': 6200,
+                 'device': 'sda'} for i in range(24)]
+        replica2part2dev_id = [
+            array.array('H', [rng.randrange(len(devs))
+                              for _ in range(2 ** part_power)])
+            for _ in range(2)]
+        replica2part2dev_id.append(array.array('H', [
+            rng.randrange(len(devs)) for _ in range(2 ** (part_power - 1))]))
+        ring.RingData(replica2part2dev_id, devs,
+                      32 - part_power).save(self.testgz)
+        r = ring.Ring(self.testdir, ring_name='whatever')
+        for part in rng.sample(range(r.partition_count), 50) + [0, 1]:
+            self.assertEqual(list(legacy_get_more_nodes(r, part)),
+                             list(r.get_more_nodes(part)), part)
+
+    def test_iter_handoff_chunks(self):
+        rb = ring.RingBuilder(8, 3.5, 1)
+        for i in range(8):
+            rb.add_dev({'id': i, 'region': 1, 'zone': i % 4, 'weight': 1.0,
+                        'ip': '127.0.0.%d' % (i % 4), 'port': 6200 + i,
+                        'device': 'sda'})
+        rb.rebalance()
+        rb.get_ring().save(self.testgz)
+        r = ring.Ring(self.testdir, ring_name='whatever')
+        rows = r._replica2part2dev_id
+        self.assertEqual(len(rows[-1]), 128)  # sanity: partial replica
+
+        def expected(start, parts, inc):
+            return [row[handoff_part]
+                    for handoff_part in itertools.chain(
+                        range(start, parts, inc),
+                        range(inc - ((parts - start) % inc), start, inc))
+                    for row in rows if handoff_part < len(row)]
+
+        for start, inc in ((0, 1), (5, 1), (127, 1), (128, 1), (255, 1),
+                           (0, 4), (6, 4), (8, 4), (253, 4)):
+            chunks = list(r._iter_handoff_chunks(start, 256, inc))
+            self.assertEqual(expected(start, 256, inc),
+                             list(itertools.chain.from_iterable(chunks)),
+                             (start, inc))
+
+        # chunks start small and grow
+        chunks = list(r._iter_handoff_chunks(0, 256, 1))
+        chunk_min = ring.ring.HANDOFF_CHUNK_MIN
+        # parts 0..chunk_min-1 all have 4 replicas
+        self.assertEqual(chunk_min * 4, len(chunks[0]))
+        self.assertEqual(chunk_min * 2 * 4, len(chunks[1]))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -16,12 +16,15 @@
 import mock
 import unittest
 import socket
+import time
 
-from eventlet import spawn, Timeout
+from eventlet import spawn, Timeout, sleep, wsgi
 
 from swift.common import bufferedhttp
+from swift.common.utils import NullLogger
 
 from test import listen_zero
+from test.debug_logger import debug_logger
 
 
 class MockHTTPSConnection(object):
@@ -173,5 +176,159 @@ class TestBufferedHTTP(unittest.TestCase):
                                 % (e, dev, path, header))
 
 
+class TestBufferedHTTPConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = []
+        self.logger = debug_logger()
+        self.pool = bufferedhttp.BufferedHTTPConnectionPool(
+            max_idle=2, logger=self.logger)
+
+    def tearDown(self):
+        for server in self.servers:
+            server.kill()
+
+    def start_server(self, **kwargs):
+        def app(env, start_response):
+            body = b'x' * int(env['PATH_INFO'].rsplit('/', 1)[-1])
+            start_response('200 OK', [('Content-Length', str(len(body)))])
+            return [body]
+
+        sock = listen_zero()
+        self.servers.append(spawn(wsgi.server, sock, app, log=NullLogger(),
+                                  **kwargs))
+        return sock.getsockname()[1]
+
+    def request(self, port, size, method='GET'):
+        conn = bufferedhttp.http_connect(
+            '127.0.0.1', port, 'sda', 1, method, '/a/c/%d' % size,
+            pool=self.pool)
+        return conn, conn.getresponse()
+
+    def test_reuse(self):
+        port = self.start_server()
+        conn, resp = self.request(port, 10)
+        sock = conn.sock
+        self.assertEqual(b'x' * 10, resp.read())
+        self.assertTrue(self.pool.release(conn, resp))
+        # the response no longer owns the socket
+        self.assertIsNone(resp.sock)
+        self.assertIs(conn.sock, sock)
+
+        for size in (70000, 0, 5):
+            conn2, resp = self.request(port, size)
+            self.assertIs(conn, conn2)
+            self.assertEqual(b'x' * size, resp.read())
+            self.assertTrue(self.pool.release(conn, resp))
+        # HEADs have nothing to read
+        conn2, resp = self.request(port, 10, 'HEAD')
+        self.assertIs(conn, conn2)
+        self.assertTrue(self.pool.release(conn, resp))
+        self.assertEqual({'backend_connection.new': 1,
+                          'backend_connection.reused': 4},
+                         self.logger.get_increment_counts())
+
+    def test_partially_read(self):
+        port = self.start_server()
+        conn, resp = self.request(port, 100)
+        self.assertEqual(b'x' * 10, resp.read(10))
+        self.assertFalse(self.pool.release(conn, resp))
+        self.assertIsNone(conn.sock)
+        self.assertFalse(self.pool.idle)
+        conn2, resp = self.request(port, 10)
+        self.assertIsNot(conn, conn2)
+        self.assertEqual(b'x' * 10, resp.read())
+        self.assertEqual({'backend_connection.new': 2},
+                         self.logger.get_increment_counts())
+
+    def test_max_idle(self):
+        port = self.start_server()
+        conns = [self.request(port, 1) for _ in range(3)]
+        for conn, resp in conns:
+            resp.read()
+        self.assertEqual([True, True, False],
+                         [self.pool.release(conn, resp)
+                          for conn, resp in conns])
+        self.assertEqual(2, len(self.pool.idle[('127.0.0.1', port)]))
+        # the most recently released connection is reused first
+        self.assertIs(conns[1][0], self.request(port, 1)[0])
+
+    def test_idle_timeout(self):
+        port = self.start_server()
+        conn, resp = self.request(port, 1)
+        resp.read()
+        self.assertTrue(self.pool.release(conn, resp))
+        with mock.patch('swift.common.bufferedhttp.time.time',
+                        return_value=time.time() + 11):
+            conn2, resp = self.request(port, 1)
+        self.assertIsNot(conn, conn2)
+        self.assertIsNone(conn.sock)
+        self.assertEqual({'backend_connection.new': 2,
+                          'backend_connection.dropped': 1},
+                         self.logger.get_increment_counts())
+
+    def test_closed_by_server(self):
+        port = self.start_server(keepalive=0.01)
+        conn, resp = self.request(port, 1)
+        resp.read()
+        self.assertTrue(self.pool.release(conn, resp))
+        sleep(0.1)
+        conn2, resp = self.request(port, 3)
+        self.assertIsNot(conn, conn2)
+        self.assertEqual(b'xxx', resp.read())
+        self.assertEqual({'backend_connection.new': 2,
+                          'backend_connection.dropped': 1},
+                         self.logger.get_increment_counts())
+
+    def test_closed_by_server_after_check(self):
+        port = self.start_server(keepalive=0.01)
+        conn, resp = self.request(port, 1)
+        resp.read()
+        self.assertTrue(self.pool.release(conn, resp))
+        sleep(0.1)
+        # the server closes the connection after the pool has checked it
+        with mock.patch.object(self.pool, '_is_dropped', return_value=False):
+            conn2, resp = self.request(port, 3)
+        self.assertIs(conn, conn2)
+        self.assertEqual(b'xxx', resp.read())
+        self.assertEqual({'backend_connection.new': 1,
+                          'backend_connection.reused': 1,
+                          'backend_connection.retried': 1},
+                         self.logger.get_increment_counts())
+        # the new connection can go back in the pool
+        self.assertTrue(self.pool.release(conn, resp))
+        conn3, resp = self.request(port, 2)
+        self.assertIs(conn, conn3)
+        self.assertEqual(b'xx', resp.read())
+
+    def test_reused_connection_retried_once(self):
+        port = self.start_server()
+        conn, resp = self.request(port, 1)
+        resp.read()
+        self.assertTrue(self.pool.release(conn, resp))
+        with mock.patch.object(
+                bufferedhttp.BufferedHTTPConnection, '_closed_by_server',
+                return_value=True) as mock_closed:
+            conn2, resp = self.request(port, 3)
+        self.assertIs(conn, conn2)
+        self.assertEqual(b'xxx', resp.read())
+        # the request sent again isn't checked again
+        self.assertEqual(1, mock_closed.call_count)
+        self.assertIsNone(conn2._replay)
+        self.assertEqual({'backend_connection.new': 1,
+                          'backend_connection.reused': 1,
+                          'backend_connection.retried': 1},
+                         self.logger.get_increment_counts())
+
+    def test_new_connection_not_retried(self):
+        port = self.start_server()
+        conn, resp = self.request(port, 1)
+        self.assertIsNone(conn._replay)
+        resp.read()
+        self.assertTrue(self.pool.release(conn, resp))
+        conn, resp = self.request(port, 1)
+        self.assertIsNone(conn._replay)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -24,6 +24,7 @@ from uuid import uuid4
 import six.moves.cPickle as pickle
 
 import base64
+import io
 import json
 import sqlite3
 import itertools
@@ -31,6 +32,8 @@ import time
 import random
 from mock import patch, MagicMock
 
+from eventlet import GreenPool
+from greenlet import GreenletExit
 from eventlet.timeout import Timeout
 from six.moves import range
 
@@ -41,11 +44,15 @@ from swift.common.constraints import \
     MAX_META_VALUE_LENGTH, MAX_META_COUNT, MAX_META_OVERALL_SIZE
 from swift.common.db import chexor, dict_factory, get_db_connection, \
     DatabaseBroker, DatabaseConnectionError, DatabaseAlreadyExists, \
-    GreenDBConnection, PICKLE_PROTOCOL, zero_like, TombstoneReclaimer
+    GreenDBConnection, PICKLE_PROTOCOL, zero_like, TombstoneReclaimer, \
+    encode_pending_record, decode_pending_entry, read_pending_entries, \
+    GroupCommitQueue, ConnectionPool
 from swift.common.utils import normalize_timestamp, mkdirs, Timestamp
 from swift.common.exceptions import LockTimeout
 from swift.common.swob import HTTPException
 
+from test import annotate_failure
+from test.debug_logger import debug_logger
 from test.unit import make_timestamp_iter, generate_db_path
 
 
@@ -72,6 +79,68 @@ class TestHelperFunctions(unittest.TestCase):
         if errors:
             self.fail('Some unexpected return values:\n' + '\n'.join(errors))
 
+    def test_encode_decode_pending_record(self):
+        record = (u'obj\u2603', '1700000000.00000', 12, 'text/plain',
+                  'etag', 0, 1, None, '1700000000.00001')
+        entry = encode_pending_record(record)
+        self.assertEqual(b'\xfe\x01', entry[:2])
+        self.assertLess(len(entry), len(base64.b64encode(
+            pickle.dumps(record, protocol=PICKLE_PROTOCOL))))
+        entries = list(read_pending_entries(io.BytesIO(entry)))
+        self.assertEqual([(1, entry[10:])], entries)
+        expected = record
+        if six.PY2:
+            expected = (u'obj\u2603',) + record[1:]
+        self.assertEqual(expected, decode_pending_entry(*entries[0]))
+
+        with self.assertRaises(ValueError) as cm:
+            decode_pending_entry(2, entry[10:])
+        self.assertEqual('Unsupported pending entry version 2',
+                         str(cm.exception))
+        with self.assertRaises(ValueError) as cm:
+            decode_pending_entry(None, b'junk')
+        self.assertEqual('Unparsable pending entry', str(cm.exception))
+
+    def test_read_pending_entries(self):
+        def legacy(record):
+            return b':' + base64.b64encode(pickle.dumps(
+                record, protocol=PICKLE_PROTOCOL))
+
+        binary = encode_pending_record(('binary', 1))
+        corrupt = binary[:-1] + b'X'
+        data = b''.join([
+            b'junk',
+            legacy(('legacy', 0)),
+            b'::',
+            binary,
+            legacy(('legacy', 2)),
+            corrupt,
+            encode_pending_record(('x' * 1000, 3)),
+            binary[:-1],  # torn write
+        ])
+        for chunk_size in (1, 7, 64, 65536):
+            with annotate_failure(chunk_size):
+                entries = list(read_pending_entries(
+                    io.BytesIO(data), chunk_size=chunk_size))
+                decoded = []
+                for version, entry in entries:
+                    try:
+                        decoded.append(decode_pending_entry(version, entry))
+                    except Exception:
+                        decoded.append((version, entry))
+                self.assertEqual([
+                    (None, b'junk'),
+                    ('legacy', 0),
+                    ('binary', 1),
+                    ('legacy', 2),
+                    (None, corrupt),
+                    ('x' * 1000, 3),
+                    (None, binary[:-1]),
+                ], decoded)
+
+        self.assertEqual([], list(read_pending_entries(io.BytesIO(b''))))
+        self.assertEqual([], list(read_pending_entries(io.BytesIO(b':'))))
+
 
 class TestDatabaseConnectionError(unittest.TestCase):
 
@@ -1608,6 +1677,346 @@ class TestDatabaseBroker(TestDbBase):
             pending = fd.read()
         self.assertFalse(pending)
 
+    def test_put_record_binary_pending(self):
+        db_file = os.path.join(self.testdir, '1.db')
+        broker = DatabaseBroker(db_file, logger=debug_logger())
+        broker._initialize = MagicMock()
+        broker.initialize(Timestamp.now())
+        broker.make_tuple_for_pickle = lambda x: (x.upper(), 1)
+
+        # an entry in the original format, left over from before the upgrade
+        broker.put_record('pinky')
+        with patch.object(swift.common.db, 'BINARY_PENDING', True):
+            broker.put_record('perky')
+        with open(broker.pending_file, 'rb') as fd:
+            pending = fd.read()
+        legacy = b':' + base64.b64encode(pickle.dumps(
+            ('PINKY', 1), protocol=PICKLE_PROTOCOL))
+        self.assertEqual(legacy + encode_pending_record(('PERKY', 1)),
+                         pending)
+
+        # both formats are committed
+        with patch.object(broker, 'merge_items') as mock_merge_items:
+            broker._commit_puts_load = lambda l, e: l.append(e)
+            broker._commit_puts(['direct'])
+        mock_merge_items.assert_called_once_with(
+            ['direct', ('PINKY', 1), ('PERKY', 1)])
+        self.assertEqual(0, os.path.getsize(broker.pending_file))
+        self.assertFalse(broker.logger.get_lines_for_level('error'))
+
+        # a corrupt entry is logged and skipped
+        with open(broker.pending_file, 'wb') as fd:
+            fd.write(encode_pending_record(('PINKY', 1))[:-1] + b'X')
+            fd.write(encode_pending_record(('PERKY', 1)))
+        with patch.object(broker, 'merge_items') as mock_merge_items:
+            broker._commit_puts()
+        mock_merge_items.assert_called_once_with([('PERKY', 1)])
+        self.assertEqual(1, len(broker.logger.get_lines_for_level('error')))
+        self.assertIn('Invalid pending entry',
+                      broker.logger.get_lines_for_level('error')[0])
+
+    def test_put_records(self):
+        db_file = os.path.join(self.testdir, '1.db')
+        broker = DatabaseBroker(db_file)
+        broker._initialize = MagicMock()
+        broker.initialize(Timestamp.now())
+        broker.make_tuple_for_pickle = lambda x: x.upper()
+
+        with patch('swift.common.db.fsync_file') as mock_fsync, \
+                patch('swift.common.db.fsync_dir') as mock_fsync_dir:
+            broker.put_records(['pinky', 'perky'])
+        mock_fsync.assert_not_called()
+        mock_fsync_dir.assert_not_called()
+        with patch('swift.common.db.fsync_file') as mock_fsync, \
+                patch('swift.common.db.fsync_dir') as mock_fsync_dir:
+            broker.put_records(['blinky'], fsync=True)
+        self.assertEqual(1, mock_fsync.call_count)
+        # the pending file already existed
+        mock_fsync_dir.assert_not_called()
+        with open(broker.pending_file, 'rb') as fd:
+            pending = fd.read()
+        self.assertEqual(['PINKY', 'PERKY', 'BLINKY'],
+                         [pickle.loads(base64.b64decode(i))
+                          for i in pending.split(b':')[1:]])
+
+        # pending file above cap
+        with open(broker.pending_file, 'ab') as fd:
+            fd.write(b'x' * (swift.common.db.PENDING_CAP + 1))
+        with patch.object(broker, '_commit_puts') as mock_commit_puts, \
+                patch('swift.common.db.fsync_file') as mock_fsync:
+            broker.put_records(('direct', 'commit'), fsync=True)
+        mock_commit_puts.assert_called_once_with(['direct', 'commit'])
+        mock_fsync.assert_not_called()
+
+        # the group commit queue is used for single records
+        queue = GroupCommitQueue()
+        broker.group_commit_queue = queue
+        with patch.object(queue, 'put_record') as mock_put_record:
+            broker.put_record('clyde')
+        mock_put_record.assert_called_once_with(broker, 'clyde')
+
+    def test_put_records_fsyncs_dir_of_new_pending_file(self):
+        db_file = os.path.join(self.testdir, '1.db')
+        broker = DatabaseBroker(db_file)
+        broker._initialize = MagicMock()
+        broker.initialize(Timestamp.now())
+        broker.make_tuple_for_pickle = lambda x: x
+        self.assertFalse(os.path.exists(broker.pending_file))
+
+        with patch('swift.common.db.fsync_file') as mock_fsync, \
+                patch('swift.common.db.fsync_dir') as mock_fsync_dir:
+            broker.put_records(['pinky'], fsync=True)
+        self.assertEqual(1, mock_fsync.call_count)
+        mock_fsync_dir.assert_called_once_with(
+            os.path.dirname(broker.pending_file))
+        self.assertTrue(os.path.exists(broker.pending_file))
+
+        # not on subsequent puts to the existing file
+        with patch('swift.common.db.fsync_file') as mock_fsync, \
+                patch('swift.common.db.fsync_dir') as mock_fsync_dir:
+            broker.put_records(['perky'], fsync=True)
+        self.assertEqual(1, mock_fsync.call_count)
+        mock_fsync_dir.assert_not_called()
+
+        # nor when fsync is not wanted
+        os.unlink(broker.pending_file)
+        with patch('swift.common.db.fsync_dir') as mock_fsync_dir:
+            broker.put_records(['blinky'])
+        mock_fsync_dir.assert_not_called()
+
+
+class TestGroupCommitQueue(TestDbBase):
+    def setUp(self):
+        super(TestGroupCommitQueue, self).setUp()
+        self.queue = GroupCommitQueue(max_batch_size=3)
+        self.broker = DatabaseBroker(
+            os.path.join(self.testdir, '1.db'),
+            group_commit_queue=self.queue)
+        self.broker._initialize = MagicMock()
+        self.broker.initialize(Timestamp.now())
+        self.broker.make_tuple_for_pickle = lambda x: x
+
+    def test_init(self):
+        queue = GroupCommitQueue()
+        self.assertEqual(100, queue.max_batch_size)
+        self.assertEqual(0, queue.max_delay)
+        self.assertTrue(queue.fsync)
+        queue = GroupCommitQueue(max_batch_size='0', max_delay='0.01',
+                                 fsync=False)
+        self.assertEqual(1, queue.max_batch_size)
+        self.assertEqual(0.01, queue.max_delay)
+        self.assertFalse(queue.fsync)
+
+    def test_put_record_batches(self):
+        calls = []
+        orig_put_records = self.broker.put_records
+
+        def fake_put_records(records, fsync=False):
+            calls.append((list(records), fsync))
+            orig_put_records(records, fsync=fsync)
+
+        pool = GreenPool()
+        with patch.object(self.broker, 'put_records', fake_put_records), \
+                patch('swift.common.db.fsync_file') as mock_fsync:
+            for i in range(5):
+                pool.spawn(self.broker.put_record, ('rec', i))
+            pool.waitall()
+            self.assertEqual({}, self.queue.queues)
+            # a lone record is written without waiting for others
+            self.broker.put_record(('rec', 5))
+        self.assertEqual([
+            ([('rec', 0), ('rec', 1), ('rec', 2)], True),
+            ([('rec', 3), ('rec', 4)], True),
+            ([('rec', 5)], True),
+        ], calls)
+        self.assertEqual(3, mock_fsync.call_count)
+        self.assertEqual({}, self.queue.queues)
+        with open(self.broker.pending_file, 'rb') as fd:
+            self.assertEqual(
+                [('rec', i) for i in range(6)],
+                [decode_pending_entry(version, entry)
+                 for version, entry in read_pending_entries(fd)])
+
+    def test_put_record_errors(self):
+        results = []
+
+        def put(record):
+            try:
+                self.broker.put_record(record)
+            except Exception as err:
+                results.append((record, err))
+            else:
+                results.append((record, None))
+
+        error = DatabaseConnectionError(self.broker.db_file, 'kaboom')
+        pool = GreenPool()
+        with patch.object(self.broker, 'put_records',
+                          side_effect=[error, None]):
+            for i in range(4):
+                pool.spawn(put, i)
+            pool.waitall()
+        self.assertEqual([(0, error), (1, error), (2, error), (3, None)],
+                         results)
+        self.assertEqual({}, self.queue.queues)
+
+        # LockTimeout is not an Exception
+        timeout = LockTimeout(1, self.broker.db_file)
+        timeout.cancel()
+        with patch.object(self.broker, 'put_records', side_effect=timeout):
+            with self.assertRaises(LockTimeout):
+                self.broker.put_record('x')
+        self.assertEqual({}, self.queue.queues)
+
+    def test_put_record_writer_killed(self):
+        results = []
+
+        def put(record):
+            try:
+                self.broker.put_record(record)
+            except BaseException as err:
+                results.append((record, type(err)))
+            else:
+                results.append((record, None))
+
+        # the writer is killed while writing the first batch; the records
+        # that were still queued are failed rather than left waiting
+        with patch.object(self.broker, 'put_records',
+                          side_effect=GreenletExit):
+            pool = GreenPool()
+            for i in range(5):
+                pool.spawn(put, i)
+            with Timeout(5):
+                pool.waitall()
+        self.assertEqual([(i, GreenletExit) for i in range(5)],
+                         sorted(results))
+        self.assertEqual({}, self.queue.queues)
+
+
+class TestConnectionPool(TestDbBase):
+    def setUp(self):
+        super(TestConnectionPool, self).setUp()
+        self.logger = debug_logger()
+        self.pool = ConnectionPool(max_size=2, logger=self.logger)
+
+    def _make_db(self, name):
+        db_file = os.path.join(self.testdir, name)
+        broker = DatabaseBroker(db_file)
+        broker._initialize = MagicMock()
+        broker.initialize(Timestamp.now())
+        return db_file
+
+    def _make_broker(self, db_file, **kwargs):
+        return DatabaseBroker(db_file, connection_pool=self.pool, **kwargs)
+
+    def _idle(self):
+        return dict((db_file, len(conns))
+                    for db_file, (_junk, conns) in self.pool._idle.items())
+
+    def test_connections_are_reused(self):
+        db_file = self._make_db('1.db')
+        with self._make_broker(db_file).get() as conn:
+            pass
+        self.assertIsNone(self._make_broker(db_file).conn)
+        self.assertEqual({db_file: 1}, self._idle())
+        broker = self._make_broker(db_file, timeout=5)
+        with broker.get() as conn2:
+            self.assertIs(conn, conn2)
+            self.assertEqual(5, conn2.timeout)
+            self.assertEqual({}, self._idle())
+        with broker.lock():
+            pass
+        with broker.get() as conn3:
+            self.assertIs(conn, conn3)
+        self.assertEqual({db_file: 1}, self._idle())
+        self.assertEqual({'db_connection_pool.miss': 1,
+                          'db_connection_pool.hit': 3},
+                         self.logger.get_increment_counts())
+
+    def test_concurrent_connections(self):
+        db_files = [self._make_db('%d.db' % i) for i in range(3)]
+        broker1 = self._make_broker(db_files[0])
+        broker2 = self._make_broker(db_files[0])
+        with broker1.get() as conn1, broker2.get() as conn2:
+            self.assertIsNot(conn1, conn2)
+        self.assertEqual({db_files[0]: 2}, self._idle())
+        # the connections to the least recently used db are closed first
+        with self._make_broker(db_files[1]).get() as conn3:
+            pass
+        self.assertEqual({db_files[1]: 1}, self._idle())
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn1.execute('SELECT 1')
+        with self._make_broker(db_files[2]).get():
+            pass
+        self.assertEqual({db_files[1]: 1, db_files[2]: 1}, self._idle())
+        with self._make_broker(db_files[1]).get() as conn:
+            self.assertIs(conn3, conn)
+
+    def test_connection_errors(self):
+        db_file = self._make_db('1.db')
+        broker = self._make_broker(db_file)
+        with self.assertRaises(ValueError):
+            with broker.get() as conn:
+                raise ValueError('boom')
+        self.assertEqual({}, self._idle())
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+    def test_replaced_and_unlinked_files(self):
+        db_file = self._make_db('1.db')
+        with self._make_broker(db_file).get() as conn:
+            conn.execute('INSERT INTO outgoing_sync (remote_id) VALUES (1)')
+            conn.commit()
+        self.assertEqual({db_file: 1}, self._idle())
+
+        # a connection is not reused once its file has been replaced...
+        os.rename(self._make_db('2.db'), db_file)
+        with self._make_broker(db_file).get() as conn2:
+            self.assertIsNot(conn, conn2)
+            self.assertEqual(0, conn2.execute(
+                'SELECT count(*) FROM outgoing_sync').fetchone()[0])
+        self.assertEqual({db_file: 1}, self._idle())
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+        # ...nor returned to the pool if it is replaced while in use
+        with self._make_broker(db_file).get() as conn3:
+            self.assertIs(conn2, conn3)
+            os.rename(self._make_db('3.db'), db_file)
+        self.assertEqual({}, self._idle())
+
+        # nor reused once its file has been unlinked
+        with self._make_broker(db_file).get() as conn4:
+            pass
+        self.assertEqual({db_file: 1}, self._idle())
+        os.unlink(db_file)
+        with self.assertRaises(DatabaseConnectionError):
+            with self._make_broker(db_file).get():
+                pass
+        self._make_db('1.db')
+        with self._make_broker(db_file).get() as conn5:
+            self.assertIsNot(conn4, conn5)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn4.execute('SELECT 1')
+
+        self.pool.invalidate(db_file)
+        self.assertEqual({}, self._idle())
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn5.execute('SELECT 1')
+
+    def test_quarantine(self):
+        db_dir = os.path.join(self.testdir, 'sda1', 'accounts', '1', 'abc',
+                              'abcdef')
+        mkdirs(db_dir)
+        db_file = self._make_db(os.path.join(db_dir, 'abcdef.db'))
+        broker = self._make_broker(db_file)
+        broker.db_type = 'account'
+        with broker.get():
+            pass
+        self.assertEqual({db_file: 1}, self._idle())
+        with self.assertRaises(sqlite3.DatabaseError):
+            broker.quarantine('testing')
+        self.assertEqual({}, self._idle())
+
 
 class TestTombstoneReclaimer(TestDbBase):
     def _make_object(self, broker, obj_name, ts, deleted):
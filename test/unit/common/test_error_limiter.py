@@ -12,11 +12,15 @@
 # implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
+import shutil
+import tempfile
 import unittest
 import mock
 from time import time
 
-from swift.common.error_limiter import ErrorLimiter
+from swift.common.error_limiter import ErrorLimiter, SharedErrorLimiter, \
+    SharedErrorTable
 from test.unit import FakeRing
 
 
@@ -97,3 +101,228 @@ class TestErrorLimiter(unittest.TestCase):
         node = self.ring.devs[0]
         expected = '%s:%s/%s' % (node['ip'], node['port'], node['device'])
         self.assertEqual(expected, limiter.node_key(node))
+
+
+class TestSharedErrorTable(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, 'error_limits')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def test_create(self):
+        with self.assertRaises(OSError):
+            SharedErrorTable(self.path, create=False)
+        table = SharedErrorTable(self.path, slots=10)
+        self.assertEqual(10, table.slots)
+        self.assertEqual(
+            SharedErrorTable.header.size + 10 * SharedErrorTable.slot.size,
+            os.path.getsize(self.path))
+        # an existing table keeps its size
+        other = SharedErrorTable(self.path, slots=20)
+        self.assertEqual(10, other.slots)
+        self.assertEqual(10, SharedErrorTable(self.path, create=False).slots)
+
+    def test_create_bad(self):
+        with self.assertRaises(ValueError):
+            SharedErrorTable(self.path, slots=0)
+        with open(self.path, 'wb') as fd:
+            fd.write(b'x' * 1024)
+        with self.assertRaises(ValueError):
+            SharedErrorTable(self.path)
+
+    def test_lookup(self):
+        table = SharedErrorTable(self.path, slots=4)
+        self.assertIsNone(table.lookup('a'))
+        index = table.lookup('a', create=True)
+        self.assertEqual(index, table.lookup('a'))
+        self.assertEqual((0, 0.0, 0.0), table.get(index))
+        table.set(index, 3, 100.0, 200.0)
+        self.assertEqual((3, 100.0, 200.0), table.get(index))
+        # another process mapping the table sees the same stats
+        other = SharedErrorTable(self.path)
+        self.assertEqual(index, other.lookup('a'))
+        self.assertEqual((3, 100.0, 200.0), other.get(index))
+
+        # fill the table
+        indexes = set([index])
+        for i, key in enumerate('bcd'):
+            indexes.add(table.lookup(key, create=True))
+            table.set(table.lookup(key), 1, 1000.0 + i, 0.0)
+        self.assertEqual(set(range(4)), indexes)
+        # when the table is full the slot of the node whose last error is
+        # oldest and is not limited is reused
+        now = time()
+        table.set(index, 3, 100.0, now + 60)
+        with mock.patch('swift.common.error_limiter.time',
+                        return_value=now):
+            new_index = table.lookup('e', create=True)
+        self.assertEqual(table.lookup('e'), new_index)
+        self.assertEqual((0, 0.0, 0.0), table.get(new_index))
+        self.assertEqual(index, table.lookup('a'))
+        self.assertIsNone(table.lookup('b'))
+
+    def test_set_checks_slot(self):
+        table = SharedErrorTable(self.path, slots=4)
+        index = table.lookup('a', create=True)
+        self.assertTrue(table.set(index, 3, 100.0, 200.0, key='a'))
+        self.assertEqual((3, 100.0, 200.0), table.get(index))
+        # the slot doesn't belong to another key
+        self.assertFalse(table.set(index, 5, 300.0, 400.0, key='b'))
+        self.assertEqual((3, 100.0, 200.0), table.get(index))
+        # the last error has changed
+        self.assertFalse(table.set(index, 0, 100.0, 0.0, key='a',
+                                   expected_last_error=99.0))
+        self.assertEqual((3, 100.0, 200.0), table.get(index))
+        self.assertTrue(table.set(index, 0, 100.0, 0.0, key='a',
+                                  expected_last_error=100.0))
+        self.assertEqual((0, 100.0, 0.0), table.get(index))
+
+    def test_limited_nodes(self):
+        table = SharedErrorTable(self.path, slots=10)
+        now = time()
+        table.set(table.lookup('1.2.3.4:6200/sda', create=True),
+                  11, now, now + 60)
+        table.set(table.lookup('1.2.3.4:6200/sdb', create=True),
+                  11, now - 120, now - 60)
+        table.set(table.lookup('1.2.3.4:6200/sdc', create=True),
+                  2, now, 0.0)
+        long_key = '1.2.3.4:6200/' + 'x' * 200
+        table.set(table.lookup(long_key, create=True), 11, now, now + 60)
+        with mock.patch('swift.common.error_limiter.time',
+                        return_value=now):
+            self.assertEqual({
+                '1.2.3.4:6200/sda': {'errors': 11,
+                                     'limited_until': now + 60},
+                long_key[:100]: {'errors': 11,
+                                 'limited_until': now + 60},
+            }, table.limited_nodes())
+
+
+class TestSharedErrorLimiter(unittest.TestCase):
+    def setUp(self):
+        self.ring = FakeRing()
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, 'error_limits')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def test_is_limited(self):
+        node = self.ring.devs[-1]
+        limiter = SharedErrorLimiter(60, 10, self.path)
+        other = SharedErrorLimiter(60, 10, self.path)
+
+        now = time()
+        with mock.patch('swift.common.error_limiter.time', return_value=now):
+            self.assertFalse(limiter.is_limited(node))
+            limiter.limit(node)
+            self.assertTrue(limiter.is_limited(node))
+            self.assertTrue(other.is_limited(node))
+            self.assertFalse(other.is_limited(self.ring.devs[0]))
+            self.assertEqual(
+                {limiter.node_key(node): {'errors': 11,
+                                          'limited_until': now + 60}},
+                other.table.limited_nodes())
+
+        with mock.patch('swift.common.error_limiter.time',
+                        return_value=now + 61):
+            self.assertFalse(other.is_limited(node))
+            self.assertFalse(limiter.is_limited(node))
+            self.assertEqual({}, limiter.table.limited_nodes())
+
+    def test_increment(self):
+        node = self.ring.devs[-1]
+        limiters = [SharedErrorLimiter(60, 10, self.path) for _ in range(2)]
+        now = time()
+        with mock.patch('swift.common.error_limiter.time', return_value=now):
+            # errors seen by each process count towards the limit
+            for i in range(10):
+                self.assertFalse(limiters[i % 2].increment(node))
+                self.assertFalse(limiters[0].is_limited(node))
+                self.assertFalse(limiters[1].is_limited(node))
+            self.assertTrue(limiters[0].increment(node))
+            self.assertTrue(limiters[1].is_limited(node))
+            index = limiters[1].table.lookup(limiters[1].node_key(node))
+            self.assertEqual((11, now, now + 60),
+                             limiters[1].table.get(index))
+
+        # Simulate time with no errors have gone by.
+        with mock.patch('swift.common.error_limiter.time',
+                        return_value=now + 61):
+            self.assertFalse(limiters[1].is_limited(node))
+            self.assertEqual((0, now, 0.0), limiters[0].table.get(index))
+            self.assertFalse(limiters[0].increment(node))
+            self.assertEqual((1, now + 61, 0.0),
+                             limiters[0].table.get(index))
+
+    def test_increment_slot_stolen(self):
+        node = self.ring.devs[-1]
+        limiter = SharedErrorLimiter(60, 10, self.path)
+        other = SharedErrorTable(self.path)
+        node_key = limiter.node_key(node)
+        index = limiter.table.lookup(node_key, create=True)
+        self.assertTrue(limiter.table.set(index, 5, 100.0, 0.0))
+
+        # another process reuses the node's slot for another node between
+        # our lookup and our write
+        orig_get = limiter.table.get
+        stolen = []
+
+        def steal_slot(index):
+            stats = orig_get(index)
+            if not stolen:
+                stolen.append(index)
+                other.slot.pack_into(other.mmap, other._offset(index),
+                                     other._hash('stealer'), 7, 200.0, 0.0,
+                                     b'stealer')
+            return stats
+
+        now = time()
+        with mock.patch.object(limiter.table, 'get', steal_slot), \
+                mock.patch('swift.common.error_limiter.time',
+                           return_value=now):
+            self.assertFalse(limiter.increment(node))
+        self.assertEqual([index], stolen)
+        # the other node's stats are untouched...
+        self.assertEqual(
+            (other._hash('stealer'), 7, 200.0, 0.0),
+            other.slot.unpack_from(other.mmap, other._offset(index))[:4])
+        # ...and the error was recorded in a new slot for the node
+        new_index = other.lookup(node_key)
+        self.assertNotEqual(index, new_index)
+        self.assertEqual((1, now, 0.0), other.get(new_index))
+
+    def test_increment_gives_up(self):
+        node = self.ring.devs[-1]
+        limiter = SharedErrorLimiter(60, 0, self.path)
+        with mock.patch.object(limiter.table, 'set',
+                               return_value=False) as mock_set:
+            self.assertFalse(limiter.increment(node))
+        self.assertEqual(limiter.max_update_attempts, mock_set.call_count)
+
+    def test_is_limited_keeps_new_error(self):
+        node = self.ring.devs[-1]
+        limiter = SharedErrorLimiter(60, 10, self.path)
+        other = SharedErrorLimiter(60, 10, self.path)
+        now = time()
+        with mock.patch('swift.common.error_limiter.time', return_value=now):
+            limiter.limit(node)
+        index = limiter.table.lookup(limiter.node_key(node))
+
+        # another process records an error while we decide that the old
+        # errors have expired
+        orig_get = limiter.table.get
+
+        def get_then_increment(index):
+            stats = orig_get(index)
+            other.increment(node)
+            return stats
+
+        with mock.patch('swift.common.error_limiter.time',
+                        return_value=now + 61), \
+                mock.patch.object(limiter.table, 'get', get_then_increment):
+            self.assertFalse(limiter.is_limited(node))
+        self.assertEqual((12, now + 61, now + 121),
+                         limiter.table.get(index))
@@ -0,0 +1,266 @@
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+import mock
+from collections import Counter
+from time import time
+
+from swift.common.latency_tracker import LatencyTracker, RequestBudget
+from test.unit import FakeRing
+
+
+class TestLatencyTracker(unittest.TestCase):
+    def setUp(self):
+        self.ring = FakeRing()
+
+    def test_init_config(self):
+        tracker = LatencyTracker(decay='0.5', expiry='300',
+                                 report_interval='5')
+        self.assertEqual(0.5, tracker.decay)
+        self.assertEqual(300.0, tracker.expiry)
+        self.assertEqual(5.0, tracker.report_interval)
+
+    def test_init_bad_config(self):
+        for decay in (0, 1.1, -0.5):
+            with self.assertRaises(ValueError):
+                LatencyTracker(decay=decay, expiry=300)
+        with self.assertRaises(ValueError):
+            LatencyTracker(decay='bad', expiry=300)
+        with self.assertRaises(ValueError):
+            LatencyTracker(decay=0.5, expiry='bad')
+
+    def test_moving_average(self):
+        node = self.ring.devs[-1]
+        tracker = LatencyTracker(decay=0.5, expiry=60)
+        self.assertEqual(0.0, tracker.score(node))
+
+        tracker.started(node)
+        tracker.finished(node, 1.0)
+        self.assertEqual(1.0, tracker.score(node))
+        tracker.started(node)
+        tracker.finished(node, 2.0)
+        self.assertEqual(1.5, tracker.score(node))
+        tracker.finished(node, 0.5)
+        self.assertEqual(1.0, tracker.score(node))
+        # outstanding count never goes negative
+        self.assertEqual(0, tracker.stats[tracker.node_key(node)][1])
+        # other devices on the same server are tracked separately
+        other = dict(node, device='other')
+        self.assertEqual(0.0, tracker.score(other))
+
+    def test_outstanding(self):
+        node = self.ring.devs[-1]
+        tracker = LatencyTracker(decay=0.5, expiry=60)
+        tracker.started(node)
+        tracker.finished(node, 1.0)
+        tracker.started(node)
+        tracker.started(node)
+        self.assertEqual(3.0, tracker.score(node))
+        self.assertEqual(2.0, tracker.score(node, outstanding_weight=0.5))
+        self.assertEqual(1.0, tracker.score(node, outstanding_weight=0))
+
+    def test_abandoned(self):
+        node = self.ring.devs[-1]
+        tracker = LatencyTracker(decay=0.5, expiry=60)
+        tracker.started(node)
+        tracker.finished(node, 1.0)
+        tracker.started(node)
+        self.assertEqual(2.0, tracker.score(node))
+        tracker.finished(node)
+        self.assertEqual(1.0, tracker.score(node))
+        self.assertEqual([1.0], list(tracker.stats[tracker.node_key(node)][4]))
+        # an abandoned request to an unknown node leaves it unknown
+        other = dict(node, device='other')
+        tracker.started(other)
+        tracker.finished(other)
+        self.assertEqual(0.0, tracker.score(other))
+
+    def test_failed(self):
+        nodes = self.ring.devs[:3]
+        tracker = LatencyTracker(decay=0.5, expiry=60)
+        for node in nodes:
+            tracker.started(node)
+            tracker.finished(node, 0.1)
+        tracker.started(nodes[0])
+        tracker.failed(nodes[0], 10.0)
+        self.assertEqual(5.05, tracker.score(nodes[0]))
+        self.assertEqual(0, tracker.stats[tracker.node_key(nodes[0])][1])
+        # the penalty isn't a recent latency
+        self.assertEqual(
+            0.1, tracker.percentile(nodes[0], 100, min_samples=1))
+        self.assertEqual(nodes[0], tracker.sort(list(nodes), choices=3)[-1])
+
+        # a node that has only ever failed isn't tried first
+        unknown = dict(nodes[0], device='unknown')
+        tracker.started(unknown)
+        tracker.failed(unknown, 10.0)
+        self.assertEqual(10.0, tracker.score(unknown))
+        self.assertIsNone(tracker.percentile(unknown, 100, min_samples=1))
+        self.assertEqual(unknown,
+                         tracker.sort(nodes + [unknown], choices=4)[-1])
+
+    def test_expiry(self):
+        node = self.ring.devs[-1]
+        tracker = LatencyTracker(decay=0.5, expiry=60)
+        now = time()
+        with mock.patch('swift.common.latency_tracker.time',
+                        return_value=now):
+            tracker.started(node)
+            tracker.finished(node, 1.0)
+        with mock.patch('swift.common.latency_tracker.time',
+                        return_value=now + 61):
+            # a new sample replaces an expired average
+            tracker.started(node)
+            tracker.finished(node, 3.0)
+            self.assertEqual(3.0, tracker.score(node))
+        with mock.patch('swift.common.latency_tracker.time',
+                        return_value=now + 100):
+            self.assertEqual(3.0, tracker.score(node, outstanding_weight=0))
+            tracker.started(node)
+            self.assertEqual(6.0, tracker.score(node))
+            tracker.finished(node, 1.0)
+        with mock.patch('swift.common.latency_tracker.time',
+                        return_value=now + 161):
+            self.assertEqual(0.0, tracker.score(node))
+            self.assertEqual({}, tracker.stats)
+
+    def test_report_due(self):
+        node = self.ring.devs[-1]
+        tracker = LatencyTracker(decay=0.5, expiry=60, report_interval=10)
+        now = time()
+        with mock.patch('swift.common.latency_tracker.time',
+                        return_value=now):
+            self.assertTrue(tracker.report_due(node))
+            self.assertFalse(tracker.report_due(node))
+            self.assertTrue(tracker.report_due(dict(node, device='other')))
+        with mock.patch('swift.common.latency_tracker.time',
+                        return_value=now + 11):
+            self.assertTrue(tracker.report_due(node))
+
+    def test_sort(self):
+        nodes = self.ring.devs[:3]
+        tracker = LatencyTracker(decay=0.5, expiry=60)
+        for node, latency in zip(nodes, (0.3, 0.1, 0.2)):
+            tracker.started(node)
+            tracker.finished(node, latency)
+
+        # with as many choices as nodes the sort is by score
+        to_sort = list(nodes)
+        self.assertIs(to_sort, tracker.sort(to_sort, choices=3))
+        self.assertEqual([nodes[1], nodes[2], nodes[0]], to_sort)
+        self.assertEqual([nodes[1], nodes[2], nodes[0]],
+                         tracker.sort(list(nodes), choices=10))
+
+        # with a single choice the order is random
+        with mock.patch('swift.common.latency_tracker.random.sample',
+                        side_effect=lambda seq, k: list(seq)[-k:]):
+            self.assertEqual([nodes[2], nodes[1], nodes[0]],
+                             tracker.sort(list(nodes), choices=1))
+
+        # with two choices the best node isn't always first, but the worst
+        # node never wins a comparison
+        firsts = Counter()
+        for _ in range(200):
+            sorted_nodes = tracker.sort(list(nodes))
+            self.assertEqual(nodes[0], sorted_nodes[-1])
+            firsts[sorted_nodes[0]['id']] += 1
+        self.assertEqual({nodes[1]['id'], nodes[2]['id']}, set(firsts))
+
+    def test_sort_unknown_nodes_first(self):
+        nodes = self.ring.devs[:3]
+        tracker = LatencyTracker(decay=0.5, expiry=60)
+        for node in nodes[:2]:
+            tracker.started(node)
+            tracker.finished(node, 0.1)
+        self.assertEqual(nodes[2], tracker.sort(list(nodes), choices=3)[0])
+
+    def test_percentile(self):
+        node = self.ring.devs[-1]
+        tracker = LatencyTracker(decay=0.5, expiry=60, sample_size=10)
+        self.assertIsNone(tracker.percentile(node, 95))
+        now = time()
+        with mock.patch('swift.common.latency_tracker.time',
+                        return_value=now):
+            for latency in range(1, 10):
+                tracker.started(node)
+                tracker.finished(node, float(latency))
+            # not enough samples yet
+            self.assertIsNone(tracker.percentile(node, 95))
+            self.assertEqual(9.0, tracker.percentile(node, 95, min_samples=9))
+            tracker.started(node)
+            tracker.finished(node, 10.0)
+            self.assertEqual(10.0, tracker.percentile(node, 95))
+            self.assertEqual(5.0, tracker.percentile(node, 50))
+            self.assertEqual(1.0, tracker.percentile(node, 0))
+            # only the most recent samples are kept
+            tracker.started(node)
+            tracker.finished(node, 0.5)
+            self.assertEqual(0.5, tracker.percentile(node, 0))
+            self.assertEqual(10.0, tracker.percentile(node, 100))
+        with mock.patch('swift.common.latency_tracker.time',
+                        return_value=now + 61):
+            # samples expire with the moving average
+            self.assertIsNone(tracker.percentile(node, 95))
+            tracker.started(node)
+            tracker.finished(node, 2.0)
+            self.assertEqual(2.0, tracker.percentile(node, 95, min_samples=1))
+
+
+class TestRequestBudget(unittest.TestCase):
+    def test_init_bad_config(self):
+        for ratio in (-0.1, 1.1, 'bad'):
+            with self.assertRaises(ValueError):
+                RequestBudget(ratio)
+
+    def test_spend_and_deposit(self):
+        budget = RequestBudget(0.5, burst=2)
+        self.assertEqual(2.0, budget.tokens)
+        self.assertTrue(budget.spend())
+        self.assertTrue(budget.spend())
+        self.assertFalse(budget.spend())
+        budget.deposit()
+        self.assertFalse(budget.spend())
+        budget.deposit()
+        self.assertTrue(budget.spend())
+        self.assertFalse(budget.spend())
+        # deposits never exceed the burst
+        for _ in range(10):
+            budget.deposit()
+        self.assertEqual(2.0, budget.tokens)
+
+    def test_refund(self):
+        budget = RequestBudget(0.5, burst=2)
+        self.assertTrue(budget.spend())
+        self.assertTrue(budget.spend())
+        self.assertFalse(budget.spend())
+        budget.refund()
+        self.assertEqual(1.0, budget.tokens)
+        self.assertTrue(budget.spend())
+        # refunds never exceed the burst
+        budget.refund()
+        budget.refund()
+        budget.refund()
+        self.assertEqual(2.0, budget.tokens)
+
+    def test_zero_ratio(self):
+        budget = RequestBudget(0, burst=1)
+        self.assertTrue(budget.spend())
+        for _ in range(100):
+            budget.deposit()
+            self.assertFalse(budget.spend())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,6 +18,7 @@
 import itertools
 from collections import defaultdict
 import errno
+import json
 import io
 import logging
 import six
@@ -895,6 +896,89 @@ class TestMemcached(unittest.TestCase):
         self.assertEqual(memcache_client.get('some_key0'), [7, 8, 9])
         self.assertIn(key, mock2.cache)
 
+    def test_get_many(self):
+        memcache_client = memcached.MemcacheRing(['1.2.3.4:11211',
+                                                  '1.2.3.5:11211'],
+                                                 logger=self.logger)
+        mock1 = MockMemcached()
+        mock2 = MockMemcached()
+        memcache_client._client_cache['1.2.3.4:11211'] = MockedMemcachePool(
+            [(mock1, mock1)] * 10)
+        memcache_client._client_cache['1.2.3.5:11211'] = MockedMemcachePool(
+            [(mock2, mock2)] * 10)
+        self.assertEqual({}, memcache_client.get_many([]))
+
+        # MemcacheRing will put 'some_key0' on server 1.2.3.5:11211 and
+        # 'some_key1' on '1.2.3.4:11211'
+        memcache_client.set('some_key0', [1, 2, 3])
+        memcache_client.set('some_key1', {'a': 'b'})
+        memcache_client.set('some_key2', b'raw', serialize=False)
+        self.logger.clear()
+        with patch.object(mock1, 'handle_get', wraps=mock1.handle_get), \
+                patch.object(mock2, 'handle_get', wraps=mock2.handle_get):
+            self.assertEqual({
+                'some_key0': [1, 2, 3],
+                'some_key1': {'a': 'b'},
+                'some_key2': b'raw',
+                'not_exists': None,
+            }, memcache_client.get_many(
+                ['some_key0', 'some_key1', 'some_key2', 'not_exists']))
+            # one command per server
+            self.assertEqual(1, mock1.handle_get.call_count)
+            self.assertEqual(1, mock2.handle_get.call_count)
+            self.assertEqual(4, len(mock1.handle_get.call_args[0]) +
+                             len(mock2.handle_get.call_args[0]))
+        self.assertEqual(['memcached.get_many.timing'], [
+            call[0][0] for call in self.logger.log_dict['timing_since']])
+
+        # if a server is down, its keys are looked for on the next server
+        mock2.down = True
+        self.assertEqual({
+            'some_key0': None,
+            'some_key1': {'a': 'b'},
+        }, memcache_client.get_many(['some_key0', 'some_key1']))
+        self.assertIn('Error talking to memcached: 1.2.3.5:11211',
+                      self.logger.get_lines_for_level('error')[0])
+
+        # ... and if they're all down, they're misses, unless asked to raise
+        mock1.down = True
+        self.assertEqual({
+            'some_key0': None,
+            'some_key1': None,
+        }, memcache_client.get_many(['some_key0', 'some_key1']))
+        with self.assertRaises(MemcacheConnectionError):
+            memcache_client.get_many(['some_key0', 'some_key1'],
+                                     raise_on_error=True)
+
+    def test_get_many_server_down(self):
+        servers = ['1.2.3.4:11211', '1.2.3.5:11211', '1.2.3.6:11211']
+        memcache_client = memcached.MemcacheRing(servers, logger=self.logger)
+        mocks = {}
+        for server in servers:
+            mocks[server] = MockMemcached()
+            memcache_client._client_cache[server] = MockedMemcachePool(
+                [(mocks[server], mocks[server])] * 50)
+        down = mocks['1.2.3.4:11211']
+        down.down = True
+        keys = ['some_key%d' % i for i in range(20)]
+        expected = {}
+        for key in keys:
+            memcache_client.set(key, key)
+            expected[key] = key
+        # the keys of the down server were set on their own next servers,
+        # which aren't all the same server
+        self.assertEqual(set(['1.2.3.5:11211', '1.2.3.6:11211']), set(
+            server for server in servers[1:]
+            if any(md5hash(key) in mocks[server].cache for key in keys)))
+        self.assertEqual({}, down.cache)
+        self.assertEqual(expected, memcache_client.get_many(keys))
+
+        # likewise once the server is error limited
+        memcache_client._error_limited['1.2.3.4:11211'] = time.time() + 60
+        self.logger.clear()
+        self.assertEqual(expected, memcache_client.get_many(keys))
+        self.assertFalse(self.logger.get_lines_for_level('error'))
+
     def test_serialization(self):
         memcache_client = memcached.MemcacheRing(['1.2.3.4:11211'],
                                                  logger=self.logger)
@@ -910,6 +994,68 @@ class TestMemcached(unittest.TestCase):
         mock.cache[key] = (b'1',) + mock.cache[key][1:]
         self.assertIsNone(memcache_client.get('some_key'))
 
+    def test_serializers(self):
+        value = {'name': u'\N{SNOWMAN}', 'bounds': [['', 'a'], ['b', 'c']]}
+        flags, data = memcached.JSONSerializer().dumps(value)
+        self.assertEqual(memcached.JSON_FLAG, flags)
+        self.assertEqual(json.dumps(value).encode('ascii'), data)
+        self.assertEqual(value, memcached.deserialize(b'2', data))
+
+        flags, compact = memcached.CompactJSONSerializer().dumps(value)
+        self.assertEqual(memcached.JSON_FLAG, flags)
+        self.assertLess(len(compact), len(data))
+        self.assertEqual(value, memcached.deserialize(b'2', compact))
+
+        for serializer_class in (memcached.JSONSerializer,
+                                 memcached.CompactJSONSerializer):
+            serializer = serializer_class(compress_threshold=len(data))
+            flags, compressed = serializer.dumps(value)
+            if serializer_class is memcached.JSONSerializer:
+                self.assertEqual(memcached.COMPRESSED_JSON_FLAGS, flags)
+                # which clients that don't know about compression take for
+                # a pickled value, and so a miss, rather than failing to
+                # parse it as JSON
+                self.assertTrue(flags & memcached.PICKLE_FLAG)
+                self.assertFalse(flags & memcached.JSON_FLAG)
+            else:
+                # the compact JSON is below the threshold
+                self.assertEqual(memcached.JSON_FLAG, flags)
+            self.assertEqual(value, memcached.deserialize(flags, compressed))
+
+        # values that aren't serialized by us are left alone
+        self.assertEqual(b'raw', memcached.deserialize(b'0', b'raw'))
+        self.assertIsNone(memcached.deserialize(b'1', b'pickled'))
+
+    def test_set_get_compressed(self):
+        serializer = memcached.CompactJSONSerializer(compress_threshold=100)
+        memcache_client = memcached.MemcacheRing(['1.2.3.4:11211'],
+                                                 logger=self.logger,
+                                                 serializer=serializer)
+        mock = MockMemcached()
+        memcache_client._client_cache['1.2.3.4:11211'] = MockedMemcachePool(
+            [(mock, mock)] * 2)
+        bounds = [['shard-%04d' % i, '.shards_a/c-%04d' % i]
+                  for i in range(100)]
+        memcache_client.set('big_key', bounds)
+        memcache_client.set('small_key', [1, 2, 3])
+        memcache_client.set_multi({'big_key2': bounds}, 'big_key2')
+        self.assertEqual(bounds, memcache_client.get('big_key'))
+        self.assertEqual([1, 2, 3], memcache_client.get('small_key'))
+        self.assertEqual(
+            {'big_key': bounds, 'big_key2': bounds, 'small_key': [1, 2, 3]},
+            memcache_client.get_many(['big_key', 'big_key2', 'small_key']))
+        big_flags, _junk, big_data = mock.cache[md5hash('big_key')]
+        self.assertEqual(b'5', big_flags)  # COMPRESSED_JSON_FLAGS
+        self.assertLess(len(big_data), len(json.dumps(bounds)) // 4)
+        self.assertEqual((b'5', b'0', big_data),
+                         mock.cache[md5hash('big_key2')])
+        self.assertEqual((b'2', b'0', b'[1,2,3]'),
+                         mock.cache[md5hash('small_key')])
+
+        # a client configured with the default serializer can read them
+        memcache_client.serializer = memcached.JSONSerializer()
+        self.assertEqual(bounds, memcache_client.get('big_key'))
+
     def test_connection_pooling(self):
         with patch('swift.common.memcached.socket') as mock_module:
             def mock_getaddrinfo(host, port, family=socket.AF_INET,
@@ -1570,6 +1716,58 @@ class TestLoadMemcache(unittest.TestCase):
             memcache._client_cache['6.7.8.9:10'].max_size, 5)
         self.assertEqual(memcache.item_size_warning_threshold, 75)
 
+    def test_conf_inline_serialization(self):
+        with mock.patch.object(memcached, 'ConfigParser', get_config_parser()):
+            memcache = memcached.load_memcache({
+                'memcache_servers': '6.7.8.9:10',
+            }, self.logger)
+        self.assertIsInstance(memcache.serializer, memcached.JSONSerializer)
+        self.assertNotIsInstance(memcache.serializer,
+                                 memcached.CompactJSONSerializer)
+        self.assertEqual(-1, memcache.serializer.compress_threshold)
+
+        with mock.patch.object(memcached, 'ConfigParser', get_config_parser()):
+            memcache = memcached.load_memcache({
+                'memcache_servers': '6.7.8.9:10',
+                'serialization_format': 'Compact_JSON',
+                'compress_threshold': '4096',
+                'compress_level': '6',
+            }, self.logger)
+        self.assertIsInstance(memcache.serializer,
+                              memcached.CompactJSONSerializer)
+        self.assertEqual(4096, memcache.serializer.compress_threshold)
+        self.assertEqual(6, memcache.serializer.compress_level)
+
+        with mock.patch.object(memcached, 'ConfigParser', get_config_parser()):
+            with self.assertRaises(ValueError) as err:
+                memcached.load_memcache({
+                    'memcache_servers': '6.7.8.9:10',
+                    'serialization_format': 'pickle',
+                }, self.logger)
+        self.assertIn("Unknown serialization_format 'pickle'",
+                      str(err.exception))
+
+        for level in ('-1', '0', '9'):
+            with mock.patch.object(memcached, 'ConfigParser',
+                                   get_config_parser()):
+                memcache = memcached.load_memcache({
+                    'memcache_servers': '6.7.8.9:10',
+                    'compress_level': level,
+                }, self.logger)
+            self.assertEqual(int(level), memcache.serializer.compress_level)
+
+        for options, msg in (
+                ({'compress_level': '10'}, "compress_level must be"),
+                ({'compress_level': '-2'}, "compress_level must be"),
+                ({'compress_threshold': '-2'}, "compress_threshold must be"),
+                ({'compress_level': 'fast'}, "invalid literal")):
+            options['memcache_servers'] = '6.7.8.9:10'
+            with mock.patch.object(memcached, 'ConfigParser',
+                                   get_config_parser()):
+                with self.assertRaises(ValueError) as err:
+                    memcached.load_memcache(options, self.logger)
+            self.assertIn(msg, str(err.exception))
+
     def test_conf_inline_ratelimiting(self):
         with mock.patch.object(memcached, 'ConfigParser', get_config_parser()):
             memcache = memcached.load_memcache({
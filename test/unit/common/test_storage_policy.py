@@ -1129,8 +1129,9 @@ class TestStoragePolicies(unittest.TestCase):
         class NamedFakeRing(FakeRing):
 
             def __init__(self, swift_dir, reload_time=15, ring_name=None,
-                         validation_hook=None):
+                         validation_hook=None, background_reload=False):
                 self.ring_name = ring_name
+                self.background_reload = background_reload
                 super(NamedFakeRing, self).__init__()
 
         with mock.patch('swift.common.storage_policy.Ring',
@@ -1141,6 +1142,15 @@ class TestStoragePolicies(unittest.TestCase):
                 self.assertEqual(ring.ring_name, policy.ring_name)
                 self.assertTrue(policy.object_ring)
                 self.assertTrue(isinstance(policy.object_ring, NamedFakeRing))
+                self.assertFalse(policy.object_ring.background_reload)
+                policy.load_ring('/path/not/used', background_reload=True)
+                self.assertTrue(policy.object_ring.background_reload)
+
+        policies[0].object_ring = None
+        with mock.patch('swift.common.storage_policy.Ring',
+                        new=NamedFakeRing):
+            policies[0].load_ring('/path/not/used', background_reload=True)
+        self.assertTrue(policies[0].object_ring.background_reload)
 
         def blow_up(*args, **kwargs):
             raise Exception('kaboom!')
@@ -5340,6 +5340,8 @@ class TestStatsdLoggingDelegation(unittest.TestCase):
         self.assertIsNone(logger.timing_since('foo', 8948, 0.57))
         self.assertIsNone(logger.timing_since('foo', 849398,
                                               sample_rate=0.61))
+        self.assertIsNone(logger.gauge('foo', 88))
+        self.assertIsNone(logger.gauge('foo', 88, sample_rate=0.61))
         # Now, the queue should be empty (no UDP packets sent)
         self.assertRaises(Empty, self.queue.get_nowait)
 
@@ -5359,6 +5361,8 @@ class TestStatsdLoggingDelegation(unittest.TestCase):
                                time.time())
         self.assertStat('some-name.another.counter:42|c',
                         self.logger.update_stats, 'another.counter', 42)
+        self.assertStat('some-name.some.gauge:12.5|g',
+                        self.logger.gauge, 'some.gauge', 12.5)
 
         # Each call can override the sample_rate (also, bonus prefix test)
         with warnings.catch_warnings():
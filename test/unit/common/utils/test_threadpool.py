@@ -0,0 +1,206 @@
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for swift.common.utils.threadpool"""
+
+import os
+import sys
+import traceback
+import unittest
+
+import mock
+from eventlet import GreenPool, sleep
+
+from swift.common.exceptions import ThreadPoolDead
+from swift.common.utils import threadpool
+
+
+class TestThreadPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tp = None
+
+    def tearDown(self):
+        if self.tp:
+            self.tp.terminate()
+
+    def _pipe_count(self):
+        # Counts the number of pipes that this process owns.
+        fd_dir = "/proc/%d/fd" % os.getpid()
+
+        def is_pipe(path):
+            try:
+                stat_result = os.stat(path)
+                return stat_result.st_mode & 0o010000 != 0
+            except OSError:
+                return False
+
+        return len([fd for fd in os.listdir(fd_dir)
+                    if is_pipe(os.path.join(fd_dir, fd))])
+
+    def _thread_id(self):
+        return threadpool.stdlib_threading.current_thread().ident
+
+    def _capture_args(self, *args, **kwargs):
+        return {'args': args, 'kwargs': kwargs}
+
+    def _raise_valueerror(self):
+        return int('fishcakes')
+
+    def test_run_in_thread_with_threads(self):
+        tp = self.tp = threadpool.ThreadPool(1)
+
+        my_id = self._thread_id()
+        other_id = tp.run_in_thread(self._thread_id)
+        self.assertNotEqual(my_id, other_id)
+
+        result = tp.run_in_thread(self._capture_args, 1, 2, bert='ernie')
+        self.assertEqual(result, {'args': (1, 2),
+                                  'kwargs': {'bert': 'ernie'}})
+
+        caught = False
+        try:
+            tp.run_in_thread(self._raise_valueerror)
+        except ValueError:
+            caught = True
+        self.assertTrue(caught)
+
+    def test_force_run_in_thread_with_threads(self):
+        # with nthreads > 0, force_run_in_thread looks just like
+        # run_in_thread
+        tp = self.tp = threadpool.ThreadPool(1)
+
+        my_id = self._thread_id()
+        other_id = tp.force_run_in_thread(self._thread_id)
+        self.assertNotEqual(my_id, other_id)
+
+        result = tp.force_run_in_thread(self._capture_args, 1, 2,
+                                        bert='ernie')
+        self.assertEqual(result, {'args': (1, 2),
+                                  'kwargs': {'bert': 'ernie'}})
+        self.assertRaises(ValueError, tp.force_run_in_thread,
+                          self._raise_valueerror)
+
+    def test_run_in_thread_without_threads(self):
+        # with zero threads, run_in_thread doesn't actually do so
+        tp = threadpool.ThreadPool(0)
+
+        my_id = self._thread_id()
+        other_id = tp.run_in_thread(self._thread_id)
+        self.assertEqual(my_id, other_id)
+
+        result = tp.run_in_thread(self._capture_args, 1, 2, bert='ernie')
+        self.assertEqual(result, {'args': (1, 2),
+                                  'kwargs': {'bert': 'ernie'}})
+        self.assertRaises(ValueError, tp.run_in_thread,
+                          self._raise_valueerror)
+
+    def test_force_run_in_thread_without_threads(self):
+        # with zero threads, force_run_in_thread uses eventlet.tpool
+        tp = threadpool.ThreadPool(0)
+
+        with mock.patch('eventlet.tpool.execute',
+                        side_effect=lambda f, *a, **kw: f(*a, **kw)) \
+                as mock_execute:
+            result = tp.force_run_in_thread(self._capture_args, 1, 2,
+                                            bert='ernie')
+        self.assertEqual(result, {'args': (1, 2),
+                                  'kwargs': {'bert': 'ernie'}})
+        self.assertEqual([mock.call(self._capture_args, 1, 2,
+                                    bert='ernie')],
+                         mock_execute.call_args_list)
+
+        my_id = self._thread_id()
+        other_id = tp.force_run_in_thread(self._thread_id)
+        self.assertNotEqual(my_id, other_id)
+
+    def test_preserving_stack_trace_from_thread(self):
+        def gamma():
+            return 1 / 0  # ZeroDivisionError
+
+        def beta():
+            return gamma()
+
+        def alpha():
+            return beta()
+
+        tp = self.tp = threadpool.ThreadPool(1)
+        try:
+            tp.run_in_thread(alpha)
+        except ZeroDivisionError:
+            # NB: format is (filename, line number, function name, text)
+            tb_func = [elem[2] for elem
+                       in traceback.extract_tb(sys.exc_info()[2])]
+        else:
+            self.fail("Expected ZeroDivisionError")
+
+        self.assertEqual(tb_func[-1], "gamma")
+        self.assertEqual(tb_func[-2], "beta")
+        self.assertEqual(tb_func[-3], "alpha")
+        # omit the middle; what's important is that the start and end are
+        # included, not the exact names of helper methods
+        self.assertEqual(tb_func[1], "run_in_thread")
+        self.assertEqual(tb_func[0], "test_preserving_stack_trace_from_thread")
+
+    def test_queue_depth(self):
+        tp = self.tp = threadpool.ThreadPool(1)
+        release = threadpool.stdlib_threading.Event()
+        self.assertEqual(0, tp.queue_depth)
+        self.assertEqual(0, tp.pending)
+
+        pool = GreenPool()
+        for _ in range(3):
+            pool.spawn(tp.run_in_thread, release.wait)
+        # one call is running, the others are waiting for the thread
+        for _ in range(100):
+            if tp.queue_depth == 2:
+                break
+            sleep(0.01)
+        self.assertEqual(3, tp.pending)
+        self.assertEqual(2, tp.queue_depth)
+        release.set()
+        pool.waitall()
+        self.assertEqual(0, tp.pending)
+        self.assertEqual(0, tp.queue_depth)
+
+    def test_terminate(self):
+        initial_thread_count = threadpool.stdlib_threading.active_count()
+        initial_pipe_count = self._pipe_count()
+
+        pool = threadpool.ThreadPool(4)
+        pool.run_in_thread(lambda: 10)
+
+        self.assertEqual(initial_thread_count + 4,
+                         threadpool.stdlib_threading.active_count())
+        self.assertEqual(initial_pipe_count + 2, self._pipe_count())
+
+        pool.terminate()
+        self.assertEqual(initial_thread_count,
+                         threadpool.stdlib_threading.active_count())
+        self.assertEqual(initial_pipe_count, self._pipe_count())
+        self.assertRaises(ThreadPoolDead, pool.run_in_thread, lambda: 1)
+        self.assertRaises(ThreadPoolDead, pool.force_run_in_thread,
+                          lambda: 1)
+
+    def test_cant_run_after_terminate_without_threads(self):
+        pool = threadpool.ThreadPool(0)
+        pool.terminate()
+        self.assertRaises(ThreadPoolDead, pool.run_in_thread, lambda: 1)
+        self.assertRaises(ThreadPoolDead, pool.force_run_in_thread,
+                          lambda: 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,9 +36,10 @@ import six
 from swift.common.exceptions import LockTimeout
 from swift.container.backend import ContainerBroker, \
     update_new_item_from_existing, UNSHARDED, SHARDING, SHARDED, \
-    COLLAPSED, SHARD_LISTING_STATES, SHARD_UPDATE_STATES, sift_shard_ranges
+    COLLAPSED, SHARD_LISTING_STATES, SHARD_UPDATE_STATES, sift_shard_ranges, \
+    ContainerStatsCache, get_db_version
 from swift.common.db import DatabaseAlreadyExists, GreenDBConnection, \
-    TombstoneReclaimer, GreenDBCursor
+    TombstoneReclaimer, GreenDBCursor, ConnectionPool
 from swift.common.request_helpers import get_reserved_name
 from swift.common.utils import Timestamp, encode_timestamps, hash_path, \
     ShardRange, make_db_file_path, md5, ShardRangeList
@@ -2194,6 +2195,54 @@ class TestContainerBroker(test_db.TestDbBase):
         }
         self.assertEqual(policy_stats, expected)
 
+    def test_stats_cache(self):
+        ts = make_timestamp_iter()
+        logger = debug_logger()
+        stats_cache = ContainerStatsCache(logger=logger)
+        db_path = self.get_db_path()
+
+        def make_broker():
+            return ContainerBroker(db_path, account='a', container='c',
+                                   stats_cache=stats_cache)
+
+        broker = make_broker()
+        broker.initialize(next(ts).internal, 0)
+        info = broker.get_info()
+        policy_stats = broker.get_policy_stats()
+        self.assertFalse(broker.has_multiple_policies())
+        self.assertEqual({'stats_cache.miss': 3},
+                         logger.get_increment_counts())
+
+        # a new broker gets the stats from the cache without using the db
+        broker = make_broker()
+        with mock.patch.object(broker, 'get',
+                               side_effect=AssertionError('db was used')):
+            self.assertEqual(info, broker.get_info())
+            self.assertEqual(policy_stats, broker.get_policy_stats())
+            self.assertFalse(broker.has_multiple_policies())
+            # callers get their own copies of the stats
+            broker.get_info()['object_count'] = 99
+            broker.get_policy_stats()[0]['object_count'] = 99
+            self.assertEqual(info, broker.get_info())
+            self.assertEqual(policy_stats, broker.get_policy_stats())
+        self.assertEqual({'stats_cache.miss': 3, 'stats_cache.hit': 7},
+                         logger.get_increment_counts())
+        self.assertEqual('c', broker.container)
+        self.assertEqual(0, broker.storage_policy_index)
+
+        # changes to the db are seen by the next broker
+        broker.put_object('o', next(ts).internal, 123, 'text/plain',
+                          EMPTY_ETAG)
+        broker = make_broker()
+        self.assertEqual(1, broker.get_info()['object_count'])
+        self.assertEqual({0: {'object_count': 1, 'bytes_used': 123}},
+                         broker.get_policy_stats())
+        broker.reported(next(ts).internal, '0', 1, 123)
+        broker = make_broker()
+        self.assertEqual(1, broker.get_info()['reported_object_count'])
+        self.assertEqual({'stats_cache.miss': 6, 'stats_cache.hit': 7},
+                         logger.get_increment_counts())
+
     @patch_policies
     def test_policy_stat_tracking(self):
         ts = make_timestamp_iter()
@@ -3197,6 +3246,43 @@ class TestContainerBroker(test_db.TestDbBase):
         self.assertEqual([row[0] for row in listing],
                          ['/'])
 
+    def test_list_objects_iter_skips_runs_of_subdirs(self):
+        broker = ContainerBroker(self.get_db_path(), account='a',
+                                 container='c')
+        broker.initialize(Timestamp('1').internal, 0)
+        for name in ('a/1', 'a/2', 'b/1', 'c/1', 'c/2/3', 'c-obj', 'd/1',
+                     'e/1', 'e/2', 'f', 'g/1'):
+            broker.put_object(name, Timestamp(0).internal, 0, 'text/plain',
+                              'd41d8cd98f00b204e9800998ecf8427e')
+        broker.put_object('b/2', Timestamp(0).internal, 0, 'text/plain',
+                          'd41d8cd98f00b204e9800998ecf8427e',
+                          storage_policy_index=1)
+        broker.put_object('h/1', Timestamp(0).internal, 0, 'text/plain',
+                          'd41d8cd98f00b204e9800998ecf8427e', deleted=1)
+
+        def do_test(expected, expected_skips, *args, **kwargs):
+            with mock.patch.object(broker, '_skip_subdirs',
+                                   wraps=broker._skip_subdirs) as mock_skip:
+                listing = broker.list_objects_iter(*args, **kwargs)
+            self.assertEqual(expected, [row[0] for row in listing])
+            self.assertEqual(expected_skips, mock_skip.call_count)
+
+        do_test(['a/', 'b/', 'c-obj', 'c/', 'd/', 'e/', 'f', 'g/'], 3,
+                100, '', '', '', '/')
+        do_test(['g/', 'f', 'e/', 'd/', 'c/', 'c-obj', 'b/', 'a/'], 3,
+                100, '', '', '', '/', reverse=True)
+        do_test(['a/', 'b/'], 1, 2, '', '', '', '/')
+        do_test(['g/', 'f', 'e/'], 2, 3, '', '', '', '/', reverse=True)
+        do_test(['b/', 'c-obj', 'c/'], 2, 3, 'a/', '', '', '/')
+        do_test(['d/', 'e/', 'f'], 1, 100, 'c/', 'g', '', '/')
+        do_test(['e/', 'd/', 'c/'], 1, 100, 'f', 'c-obj', '', '/',
+                reverse=True)
+        do_test(['c/1', 'c/2/'], 1, 100, '', '', 'c/', '/')
+        do_test(['b/'], 1, 100, '', '', '', '/', storage_policy_index=1)
+        do_test(['a/', 'b/', 'c-obj', 'c/', 'd/', 'e/', 'f', 'g/', 'h/'], 3,
+                100, '', '', '', '/', include_deleted=None)
+        do_test(['c-obj', 'f'], 0, 100, '', '', None, None, path='')
+
     def test_list_objects_iter_order_and_reverse(self):
         # Test ContainerBroker.list_objects_iter
         broker = ContainerBroker(self.get_db_path(), account='a',
@@ -5101,6 +5187,27 @@ class TestContainerBroker(test_db.TestDbBase):
             'database', lines[0])
         self.assertFalse(lines[1:])
 
+    @with_tempdir
+    def test_set_sharded_state_connection_pool(self, tempdir):
+        retiring_db_path = os.path.join(
+            tempdir, 'containers', 'part', 'suffix', 'hash', 'container.db')
+        pool = ConnectionPool()
+        broker = ContainerBroker(retiring_db_path, account='a', container='c',
+                                 connection_pool=pool)
+        broker.initialize(next(self.ts).internal, 0)
+        broker.enable_sharding(next(self.ts))
+        self.assertTrue(broker.set_sharding_state())
+        sub_brokers = broker.get_brokers()
+        self.assertEqual([pool, pool],
+                         [b.connection_pool for b in sub_brokers])
+        for sub_broker in sub_brokers:
+            sub_broker.get_info()
+        self.assertEqual([retiring_db_path, broker.db_file],
+                         sorted(pool._idle))
+        self.assertTrue(broker.set_sharded_state())
+        # connections to the unlinked retiring db are closed
+        self.assertEqual([broker.db_file], list(pool._idle))
+
     @with_tempdir
     def test_set_sharded_state_errors(self, tempdir):
         retiring_db_path = os.path.join(
@@ -6616,6 +6723,49 @@ class TestUpdateNewItemFromExisting(unittest.TestCase):
 
 
 class TestModuleFunctions(unittest.TestCase):
+    @with_tempdir
+    def test_get_db_version(self, tempdir):
+        db_path = os.path.join(tempdir, 'c.db')
+        self.assertIsNone(get_db_version(db_path))
+        broker = ContainerBroker(db_path, account='a', container='c')
+        broker.initialize(Timestamp.now().internal, 0)
+        version = get_db_version(db_path)
+        self.assertEqual(version, get_db_version(db_path))
+        # every transaction changes the version, even if it changes neither
+        # the size nor the mtime of the file
+        st = os.stat(db_path)
+        broker.reported('1', '0', 1, 1)
+        os.utime(db_path, (st.st_atime, st.st_mtime))
+        self.assertEqual(st.st_size, os.path.getsize(db_path))
+        self.assertNotEqual(version, get_db_version(db_path))
+
+    def test_container_stats_cache(self):
+        logger = debug_logger()
+        cache = ContainerStatsCache(max_size=2, logger=logger)
+        self.assertIsNone(cache.get('a.db', 1, 'info'))
+        cache.set('a.db', 1, 'info', {'object_count': 1})
+        cache.set('a.db', 1, 'multiple_policies', False)
+        self.assertEqual({'object_count': 1}, cache.get('a.db', 1, 'info'))
+        self.assertIs(False, cache.get('a.db', 1, 'multiple_policies'))
+        self.assertIsNone(cache.get('a.db', 1, 'policy_stats'))
+        # a new version of the db discards all of the stats of the old one
+        self.assertIsNone(cache.get('a.db', 2, 'info'))
+        cache.set('a.db', 2, 'info', {'object_count': 2})
+        self.assertEqual({'object_count': 2}, cache.get('a.db', 2, 'info'))
+        self.assertIsNone(cache.get('a.db', 2, 'multiple_policies'))
+        self.assertIsNone(cache.get('a.db', 1, 'info'))
+        self.assertEqual({'stats_cache.hit': 3, 'stats_cache.miss': 5},
+                         logger.get_increment_counts())
+
+        # the least recently used db is evicted
+        cache.set('a.db', 1, 'info', {'object_count': 1})
+        cache.set('b.db', 1, 'info', {'object_count': 3})
+        cache.get('a.db', 1, 'info')
+        cache.set('c.db', 1, 'info', {'object_count': 4})
+        self.assertEqual({'object_count': 1}, cache.get('a.db', 1, 'info'))
+        self.assertIsNone(cache.get('b.db', 1, 'info'))
+        self.assertEqual({'object_count': 4}, cache.get('c.db', 1, 'info'))
+
     def test_sift_shard_ranges(self):
         ts_iter = make_timestamp_iter()
         existing_shards = {}
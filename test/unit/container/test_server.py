@@ -28,7 +28,7 @@ from shutil import rmtree
 from tempfile import mkdtemp
 from xml.dom import minidom
 
-from eventlet import spawn, Timeout
+from eventlet import GreenPool, spawn, Timeout
 import json
 import six
 from six import StringIO
@@ -40,6 +40,7 @@ from swift.common.swob import (Request, WsgiBytesIO, HTTPNoContent,
                                bytes_to_wsgi)
 import swift.container
 from swift.container import server as container_server
+from swift.container.backend import ContainerBroker
 from swift.common import constraints
 from swift.common.utils import (Timestamp, mkdirs, public, replication,
                                 storage_directory, lock_parent_directory,
@@ -273,6 +274,62 @@ class TestContainerController(unittest.TestCase):
         req.get_response(self.controller)
         self._test_head(Timestamp(start, offset=1), ts)
 
+    def test_HEAD_stats_cache(self):
+        self.assertIsNone(self.controller.stats_cache)
+        self.controller = container_server.ContainerController(
+            {'devices': self.testdir, 'mount_check': 'false',
+             'stats_cache_size': '10'},
+            logger=self.logger)
+        self.assertEqual(10, self.controller.stats_cache.max_size)
+        req = Request.blank('/sda1/p/a/c', method='PUT', headers={
+            'X-Timestamp': next(self.ts).internal})
+        self.assertEqual(201, req.get_response(self.controller).status_int)
+
+        def do_head():
+            req = Request.blank('/sda1/p/a/c', method='HEAD')
+            resp = req.get_response(self.controller)
+            self.assertEqual(204, resp.status_int)
+            return int(resp.headers['X-Container-Object-Count'])
+
+        self.assertEqual(0, do_head())
+        counts = self.logger.get_increment_counts()
+        self.assertEqual(0, do_head())
+        # the second HEAD gets all of the stats it needs from the cache
+        new_counts = self.logger.get_increment_counts()
+        self.assertEqual(counts['stats_cache.miss'],
+                         new_counts['stats_cache.miss'])
+        self.assertGreater(new_counts['stats_cache.hit'],
+                           counts.get('stats_cache.hit', 0))
+
+        req = Request.blank(
+            '/sda1/p/a/c/o', method='PUT',
+            headers={'X-Timestamp': next(self.ts).internal, 'X-Size': '1',
+                     'X-Content-Type': 'text/plain', 'X-Etag': 'x'})
+        self._update_object_put_headers(req)
+        self.assertEqual(201, req.get_response(self.controller).status_int)
+        self.assertEqual(1, do_head())
+
+    def test_db_connection_pool(self):
+        self.assertIsNone(self.controller.connection_pool)
+        self.controller = container_server.ContainerController(
+            {'devices': self.testdir, 'mount_check': 'false',
+             'db_connection_pool_size': '4'},
+            logger=self.logger)
+        pool = self.controller.connection_pool
+        self.assertEqual(4, pool.max_size)
+        req = Request.blank('/sda1/p/a/c', method='PUT', headers={
+            'X-Timestamp': next(self.ts).internal})
+        self.assertEqual(201, req.get_response(self.controller).status_int)
+        self.logger.clear()
+        for i in range(3):
+            req = Request.blank('/sda1/p/a/c', method='GET')
+            self.assertEqual(204, req.get_response(self.controller).status_int)
+        counts = self.logger.get_increment_counts()
+        self.assertEqual(1, counts['db_connection_pool.miss'])
+        self.assertGreater(counts['db_connection_pool.hit'], 2)
+        self.assertEqual([1], [len(conns)
+                               for _junk, conns in pool._idle.values()])
+
     def test_HEAD_not_found(self):
         req = Request.blank('/sda1/p/a/c', method='HEAD')
         resp = req.get_response(self.controller)
@@ -568,6 +625,58 @@ class TestContainerController(unittest.TestCase):
             resp = req.get_response(self.controller)
             self.assertEqual(resp.status_int, 202)
 
+    def test_PUT_obj_group_commit(self):
+        self.assertIsNone(self.controller.group_commit_queue)
+        self.controller = container_server.ContainerController(
+            {'devices': self.testdir, 'mount_check': 'false',
+             'group_commit': 'true', 'group_commit_max_batch_size': '10',
+             'group_commit_max_delay': '0.001'},
+            logger=self.logger)
+        queue = self.controller.group_commit_queue
+        self.assertEqual(10, queue.max_batch_size)
+        self.assertEqual(0.001, queue.max_delay)
+        self.assertTrue(queue.fsync)
+
+        req = Request.blank('/sda1/p/a/c', method='PUT', headers={
+            'X-Timestamp': next(self.ts).internal})
+        resp = req.get_response(self.controller)
+        self.assertEqual(201, resp.status_int)
+
+        def put_obj(i):
+            req = Request.blank(
+                '/sda1/p/a/c/o%d' % i, method='PUT',
+                headers={'X-Timestamp': next(self.ts).internal,
+                         'X-Size': str(i), 'X-Content-Type': 'text/plain',
+                         'X-Etag': 'x'})
+            self._update_object_put_headers(req)
+            return req.get_response(self.controller).status_int
+
+        calls = []
+        orig_put_records = ContainerBroker.put_records
+
+        def fake_put_records(broker, records, fsync=False):
+            calls.append((len(records), fsync))
+            return orig_put_records(broker, records, fsync=fsync)
+
+        pool = GreenPool()
+        with mock.patch.object(ContainerBroker, 'put_records',
+                               fake_put_records), \
+                mock.patch('swift.common.db.fsync_file') as mock_fsync:
+            statuses = list(pool.imap(put_obj, range(15)))
+        self.assertEqual([201] * 15, statuses)
+        self.assertEqual([(10, True), (5, True)], calls)
+        self.assertEqual(2, mock_fsync.call_count)
+        self.assertEqual({}, queue.queues)
+
+        req = Request.blank('/sda1/p/a/c', method='GET',
+                            headers={'Accept': 'application/json'})
+        resp = req.get_response(self.controller)
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual(sorted('o%d' % i for i in range(15)),
+                         [obj['name'] for obj in json.loads(resp.body)])
+        self.assertEqual(sum(range(15)),
+                         int(resp.headers['X-Container-Bytes-Used']))
+
     def test_PUT_obj_not_found(self):
         req = Request.blank(
             '/sda1/p/a/c/o', environ={'REQUEST_METHOD': 'PUT'},
@@ -40,7 +40,7 @@ from contextlib import closing, contextmanager
 from gzip import GzipFile
 import pyeclib.ec_iface
 
-from eventlet import hubs, timeout, tpool
+from eventlet import hubs, patcher, sleep, timeout, tpool
 from swift.obj.diskfile import MD5_OF_EMPTY_STRING, update_auditor_status
 from test import BaseTestCase
 from test.debug_logger import debug_logger
@@ -59,7 +59,7 @@ from swift.common.exceptions import DiskFileNotExist, DiskFileQuarantined, \
     DiskFileDeviceUnavailable, DiskFileDeleted, DiskFileNotOpen, \
     DiskFileError, ReplicationLockTimeout, DiskFileCollision, \
     DiskFileExpired, SwiftException, DiskFileNoSpace, \
-    DiskFileXattrNotSupported, PartitionLockTimeout
+    DiskFileXattrNotSupported, PartitionLockTimeout, LockTimeout
 from swift.common.storage_policy import (
     POLICIES, get_policy_string, StoragePolicy, ECStoragePolicy, REPL_POLICY,
     EC_POLICY, PolicyError)
@@ -963,6 +963,46 @@ class TestObjectAuditLocationGenerator(unittest.TestCase):
             locations.sort()
             self.assertEqual(locations, expected)
 
+    def test_finding_of_hashdirs_with_hashes_index(self):
+        with temptree([]) as tmpdir:
+            part_path = os.path.join(tmpdir, "sdp", "objects", "1519")
+            hash_paths = [
+                os.path.join(part_path, "aca",
+                             "5c1fdc1ffb12e5eaf84edc30d8b67aca"),
+                os.path.join(part_path, "aca",
+                             "fdfd184d39080020bc8b487f8a7beaca"),
+                os.path.join(part_path, "df2",
+                             "b0fe7af831cc7b1af5bf486b1c841df2")]
+            for path in hash_paths:
+                os.makedirs(path)
+            logger = debug_logger()
+
+            def get_locations():
+                diskfile.clear_auditor_status(tmpdir, "objects")
+                return sorted(
+                    loc.path for loc in
+                    diskfile.object_audit_location_generator(
+                        devices=tmpdir, datadir="objects", mount_check=False,
+                        logger=logger, use_hashes_index=True))
+
+            # the first walk lists the partition and indexes it...
+            self.assertEqual(hash_paths, get_locations())
+            self.assertEqual({
+                'aca': {'5c1fdc1ffb12e5eaf84edc30d8b67aca',
+                        'fdfd184d39080020bc8b487f8a7beaca'},
+                'df2': {'b0fe7af831cc7b1af5bf486b1c841df2'},
+            }, diskfile.read_hashes_index(part_path))
+
+            # ... after that the index is used
+            os.makedirs(os.path.join(part_path, "ca5",
+                                     "4a943bc72c2e647c4675923d58cf4ca5"))
+            with mock.patch('swift.obj.diskfile.listdir',
+                            wraps=diskfile.listdir) as mock_listdir:
+                self.assertEqual(hash_paths, get_locations())
+            self.assertNotIn(mock.call(part_path),
+                             mock_listdir.call_args_list)
+            self.assertFalse(logger.get_lines_for_level('warning'))
+
     def test_skipping_unmounted_devices(self):
         with temptree([]) as tmpdir, mock_check_drive() as mocks:
             mocks['ismount'].side_effect = lambda path: path.endswith('sdp')
@@ -1213,6 +1253,70 @@ class TestDiskFileRouter(unittest.TestCase):
                       str(cm.exception))
 
 
+class TestDeviceThreadPools(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.logger = debug_logger()
+        self.conf = {'recon_cache_path': self.tmpdir,
+                     'threadpool_recon_interval': '0'}
+
+    def tearDown(self):
+        rmtree(self.tmpdir, ignore_errors=True)
+
+    @patch_policies(test_policies)
+    def test_shared_by_managers(self):
+        self.conf['threads_per_disk'] = '2'
+        df_router = diskfile.DiskFileRouter(self.conf, self.logger)
+        threadpools = df_router[POLICIES[0]].threadpools
+        self.assertIsInstance(threadpools, diskfile.DeviceThreadPools)
+        self.assertEqual(2, threadpools.threads_per_disk)
+        self.assertIs(threadpools, df_router[POLICIES[1]].threadpools)
+
+    def test_no_threads(self):
+        threadpools = diskfile.DeviceThreadPools({}, self.logger)
+        self.assertEqual(0, threadpools.threads_per_disk)
+        self.assertEqual(30, threadpools.recon_interval)
+        with mock.patch('swift.obj.diskfile.spawn_n') as mock_spawn:
+            pool = threadpools['sda1']
+        self.assertIs(pool, threadpools['sda1'])
+        self.assertEqual(0, pool.nthreads)
+        self.assertFalse(mock_spawn.called)
+        self.assertEqual({}, threadpools.get_stats())
+
+    def test_dump_recon(self):
+        self.conf['threads_per_disk'] = '3'
+        threadpools = diskfile.DeviceThreadPools(self.conf, self.logger)
+        for device in ('sda1', 'sda2'):
+            self.addCleanup(threadpools[device].terminate)
+        threadpools['sda1'].pending = 5
+        with mock.patch.object(threadpools['sda1']._run_queue, 'qsize',
+                               return_value=2):
+            self.assertEqual({
+                'sda1': {'threads': 3, 'queue_depth': 2, 'in_progress': 3},
+                'sda2': {'threads': 3, 'queue_depth': 0, 'in_progress': 0},
+            }, threadpools.get_stats())
+        threadpools['sda1'].pending = 0
+
+        threadpools.recon_interval = 30
+        rcache = os.path.join(self.tmpdir, 'object.recon')
+        utils.dump_recon_cache({'object_server_threadpools': {
+            '1': {'devices': {}, 'updated': 1000},
+            '2': {'devices': {}, 'updated': 700},
+            '3': 'junk',
+        }}, rcache, self.logger)
+        with mock.patch('swift.obj.diskfile.os.getpid', return_value=4), \
+                mock.patch('swift.obj.diskfile.time.time',
+                           return_value=1001):
+            threadpools.dump_recon()
+        stats = {'threads': 3, 'queue_depth': 0, 'in_progress': 0}
+        self.assertEqual({
+            '1': {'devices': {}, 'updated': 1000},
+            '4': {'devices': {'sda1': stats, 'sda2': stats},
+                  'updated': 1001},
+        }, utils.load_recon_cache(rcache)['object_server_threadpools'])
+
+
 class BaseDiskFileTestMixin(object):
     """
     Bag of helpers that are useful in the per-policy DiskFile test classes,
@@ -2140,6 +2244,150 @@ class DiskFileManagerMixin(BaseDiskFileTestMixin):
         self.assertTrue(os.path.exists(os.path.join(
             self.testdir, self.existing_device, 'objects', '0')))
 
+    def test_yield_hashes_with_hashes_index(self):
+        self.conf['hashes_index'] = 'yes'
+        df_mgr = self.mgr_cls(self.conf, self.logger)
+        part_path = os.path.join(
+            self.testdir, self.existing_device, 'objects', '0')
+        df1 = df_mgr.get_diskfile(
+            self.existing_device, 0, 'a', 'c', 'o1', POLICIES[0])
+        df1.delete(next(self._ts_iter))
+        df1_hash = utils.hash_path('a', 'c', 'o1')
+        # the partition isn't indexed until it is walked
+        self.assertIsNone(diskfile.read_hashes_index(part_path))
+        hashes = list(df_mgr.yield_hashes(
+            self.existing_device, '0', POLICIES[0]))
+        self.assertEqual([df1_hash], [hash_ for hash_, _ in hashes])
+        self.assertEqual({df1_hash[-3:]: {df1_hash}},
+                         diskfile.read_hashes_index(part_path))
+
+        # objects are indexed as they are written
+        df2 = df_mgr.get_diskfile(
+            self.existing_device, 0, 'a', 'c', 'o2', POLICIES[0])
+        df2.delete(next(self._ts_iter))
+        df2_hash = utils.hash_path('a', 'c', 'o2')
+        expected = {}
+        for hash_ in (df1_hash, df2_hash):
+            expected.setdefault(hash_[-3:], set()).add(hash_)
+        self.assertEqual(expected, diskfile.read_hashes_index(part_path))
+
+        # and the partition and suffix dirs are no longer listed
+        with mock.patch('os.listdir', wraps=os.listdir) as mock_listdir:
+            hashes = dict(df_mgr.yield_hashes(
+                self.existing_device, '0', POLICIES[0]))
+        self.assertEqual({df1_hash, df2_hash}, set(hashes))
+        self.assertEqual(sorted([df1._datadir, df2._datadir]), sorted(
+            call[0][0] for call in mock_listdir.call_args_list))
+
+        # unless indexes are disabled, though the index is kept up to date
+        df3 = self.df_mgr.get_diskfile(
+            self.existing_device, 0, 'a', 'c', 'o3', POLICIES[0])
+        df3.delete(next(self._ts_iter))
+        df3_hash = utils.hash_path('a', 'c', 'o3')
+        expected.setdefault(df3_hash[-3:], set()).add(df3_hash)
+        self.assertEqual(expected, diskfile.read_hashes_index(part_path))
+        with mock.patch('os.listdir', wraps=os.listdir) as mock_listdir:
+            hashes = dict(self.df_mgr.yield_hashes(
+                self.existing_device, '0', POLICIES[0]))
+        self.assertEqual({df1_hash, df2_hash, df3_hash}, set(hashes))
+        self.assertIn(mock.call(part_path), mock_listdir.call_args_list)
+
+    def test_index_object_hash_remembers_unindexed_partitions(self):
+        part_path = os.path.join(
+            self.testdir, self.existing_device, 'objects', '0')
+        hashes = []
+
+        def write(name):
+            df = self.df_mgr.get_diskfile(
+                self.existing_device, 0, 'a', 'c', name, POLICIES[0])
+            df.delete(next(self._ts_iter))
+            hashes.append(utils.hash_path('a', 'c', name))
+            return df
+
+        now = time()
+        with mock.patch('swift.obj.diskfile.time.time', return_value=now), \
+                mock.patch('swift.obj.diskfile.index_object_hash',
+                           wraps=diskfile.index_object_hash) as mock_index:
+            write('o1')
+            write('o2')
+        # the partition has no index, and that is remembered
+        self.assertEqual(1, mock_index.call_count)
+        self.assertEqual(
+            {part_path: now + diskfile.HASHES_INDEX_ABSENT_TIME},
+            self.df_mgr._unindexed_partitions)
+
+        # another process indexes the partition; our writes aren't indexed
+        # until we look again
+        diskfile.finish_hashes_index(
+            part_path, diskfile.start_hashes_index(part_path), {})
+        with mock.patch('swift.obj.diskfile.time.time',
+                        return_value=now + 1):
+            write('o3')
+        self.assertEqual({}, diskfile.read_hashes_index(part_path))
+        with mock.patch('swift.obj.diskfile.time.time',
+                        return_value=now + 1 +
+                        diskfile.HASHES_INDEX_ABSENT_TIME):
+            write('o4')
+        self.assertEqual({hashes[3][-3:]: {hashes[3]}},
+                         diskfile.read_hashes_index(part_path))
+        self.assertEqual({}, self.df_mgr._unindexed_partitions)
+
+        # a rehash always looks for the index, and corrects it
+        self.df_mgr._unindexed_partitions[part_path] = \
+            now + 2 * diskfile.HASHES_INDEX_ABSENT_TIME
+        suffixes = set(hash_[-3:] for hash_ in hashes)
+        with mock.patch('swift.obj.diskfile.time.time',
+                        return_value=now + 2):
+            self.df_mgr.get_hashes(self.existing_device, '0', suffixes,
+                                   POLICIES[0])
+        expected = {}
+        for hash_ in hashes:
+            expected.setdefault(hash_[-3:], set()).add(hash_)
+        self.assertEqual(expected, diskfile.read_hashes_index(part_path))
+        self.assertEqual({}, self.df_mgr._unindexed_partitions)
+
+        # as does building an index in this process
+        self.df_mgr._unindexed_partitions[part_path] = \
+            now + 2 * diskfile.HASHES_INDEX_ABSENT_TIME
+        self.df_mgr.start_hashes_index(part_path)
+        self.assertEqual({}, self.df_mgr._unindexed_partitions)
+
+    def test_unindexed_partitions_bounded(self):
+        objects_path = os.path.join(
+            self.testdir, self.existing_device, 'objects')
+        unindexed = self.df_mgr._unindexed_partitions
+
+        def index(part, at):
+            with mock.patch('swift.obj.diskfile.time.time',
+                            return_value=at):
+                self.df_mgr.index_object_hash(os.path.join(
+                    objects_path, str(part), 'abc',
+                    'd41d8cd98f00b204e9800998ecf8eabc'))
+
+        now = time()
+        with mock.patch('swift.obj.diskfile.HASHES_INDEX_ABSENT_MAX_ENTRIES',
+                        3):
+            for part in range(10):
+                index(part, now)
+                self.assertLessEqual(len(unindexed), 3)
+            self.assertEqual([os.path.join(objects_path, str(part))
+                              for part in (7, 8, 9)], list(unindexed))
+
+            # expired entries are dropped as others are added...
+            index(10, now + diskfile.HASHES_INDEX_ABSENT_TIME)
+            self.assertEqual([os.path.join(objects_path, '10')],
+                             list(unindexed))
+            # ... or when they are next looked up
+            with mock.patch('swift.obj.diskfile.index_object_hash',
+                            return_value=True):
+                index(10, now + 2 * diskfile.HASHES_INDEX_ABSENT_TIME)
+            self.assertEqual({}, unindexed)
+
+        # rehashing doesn't remember partitions with no index
+        self.df_mgr.reindex_suffix(os.path.join(objects_path, '0', 'abc'),
+                                   [])
+        self.assertEqual({}, unindexed)
+
     def test_yield_hashes_empty_suffixes(self):
         def _listdir(path):
             return []
@@ -4073,6 +4321,27 @@ class DiskFileMixin(BaseDiskFileTestMixin):
         except SwiftException as err:
             self.fail("Unexpected swift exception raised: %r" % err)
 
+    def test_threads_per_disk(self):
+        self.conf['threads_per_disk'] = '1'
+        self.conf['threadpool_recon_interval'] = '0'
+        self.df_router = diskfile.DiskFileRouter(self.conf, self.logger)
+        threadpools = self.df_router[POLICIES.default].threadpools
+        pool = threadpools[self.existing_device]
+        self.addCleanup(pool.terminate)
+        self.assertEqual(1, pool.nthreads)
+        with mock.patch.object(pool, '_run_in_worker',
+                               wraps=pool._run_in_worker) as mock_run:
+            df, data = self._create_test_file(b'1234567890')
+            self.assertIs(pool, df._threadpool)
+            self.assertEqual(data, b''.join(df.reader()))
+        called = set(call[0][0].__name__
+                     for call in mock_run.call_args_list)
+        # the object was written, opened and read in the device's thread
+        self.assertEqual(set(), {'_finalize_put', '_open', 'read'} - called)
+        self.assertEqual({self.existing_device: {
+            'threads': 1, 'queue_depth': 0, 'in_progress': 0,
+        }}, threadpools.get_stats())
+
     def test_get_metadata(self):
         timestamp = self.ts().internal
         df, df_data = self._create_test_file(b'1234567890',
@@ -7669,6 +7938,166 @@ class TestSuffixHashes(unittest.TestCase):
             }
             self.assertEqual(open_log, expected)
 
+    def test_invalidate_hash_metrics(self):
+        for policy in self.iter_policies():
+            self.logger.clear()
+            df_mgr = self.df_router[policy]
+            self.assertIsNone(df_mgr.hash_invalidation_batcher)
+            df = df_mgr.get_diskfile('sda1', '0', 'a', 'c', 'o',
+                                     policy=policy)
+            df.delete(self.ts())
+            df.delete(self.ts())
+            self.assertEqual({'hash_invalidation.flushes': 2,
+                              'hash_invalidation.suffixes': 2},
+                             self.logger.get_stats_counts())
+            self.assertEqual(
+                ['hash_invalidation.lock_wait'] * 2,
+                [call[0][0] for call in self.logger.log_dict['timing']])
+
+    def _call_in_real_thread(self, func, *args):
+        errors = []
+
+        def call():
+            try:
+                func(*args)
+            except BaseException as err:
+                errors.append(err)
+
+        thread = patcher.original('threading').Thread(target=call)
+        thread.start()
+        thread.join()
+        if errors:
+            raise errors[0]
+
+    def test_invalidate_hash_batched(self):
+        self.conf['batch_hash_invalidations'] = 'yes'
+        self.df_router = diskfile.DiskFileRouter(self.conf, self.logger)
+        orig_append = diskfile.append_hash_invalidations
+        # the writers that are batched are real threads
+        threading = patcher.original('threading')
+        flushing = threading.Event()
+        release = threading.Event()
+
+        def slow_append(partition_dir, suffixes):
+            flushing.set()
+            release.wait()
+            return orig_append(partition_dir, suffixes)
+
+        def invalidate(suffix_dir):
+            try:
+                df_mgr.invalidate_hash(suffix_dir)
+            except Exception as err:
+                errors.append(err)
+
+        for policy in self.iter_policies():
+            self.logger.clear()
+            flushing.clear()
+            release.clear()
+            errors = []
+            df_mgr = self.df_router[policy]
+            batcher = df_mgr.hash_invalidation_batcher
+            part_path = os.path.join(self.devices, 'sda1',
+                                     diskfile.get_data_dir(policy), '0')
+            suffixes = ['%03x' % i for i in range(10)]
+            with mock.patch('swift.obj.diskfile.append_hash_invalidations',
+                            side_effect=slow_append) as mock_append, \
+                    mock.patch.object(batcher, '_sleep') as mock_sleep:
+                threads = [
+                    threading.Thread(target=invalidate, args=(
+                        os.path.join(part_path, suffix),))
+                    for suffix in suffixes]
+                # the first invalidation is flushed on its own...
+                threads[0].start()
+                self.assertTrue(flushing.wait(5))
+                # ... while the rest join the next batch
+                for thread in threads[1:]:
+                    thread.start()
+                for _ in range(500):
+                    batch = batcher._open_batches.get(part_path)
+                    if batch and len(batch.suffixes) == 9:
+                        break
+                    sleep(0.01)
+                else:
+                    self.fail('Invalidations were not batched')
+                release.set()
+                for thread in threads:
+                    thread.join()
+            # nothing polls while waiting for a batch
+            self.assertFalse(mock_sleep.called)
+            self.assertEqual([], errors)
+            self.assertEqual([mock.call(part_path, suffixes[:1]),
+                              mock.call(part_path, suffixes[1:])],
+                             mock_append.call_args_list)
+            with open(os.path.join(
+                    part_path, diskfile.HASH_INVALIDATIONS_FILE)) as fp:
+                self.assertEqual(suffixes, fp.read().splitlines())
+            self.assertEqual({'hash_invalidation.flushes': 2,
+                              'hash_invalidation.suffixes': 10},
+                             self.logger.get_stats_counts())
+            self.assertEqual({}, batcher._open_batches)
+            self.assertEqual(set(), batcher._flushing)
+
+    def test_invalidate_hash_batched_error(self):
+        self.conf['batch_hash_invalidations'] = 'yes'
+        self.conf['hash_invalidation_max_delay'] = '0.01'
+        self.df_router = diskfile.DiskFileRouter(self.conf, self.logger)
+        for policy in self.iter_policies():
+            df_mgr = self.df_router[policy]
+            batcher = df_mgr.hash_invalidation_batcher
+            self.assertEqual(0.01, batcher.max_delay)
+            part_path = os.path.join(self.devices, 'sda1',
+                                     diskfile.get_data_dir(policy), '0')
+            suffix_dir = os.path.join(part_path, 'abc')
+            with mock.patch('swift.obj.diskfile.lock_path',
+                            side_effect=LockTimeout):
+                with self.assertRaises(LockTimeout):
+                    self._call_in_real_thread(
+                        df_mgr.invalidate_hash, suffix_dir)
+            self.assertEqual({}, batcher._open_batches)
+            self.assertEqual(set(), batcher._flushing)
+            # a flusher that is interrupted fails its batch without raising
+            # its own Timeout in the other writers
+            with mock.patch.object(batcher, '_sleep',
+                                   side_effect=timeout.Timeout):
+                with self.assertRaises(timeout.Timeout):
+                    self._call_in_real_thread(
+                        df_mgr.invalidate_hash, suffix_dir)
+            self.assertEqual({}, batcher._open_batches)
+            self.assertEqual(set(), batcher._flushing)
+            # and the next invalidation is written, after a real sleep
+            with mock.patch('swift.obj.diskfile.sleep') as mock_green_sleep, \
+                    mock.patch.object(batcher, '_sleep',
+                                      wraps=batcher._sleep) as mock_sleep:
+                self._call_in_real_thread(df_mgr.invalidate_hash, suffix_dir)
+            mock_green_sleep.assert_not_called()
+            mock_sleep.assert_called_once_with(0.01)
+            with open(os.path.join(
+                    part_path, diskfile.HASH_INVALIDATIONS_FILE)) as fp:
+                self.assertEqual(['abc'], fp.read().splitlines())
+
+    def test_invalidate_hash_batcher_greenthreads(self):
+        self.conf['batch_hash_invalidations'] = 'yes'
+        self.conf['hash_invalidation_max_delay'] = '10'
+        self.df_router = diskfile.DiskFileRouter(self.conf, self.logger)
+        for policy in self.iter_policies():
+            self.logger.clear()
+            df_mgr = self.df_router[policy]
+            batcher = df_mgr.hash_invalidation_batcher
+            part_path = os.path.join(self.devices, 'sda1',
+                                     diskfile.get_data_dir(policy), '0')
+            # greenthreads don't wait for a batch, they append at once
+            with mock.patch.object(batcher, '_sleep') as mock_sleep:
+                df_mgr.invalidate_hash(os.path.join(part_path, 'abc'))
+                df_mgr.invalidate_hash(os.path.join(part_path, 'def'))
+            self.assertFalse(mock_sleep.called)
+            self.assertEqual({}, batcher._open_batches)
+            with open(os.path.join(
+                    part_path, diskfile.HASH_INVALIDATIONS_FILE)) as fp:
+                self.assertEqual(['abc', 'def'], fp.read().splitlines())
+            self.assertEqual({'hash_invalidation.flushes': 2,
+                              'hash_invalidation.suffixes': 2},
+                             self.logger.get_stats_counts())
+
     def _test_invalidate_hash_racing_get_hashes_diff_suffix(self, existing):
         # a suffix can be changed or created by second process while new pkl is
         # being calculated - verify that suffix is correct after next
@@ -8987,6 +9416,106 @@ class TestSuffixHashes(unittest.TestCase):
                                            policy)
             self.assertEqual(hashes, new_hashes)
 
+    def test_get_hashes_binary_hashes_file(self):
+        self.conf['binary_hashes_file'] = 'yes'
+        self.df_router = diskfile.DiskFileRouter(self.conf, self.logger)
+        for policy in self.iter_policies():
+            df_mgr = self.df_router[policy]
+            self.assertTrue(df_mgr.binary_hashes_file)
+            part_path = os.path.join(
+                self.devices, self.existing_device,
+                diskfile.get_data_dir(policy), '0')
+            df = df_mgr.get_diskfile(self.existing_device, '0', 'a', 'c',
+                                     'o', policy=policy, frag_index=4)
+            df.delete(self.ts())
+            suffix = os.path.basename(os.path.dirname(df._datadir))
+            hashes = df_mgr.get_hashes(self.existing_device, '0', [],
+                                       policy)
+            self.assertIn(suffix, hashes)
+            files = os.listdir(part_path)
+            if policy.policy_type == EC_POLICY:
+                # per frag index hashes don't fit in hashes.bin
+                self.assertIn(diskfile.HASH_FILE, files)
+                self.assertNotIn(diskfile.BINARY_HASH_FILE, files)
+            else:
+                self.assertIn(diskfile.BINARY_HASH_FILE, files)
+                self.assertNotIn(diskfile.HASH_FILE, files)
+
+            # invalidate and rehash
+            df.delete(self.ts())
+            new_hashes = df_mgr.get_hashes(self.existing_device, '0', [],
+                                           policy)
+            self.assertNotEqual(hashes[suffix], new_hashes[suffix])
+            with mock.patch.object(df_mgr, '_hash_suffix') as mocked:
+                self.assertEqual(new_hashes, df_mgr.get_hashes(
+                    self.existing_device, '0', [], policy))
+            mocked.assert_not_called()
+
+    def test_get_hashes_binary_hashes_file_disabled(self):
+        self.conf['binary_hashes_file'] = 'yes'
+        binary_router = diskfile.DiskFileRouter(self.conf, self.logger)
+        # per frag index hashes don't fit in hashes.bin
+        policy = [p for p in POLICIES if p.policy_type == REPL_POLICY][0]
+        part_path = os.path.join(
+            self.devices, self.existing_device,
+            diskfile.get_data_dir(policy), '0')
+        df = binary_router[policy].get_diskfile(
+            self.existing_device, '0', 'a', 'c', 'o', policy=policy)
+        df.delete(self.ts())
+        hashes = binary_router[policy].get_hashes(
+            self.existing_device, '0', [], policy)
+        self.assertEqual([diskfile.BINARY_HASH_FILE], [
+            f for f in os.listdir(part_path) if f.startswith('hashes.')
+            and f != diskfile.HASH_INVALIDATIONS_FILE])
+
+        # with the option off, the hashes.bin is still used while there is
+        # no hashes.pkl...
+        df_mgr = self.df_router[policy]
+        self.assertFalse(df_mgr.binary_hashes_file)
+        with mock.patch.object(df_mgr, '_hash_suffix') as mocked:
+            self.assertEqual(hashes, df_mgr.get_hashes(
+                self.existing_device, '0', [], policy))
+        mocked.assert_not_called()
+        # ... and is replaced by one when it's next written
+        df.delete(self.ts())
+        new_hashes = df_mgr.get_hashes(self.existing_device, '0', [], policy)
+        suffix = os.path.basename(os.path.dirname(df._datadir))
+        self.assertNotEqual(hashes[suffix], new_hashes[suffix])
+        files = os.listdir(part_path)
+        self.assertIn(diskfile.HASH_FILE, files)
+        self.assertNotIn(diskfile.BINARY_HASH_FILE, files)
+
+        # after which there's no looking for a hashes.bin
+        with mock.patch('swift.obj.diskfile._read_binary_hashes') as mocked:
+            self.assertEqual(new_hashes, df_mgr.get_hashes(
+                self.existing_device, '0', [], policy))
+        mocked.assert_not_called()
+
+    def test_get_hashes_reindexes_suffix(self):
+        for policy in self.iter_policies():
+            df_mgr = self.df_router[policy]
+            part_path = os.path.join(
+                self.devices, self.existing_device,
+                diskfile.get_data_dir(policy), '0')
+            df1 = df_mgr.get_diskfile(self.existing_device, '0', 'a', 'c',
+                                      'o1', policy=policy, frag_index=4)
+            df1.delete(self.ts())
+            suffix_dir = os.path.dirname(df1._datadir)
+            diskfile.finish_hashes_index(
+                part_path, diskfile.start_hashes_index(part_path), {})
+            self.assertEqual({}, diskfile.read_hashes_index(part_path))
+            # rehashing a suffix brings it up to date in the index...
+            df_mgr.get_hashes(self.existing_device, '0',
+                              [os.path.basename(suffix_dir)], policy)
+            df1_hash = os.path.basename(df1._datadir)
+            self.assertEqual({df1_hash[-3:]: {df1_hash}},
+                             diskfile.read_hashes_index(part_path))
+            # ... including when it's gone
+            rmtree(suffix_dir)
+            df_mgr.get_hashes(self.existing_device, '0',
+                              [os.path.basename(suffix_dir)], policy)
+            self.assertEqual({}, diskfile.read_hashes_index(part_path))
+
     def _do_test_get_hashes_new_pkl_finds_new_suffix_dirs(self, device):
         for policy in self.iter_policies():
             df_mgr = self.df_router[policy]
@@ -9399,7 +9928,7 @@ class TestSuffixHashes(unittest.TestCase):
             non_local = {'suffix_count': 1}
             calls = []
 
-            def mock_read_hashes(filename):
+            def mock_read_hashes(filename, binary=True):
                 rv = {'%03x' % i: 'fake'
                       for i in range(non_local['suffix_count'])}
                 if len(calls) <= 3:
@@ -9521,6 +10050,238 @@ class TestHashesHelpers(unittest.TestCase):
         result = diskfile.read_hashes(self.testdir)
         self.assertFalse(result['valid'])
 
+    def _make_object_hashes(self, suffix, count):
+        return [md5(str(i)).hexdigest()[:29] + suffix for i in range(count)]
+
+    def test_hashes_index_build(self):
+        self.assertIsNone(diskfile.read_hashes_index(self.testdir))
+        abc_hashes = self._make_object_hashes('abc', 3)
+        def_hashes = self._make_object_hashes('def', 2)
+        # nothing is indexed until the index is started
+        diskfile.index_object_hash(
+            os.path.join(self.testdir, 'abc', abc_hashes[0]))
+        self.assertEqual([], os.listdir(self.testdir))
+
+        token = diskfile.start_hashes_index(self.testdir)
+        # an index that is being built can't be used...
+        self.assertIsNone(diskfile.read_hashes_index(self.testdir))
+        # ... but objects written during the walk are indexed
+        diskfile.index_object_hash(
+            os.path.join(self.testdir, 'abc', abc_hashes[2]))
+        diskfile.reindex_suffix(os.path.join(self.testdir, 'def'),
+                                def_hashes)
+        self.assertTrue(diskfile.finish_hashes_index(self.testdir, token, {
+            'abc': abc_hashes[:2] + ['not-a-hash'],
+            'fff': [],
+            'tmp': ['junk'],
+        }))
+        self.assertEqual({'abc': set(abc_hashes), 'def': set(def_hashes)},
+                         diskfile.read_hashes_index(self.testdir))
+        with open(os.path.join(self.testdir,
+                               diskfile.HASHES_INDEX_FILE)) as f:
+            self.assertEqual([
+                diskfile.HASHES_INDEX_HEADER,
+                '=abc ' + ' '.join(sorted(abc_hashes)),
+                '=def ' + ' '.join(sorted(def_hashes)),
+            ], f.read().splitlines())
+
+        # updates to the finished index don't take the partition lock
+        with mock.patch('swift.obj.diskfile.lock_path') as mock_lock_path:
+            diskfile.reindex_suffix(os.path.join(self.testdir, 'abc'),
+                                    abc_hashes[1:])
+            diskfile.reindex_suffix(os.path.join(self.testdir, 'def'), [])
+            diskfile.index_object_hash(
+                os.path.join(self.testdir, 'abc', abc_hashes[0]))
+        self.assertFalse(mock_lock_path.called)
+        self.assertEqual({'abc': set(abc_hashes)},
+                         diskfile.read_hashes_index(self.testdir))
+
+    def test_hashes_index_abandoned_build(self):
+        abc_hashes = self._make_object_hashes('abc', 2)
+        token1 = diskfile.start_hashes_index(self.testdir)
+        token2 = diskfile.start_hashes_index(self.testdir)
+        self.assertTrue(diskfile.finish_hashes_index(
+            self.testdir, token2, {'abc': abc_hashes[1:]}))
+        self.assertFalse(diskfile.finish_hashes_index(
+            self.testdir, token1, {'abc': abc_hashes[:1]}))
+        self.assertEqual({'abc': set(abc_hashes[1:])},
+                         diskfile.read_hashes_index(self.testdir))
+        os.unlink(os.path.join(self.testdir, diskfile.HASHES_INDEX_FILE))
+        self.assertFalse(diskfile.finish_hashes_index(
+            self.testdir, token2, {'abc': abc_hashes[1:]}))
+        self.assertNotIn(diskfile.HASHES_INDEX_FILE, os.listdir(self.testdir))
+
+    def test_hashes_index_partial_and_corrupt_records(self):
+        abc_hashes = self._make_object_hashes('abc', 2)
+        diskfile.finish_hashes_index(
+            self.testdir, diskfile.start_hashes_index(self.testdir),
+            {'abc': abc_hashes[:1]})
+        index_file = os.path.join(self.testdir, diskfile.HASHES_INDEX_FILE)
+        with open(index_file, 'ab') as f:
+            f.write(b'+' + abc_hashes[1][:10].encode('ascii'))
+        # an interrupted append is ignored
+        self.assertEqual({'abc': set(abc_hashes[:1])},
+                         diskfile.read_hashes_index(self.testdir))
+        with open(index_file, 'ab') as f:
+            f.write(b'\n')
+        self.assertIsNone(diskfile.read_hashes_index(self.testdir))
+
+        for bad_record in (b'=abc ' + abc_hashes[0][:-3].encode('ascii') +
+                           b'def', b'?' + abc_hashes[0].encode('ascii'),
+                           b'\xff'):
+            diskfile.finish_hashes_index(
+                self.testdir, diskfile.start_hashes_index(self.testdir), {})
+            with open(index_file, 'ab') as f:
+                f.write(bad_record + b'\n')
+            self.assertIsNone(diskfile.read_hashes_index(self.testdir))
+
+    def test_hashes_index_compaction(self):
+        abc_hashes = self._make_object_hashes('abc', 3)
+        diskfile.finish_hashes_index(
+            self.testdir, diskfile.start_hashes_index(self.testdir),
+            {'abc': abc_hashes})
+        index_file = os.path.join(self.testdir, diskfile.HASHES_INDEX_FILE)
+        with mock.patch('swift.obj.diskfile.HASHES_INDEX_SLACK', 5):
+            for i in range(5):
+                diskfile.index_object_hash(
+                    os.path.join(self.testdir, 'abc', abc_hashes[0]))
+            self.assertEqual({'abc': set(abc_hashes)},
+                             diskfile.read_hashes_index(self.testdir))
+            with open(index_file) as f:
+                self.assertEqual(7, len(f.read().splitlines()))
+            diskfile.index_object_hash(
+                os.path.join(self.testdir, 'abc', abc_hashes[0]))
+            self.assertEqual({'abc': set(abc_hashes)},
+                             diskfile.read_hashes_index(self.testdir))
+            with open(index_file) as f:
+                self.assertEqual(2, len(f.read().splitlines()))
+
+    def test_read_write_binary_hashes(self):
+        hashes = {'000': md5(b'a').hexdigest(),
+                  'fff': md5(b'b').hexdigest(),
+                  'abc': None, 'valid': True}
+        diskfile.write_hashes(self.testdir, hashes, binary=True)
+        self.assertEqual([diskfile.BINARY_HASH_FILE],
+                         os.listdir(self.testdir))
+        self.assertEqual(diskfile.BINARY_HASHES_SIZE, os.path.getsize(
+            os.path.join(self.testdir, diskfile.BINARY_HASH_FILE)))
+        result = diskfile.read_hashes(self.testdir)
+        self.assertEqual(hashes, result)
+
+        hashes = {'valid': False}
+        diskfile.write_hashes(self.testdir, hashes, binary=True)
+        self.assertEqual(hashes, diskfile.read_hashes(self.testdir))
+
+    def test_write_hashes_switches_format(self):
+        hashes = {'000': md5(b'a').hexdigest(),
+                  'valid': True}
+        diskfile.write_hashes(self.testdir, hashes)
+        self.assertEqual([diskfile.HASH_FILE], os.listdir(self.testdir))
+        diskfile.write_hashes(self.testdir, hashes, binary=True)
+        self.assertEqual([diskfile.BINARY_HASH_FILE],
+                         os.listdir(self.testdir))
+        self.assertEqual(hashes, diskfile.read_hashes(self.testdir))
+        diskfile.write_hashes(self.testdir, hashes)
+        self.assertEqual([diskfile.HASH_FILE], os.listdir(self.testdir))
+        self.assertEqual(hashes, diskfile.read_hashes(self.testdir))
+
+    def test_write_binary_hashes_falls_back_to_pickle(self):
+        # EC suffix hashes are dicts of per frag index hashes
+        hashes = {'000': {None: md5(b'a').hexdigest(),
+                          2: md5(b'b').hexdigest()},
+                  'valid': True}
+        diskfile.write_hashes(self.testdir, hashes, binary=True)
+        self.assertEqual([diskfile.HASH_FILE], os.listdir(self.testdir))
+        self.assertEqual(hashes, diskfile.read_hashes(self.testdir))
+
+    def test_read_newest_hashes_file(self):
+        old_hashes = {'000': md5(b'a').hexdigest(),
+                      'valid': True}
+        new_hashes = {'000': md5(b'b').hexdigest(),
+                      'valid': True}
+        with mock.patch('swift.obj.diskfile.remove_file'):
+            with mock.patch('swift.obj.diskfile.time.time',
+                            return_value=1000.0):
+                diskfile.write_hashes(self.testdir, dict(old_hashes))
+            with mock.patch('swift.obj.diskfile.time.time',
+                            return_value=2000.0):
+                diskfile.write_hashes(self.testdir, dict(new_hashes),
+                                      binary=True)
+        self.assertEqual(
+            sorted([diskfile.HASH_FILE, diskfile.BINARY_HASH_FILE]),
+            sorted(os.listdir(self.testdir)))
+        self.assertEqual(dict(new_hashes, updated=2000.0),
+                         diskfile.read_hashes(self.testdir))
+
+        with mock.patch('swift.obj.diskfile.remove_file'):
+            with mock.patch('swift.obj.diskfile.time.time',
+                            return_value=3000.0):
+                diskfile.write_hashes(self.testdir, dict(old_hashes))
+        self.assertEqual(dict(old_hashes, updated=3000.0),
+                         diskfile.read_hashes(self.testdir))
+
+    def test_ignore_corrupted_binary_hashes(self):
+        hashes = {'000': md5(b'a').hexdigest(),
+                  'valid': True}
+        diskfile.write_hashes(self.testdir, hashes, binary=True)
+        hashes_file = os.path.join(self.testdir, diskfile.BINARY_HASH_FILE)
+        with open(hashes_file, 'rb') as f:
+            data = f.read()
+
+        def check_corrupted(corrupted_data):
+            with open(hashes_file, 'wb') as f:
+                f.write(corrupted_data)
+            self.assertEqual({'valid': False, 'updated': -1},
+                             diskfile.read_hashes(self.testdir))
+
+        check_corrupted(b'')
+        check_corrupted(data[:-1])
+        check_corrupted(data + b'\x00')
+        check_corrupted(b'XXXX' + data[4:])
+        check_corrupted(data[:4] + b'\x02' + data[5:])
+        # bad slot state
+        offset = diskfile.BINARY_HASHES_HEADER.size
+        check_corrupted(data[:offset] + b'\x07' + data[offset + 1:])
+
+    def test_consolidate_binary_hashes_in_place(self):
+        hashes = {'000': md5(b'a').hexdigest(),
+                  'abc': md5(b'b').hexdigest(),
+                  'valid': True}
+        diskfile.write_hashes(self.testdir, hashes, binary=True)
+        hashes_file = os.path.join(self.testdir, diskfile.BINARY_HASH_FILE)
+        inode = os.stat(hashes_file).st_ino
+        invalidations_file = os.path.join(
+            self.testdir, diskfile.HASH_INVALIDATIONS_FILE)
+        with open(invalidations_file, 'w') as f:
+            f.write('abc\nfff\nabc\n')
+        now = hashes['updated'] + 10
+        with mock.patch('swift.obj.diskfile.time.time', return_value=now), \
+                mock.patch('swift.obj.diskfile.write_hashes') as mock_write:
+            result = diskfile.consolidate_hashes(self.testdir)
+        self.assertFalse(mock_write.called)
+        expected = dict(hashes, abc=None, fff=None, updated=now)
+        self.assertEqual(expected, result)
+        self.assertEqual(expected, diskfile.read_hashes(self.testdir))
+        self.assertEqual(inode, os.stat(hashes_file).st_ino)
+        self.assertEqual(0, os.path.getsize(invalidations_file))
+
+    def test_consolidate_invalid_binary_hashes(self):
+        hashes = {'valid': False}
+        diskfile.write_hashes(self.testdir, hashes, binary=True)
+        invalidations_file = os.path.join(
+            self.testdir, diskfile.HASH_INVALIDATIONS_FILE)
+        with open(invalidations_file, 'w') as f:
+            f.write('abc\n')
+        result = diskfile.consolidate_hashes(self.testdir)
+        self.assertEqual({'abc': None, 'valid': False,
+                          'updated': result['updated']}, result)
+        # still binary
+        self.assertEqual(
+            sorted([diskfile.BINARY_HASH_FILE,
+                    diskfile.HASH_INVALIDATIONS_FILE, '.lock']),
+            sorted(os.listdir(self.testdir)))
+        self.assertEqual(result, diskfile.read_hashes(self.testdir))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -12,8 +12,10 @@
 # implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import io
 import os
 from argparse import Namespace
+import functools
 import itertools
 import json
 from collections import defaultdict
@@ -21,6 +23,7 @@ import unittest
 import mock
 
 import six
+from eventlet import GreenPool, sleep
 
 from swift.proxy import server as proxy_server
 from swift.proxy.controllers.base import headers_to_container_info, \
@@ -28,7 +31,7 @@ from swift.proxy.controllers.base import headers_to_container_info, \
     get_cache_key, get_account_info, get_info, get_object_info, \
     Controller, GetOrHeadHandler, bytes_to_skip, clear_info_cache, \
     set_info_cache, NodeIter, headers_from_container_info, \
-    record_cache_op_metrics
+    record_cache_op_metrics, LocalInfoCache, SingleFlight, prefetch_info
 from swift.common.swob import Request, HTTPException, RESPONSE_REASONS, \
     bytes_to_wsgi
 from swift.common import exceptions
@@ -590,6 +593,288 @@ class TestFuncs(BaseTest):
                          shard='listing')
         check_not_in_cache(req, shard_cache_key)
 
+    def test_local_info_cache(self):
+        logger = debug_logger()
+        cache = LocalInfoCache(2, 10, 1, logger)
+        now = 1000.0
+        with mock.patch('swift.proxy.controllers.base.time.time',
+                        return_value=now):
+            self.assertIsNone(cache.get('container/a/c1'))
+            cache.set('container/a/c1', {'status': 200, 'bytes': 1})
+            cache.set('container/a/c2', {'status': 404})
+            cache.set('account/a', {'status': 200})
+            self.assertEqual(2, len(cache))
+            # least recently used entry was evicted
+            self.assertIsNone(cache.get('container/a/c1'))
+            info = cache.get('container/a/c2')
+            self.assertEqual({'status': 404}, info)
+            # callers get their own copy
+            info['status'] = 200
+            self.assertEqual({'status': 404}, cache.get('container/a/c2'))
+        with mock.patch('swift.proxy.controllers.base.time.time',
+                        return_value=now + 1):
+            # negative entries expire sooner
+            self.assertIsNone(cache.get('container/a/c2'))
+            self.assertEqual({'status': 200}, cache.get('account/a'))
+            cache.delete('account/a')
+            self.assertIsNone(cache.get('account/a'))
+        self.assertEqual({
+            'container.info.local_cache.miss': 3,
+            'container.info.local_cache.hit': 2,
+            'container.info.local_cache.evict': 1,
+            'account.info.local_cache.hit': 1,
+            'account.info.local_cache.miss': 1,
+        }, logger.get_increment_counts())
+
+        # a zero ttl disables caching
+        cache = LocalInfoCache(2, 0, 0)
+        cache.set('account/a', {'status': 200})
+        self.assertEqual(0, len(cache))
+
+    def test_get_container_info_local_cache(self):
+        local_cache = LocalInfoCache(10, 10, 10)
+        app = FakeApp(statuses=[200, 200])
+        app.local_info_cache = local_cache
+        memcache = FakeCache()
+        req = Request.blank("/v1/account/cont",
+                            environ={'swift.cache': memcache})
+        info = get_container_info(req.environ, app)
+        self.assertEqual(200, info['status'])
+        self.assertIs(local_cache, req.environ['swift.local_info_cache'])
+        cache_key = get_cache_key('account', 'cont')
+        self.assertEqual('6666', local_cache.get(cache_key)['bytes'])
+        self.assertEqual(2, len(app.captured_envs))
+
+        # another request is served from the local cache, not memcache
+        memcache.store.clear()
+        req = Request.blank("/v1/account/cont",
+                            environ={'swift.cache': memcache})
+        info = get_container_info(req.environ, app)
+        self.assertEqual(200, info['status'])
+        self.assertEqual(2, len(app.captured_envs))
+        self.assertIn(cache_key, req.environ['swift.infocache'])
+
+        # info found in memcache is put in the local cache
+        local_cache.delete(cache_key)
+        req = Request.blank(
+            "/v1/account/cont",
+            environ={'swift.cache': FakeCache({'status': 200,
+                                               'bytes': 3867})})
+        info = get_container_info(req.environ, app)
+        self.assertEqual(3867, info['bytes'])
+        self.assertEqual(3867, local_cache.get(cache_key)['bytes'])
+        self.assertEqual(2, len(app.captured_envs))
+
+        # clearing the info cache clears the local cache too
+        clear_info_cache(req.environ, 'account', 'cont')
+        self.assertIsNone(local_cache.get(cache_key))
+
+    def test_single_flight(self):
+        logger = debug_logger()
+        single_flight = SingleFlight(logger)
+        calls = []
+
+        def fetch(result):
+            calls.append(result)
+            sleep(0.01)
+            return result
+
+        pool = GreenPool()
+        threads = [pool.spawn(single_flight.run, 'key', 'container.info',
+                              functools.partial(fetch, result))
+                   for result in ('a', 'b', 'c')]
+        threads.append(pool.spawn(single_flight.run, 'other',
+                                  'container.info',
+                                  functools.partial(fetch, 'd')))
+        pool.waitall()
+        self.assertEqual([('a', False), ('a', True), ('a', True),
+                          ('d', False)], [t.wait() for t in threads])
+        self.assertEqual(['a', 'd'], calls)
+        self.assertEqual({}, single_flight._in_flight)
+        self.assertEqual(2, len(logger.log_dict['timing_since']))
+        self.assertEqual('container.info.coalesced.timing',
+                         logger.log_dict['timing_since'][0][0][0])
+
+        # once the first call is done, there's nothing to wait for
+        self.assertEqual(('e', False),
+                         single_flight.run('key', 'container.info',
+                                           functools.partial(fetch, 'e')))
+
+    def test_single_flight_error_or_timeout(self):
+        logger = debug_logger()
+        single_flight = SingleFlight(logger, wait_timeout=0.01)
+        calls = []
+
+        def fetch(result):
+            calls.append(result)
+            sleep(0.02)
+            if result == 'a':
+                raise ValueError('kaboom')
+            return result
+
+        pool = GreenPool()
+        threads = [pool.spawn(single_flight.run, 'key', 'shard_listing',
+                              functools.partial(fetch, result))
+                   for result in ('a', 'b')]
+        pool.waitall()
+        self.assertRaises(ValueError, threads[0].wait)
+        # the waiter gave up and fetched for itself
+        self.assertEqual(('b', False), threads[1].wait())
+        self.assertEqual(['a', 'b'], calls)
+        self.assertEqual({'shard_listing.coalesced.timeout': 1},
+                         logger.get_increment_counts())
+
+        single_flight = SingleFlight(logger, wait_timeout=1)
+        del calls[:]
+        threads = [pool.spawn(single_flight.run, 'key', 'shard_listing',
+                              functools.partial(fetch, result))
+                   for result in ('a', 'b')]
+        pool.waitall()
+        self.assertRaises(ValueError, threads[0].wait)
+        self.assertEqual(('b', False), threads[1].wait())
+        self.assertEqual(['a', 'b'], calls)
+        self.assertEqual({}, single_flight._in_flight)
+
+    def test_single_flight_lease(self):
+        logger = debug_logger()
+        memcache = FakeMemcache()
+        single_flight = SingleFlight(logger, lease_time=1,
+                                     lease_poll_interval=0.001)
+        rechecks = []
+
+        def recheck():
+            rechecks.append(memcache.get('key'))
+            return memcache.get('key')
+
+        # nobody else holds the lease
+        self.assertEqual(('a', False), single_flight.run(
+            'key', 'container.info', lambda: 'a', memcache, recheck))
+        self.assertEqual([], rechecks)
+        self.assertNotIn('coalesce-lease/key', memcache.store)
+
+        # another worker holds the lease and caches the result
+        memcache.incr('coalesce-lease/key')
+
+        def other_worker():
+            sleep(0.01)
+            memcache.set('key', 'b')
+            memcache.delete('coalesce-lease/key')
+
+        pool = GreenPool()
+        pool.spawn(other_worker)
+        self.assertEqual(('b', False), single_flight.run(
+            'key', 'container.info', lambda: 'a', memcache, recheck))
+        pool.waitall()
+        self.assertEqual('b', rechecks[-1])
+        self.assertEqual({'container.info.lease.wait': 1,
+                          'container.info.lease.hit': 1},
+                         logger.get_increment_counts())
+
+        # another worker releases the lease without caching a result
+        logger.clear()
+        memcache.delete('key')
+        memcache.incr('coalesce-lease/key')
+
+        def other_worker():
+            sleep(0.01)
+            memcache.delete('coalesce-lease/key')
+
+        pool.spawn(other_worker)
+        self.assertEqual(('a', False), single_flight.run(
+            'key', 'container.info', lambda: 'a', memcache, recheck))
+        pool.waitall()
+        self.assertEqual({'container.info.lease.wait': 1,
+                          'container.info.lease.miss': 1},
+                         logger.get_increment_counts())
+
+    def test_get_container_info_coalesced(self):
+        class SlowApp(FakeApp):
+            def __call__(self, environ, start_response):
+                sleep(0.01)
+                return super(SlowApp, self).__call__(environ, start_response)
+
+        app = SlowApp()
+        app.single_flight = SingleFlight(debug_logger())
+        envs = [Request.blank("/v1/account/cont").environ for _ in range(3)]
+        pool = GreenPool()
+        threads = [pool.spawn(get_container_info, env, app) for env in envs]
+        pool.waitall()
+        infos = [t.wait() for t in threads]
+        self.assertEqual([200] * 3, [info['status'] for info in infos])
+        self.assertEqual([6666] * 3, [info['bytes'] for info in infos])
+        # one HEAD for the account and one for the container
+        self.assertEqual(2, len(app.captured_envs))
+        cache_key = get_cache_key('account', 'cont')
+        for env in envs:
+            self.assertEqual('6666',
+                             env['swift.infocache'][cache_key]['bytes'])
+        # each request has its own copy of the info
+        infos = [env['swift.infocache'][cache_key] for env in envs]
+        self.assertIsNot(infos[0], infos[1])
+        self.assertIsNot(infos[1], infos[2])
+
+    def test_prefetch_info(self):
+        class GetManyCache(FakeMemcache):
+            def get_many(self, keys, raise_on_error=False):
+                self.calls.append(mock.call.get_many(keys))
+                return dict((key, self.store.get(key)) for key in keys)
+
+        memcache = GetManyCache()
+        acct_cache_key = get_cache_key('account')
+        cont_cache_key = get_cache_key('account', 'cont')
+        memcache.store[acct_cache_key] = {'status': 200, 'bytes': 1}
+        memcache.store[cont_cache_key] = {'status': 200, 'bytes': 2}
+        app = FakeApp()
+        app.logger = debug_logger()
+        app._pipeline_final_app = app
+        env = {'swift.cache': memcache}
+        prefetch_info(app, env, 'account', 'cont')
+        self.assertEqual([mock.call.get_many(
+            [acct_cache_key, cont_cache_key])], memcache.calls)
+
+        # the infos are used, with the usual metrics, without going back to
+        # memcache
+        self.assertEqual(1, get_info(app, env, 'account')['bytes'])
+        self.assertEqual(2, get_info(app, env, 'account', 'cont')['bytes'])
+        self.assertEqual(1, len(memcache.calls))
+        self.assertEqual({}, env['swift.memcache_prefetch'])
+        self.assertEqual({'account.info.cache.hit': 1,
+                          'container.info.cache.hit': 1},
+                         app.logger.get_increment_counts())
+
+        # nothing to do for what's already in env
+        prefetch_info(app, env, 'account', 'cont')
+        env['swift.infocache'].pop(cont_cache_key)
+        prefetch_info(app, env, 'account', 'cont')
+        self.assertEqual(1, len(memcache.calls))
+
+        # prefetched values aren't used once the info has been cleared
+        env = {'swift.cache': memcache}
+        prefetch_info(app, env, 'account', 'cont')
+        self.assertEqual(2, len(memcache.calls))
+        clear_info_cache(env, 'account', 'cont')
+        self.assertEqual([acct_cache_key],
+                         list(env['swift.memcache_prefetch']))
+
+        # misses aren't kept, so they're looked up again
+        memcache.store.pop(cont_cache_key, None)
+        memcache.clear_calls()
+        env = {'swift.cache': memcache}
+        prefetch_info(app, env, 'account', 'cont')
+        self.assertEqual([acct_cache_key],
+                         list(env['swift.memcache_prefetch']))
+        self.assertEqual(1, get_info(app, env, 'account')['bytes'])
+        memcache.store[cont_cache_key] = {'status': 200, 'bytes': 3}
+        self.assertEqual(3, get_info(app, env, 'account', 'cont')['bytes'])
+        self.assertEqual([mock.call.get_many([acct_cache_key,
+                                              cont_cache_key]),
+                          mock.call.get(cont_cache_key)], memcache.calls)
+
+        # memcache clients without get_many are left alone
+        env = {'swift.cache': FakeMemcache()}
+        prefetch_info(app, env, 'account', 'cont')
+        self.assertNotIn('swift.memcache_prefetch', env)
+
     def test_record_cache_op_metrics(self):
         record_cache_op_metrics(
             self.logger, 'shard_listing', 'infocache_hit')
@@ -1142,6 +1427,48 @@ class TestFuncs(BaseTest):
         self.assertRaises(exceptions.RangeAlreadyComplete,
                           handler.fast_forward, 1)
 
+    @mock.patch.object(six, 'PY2', False)
+    def test_can_zero_copy(self):
+        client_input = mock.MagicMock()
+        body = b'x' * 2048
+
+        def do_test(method='GET', headers=None, backend_headers=None,
+                    zero_copy=True, min_size=1024, **environ):
+            environ.setdefault('wsgi.input', client_input)
+            req = Request.blank('/v1/a/c/o', environ=environ, method=method)
+            handler = GetOrHeadHandler(
+                self.app, req, 'Object', Namespace(num_primary_nodes=3),
+                None, None, backend_headers or {}, zero_copy=zero_copy)
+            handler.zero_copy_min_size = min_size
+            source = TestSource([body], headers=headers)
+            source.chunked = False
+            source._real_socket = mock.MagicMock()
+            source._readline_buffer = b''
+            source.fp = io.BufferedReader(io.BytesIO(body))
+            with mock.patch.object(self.app, 'zero_copy_pipe_size', 65536):
+                return handler._can_zero_copy(req, source)
+
+        self.assertTrue(do_test())
+        self.assertTrue(do_test(min_size=2048))
+        self.assertTrue(do_test(headers={'x-object-meta-crypto': 'fine'}))
+        self.assertFalse(do_test(zero_copy=False))
+        self.assertFalse(do_test(min_size=2049))
+        self.assertFalse(do_test(backend_headers={'Range': 'bytes=1-2'}))
+        self.assertFalse(do_test(**{'swift.source': 'SLO'}))
+        self.assertFalse(do_test(**{'wsgi.url_scheme': 'https'}))
+        self.assertFalse(do_test(**{'wsgi.input': io.BytesIO()}))
+        for header in ('X-Static-Large-Object', 'X-Object-Manifest',
+                       'X-Object-Sysmeta-Symlink-Target',
+                       'X-Object-Sysmeta-Crypto-Body-Meta'):
+            self.assertFalse(do_test(headers={header.lower(): 'x'}), header)
+        with mock.patch.object(self.app, 'zero_copy_pipe_size', None):
+            req = Request.blank('/', environ={'wsgi.input': client_input})
+            handler = GetOrHeadHandler(
+                self.app, req, 'Object', Namespace(num_primary_nodes=3),
+                None, None, {}, zero_copy=True)
+            self.assertFalse(handler._can_zero_copy(
+                req, TestSource([body])))
+
     def test_range_fast_forward_after_data_timeout(self):
         req = Request.blank('/')
 
@@ -1444,6 +1444,80 @@ class TestContainerController(TestRingBase):
             ['Aborting listing from shards due to bad response: %s'
              % ([200, 200, 503],)], errors[-1:])
 
+    def test_GET_sharded_container_concurrent_shard_listings(self):
+        self.app.shard_listing_concurrency = 3
+        shard_bounds = ('', 'ham', 'pie', '')
+        shard_ranges = [
+            ShardRange('.shards_a/c_%s' % upper, Timestamp.now(), lower, upper)
+            for lower, upper in zip(shard_bounds[:-1], shard_bounds[1:])]
+        sr_dicts = [dict(sr, last_modified=sr.timestamp.isoformat)
+                    for sr in shard_ranges]
+        sr_objs = [self._make_shard_objects(sr) for sr in shard_ranges]
+        shard_resp_hdrs = {'X-Backend-Sharding-State': 'unsharded',
+                           'X-Backend-Storage-Policy-Index': 0}
+        root_shard_resp_hdrs = {'X-Backend-Sharding-State': 'sharded',
+                                'X-Backend-Timestamp': '99',
+                                'X-Container-Object-Count': 1000,
+                                'X-Container-Bytes-Used': 1000,
+                                'X-Backend-Storage-Policy-Index': 0,
+                                'X-Backend-Record-Type': 'shard'}
+        shard_req_hdrs = {'X-Backend-Record-Type': 'auto',
+                          'X-Backend-Storage-Policy-Index': '0'}
+        root_req_hdrs = {'X-Backend-Record-Type': 'auto'}
+        shard_paths = [wsgi_quote(str_to_wsgi(sr.name))
+                       for sr in shard_ranges]
+        misplaced = dict(sr_objs[0][0], name='B0')
+
+        # all three shard listings are fetched at once, so the second and
+        # third have no marker; the names they list that were already listed
+        # are dropped, and the third listing is cut down to the limit
+        mock_responses = [
+            (200, sr_dicts, root_shard_resp_hdrs),
+            (200, sr_objs[0], shard_resp_hdrs),
+            (200, [misplaced] + sr_objs[1], shard_resp_hdrs),
+            (200, sr_objs[2][:50], shard_resp_hdrs),
+        ]
+        expected_requests = [
+            ('a/c', root_req_hdrs, dict(states='listing', limit='50'))] + [
+            (path, shard_req_hdrs,
+             dict(marker='', end_marker=end_marker, states='listing',
+                  limit='50'))
+            for path, end_marker in zip(
+                shard_paths, ('ham\x00', 'pie\x00', ''))]
+        expected_objects = sr_objs[0] + sr_objs[1] + sr_objs[2][:2]
+        self._check_GET_shard_listing(
+            mock_responses, expected_objects, expected_requests,
+            query_string='?limit=50')
+        self.assertNotIn('container.shard_listing.refetch',
+                         self.logger.get_increment_counts())
+
+        # if names that were already listed take up so much of a listing
+        # that it might have been cut short then it is fetched again
+        mock_responses = [
+            (200, sr_dicts, root_shard_resp_hdrs),
+            (200, sr_objs[0][:2], shard_resp_hdrs),
+            (200, [dict(misplaced, name=name) for name in ('A0', 'A1', 'A2')] +
+             sr_objs[1][:1], shard_resp_hdrs),
+            (200, sr_objs[2][:4], shard_resp_hdrs),
+            (200, sr_objs[1][:2], shard_resp_hdrs),
+        ]
+        expected_requests = [
+            ('a/c', root_req_hdrs, dict(states='listing', limit='4'))] + [
+            (path, shard_req_hdrs,
+             dict(marker='', end_marker=end_marker, states='listing',
+                  limit='4'))
+            for path, end_marker in zip(
+                shard_paths, ('ham\x00', 'pie\x00', ''))] + [
+            (shard_paths[1], shard_req_hdrs,
+             dict(marker='B', end_marker='pie\x00', states='listing',
+                  limit='2'))]
+        expected_objects = sr_objs[0][:2] + sr_objs[1][:2]
+        self._check_GET_shard_listing(
+            mock_responses, expected_objects, expected_requests,
+            query_string='?limit=4')
+        self.assertEqual(1, self.logger.get_increment_counts().get(
+            'container.shard_listing.refetch'))
+
     def test_GET_sharded_container_with_delimiter(self):
         shard_bounds = (('', 'ha/ppy'), ('ha/ppy', 'ha/ptic'),
                         ('ha/ptic', 'ham'), ('ham', 'pie'), ('pie', ''))
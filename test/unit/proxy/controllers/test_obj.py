@@ -1296,6 +1296,25 @@ class TestReplicatedObjController(CommonObjectControllerMixin,
             node_error_count(self.app, object_ring.devs[1]),
             self.app.error_limiter.suppression_limit + 1)
 
+    def test_PUT_connect_exceptions_adaptive_sorting(self):
+        object_ring = self.app.get_object_ring(None)
+        self.app.sort_nodes = lambda n, *args, **kwargs: n  # disable shuffle
+        self.app.sorts_adaptively = True
+        req = swob.Request.blank('/v1/a/c/o.jpg', method='PUT',
+                                 body=b'test body')
+        with set_http_connect(Exception('kaboom!'), (507, None), 201, 201,
+                              201):
+            resp = req.get_response(self.app)
+        self.assertEqual(resp.status_int, 201)
+        # a node that didn't respond counts as slow; one that responded
+        # counts as quick, whatever it said
+        self.assertEqual(self.app.node_timeout,
+                         self.app.node_latencies.score(object_ring.devs[0]))
+        self.assertLess(self.app.node_latencies.score(object_ring.devs[1]),
+                        1.0)
+        self.assertEqual([0] * 5, [
+            stats[1] for stats in self.app.node_latencies.stats.values()])
+
     def test_PUT_connect_exception_with_unicode_path(self):
         expected = 201
         statuses = (
@@ -1608,6 +1627,150 @@ class TestReplicatedObjController(CommonObjectControllerMixin,
             self.assertIn('my-txn-id', line)
         self.assertIn('From Object Server', stdout.getvalue())
 
+    def _enable_hedged_gets(self, delay):
+        policy_opts = self.app.get_policy_options(self.policy)
+        policy_opts.hedged_gets = True
+        # with no recent latencies the hedge delay is the concurrency_timeout
+        policy_opts.concurrency_timeout = delay
+        self.app.hedges_gets = True
+
+    def test_GET_hedged(self):
+        self._enable_hedged_gets(0.01)
+        req = swift.common.swob.Request.blank('/v1/a/c/o')
+        with mocked_http_conn(FakeStatus(200, response_sleep=1.0),
+                              200) as log:
+            resp = req.get_response(self.app)
+            self.assertEqual(b'', resp.body)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(2, len(log.requests))
+        self.assertEqual({'object.hedged_get.sent': 1,
+                          'object.hedged_get.won': 1},
+                         self.app.logger.get_increment_counts())
+        # both requests are tracked, and neither is outstanding
+        self.assertEqual([0, 0], [
+            stats[1] for stats in self.app.node_latencies.stats.values()])
+        self.assertEqual(9, self.app.hedge_budget.tokens)
+
+        # HEADs are not hedged
+        self.app.logger.clear()
+        req = swift.common.swob.Request.blank('/v1/a/c/o', method='HEAD')
+        with mocked_http_conn(FakeStatus(200, response_sleep=0.05)) as log:
+            resp = req.get_response(self.app)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(1, len(log.requests))
+        self.assertEqual({}, self.app.logger.get_increment_counts())
+
+    def test_GET_hedged_loser_cancelled(self):
+        self._enable_hedged_gets(0.01)
+        req = swift.common.swob.Request.blank('/v1/a/c/o')
+        with mocked_http_conn(FakeStatus(200, response_sleep=1.0),
+                              200) as log:
+            resp = req.get_response(self.app)
+            self.assertEqual(b'', resp.body)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(2, len(log.requests))
+        nodes = self.obj_ring.get_part_nodes(
+            self.obj_ring.get_part('a', 'c', 'o'))
+        loser, winner = [
+            node for request in log.requests for node in nodes
+            if (node['ip'], node['port']) == (request['ip'], request['port'])]
+        # the cancelled request isn't outstanding, and it didn't record the
+        # time it was cut short after as a latency
+        tracker = self.app.node_latencies
+        self.assertEqual([None, 0], tracker.stats[tracker.node_key(loser)][:2])
+        self.assertEqual(0.0, tracker.score(loser))
+        self.assertIsNone(tracker.percentile(loser, 0, min_samples=1))
+        self.assertIsNotNone(tracker.percentile(winner, 0, min_samples=1))
+        # ... and its connection was closed
+        self.assertTrue(log.responses[0].closed)
+
+    def test_GET_hedged_first_wins(self):
+        self._enable_hedged_gets(0.01)
+        req = swift.common.swob.Request.blank('/v1/a/c/o')
+        with mocked_http_conn(FakeStatus(200, response_sleep=0.05),
+                              FakeStatus(200, response_sleep=1.0)) as log:
+            resp = req.get_response(self.app)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(2, len(log.requests))
+        self.assertEqual({'object.hedged_get.sent': 1},
+                         self.app.logger.get_increment_counts())
+
+    def test_GET_hedged_uses_node_latency(self):
+        self._enable_hedged_gets(0.01)
+        req = swift.common.swob.Request.blank('/v1/a/c/o')
+        # every node usually takes a while to respond
+        for node in self.obj_ring.devs:
+            for _ in range(10):
+                self.app.node_request_started(node)
+                self.app.node_request_finished(node, 1.0)
+        with mocked_http_conn(FakeStatus(200, response_sleep=0.05)) as log:
+            resp = req.get_response(self.app)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(1, len(log.requests))
+        self.assertEqual({}, self.app.logger.get_increment_counts())
+
+    def test_GET_hedged_error(self):
+        self._enable_hedged_gets(0.05)
+        req = swift.common.swob.Request.blank('/v1/a/c/o')
+        # a quick error isn't hedged; the next node is tried as usual
+        with mocked_http_conn(503, 200) as log:
+            resp = req.get_response(self.app)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(2, len(log.requests))
+        self.assertNotIn('object.hedged_get.sent',
+                         self.app.logger.get_increment_counts())
+
+    def test_GET_connect_error_demotes_node(self):
+        policy_opts = self.app.get_policy_options(self.policy)
+        policy_opts.sorting_method = 'adaptive'
+        policy_opts.adaptive_sorting_choices = 3
+        self.app.sorts_adaptively = True
+        req = swift.common.swob.Request.blank('/v1/a/c/o')
+        with mocked_http_conn(Exception('connect failed'), 200) as log:
+            resp = req.get_response(self.app)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(2, len(log.requests))
+        nodes = self.obj_ring.get_part_nodes(
+            self.obj_ring.get_part('a', 'c', 'o'))
+        failed_node, good_node = [
+            node for request in log.requests for node in nodes
+            if (node['ip'], node['port']) == (request['ip'], request['port'])]
+        # neither request is outstanding, and the failure counts as a slow
+        # response rather than a fast one
+        self.assertEqual([0, 0], [
+            stats[1] for stats in self.app.node_latencies.stats.values()])
+        self.assertEqual(self.app.recoverable_node_timeout,
+                         self.app.node_latencies.score(failed_node))
+        self.assertLess(self.app.node_latencies.score(good_node),
+                        self.app.node_latencies.score(failed_node))
+        for _ in range(5):
+            self.assertEqual(failed_node, self.app.sort_nodes(
+                list(nodes), self.policy)[-1])
+
+    def test_GET_hedged_budget_exhausted(self):
+        self._enable_hedged_gets(0.01)
+        self.app.hedge_budget.tokens = 0
+        req = swift.common.swob.Request.blank('/v1/a/c/o')
+        with mocked_http_conn(FakeStatus(200, response_sleep=0.05)) as log:
+            resp = req.get_response(self.app)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(1, len(log.requests))
+        self.assertEqual({'object.hedged_get.budget_exhausted': 1},
+                         self.app.logger.get_increment_counts())
+        self.assertAlmostEqual(0.05, self.app.hedge_budget.tokens)
+
+    def test_GET_hedged_no_more_nodes(self):
+        self._enable_hedged_gets(0.01)
+        self.app.request_node_count = lambda r: 1
+        req = swift.common.swob.Request.blank('/v1/a/c/o')
+        with mocked_http_conn(FakeStatus(200, response_sleep=0.05)) as log:
+            resp = req.get_response(self.app)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(1, len(log.requests))
+        # there was no node to hedge to, so the budget isn't spent
+        self.assertEqual({}, self.app.logger.get_increment_counts())
+        self.assertEqual(10, self.app.hedge_budget.tokens)
+
     def test_GET_handoff(self):
         req = swift.common.swob.Request.blank('/v1/a/c/o')
         codes = [503] * self.obj_ring.replicas + [200]
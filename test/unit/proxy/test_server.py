@@ -63,13 +63,15 @@ from test.unit.helpers import setup_servers, teardown_servers
 from swift.proxy import server as proxy_server
 from swift.proxy.controllers.obj import ReplicatedObjectController
 from swift.obj import server as object_server
-from swift.common.bufferedhttp import BufferedHTTPResponse
+from swift.common.bufferedhttp import BufferedHTTPResponse, \
+    BufferedHTTPConnection, BufferedHTTPConnectionPool
 from swift.common.middleware import proxy_logging, versioned_writes, \
     copy, listing_formats
 from swift.common.middleware.acl import parse_acl, format_acl
 from swift.common.exceptions import ChunkReadTimeout, DiskFileNotExist, \
     APIVersionError, ChunkReadError
 from swift.common import utils, constraints, registry
+from swift.common.error_limiter import SharedErrorLimiter
 from swift.common.utils import hash_path, storage_directory, \
     parse_content_type, parse_mime_headers, StatsdClient, \
     iter_multipart_mime_documents, public, mkdirs, NullLogger, md5, \
@@ -78,7 +80,7 @@ from swift.common.wsgi import loadapp, ConfigString
 from swift.common.http_protocol import SwiftHttpProtocol
 from swift.proxy.controllers import base as proxy_base
 from swift.proxy.controllers.base import get_cache_key, cors_validation, \
-    get_account_info, get_container_info
+    get_account_info, get_container_info, splice_to_socket
 import swift.proxy.controllers
 import swift.proxy.controllers.obj
 from swift.common.header_key_dict import HeaderKeyDict
@@ -517,6 +519,7 @@ class TestController(unittest.TestCase):
         app = mock.MagicMock()
         app._pipeline_final_app = app
         app.account_existence_skip_cache = 0.0
+        app.local_info_cache = None
         memcache = mock.MagicMock()
         memcache.get = mock.MagicMock()
         memcache.get.return_value = {
@@ -544,6 +547,7 @@ class TestController(unittest.TestCase):
         app = mock.MagicMock()
         app._pipeline_final_app = app
         app.container_existence_skip_cache = 0.0
+        app.local_info_cache = None
         memcache = mock.MagicMock()
         memcache.get = mock.MagicMock()
         memcache.get.return_value = {
@@ -650,6 +654,17 @@ class TestProxyServerConfiguration(unittest.TestCase):
         self.assertEqual(app.recheck_updating_shard_ranges, 1800)
         self.assertEqual(app.recheck_listing_shard_ranges, 900)
 
+    def test_background_ring_reload(self):
+        app = self._make_app({})
+        self.assertFalse(app.background_ring_reload)
+        for policy in POLICIES:
+            self.assertFalse(policy.object_ring.background_reload)
+
+        app = self._make_app({'background_ring_reload': 'yes'})
+        self.assertTrue(app.background_ring_reload)
+        for policy in POLICIES:
+            self.assertTrue(policy.object_ring.background_reload)
+
     def test_memcache_skip_options(self):
         # check default options
         app = self._make_app({})
@@ -662,6 +677,37 @@ class TestProxyServerConfiguration(unittest.TestCase):
         self.assertEqual(app.container_listing_shard_ranges_skip_cache, 0.0001)
         self.assertEqual(app.container_updating_shard_ranges_skip_cache, 0.001)
 
+    def test_local_info_cache_options(self):
+        app = self._make_app({})
+        self.assertIsNone(app.local_info_cache)
+        app = self._make_app({'local_info_cache_size': '100'})
+        self.assertEqual(100, app.local_info_cache.max_size)
+        self.assertEqual(1.0, app.local_info_cache.ttl)
+        self.assertEqual(0.1, app.local_info_cache.negative_ttl)
+        app = self._make_app({'local_info_cache_size': '10',
+                              'local_info_cache_ttl': '2.5',
+                              'local_info_cache_negative_ttl': '0'})
+        self.assertEqual(10, app.local_info_cache.max_size)
+        self.assertEqual(2.5, app.local_info_cache.ttl)
+        self.assertEqual(0, app.local_info_cache.negative_ttl)
+        with self.assertRaises(ValueError):
+            self._make_app({'local_info_cache_size': '-1'})
+
+    def test_coalesce_backend_requests_options(self):
+        app = self._make_app({})
+        self.assertIsNone(app.single_flight)
+        app = self._make_app({'coalesce_backend_requests': 'yes'})
+        self.assertEqual(10.0, app.single_flight.wait_timeout)
+        self.assertEqual(0, app.single_flight.lease_time)
+        self.assertEqual(0.05, app.single_flight.lease_poll_interval)
+        app = self._make_app({'coalesce_backend_requests': 'yes',
+                              'coalesce_wait_timeout': '2',
+                              'coalesce_lease_time': '0.5',
+                              'coalesce_lease_poll_interval': '0.01'})
+        self.assertEqual(2.0, app.single_flight.wait_timeout)
+        self.assertEqual(0.5, app.single_flight.lease_time)
+        self.assertEqual(0.01, app.single_flight.lease_poll_interval)
+
 
 @patch_policies([StoragePolicy(0, 'zero', True, object_ring=FakeRing())])
 class TestProxyServer(unittest.TestCase):
@@ -1047,6 +1093,55 @@ class TestProxyServer(unittest.TestCase):
                                           node_timings=node_timings)
         self.assertEqual([nodes[1], nodes[2], nodes[0]], actual)
 
+    @patch_policies([StoragePolicy(0, 'zero', True, object_ring=FakeRing()),
+                     StoragePolicy(1, 'one', False, object_ring=FakeRing())])
+    def test_sort_nodes_adaptive(self):
+        nodes = [{'region': 1, 'zone': 1, 'ip': '127.0.0.1', 'port': 6200,
+                  'device': 'sd%s' % dev} for dev in 'abc']
+        conf = {'sorting_method': 'shuffle'}
+        per_policy = {'0': {'sorting_method': 'adaptive',
+                            'adaptive_sorting_choices': '3'}}
+        app = proxy_server.Application(dict(conf, policy_config=per_policy),
+                                       logger=debug_logger(),
+                                       container_ring=FakeRing(),
+                                       account_ring=FakeRing())
+        self.assertTrue(app.sorts_adaptively)
+        self.assertFalse(app.sorts_by_timing)
+        # devices, not ips, are tracked
+        for node, latency in zip(nodes, (0.3, 0.1, 0.2)):
+            app.node_request_started(node)
+            app.node_request_finished(node, latency)
+        self.assertEqual(3, len(app.node_latencies.stats))
+        with mock.patch('swift.proxy.server.shuffle', lambda x: x):
+            # with as many choices as nodes, the order is by score
+            self.assertEqual([nodes[1], nodes[2], nodes[0]],
+                             app.sort_nodes(list(nodes), POLICIES[0]))
+            # other policies are unaffected
+            self.assertEqual(nodes, app.sort_nodes(list(nodes), POLICIES[1]))
+            # outstanding requests count against a node
+            app.node_request_started(nodes[1])
+            app.node_request_started(nodes[1])
+            self.assertEqual([nodes[2], nodes[0], nodes[1]],
+                             app.sort_nodes(list(nodes), POLICIES[0]))
+
+        # each node's score is reported
+        self.assertEqual([
+            (('adaptive_sorting.127_0_0_1_6200_sda.score', 300.0), {}),
+            (('adaptive_sorting.127_0_0_1_6200_sdb.score', 100.0), {}),
+            (('adaptive_sorting.127_0_0_1_6200_sdc.score', 200.0), {}),
+        ], app.logger.logger.log_dict['gauge'])
+
+    def test_sort_nodes_adaptive_not_configured(self):
+        node = {'ip': '127.0.0.1', 'port': 6200, 'device': 'sda'}
+        app = proxy_server.Application({}, logger=debug_logger(),
+                                       container_ring=FakeRing(),
+                                       account_ring=FakeRing())
+        self.assertFalse(app.sorts_adaptively)
+        app.node_request_started(node)
+        app.node_request_finished(node, 0.1)
+        self.assertEqual({}, app.node_latencies.stats)
+        self.assertFalse(app.logger.logger.log_dict['gauge'])
+
     def test_node_concurrency(self):
         nodes = [{'region': 1, 'zone': 1, 'ip': '127.0.0.1', 'port': 6010,
                   'device': 'sda'},
@@ -1384,6 +1479,54 @@ class TestProxyServer(unittest.TestCase):
         self.assertIs(log_kwargs['exc_info'][1], expected_err)
         self.assertEqual(4, node_error_count(app, node))
 
+    def test_backend_connection_pool_config(self):
+        app = proxy_server.Application({}, account_ring=FakeRing(),
+                                       container_ring=FakeRing())
+        self.assertIsNone(app.backend_connection_pool)
+        logger = debug_logger()
+        app = proxy_server.Application(
+            {'backend_connection_pool': 'yes',
+             'backend_connection_pool_size': '8',
+             'backend_connection_idle_timeout': '2.5'},
+            account_ring=FakeRing(), container_ring=FakeRing(),
+            logger=logger)
+        pool = app.backend_connection_pool
+        self.assertIsInstance(pool, BufferedHTTPConnectionPool)
+        self.assertEqual(8, pool.max_idle)
+        self.assertEqual(2.5, pool.idle_timeout)
+        self.assertIs(logger, pool.logger)
+
+    def test_error_limit_shared_file(self):
+        tempdir = mkdtemp()
+        try:
+            conf = {'error_suppression_limit': '2',
+                    'error_limiter_shared_file':
+                        os.path.join(tempdir, 'error_limits'),
+                    'error_limiter_shared_slots': '100'}
+            # e.g. two workers
+            apps = [proxy_server.Application(
+                conf, account_ring=FakeRing(), container_ring=FakeRing(),
+                logger=debug_logger()) for _ in range(2)]
+            for app in apps:
+                self.assertIsInstance(app.error_limiter, SharedErrorLimiter)
+                self.assertEqual(100, app.error_limiter.table.slots)
+            node = apps[0].container_ring.get_part_nodes(0)[0]
+            apps[0].error_occurred(node, 'test msg')
+            apps[1].error_occurred(node, 'test msg')
+            self.assertFalse(apps[0].error_limited(node))
+            apps[1].error_occurred(node, 'test msg')
+            self.assertTrue(apps[0].error_limited(node))
+            self.assertEqual(
+                [node_to_string(node)],
+                list(apps[0].error_limiter.table.limited_nodes()))
+
+            other = apps[0].container_ring.get_part_nodes(0)[1]
+            self.assertFalse(apps[0].error_limited(other))
+            apps[0].error_limit(other, 'test msg')
+            self.assertTrue(apps[1].error_limited(other))
+        finally:
+            rmtree(tempdir, ignore_errors=True)
+
     def test_check_response_200(self):
         app = proxy_server.Application({},
                                        account_ring=FakeRing(),
@@ -1802,12 +1945,16 @@ class TestProxyServerConfigLoading(unittest.TestCase):
         default_options = app.get_policy_options(None)
         self.assertEqual(
             "ProxyOverrideOptions({}, {'sorting_method': 'shuffle', "
+            "'adaptive_sorting_choices': 2, "
+            "'adaptive_sorting_outstanding_weight': 1.0, "
             "'read_affinity': '', 'write_affinity': '', "
             "'write_affinity_node_count': '2 * replicas', "
             "'write_affinity_handoff_delete_count': None, "
             "'rebalance_missing_suppression_count': 1, "
             "'concurrent_gets': False, 'concurrency_timeout': 0.5, "
-            "'concurrent_ec_extra_requests': 0"
+            "'concurrent_ec_extra_requests': 0, "
+            "'hedged_gets': False, 'hedged_gets_percentile': 95.0, "
+            "'zero_copy_gets': False, 'zero_copy_gets_min_size': 1048576"
             "}, app)",
             repr(default_options))
         self.assertEqual(default_options, eval(repr(default_options), {
@@ -1816,12 +1963,16 @@ class TestProxyServerConfigLoading(unittest.TestCase):
         policy_0_options = app.get_policy_options(POLICIES[0])
         self.assertEqual(
             "ProxyOverrideOptions({}, {'sorting_method': 'affinity', "
+            "'adaptive_sorting_choices': 2, "
+            "'adaptive_sorting_outstanding_weight': 1.0, "
             "'read_affinity': 'r1=100', 'write_affinity': 'r1', "
             "'write_affinity_node_count': '1 * replicas', "
             "'write_affinity_handoff_delete_count': 4, "
             "'rebalance_missing_suppression_count': 2, "
             "'concurrent_gets': False, 'concurrency_timeout': 0.5, "
-            "'concurrent_ec_extra_requests': 0"
+            "'concurrent_ec_extra_requests': 0, "
+            "'hedged_gets': False, 'hedged_gets_percentile': 95.0, "
+            "'zero_copy_gets': False, 'zero_copy_gets_min_size': 1048576"
             "}, app)",
             repr(policy_0_options))
         self.assertEqual(policy_0_options, eval(repr(policy_0_options), {
@@ -2144,7 +2295,7 @@ class TestProxyServerConfigLoading(unittest.TestCase):
                 self._write_conf_and_load_app(conf_sections)
             self.assertEqual(
                 'Invalid sorting_method value; must be one of shuffle, '
-                "timing, affinity, not 'broken' for %s" % scope,
+                "timing, affinity, adaptive, not 'broken' for %s" % scope,
                 cm.exception.args[0])
 
         conf_sections = """
@@ -2167,6 +2318,96 @@ class TestProxyServerConfigLoading(unittest.TestCase):
         """
         do_test(conf_sections, '(default)')
 
+    def test_per_policy_conf_invalid_adaptive_sorting_choices_value(self):
+        conf_sections = """
+        [app:proxy-server]
+        use = egg:swift#proxy
+
+        [proxy-server:policy:0]
+        sorting_method = adaptive
+        adaptive_sorting_choices = 0
+        """
+        with self.assertRaises(ValueError) as cm:
+            self._write_conf_and_load_app(conf_sections)
+        self.assertEqual(
+            'Invalid adaptive_sorting_choices value; must be at least 1, '
+            'not 0 for policy 0 (nulo)', cm.exception.args[0])
+
+    def test_per_policy_conf_invalid_hedged_gets_percentile_value(self):
+        conf_sections = """
+        [app:proxy-server]
+        use = egg:swift#proxy
+
+        [proxy-server:policy:0]
+        hedged_gets = on
+        hedged_gets_percentile = 0
+        """
+        with self.assertRaises(ValueError) as cm:
+            self._write_conf_and_load_app(conf_sections)
+        self.assertEqual(
+            'Invalid hedged_gets_percentile value; must be > 0 and <= 100, '
+            'not 0.0 for policy 0 (nulo)', cm.exception.args[0])
+
+    def test_per_policy_conf_hedged_gets(self):
+        conf_sections = """
+        [app:proxy-server]
+        use = egg:swift#proxy
+        hedged_gets_budget = 10
+
+        [proxy-server:policy:0]
+        hedged_gets = on
+        hedged_gets_percentile = 99
+        """
+        exp_options = {
+            None: {
+                "hedged_gets": False,
+                "hedged_gets_percentile": 95.0,
+            }, POLICIES[0]: {
+                "hedged_gets": True,
+                "hedged_gets_percentile": 99.0,
+            }}
+        app = self._write_conf_and_load_app(conf_sections)
+        self._check_policy_options(app, exp_options, {})
+        self.assertTrue(app.hedges_gets)
+        self.assertEqual(0.1, app.hedge_budget.ratio)
+
+    def test_per_policy_conf_zero_copy_gets(self):
+        conf_sections = """
+        [app:proxy-server]
+        use = egg:swift#proxy
+        object_chunk_size = 32768
+
+        [proxy-server:policy:0]
+        zero_copy_gets = on
+        zero_copy_gets_min_size = 4096
+        """
+        exp_options = {
+            None: {
+                "zero_copy_gets": False,
+                "zero_copy_gets_min_size": 1048576,
+            }, POLICIES[0]: {
+                "zero_copy_gets": True,
+                "zero_copy_gets_min_size": 4096,
+            }}
+        with mock.patch('swift.proxy.server.open',
+                        mock.mock_open(read_data='1048576\n')):
+            app = self._write_conf_and_load_app(conf_sections)
+        self._check_policy_options(app, exp_options, {})
+        self.assertEqual(32768, app.zero_copy_pipe_size)
+
+        with mock.patch('swift.proxy.server.open',
+                        mock.mock_open(read_data='16384\n')):
+            app = self._write_conf_and_load_app(conf_sections)
+        self.assertEqual(16384, app.zero_copy_pipe_size)
+
+        with mock.patch('swift.common.splice.splice._c_splice', None):
+            app = self._write_conf_and_load_app(conf_sections)
+        self.assertIsNone(app.zero_copy_pipe_size)
+        self.assertEqual([
+            'Use of splice() requested (config says "zero_copy_gets = '
+            'true"), but the system does not support it. splice() will not '
+            'be used.'], app.logger.get_lines_for_level('warning'))
+
     def test_per_policy_conf_invalid_read_affinity_value(self):
         def do_test(conf_sections, label):
             with self.assertRaises(ValueError) as cm:
@@ -2746,6 +2987,140 @@ class TestReplicatedObjectController(
         self.assertEqual(res.status_int, 200)
         self.assertEqual(res.body, obj)
 
+    @unpatch_policies
+    def test_backend_connection_pool(self):
+        prolis = _test_sockets[0]
+        prosrv = _test_servers[0]
+        sock = connect_tcp(('localhost', prolis.getsockname()[1]))
+        fd = sock.makefile('rwb')
+        # larger than the proxy's object_chunk_size
+        obj = b'pooled' * 20000
+        path = '/v1/a/c/o.pooled'
+        fd.write(('PUT %s HTTP/1.1\r\n'
+                  'Host: localhost\r\n'
+                  'Connection: close\r\n'
+                  'X-Storage-Token: t\r\n'
+                  'Content-Length: %s\r\n'
+                  'Content-Type: application/octet-stream\r\n'
+                  '\r\n' % (path, str(len(obj)))).encode('ascii'))
+        fd.write(obj)
+        fd.flush()
+        headers = readuntil2crlfs(fd)
+        exp = b'HTTP/1.1 201'
+        self.assertEqual(headers[:len(exp)], exp)
+
+        logger = debug_logger()
+        pool = BufferedHTTPConnectionPool(logger=logger)
+        with mock.patch.object(prosrv, 'backend_connection_pool', pool):
+            for method, status in (('GET', 200), ('HEAD', 200),
+                                   ('POST', 202), ('GET', 200),
+                                   ('GET', 200)):
+                req = Request.blank(path, method=method)
+                res = req.get_response(prosrv)
+                self.assertEqual(res.status_int, status)
+                if method == 'GET':
+                    self.assertEqual(res.body, obj)
+            # a GET whose body isn't read to the end doesn't leave its
+            # connection in the pool
+            req = Request.blank(path, headers={'X-Newest': 'true'})
+            res = req.get_response(prosrv)
+            self.assertEqual(res.status_int, 200)
+            app_iter = iter(res.app_iter)
+            next(app_iter)
+            idle = sum(len(conns) for conns in pool.idle.values())
+            app_iter.close()
+            self.assertEqual(
+                idle, sum(len(conns) for conns in pool.idle.values()))
+
+            # a request on a reused connection that the server closed
+            # without responding is sent again, and isn't an error
+            errors = dict(prosrv.error_limiter.stats)
+            with mock.patch.object(BufferedHTTPConnection,
+                                   '_closed_by_server', return_value=True):
+                req = Request.blank(path)
+                res = req.get_response(prosrv)
+                self.assertEqual(res.status_int, 200)
+                self.assertEqual(res.body, obj)
+            self.assertEqual(errors, prosrv.error_limiter.stats)
+
+        counts = logger.get_increment_counts()
+        self.assertGreater(counts.get('backend_connection.retried', 0), 0)
+        self.assertGreater(counts.get('backend_connection.reused', 0), 0)
+        self.assertGreater(counts.get('backend_connection.new', 0), 0)
+        for conns in pool.idle.values():
+            for conn, _released in conns:
+                conn.close()
+
+    @unpatch_policies
+    def test_zero_copy_GET(self):
+        prolis = _test_sockets[0]
+        prosrv = _test_servers[0]
+        sock = connect_tcp(('localhost', prolis.getsockname()[1]))
+        fd = sock.makefile('rwb')
+        # larger than the pipe, so it takes more than one splice
+        obj = b'spliced' * 20000
+        path = '/v1/a/c/o.spliced'
+        fd.write(('PUT %s HTTP/1.1\r\n'
+                  'Host: localhost\r\n'
+                  'Connection: close\r\n'
+                  'X-Storage-Token: t\r\n'
+                  'Content-Length: %s\r\n'
+                  'Content-Type: application/octet-stream\r\n'
+                  '\r\n' % (path, str(len(obj)))).encode('ascii'))
+        fd.write(obj)
+        fd.flush()
+        headers = readuntil2crlfs(fd)
+        exp = b'HTTP/1.1 201'
+        self.assertEqual(headers[:len(exp)], exp)
+
+        def do_get(fd, extra_headers=''):
+            fd.write(('GET %s HTTP/1.1\r\n'
+                      'Host: localhost\r\n'
+                      'X-Storage-Token: t\r\n'
+                      '%s'
+                      '\r\n' % (path, extra_headers)).encode('ascii'))
+            fd.flush()
+            headers = readuntil2crlfs(fd)
+            self.assertEqual(headers[:9], b'HTTP/1.1 ')
+            content_length = int(re.search(
+                b'Content-Length: (\\d+)', headers, re.I).group(1))
+            return int(headers[9:12]), fd.read(content_length)
+
+        def spliced_bytes():
+            spliced = sum(call[0][2] for call in mock_splice.call_args_list)
+            mock_splice.reset_mock()
+            return spliced
+
+        options = prosrv.get_policy_options(POLICIES.default)
+        with mock.patch.object(options, 'zero_copy_gets', True), \
+                mock.patch.object(prosrv, 'zero_copy_pipe_size', 16384), \
+                mock.patch('swift.proxy.controllers.base.splice_to_socket',
+                           side_effect=splice_to_socket) as mock_splice:
+            sock = connect_tcp(('localhost', prolis.getsockname()[1]))
+            fd = sock.makefile('rwb')
+            # too small to be worth splicing
+            self.assertGreater(options.zero_copy_gets_min_size, len(obj))
+            self.assertEqual((200, obj), do_get(fd))
+            self.assertEqual(0, spliced_bytes())
+
+            with mock.patch.object(options, 'zero_copy_gets_min_size', 1):
+                # the client connection is still good after a spliced
+                # response
+                for _ in range(2):
+                    prosrv.logger.clear()
+                    self.assertEqual((200, obj), do_get(fd))
+                    spliced = spliced_bytes()
+                    self.assertGreater(spliced, len(obj) // 2)
+                    self.assertLess(spliced, len(obj))
+                    # proxy-logging counts the spliced bytes too
+                    log_line = prosrv.logger.get_lines_for_level('info')[0]
+                    self.assertIn(' %d ' % len(obj), log_line)
+
+                # but not ranges
+                self.assertEqual((206, obj[10:20]),
+                                 do_get(fd, 'Range: bytes=10-19\r\n'))
+                self.assertEqual(0, spliced_bytes())
+
     @unpatch_policies
     def test_GET_ranges(self):
         prolis = _test_sockets[0]
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark for group commits of container updates.
+
+Runs several container-server workers, each as a process handling object
+updates for the same container from many concurrent greenthreads, and
+reports the rate of updates with and without group_commit::
+
+    python tools/benchmarks/container_group_commit.py --workers 4 \
+        --concurrency 32 --updates 2000 --devices /srv/node
+
+The devices directory should be on the kind of filesystem that container
+databases are kept on, since the cost of each fsync matters.
+"""
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from eventlet import GreenPool
+
+from swift.common.swob import Request
+from swift.common.utils import Timestamp
+from swift.container.server import ContainerController
+
+
+def make_controller(devices, group_commit):
+    return ContainerController({
+        'devices': devices, 'mount_check': 'false',
+        'group_commit': str(group_commit), 'log_level': 'ERROR'})
+
+
+def put_container(devices):
+    req = Request.blank('/sda1/p/a/c', method='PUT', headers={
+        'X-Timestamp': Timestamp.now().internal,
+        'X-Backend-Storage-Policy-Index': '0'})
+    resp = req.get_response(make_controller(devices, False))
+    if resp.status_int != 201:
+        raise Exception('Container PUT failed: %s' % resp.status)
+
+
+def run_worker(devices, group_commit, worker, concurrency, updates, start):
+    controller = make_controller(devices, group_commit)
+
+    def put_object(i):
+        req = Request.blank(
+            '/sda1/p/a/c/o-%d-%d' % (worker, i), method='PUT',
+            headers={'X-Timestamp': Timestamp.now().internal,
+                     'X-Size': '1', 'X-Content-Type': 'text/plain',
+                     'X-Etag': 'd41d8cd98f00b204e9800998ecf8427e',
+                     'X-Backend-Storage-Policy-Index': '0'})
+        return req.get_response(controller).status_int
+
+    start.wait()
+    pool = GreenPool(concurrency)
+    for status in pool.imap(put_object, range(updates)):
+        if status != 201:
+            raise Exception('Object update failed: %s' % status)
+
+
+def measure(devices, group_commit, workers, concurrency, updates):
+    put_container(devices)
+    start = multiprocessing.Event()
+    procs = [multiprocessing.Process(target=run_worker, args=(
+        devices, group_commit, worker, concurrency, updates, start))
+        for worker in range(workers)]
+    for proc in procs:
+        proc.start()
+    begin = time.time()
+    start.set()
+    for proc in procs:
+        proc.join()
+        if proc.exitcode:
+            raise Exception('Worker failed')
+    return workers * updates / (time.time() - begin)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of container-server workers')
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help='number of concurrent updates per worker')
+    parser.add_argument('--updates', type=int, default=2000,
+                        help='number of updates per worker')
+    parser.add_argument('--devices', default=None,
+                        help='directory in which to make a temporary devices '
+                        'directory')
+    args = parser.parse_args()
+
+    print('%-14s %12s' % ('group_commit', 'updates/s'))
+    for group_commit in (False, True):
+        devices = tempfile.mkdtemp(dir=args.devices)
+        try:
+            os.mkdir(os.path.join(devices, 'sda1'))
+            rate = measure(devices, group_commit, args.workers,
+                           args.concurrency, args.updates)
+        finally:
+            shutil.rmtree(devices)
+        print('%-14s %12.0f' % (group_commit, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark for delimiter listings of container databases.
+
+Builds a container database whose objects are spread over many
+pseudo-directories, lists pages of it with delimiter=/ and reports, for
+each page, the number of SQL queries run and the time taken::
+
+    python tools/benchmarks/delimiter_listing.py --dirs 100000 \
+        --objects-per-dir 100 --pages 3 --db /srv/node/bench.db
+
+Building a large database takes a while, so it is kept at --db for later
+runs if that is given.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import sqlite3
+
+import mock
+
+from swift.common.db import GreenDBConnection
+from swift.common.utils import Timestamp
+from swift.container.backend import ContainerBroker
+
+
+def build_db(path, num_dirs, objects_per_dir, loose_objects):
+    broker = ContainerBroker(path, account='a', container='c')
+    broker.initialize(Timestamp.now().internal, 0)
+    ts = Timestamp.now().internal
+    names = ['dir%08d/obj%06d' % (d, o)
+             for d in range(num_dirs) for o in range(objects_per_dir)]
+    names += ['dir%08d.txt' % (i * num_dirs // max(loose_objects, 1))
+              for i in range(loose_objects)]
+    names.sort()
+    with broker.get() as conn:
+        conn.execute('DROP INDEX ix_object_deleted_name')
+        conn.executemany(
+            'INSERT INTO object (name, created_at, size, content_type, '
+            'etag, deleted, storage_policy_index) '
+            'VALUES (?, ?, 0, "text/plain", '
+            '"d41d8cd98f00b204e9800998ecf8427e", 0, 0)',
+            ((name, ts) for name in names))
+        conn.execute('CREATE INDEX ix_object_deleted_name '
+                     'ON object (deleted, name)')
+        conn.commit()
+    return broker
+
+
+def list_pages(broker, pages, limit, reverse):
+    queries = [0]
+    execute = sqlite3.Connection.execute
+
+    def counting_execute(self, *args, **kwargs):
+        queries[0] += 1
+        return execute(self, *args, **kwargs)
+
+    marker = ''
+    with mock.patch.object(GreenDBConnection, 'execute', counting_execute):
+        for page in range(pages):
+            queries[0] = 0
+            start = time.time()
+            listing = broker.list_objects_iter(
+                limit, '' if reverse else marker, marker if reverse else '',
+                None, '/', reverse=reverse)
+            elapsed = time.time() - start
+            print('%-8s %5d %8d %8d %10.4f' % (
+                'reverse' if reverse else 'forward', page, len(listing),
+                queries[0], elapsed))
+            if not listing:
+                break
+            marker = listing[-1][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dirs', type=int, default=100000,
+                        help='number of pseudo-directories')
+    parser.add_argument('--objects-per-dir', type=int, default=100,
+                        help='number of objects in each pseudo-directory')
+    parser.add_argument('--loose-objects', type=int, default=1000,
+                        help='number of objects not in a pseudo-directory')
+    parser.add_argument('--pages', type=int, default=3,
+                        help='number of pages to list in each direction')
+    parser.add_argument('--limit', type=int, default=10000,
+                        help='listing limit')
+    parser.add_argument('--db', default=None,
+                        help='path of the database to build or reuse')
+    args = parser.parse_args()
+
+    tmpdir = None
+    path = args.db
+    if path is None:
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, 'bench.db')
+    try:
+        if os.path.exists(path):
+            broker = ContainerBroker(path, account='a', container='c')
+        else:
+            broker = build_db(path, args.dirs, args.objects_per_dir,
+                              args.loose_objects)
+        print('%-8s %5s %8s %8s %10s' % (
+            'order', 'page', 'entries', 'queries', 'seconds'))
+        for reverse in (False, True):
+            list_pages(broker, args.pages, args.limit, reverse)
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
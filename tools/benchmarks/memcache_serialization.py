@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark for the memcache serializers.
+
+Reports the size of, and the time taken to serialize and deserialize, some
+typical values that the proxy-server caches: container info, and the
+namespaces of containers with various numbers of shards::
+
+    python tools/benchmarks/memcache_serialization.py --shards 100 10000
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+import timeit
+
+from swift.common.memcached import JSONSerializer, CompactJSONSerializer, \
+    deserialize
+from swift.common.utils import NamespaceBoundList, Namespace, Timestamp
+from swift.proxy.controllers.base import headers_to_container_info
+
+
+def make_container_info():
+    return headers_to_container_info({
+        'x-container-object-count': '123456',
+        'x-container-bytes-used': '987654321',
+        'x-backend-storage-policy-index': '1',
+        'x-backend-sharding-state': 'sharded',
+        'x-put-timestamp': Timestamp.now().internal,
+        'x-timestamp': Timestamp.now().internal,
+        'x-container-read': '.r:*,.rlistings',
+        'x-container-meta-color': 'blue',
+        'x-container-sysmeta-versions-enabled': 'true',
+    }, 200)
+
+
+def make_namespaces(num_shards):
+    ts = Timestamp.now().internal
+    namespaces = [
+        Namespace('.shards_AUTH_test/container-%s-%s-%d' % (
+            'd41d8cd98f00b204e9800998ecf8427e', ts, i),
+            'obj%08d' % (i * 1000) if i else '',
+            'obj%08d' % ((i + 1) * 1000) if i < num_shards - 1 else '')
+        for i in range(num_shards)]
+    return NamespaceBoundList.parse(namespaces).bounds
+
+
+def measure(serializer, value, number):
+    flags, data = serializer.dumps(value)
+    dumps_time = timeit.timeit(
+        lambda: serializer.dumps(value), number=number) / number
+    loads_time = timeit.timeit(
+        lambda: deserialize(flags, data), number=number) / number
+    return len(data), dumps_time, loads_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--shards', type=int, nargs='+',
+                        default=[10, 100, 1000, 10000])
+    parser.add_argument('--compress-threshold', type=int, default=1024)
+    parser.add_argument('--number', type=int, default=100,
+                        help='number of times to time each operation')
+    args = parser.parse_args()
+
+    serializers = [
+        ('json', JSONSerializer()),
+        ('compact_json', CompactJSONSerializer()),
+        ('json+zlib', JSONSerializer(
+            compress_threshold=args.compress_threshold)),
+        ('compact_json+zlib', CompactJSONSerializer(
+            compress_threshold=args.compress_threshold)),
+    ]
+    payloads = [('container info', make_container_info())] + [
+        ('%d shards' % num_shards, make_namespaces(num_shards))
+        for num_shards in args.shards]
+
+    print('%-16s %-18s %10s %12s %12s' % (
+        'payload', 'serializer', 'bytes', 'dumps (us)', 'loads (us)'))
+    for payload_name, value in payloads:
+        for serializer_name, serializer in serializers:
+            size, dumps_time, loads_time = measure(
+                serializer, value, args.number)
+            print('%-16s %-18s %10d %12.1f %12.1f' % (
+                payload_name, serializer_name, size, dumps_time * 1e6,
+                loads_time * 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark for the .pending file formats of container and account databases.
+
+Puts records to a container and an account broker with and without
+db_binary_pending, and reports the size of each pending entry, the rate of
+put_record calls, the rate at which pending entries are read back, and the
+rate of commits to the database::
+
+    python tools/benchmarks/pending_file.py --records 2000
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import mock
+
+import swift.common.db
+from swift.account.backend import AccountBroker
+from swift.common.utils import Timestamp
+from swift.container.backend import ContainerBroker
+
+
+def container_record(i, ts):
+    return dict(name='some/object/name-%08d' % i, created_at=ts,
+                size=12345, content_type='application/octet-stream',
+                etag='d41d8cd98f00b204e9800998ecf8427e', deleted=0,
+                storage_policy_index=0, ctype_timestamp=None,
+                meta_timestamp=None)
+
+
+def account_record(i, ts):
+    return dict(name='container-%08d' % i, put_timestamp=ts,
+                delete_timestamp='0', object_count=10, bytes_used=12345,
+                deleted=0, storage_policy_index=0)
+
+
+def make_broker(path, broker_class):
+    if broker_class is ContainerBroker:
+        broker = broker_class(path, account='a', container='c')
+        broker.initialize(Timestamp.now().internal, 0)
+    else:
+        broker = broker_class(path, account='a')
+        broker.initialize(Timestamp.now().internal)
+    return broker
+
+
+def measure(tmpdir, broker_class, make_record, num_records, binary):
+    path = os.path.join(tmpdir, '%s-%s.db' % (broker_class.db_type, binary))
+    broker = make_broker(path, broker_class)
+    ts = Timestamp.now().internal
+    records = [make_record(i, ts) for i in range(num_records)]
+    with mock.patch.object(swift.common.db, 'BINARY_PENDING', binary), \
+            mock.patch.object(swift.common.db, 'PENDING_CAP', float('inf')):
+        start = time.time()
+        for record in records:
+            broker.put_record(record)
+        put_elapsed = time.time() - start
+    entry_size = os.path.getsize(broker.pending_file) / float(num_records)
+    with open(broker.pending_file, 'rb') as fp:
+        pending = fp.read()
+
+    # reading the entries, without merging them into the database
+    with mock.patch.object(broker, 'merge_items'):
+        start = time.time()
+        broker._commit_puts()
+        read_elapsed = time.time() - start
+    with open(broker.pending_file, 'wb') as fp:
+        fp.write(pending)
+    start = time.time()
+    broker._commit_puts()
+    commit_elapsed = time.time() - start
+    return (entry_size, num_records / put_elapsed,
+            num_records / read_elapsed, num_records / commit_elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--records', type=int, default=2000,
+                        help='number of records to put')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print('%-10s %-7s %8s %10s %10s %10s' % (
+            'broker', 'binary', 'bytes', 'puts/s', 'reads/s', 'commits/s'))
+        for broker_class, make_record in (
+                (ContainerBroker, container_record),
+                (AccountBroker, account_record)):
+            for binary in (False, True):
+                print('%-10s %-7s %8.1f %10.0f %10.0f %10.0f' % ((
+                    broker_class.db_type, binary) + measure(
+                        tmpdir, broker_class, make_record, args.records,
+                        binary)))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark for zero-copy proxy object GETs.
+
+Starts an in-process cluster listening on loopback (the same one the proxy
+unit tests use), uploads an object to a replicated policy, and reports the
+throughput of GETs of it through the proxy with and without zero_copy_gets::
+
+    TMPDIR=/dev/shm PYTHONPATH=. \
+        python tools/benchmarks/proxy_zero_copy_get.py --size 64
+
+It must be run from the top of the source tree, with a TMPDIR that supports
+xattrs for the object servers.
+"""
+from __future__ import print_function
+
+import argparse
+import time
+
+from swift.common.splice import splice
+from swift.common.storage_policy import POLICIES
+from test.unit import connect_tcp, readuntil2crlfs
+from test.unit.helpers import setup_servers, teardown_servers
+
+
+def put_object(port, path, size):
+    sock = connect_tcp(('localhost', port))
+    fd = sock.makefile('rwb')
+    fd.write(('PUT %s HTTP/1.1\r\n'
+              'Host: localhost\r\n'
+              'Connection: close\r\n'
+              'X-Storage-Token: t\r\n'
+              'Content-Length: %d\r\n'
+              'Content-Type: application/octet-stream\r\n'
+              '\r\n' % (path, size)).encode('ascii'))
+    chunk = b'x' * 65536
+    left = size
+    while left > 0:
+        fd.write(chunk[:left])
+        left -= len(chunk)
+    fd.flush()
+    headers = readuntil2crlfs(fd)
+    if not headers.startswith(b'HTTP/1.1 201'):
+        raise Exception('PUT failed: %r' % headers)
+    sock.close()
+
+
+def get_object(fd, path, size):
+    fd.write(('GET %s HTTP/1.1\r\n'
+              'Host: localhost\r\n'
+              'X-Storage-Token: t\r\n'
+              '\r\n' % path).encode('ascii'))
+    fd.flush()
+    headers = readuntil2crlfs(fd)
+    if not headers.startswith(b'HTTP/1.1 200'):
+        raise Exception('GET failed: %r' % headers)
+    left = size
+    while left > 0:
+        chunk = fd.read(min(left, 1048576))
+        if not chunk:
+            raise Exception('GET was cut short')
+        left -= len(chunk)
+
+
+def measure(port, path, size, number):
+    sock = connect_tcp(('localhost', port))
+    fd = sock.makefile('rwb')
+    get_object(fd, path, size)  # warm up
+    start = time.time()
+    for _ in range(number):
+        get_object(fd, path, size)
+    elapsed = time.time() - start
+    sock.close()
+    return size * number / elapsed / 1048576
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=64,
+                        help='object size in MiB')
+    parser.add_argument('--number', type=int, default=20,
+                        help='number of GETs to time')
+    args = parser.parse_args()
+
+    if not splice.available:
+        parser.error('splice() is not available on this system')
+    size = args.size * 1048576
+    context = setup_servers()
+    try:
+        prosrv = context['test_servers'][0]
+        port = context['test_sockets'][0].getsockname()[1]
+        path = '/v1/a/c/o.bench'
+        put_object(port, path, size)
+        options = prosrv.get_policy_options(POLICIES.default)
+        options.zero_copy_gets_min_size = 1
+        print('%-16s %12s' % ('zero_copy_gets', 'MiB/s'))
+        for zero_copy in (False, True):
+            options.zero_copy_gets = zero_copy
+            prosrv.zero_copy_pipe_size = \
+                prosrv.object_chunk_size if zero_copy else None
+            print('%-16s %12.1f' % (
+                zero_copy, measure(port, path, size, args.number)))
+    finally:
+        teardown_servers(context)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Microbenchmark for Ring.get_more_nodes().
+
+Times taking the first few handoffs (as the proxy does) and walking every
+handoff (as the replicator and reconstructor may) for a part, and checks that
+the handoffs are the same as those of the previous implementation::
+
+    python tools/benchmarks/ring_get_more_nodes.py --part-power 16 20
+"""
+from __future__ import print_function
+
+import argparse
+import itertools
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import timeit
+
+from swift.common import utils
+from swift.common.utils import md5
+
+sys.path.insert(0, os.path.dirname(__file__))
+from ring_get_nodes import make_ring  # noqa: E402
+
+
+def legacy_get_more_nodes(r, part):
+    # the get_more_nodes() implementation before handoffs were chunked
+    primary_nodes = r._get_part_nodes(part)
+    used = set(d['id'] for d in primary_nodes)
+    index = itertools.count()
+    same_regions = set(d['region'] for d in primary_nodes)
+    same_zones = set((d['region'], d['zone']) for d in primary_nodes)
+    same_ips = set(
+        (d['region'], d['zone'], d['ip']) for d in primary_nodes)
+
+    parts = len(r._replica2part2dev_id[0])
+    part_hash = md5(str(part).encode('ascii'),
+                    usedforsecurity=False).digest()
+    start = struct.unpack_from('>I', part_hash)[0] >> r._part_shift
+    inc = int(parts / 65536) or 1
+
+    def handoff_parts():
+        return itertools.chain(range(start, parts, inc),
+                               range(inc - ((parts - start) % inc),
+                                     start, inc))
+
+    hit_all_regions = len(same_regions) == r._num_regions
+    for handoff_part in handoff_parts():
+        if hit_all_regions:
+            break
+        for part2dev_id in r._replica2part2dev_id:
+            if handoff_part < len(part2dev_id):
+                dev_id = part2dev_id[handoff_part]
+                dev = r._devs[dev_id]
+                region = dev['region']
+                if dev_id not in used and region not in same_regions:
+                    yield dict(dev, handoff_index=next(index))
+                    used.add(dev_id)
+                    same_regions.add(region)
+                    zone = dev['zone']
+                    same_zones.add((region, zone))
+                    same_ips.add((region, zone, dev['ip']))
+                    if len(same_regions) == r._num_regions:
+                        hit_all_regions = True
+                        break
+
+    hit_all_zones = len(same_zones) == r._num_zones
+    for handoff_part in handoff_parts():
+        if hit_all_zones:
+            break
+        for part2dev_id in r._replica2part2dev_id:
+            if handoff_part < len(part2dev_id):
+                dev_id = part2dev_id[handoff_part]
+                dev = r._devs[dev_id]
+                zone = (dev['region'], dev['zone'])
+                if dev_id not in used and zone not in same_zones:
+                    yield dict(dev, handoff_index=next(index))
+                    used.add(dev_id)
+                    same_zones.add(zone)
+                    same_ips.add(zone + (dev['ip'],))
+                    if len(same_zones) == r._num_zones:
+                        hit_all_zones = True
+                        break
+
+    hit_all_ips = len(same_ips) == r._num_ips
+    for handoff_part in handoff_parts():
+        if hit_all_ips:
+            break
+        for part2dev_id in r._replica2part2dev_id:
+            if handoff_part < len(part2dev_id):
+                dev_id = part2dev_id[handoff_part]
+                dev = r._devs[dev_id]
+                ip = (dev['region'], dev['zone'], dev['ip'])
+                if dev_id not in used and ip not in same_ips:
+                    yield dict(dev, handoff_index=next(index))
+                    used.add(dev_id)
+                    same_ips.add(ip)
+                    if len(same_ips) == r._num_ips:
+                        hit_all_ips = True
+                        break
+
+    hit_all_devs = len(used) == r._num_assigned_devs
+    for handoff_part in handoff_parts():
+        if hit_all_devs:
+            break
+        for part2dev_id in r._replica2part2dev_id:
+            if handoff_part < len(part2dev_id):
+                dev_id = part2dev_id[handoff_part]
+                if dev_id not in used:
+                    yield dict(r._devs[dev_id], handoff_index=next(index))
+                    used.add(dev_id)
+                    if len(used) == r._num_assigned_devs:
+                        hit_all_devs = True
+                        break
+
+
+def bench(label, func, parts, number):
+    per_call = timeit.timeit(lambda: [func(p) for p in parts],
+                             number=number) / (number * len(parts))
+    print('  %-34s %10.1f us/call' % (label, per_call * 1e6))
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--part-power', type=int, nargs='+',
+                        default=[16, 20])
+    parser.add_argument('--replicas', type=int, default=3)
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--handoffs', type=int, default=6,
+                        help='number of handoffs taken in the short test')
+    parser.add_argument('--parts', type=int, default=20)
+    parser.add_argument('--number', type=int, default=5)
+    args = parser.parse_args()
+
+    utils.HASH_PATH_SUFFIX = b'bench'
+    utils.HASH_PATH_PREFIX = b''
+    for part_power in args.part_power:
+        tmpdir = tempfile.mkdtemp()
+        try:
+            ring = make_ring(tmpdir, part_power, args.replicas, args.devices)
+            parts = list(range(0, 2 ** part_power,
+                               2 ** part_power // args.parts))
+            for part in parts:
+                if list(legacy_get_more_nodes(ring, part)) != \
+                        list(ring.get_more_nodes(part)):
+                    sys.exit('handoffs differ for part %d!' % part)
+            print('part_power=%d replicas=%d devices=%d' % (
+                part_power, args.replicas, args.devices))
+            for label, take in (('first %d' % args.handoffs, args.handoffs),
+                                ('all', None)):
+                before = bench(
+                    '%s handoffs (before)' % label,
+                    lambda p: list(itertools.islice(
+                        legacy_get_more_nodes(ring, p), take)),
+                    parts, args.number)
+                after = bench(
+                    '%s handoffs (after)' % label,
+                    lambda p: list(itertools.islice(
+                        ring.get_more_nodes(p), take)),
+                    parts, args.number)
+                print('  %-34s %10.2fx' % ('speedup', before / after))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Microbenchmark for Ring.get_part_nodes() and Ring.get_nodes().
+
+Compares the per-call latency of the cached primary node lists against the
+previous implementation, which rebuilt the node list on every call, for rings
+of a few different part powers::
+
+    python tools/benchmarks/ring_get_nodes.py --part-power 18 22
+"""
+from __future__ import print_function
+
+import argparse
+import array
+import os
+import random
+import shutil
+import tempfile
+import timeit
+
+from six.moves import range
+
+from swift.common import utils
+from swift.common.ring import Ring, RingData
+
+
+def make_ring(path, part_power, replicas, num_devs):
+    devs = [{'id': i, 'region': 1, 'zone': i % 8, 'weight': 100.0,
+             'ip': '10.0.%d.%d' % (i // 250, i % 250), 'port': 6200,
+             'device': 'sd%d' % i, 'meta': ''}
+            for i in range(num_devs)]
+    rng = random.Random(part_power)
+    replica2part2dev_id = []
+    for r in range(replicas):
+        replica2part2dev_id.append(array.array(
+            'H', (rng.randrange(num_devs) for _ in range(2 ** part_power))))
+    RingData(replica2part2dev_id, devs, 32 - part_power).save(
+        os.path.join(path, 'bench.ring.gz'))
+    return Ring(path, ring_name='bench')
+
+
+def legacy_get_part_nodes(ring, part):
+    part_nodes = []
+    seen_ids = set()
+    for r2p2d in ring._replica2part2dev_id:
+        if part < len(r2p2d):
+            dev_id = r2p2d[part]
+            if dev_id not in seen_ids:
+                part_nodes.append(ring.devs[dev_id])
+                seen_ids.add(dev_id)
+    return [dict(node, index=i) for i, node in enumerate(part_nodes)]
+
+
+def bench(label, func, args, number):
+    per_call = timeit.timeit(lambda: [func(*a) for a in args],
+                             number=number) / (number * len(args))
+    print('  %-34s %8.3f us/call' % (label, per_call * 1e6))
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--part-power', type=int, nargs='+',
+                        default=[18, 22])
+    parser.add_argument('--replicas', type=int, default=3)
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--hot-parts', type=int, default=1000,
+                        help='number of distinct partitions to look up')
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    utils.HASH_PATH_SUFFIX = b'bench'
+    utils.HASH_PATH_PREFIX = b''
+    for part_power in args.part_power:
+        tmpdir = tempfile.mkdtemp()
+        try:
+            ring = make_ring(tmpdir, part_power, args.replicas, args.devices)
+            rng = random.Random(0)
+            parts = [(rng.randrange(2 ** part_power),)
+                     for _ in range(args.hot_parts)]
+            names = [('AUTH_test', 'c%d' % i, 'o')
+                     for i in range(args.hot_parts)]
+            print('part_power=%d replicas=%d devices=%d' % (
+                part_power, args.replicas, args.devices))
+            before = bench('get_part_nodes (before)',
+                           lambda p: legacy_get_part_nodes(ring, p),
+                           parts, args.number)
+            after = bench('get_part_nodes (after)',
+                          ring.get_part_nodes, parts, args.number)
+            print('  %-34s %8.2fx' % ('speedup', before / after))
+            before = bench(
+                'get_nodes (before)',
+                lambda *n: legacy_get_part_nodes(ring, ring.get_part(*n)),
+                names, args.number)
+            after = bench('get_nodes (after)', ring.get_nodes, names,
+                          args.number)
+            print('  %-34s %8.2fx' % ('speedup', before / after))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
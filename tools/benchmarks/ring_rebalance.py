@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark for RingBuilder.rebalance().
+
+Runs a swift-ring-builder-analyzer scenario once for each of the given
+process counts, reports the wall-clock time of each run and checks that every
+run produced exactly the same ring::
+
+    python tools/benchmarks/ring_rebalance.py scenario.json --processes 1 4
+
+Without a scenario file, a scenario is made up that adds ``--devices``
+devices to a ring of ``--part-power``, then changes the weight of every
+tenth device and removes a few::
+
+    python tools/benchmarks/ring_rebalance.py --part-power 20 --devices 2000
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import sys
+import time
+
+from six.moves import range
+from six import StringIO
+
+from swift.cli.ring_builder_analyzer import parse_scenario, run_scenario
+
+
+def make_scenario(part_power, num_devs):
+    add_round = [
+        ['add', 'r%dz%d-10.%d.%d.%d:6200/sd%d' % (
+            1 + i % 3, 1 + i % 12, i % 12, i // 250, i % 250, i), 100]
+        for i in range(num_devs)]
+    weight_round = [['set_weight', i, 150] for i in range(0, num_devs, 10)]
+    remove_round = [['remove', i] for i in range(1, num_devs, num_devs // 4)]
+    return {'part_power': part_power, 'replicas': 3, 'overload': 0.1,
+            'random_seed': 203488,
+            'rounds': [add_round, weight_round, remove_round]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('scenario_path', nargs='?',
+                        help='swift-ring-builder-analyzer scenario file')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--part-power', type=int, default=18)
+    parser.add_argument('--devices', type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.scenario_path:
+        with open(args.scenario_path) as fp:
+            scenario_data = fp.read()
+    else:
+        scenario_data = json.dumps(make_scenario(args.part_power,
+                                                 args.devices))
+
+    rings = []
+    for processes in args.processes:
+        scenario = parse_scenario(scenario_data)
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            start = time.time()
+            builder = run_scenario(scenario, processes=processes)
+            elapsed = time.time() - start
+        finally:
+            sys.stdout = stdout
+        rings.append(builder.get_ring().to_dict())
+        print('processes=%-3d %8.2fs' % (processes, elapsed))
+
+    if any(ring != rings[0] for ring in rings):
+        print('rings differ!')
+        return 1
+    print('all rings identical')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
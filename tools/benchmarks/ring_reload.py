@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark of request latency while a changed ring is pushed.
+
+A number of greenthreads stand in for proxy requests: each repeatedly
+yields to the hub, calls Ring.get_nodes() and records how long that took
+from the moment it was ready to run, so time that other greenthreads spend
+blocking the hub (e.g. loading a ring inline) counts against every request
+waiting behind them. Part way through, a ring file with new partition
+assignments is written over the one in use; latency percentiles are
+reported for the requests made around that push, along with how long it
+took for the new ring to be in use, with background ring reloading off and
+on::
+
+    python tools/benchmarks/ring_reload.py --part-power 20 --concurrency 50
+"""
+from __future__ import print_function
+
+import argparse
+import array
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import eventlet
+from eventlet import tpool
+from six.moves import range
+
+from swift.common import utils
+from swift.common.ring import Ring, RingData
+
+
+def write_ring(path, part_power, replicas, num_devs, seed):
+    devs = [{'id': i, 'region': 1, 'zone': i % 8, 'weight': 100.0,
+             'ip': '10.0.%d.%d' % (i // 250, i % 250), 'port': 6200,
+             'device': 'sd%d' % i, 'meta': ''}
+            for i in range(num_devs)]
+    rng = random.Random(seed)
+    replica2part2dev_id = []
+    for r in range(replicas):
+        replica2part2dev_id.append(array.array(
+            'H', (rng.randrange(num_devs) for _ in range(2 ** part_power))))
+    ring_file = os.path.join(path, 'bench.ring.gz')
+    tmp_file = ring_file + '.tmp'
+    RingData(replica2part2dev_id, devs, 32 - part_power).save(tmp_file)
+    # make sure the mtime differs from that of the ring already loaded
+    os.utime(tmp_file, (seed, seed + 1))
+    return tmp_file, ring_file
+
+
+def percentile(sorted_values, pct):
+    index = int(round(pct / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def run(args, tmpdir, background_reload):
+    os.rename(*write_ring(tmpdir, args.part_power, args.replicas,
+                          args.devices, 0))
+    ring = Ring(tmpdir, ring_name='bench', reload_time=0.05,
+                background_reload=background_reload)
+    latencies = []
+    stop = []
+
+    def request(worker):
+        i = 0
+        while not stop:
+            ready = time.time()
+            eventlet.sleep(0)
+            ring.get_nodes('AUTH_test', 'c%d' % worker, 'o%d' % i)
+            latencies.append(time.time() - ready)
+            i += 1
+
+    pool = eventlet.GreenPool(args.concurrency)
+    for worker in range(args.concurrency):
+        pool.spawn_n(request, worker)
+    eventlet.sleep(args.duration / 2.0)
+    # the push: write the new ring in a real thread, as rsync or
+    # swift-ring-builder would from another process, then move it into place
+    old_md5 = ring.md5
+    tmp_file, ring_file = tpool.execute(
+        write_ring, tmpdir, args.part_power, args.replicas, args.devices, 1)
+    os.rename(tmp_file, ring_file)
+    pushed = time.time()
+    while ring.md5 == old_md5:
+        eventlet.sleep(0.001)
+    reload_time = time.time() - pushed
+    eventlet.sleep(args.duration / 2.0)
+    stop.append(True)
+    pool.waitall()
+    return sorted(latencies), reload_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--part-power', type=int, default=20)
+    parser.add_argument('--replicas', type=int, default=3)
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=4.0,
+                        help='seconds of requests around each push')
+    args = parser.parse_args()
+
+    utils.HASH_PATH_SUFFIX = b'bench'
+    utils.HASH_PATH_PREFIX = b''
+    print('part_power=%d replicas=%d devices=%d concurrency=%d' % (
+        args.part_power, args.replicas, args.devices, args.concurrency))
+    print('  %-22s %9s %9s %9s %9s %9s %9s' % (
+        '', 'requests', 'p50 ms', 'p99 ms', 'p99.9 ms', 'max ms',
+        'reload ms'))
+    for background_reload in (False, True):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            latencies, reload_time = run(args, tmpdir, background_reload)
+        finally:
+            shutil.rmtree(tmpdir)
+        print('  %-22s %9d %9.3f %9.3f %9.3f %9.3f %9.1f' % (
+            'background_reload=%s' % background_reload, len(latencies),
+            percentile(latencies, 50) * 1e3,
+            percentile(latencies, 99) * 1e3,
+            percentile(latencies, 99.9) * 1e3,
+            latencies[-1] * 1e3, reload_time * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# Copyright (c) 2010-2023 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark for listings of sharded containers.
+
+Lists a root container whose shard ranges have been returned by the root,
+with each shard listing delayed by a simulated backend latency, and reports
+the time taken for each value of shard_listing_concurrency::
+
+    PYTHONPATH=. python tools/benchmarks/sharded_listing.py \
+        --shards 200 --objects 50 --latency 0.01 --concurrency 1 4 16
+
+It must be run from the top of the source tree.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import time
+
+import eventlet
+import mock
+
+from swift.common.swob import Request, Response
+from swift.common.utils import ShardRange, Timestamp
+from swift.proxy import server as proxy_server
+from swift.proxy.controllers.container import ContainerController
+from test.unit import FakeRing, patch_policies
+
+
+def make_shard_ranges(num_shards, objects_per_shard):
+    ts = Timestamp.now()
+    bounds = [''] + ['obj%08d' % (i * objects_per_shard)
+                     for i in range(1, num_shards)] + ['']
+    return [ShardRange('.shards_a/c_%d' % i, ts, lower, upper,
+                       state=ShardRange.ACTIVE)
+            for i, (lower, upper) in enumerate(zip(bounds, bounds[1:]))]
+
+
+def make_fake_shard_listing(objects_per_shard, latency):
+    def fake_shard_listing(req, shard_range, headers, params,
+                           logger_thread_locals=None):
+        eventlet.sleep(latency)
+        index = int(shard_range.container.rsplit('_', 1)[1])
+        names = ['obj%08d' % (index * objects_per_shard + i)
+                 for i in range(objects_per_shard)]
+        names = [name for name in names if name > params['marker']]
+        objs = [{'name': name, 'bytes': 1, 'hash': 'etag',
+                 'content_type': 'text/plain',
+                 'last_modified': '1970-01-01T00:00:01.000000'}
+                for name in names[:int(params['limit'])]]
+        return objs, Response(headers={
+            'X-Backend-Storage-Policy-Index': '0'})
+    return fake_shard_listing
+
+
+def list_root(app, shard_ranges, limit):
+    req = Request.blank('/v1/a/c?format=json&limit=%d' % limit)
+    resp = Response(
+        body=json.dumps([dict(sr) for sr in shard_ranges]).encode('ascii'),
+        headers={'X-Backend-Storage-Policy-Index': '0',
+                 'X-Backend-Record-Type': 'shard'})
+    controller = ContainerController(app, 'a', 'c')
+    start = time.time()
+    listing = controller._get_from_shards(req, resp)
+    elapsed = time.time() - start
+    return elapsed, len(json.loads(listing.body))
+
+
+@patch_policies(legacy_only=True)
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--shards', type=int, default=200,
+                        help='number of shards in the container')
+    parser.add_argument('--objects', type=int, default=50,
+                        help='number of objects in each shard')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='latency of each shard listing, in seconds')
+    parser.add_argument('--limit', type=int, default=10000,
+                        help='listing limit')
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[1, 4, 16],
+                        help='values of shard_listing_concurrency to try')
+    args = parser.parse_args()
+
+    shard_ranges = make_shard_ranges(args.shards, args.objects)
+    fake_shard_listing = make_fake_shard_listing(args.objects, args.latency)
+    print('%-12s %10s %10s' % ('concurrency', 'objects', 'seconds'))
+    for concurrency in args.concurrency:
+        app = proxy_server.Application(
+            {'shard_listing_concurrency': concurrency,
+             'log_level': 'ERROR'},
+            account_ring=FakeRing(), container_ring=FakeRing())
+        with mock.patch.object(ContainerController, '_get_shard_listing',
+                               side_effect=fake_shard_listing):
+            elapsed, num_objects = list_root(app, shard_ranges, args.limit)
+        print('%-12d %10d %10.3f' % (concurrency, num_objects, elapsed))
+
+
+if __name__ == '__main__':
+    main()